@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0914
+"""
+Apply profile
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import re
+import sys
+
+# Instance keys in resource addresses, e.g. [0] or ["a"], which graph nodes don't have.
+INSTANCE_KEY = re.compile(r"\[[^\]]*\]")
+
+# A dependency edge in `terraform graph` output.
+GRAPH_EDGE = re.compile(r'^\s*"(?P<source>[^"]+)"\s*->\s*"(?P<target>[^"]+)"')
+
+
+def parse_timestamp(value: str) -> float:
+    """
+    Parse an @timestamp of the terraform -json output into epoch seconds.
+
+    :param value: The timestamp, e.g. 2024-05-01T12:00:00.123456Z
+    :type value: str
+    :return: float
+    """
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def get_node_name(address: str) -> str:
+    """
+    Return the graph node name of a resource address or `terraform graph` node.
+
+    :param address: e.g. module.db_proxy[0].aws_db_proxy.this or
+        "[root] module.db_proxy.aws_db_proxy.this (expand)"
+    :type address: str
+    :return: str
+    """
+    name: str = address.replace("[root] ", "")
+    name = re.sub(r" \((expand|close|destroy|prepare state)\)$", "", name)
+    return INSTANCE_KEY.sub("", name)
+
+
+def is_resource(name: str) -> bool:
+    """
+    Return True if a graph node name is a managed or data resource, and not a
+    variable, local, output, module, provider or other internal node.
+
+    :param name: The node name from get_node_name()
+    :type name: str
+    :return: bool
+    """
+    parts: list = name.split(".")
+    while len(parts) > 2 and parts[0] == "module":
+        parts = parts[2:]
+    if len(parts) == 3 and parts[0] == "data":
+        return True
+    return len(parts) == 2 and parts[0] not in (
+        "data",
+        "local",
+        "meta",
+        "module",
+        "output",
+        "var",
+    )
+
+
+def parse_graph(lines) -> dict:
+    """
+    Parse `terraform graph` DOT output into the resources each resource
+    depends on. Edges point from a resource to its dependency. Resources
+    mostly depend on each other through variables, outputs, locals and
+    module nodes, so these are collapsed: a resource depends on the first
+    resources reachable through them.
+
+    :param lines: The DOT lines
+    :return: dict of node name to set of node names
+    """
+    edges: dict = {}
+    for line in lines:
+        match = GRAPH_EDGE.match(line)
+        if match is None:
+            continue
+        source: str = get_node_name(match.group("source"))
+        target: str = get_node_name(match.group("target"))
+        if source != target:
+            edges.setdefault(source, set()).add(target)
+
+    reachable: dict = {}
+
+    def get_resources(node: str) -> set:
+        # The resources a non-resource node leads to, without passing a resource.
+        if node not in reachable:
+            reachable[node] = set()
+            for target in edges.get(node, set()):
+                if is_resource(target):
+                    reachable[node].add(target)
+                else:
+                    reachable[node] |= get_resources(target)
+        return reachable[node]
+
+    dependencies: dict = {}
+    for source, targets in edges.items():
+        if not is_resource(source):
+            continue
+        resources: set = set()
+        for target in targets:
+            resources |= {target} if is_resource(target) else get_resources(target)
+        resources.discard(source)
+        if resources:
+            dependencies[source] = resources
+    return dependencies
+
+
+def get_key(resource: dict) -> tuple:
+    """
+    Return the key of a resource in a profile. A replaced resource is both
+    deleted and created, so the address alone isn't unique.
+
+    :param resource: A resource of the timeline
+    :type resource: dict
+    :return: tuple of address and action
+    """
+    return resource["address"], resource["action"]
+
+
+class ApplyProfiler:
+    """
+    Class for building a per-resource timeline from `terraform apply -json`
+    or `terraform destroy -json` output, one line at a time
+    """
+
+    def __init__(self) -> None:
+        """Class constructor."""
+        self.resources: dict = {}
+        self.first: float = None
+        self.last: float = None
+        self.summary: dict = None
+
+    def feed(self, line: str) -> dict:
+        """
+        Process one line of the JSON output. Lines that aren't JSON, e.g. from
+        a wrapper script, are ignored.
+
+        :param line: The output line
+        :type line: str
+        :return: dict, the parsed message or None
+        """
+        try:
+            message: dict = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(message, dict) or "@timestamp" not in message:
+            return None
+        timestamp: float = parse_timestamp(message["@timestamp"])
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+        kind: str = message.get("type", "")
+        if kind == "change_summary":
+            self.summary = message.get("changes", None)
+        if kind not in ("apply_start", "apply_complete", "apply_errored"):
+            return message
+        hook: dict = message.get("hook", {})
+        address: str = hook.get("resource", {}).get("addr", None)
+        if address is None:
+            return message
+        action: str = hook.get("action", None)
+        resource: dict = self.resources.setdefault(
+            (address, action),
+            {"address": address, "action": action, "start": timestamp},
+        )
+        if kind == "apply_start":
+            resource["start"] = timestamp
+        else:
+            resource["end"] = timestamp
+            resource["status"] = "complete" if kind == "apply_complete" else "errored"
+            if "elapsed_seconds" in hook:
+                resource["elapsed_seconds"] = hook["elapsed_seconds"]
+        return message
+
+    def timeline(self) -> list:
+        """
+        Return the resources ordered by start, with times relative to the first
+        message. Resources still in progress end at the last message.
+
+        :return: list of dict
+        """
+        timeline: list = []
+        for resource in sorted(self.resources.values(), key=lambda item: item["start"]):
+            end: float = resource.get("end", self.last)
+            timeline.append(
+                {
+                    "address": resource["address"],
+                    "action": resource["action"],
+                    "status": resource.get("status", "in_progress"),
+                    "start_s": resource["start"] - self.first,
+                    "end_s": end - self.first,
+                    "duration_s": end - resource["start"],
+                }
+            )
+        return timeline
+
+    def profile(self, dependencies: dict = None) -> dict:
+        """
+        Return the timeline with its critical path.
+
+        :param dependencies: Dependencies from parse_graph(). Default: None,
+            inferred from the timeline
+        :type dependencies: dict
+        :return: dict
+        """
+        timeline: list = self.timeline()
+        wall: float = (self.last - self.first) if self.first is not None else 0.0
+        busy: float = sum(resource["duration_s"] for resource in timeline)
+        path: list = get_critical_path(timeline, dependencies)
+        return {
+            "wall_s": wall,
+            "busy_s": busy,
+            "parallelism": busy / wall if wall > 0 else 0.0,
+            "changes": self.summary,
+            "resources": timeline,
+            "critical_path": path,
+            "critical_path_s": sum(resource["duration_s"] for resource in path),
+        }
+
+
+def get_critical_path(timeline: list, dependencies: dict = None) -> list:
+    """
+    Return the chain of resources that determined the total apply time.
+
+    With graph dependencies, it is the longest chain of dependent resources
+    by duration, with the dependencies reversed for deletes. The two halves
+    of a replaced resource depend on each other in the order they ran.
+    Without them, each resource is assumed to have waited for the last
+    resource that finished before it started, and the chain is followed back
+    from the last resource to finish.
+
+    :param timeline: The timeline from ApplyProfiler.timeline()
+    :param dependencies: Dependencies from parse_graph(). Default: None
+    :type timeline: list
+    :type dependencies: dict
+    :return: list of dict, in execution order
+    """
+    if len(timeline) == 0:
+        return []
+    by_start: list = sorted(timeline, key=lambda resource: resource["start_s"])
+    previous: dict = {}
+    if dependencies is None:
+        for resource in by_start:
+            finished: list = [
+                other
+                for other in by_start
+                if other is not resource and other["end_s"] <= resource["start_s"]
+            ]
+            if finished:
+                previous[get_key(resource)] = max(
+                    finished, key=lambda other: other["end_s"]
+                )
+    else:
+        nodes: dict = {}
+        for resource in by_start:
+            nodes.setdefault(get_node_name(resource["address"]), []).append(resource)
+        reversed_dependencies: dict = {}
+        for source, targets in dependencies.items():
+            for target in targets:
+                reversed_dependencies.setdefault(target, set()).add(source)
+        finish: dict = {}
+        for resource in sorted(timeline, key=lambda resource: resource["end_s"]):
+            edges: dict = (
+                reversed_dependencies
+                if resource["action"] == "delete"
+                else dependencies
+            )
+            upstream: list = [
+                other
+                for name in edges.get(get_node_name(resource["address"]), set())
+                for other in nodes.get(name, [])
+                if get_key(other) in finish
+            ] + [
+                other
+                for other in by_start
+                if other["address"] == resource["address"]
+                and other["action"] != resource["action"]
+                and other["end_s"] <= resource["start_s"]
+            ]
+            best: dict = max(
+                upstream, key=lambda other: finish[get_key(other)], default=None
+            )
+            base: float = finish[get_key(best)] if best is not None else 0.0
+            finish[get_key(resource)] = base + resource["duration_s"]
+            if best is not None:
+                previous[get_key(resource)] = best
+        last: dict = max(timeline, key=lambda resource: finish[get_key(resource)])
+        return follow_path(last, previous)
+    return follow_path(max(timeline, key=lambda resource: resource["end_s"]), previous)
+
+
+def follow_path(last: dict, previous: dict) -> list:
+    """
+    Follow the predecessors back from the last resource.
+
+    :param last: The last resource of the path
+    :param previous: The predecessor per resource key
+    :type last: dict
+    :type previous: dict
+    :return: list of dict, in execution order
+    """
+    path: list = [last]
+    while get_key(path[-1]) in previous:
+        path.append(previous[get_key(path[-1])])
+    return list(reversed(path))
+
+
+def compare(baseline: dict, current: dict) -> dict:
+    """
+    Compare two profiles resource by resource.
+
+    :param baseline: The earlier profile
+    :param current: The later profile
+    :type baseline: dict
+    :type current: dict
+    :return: dict
+    """
+    before: dict = {get_key(resource): resource for resource in baseline["resources"]}
+    after: dict = {get_key(resource): resource for resource in current["resources"]}
+    resources: list = []
+    for key in sorted(set(before) | set(after), key=str):
+        old: float = before[key]["duration_s"] if key in before else None
+        new: float = after[key]["duration_s"] if key in after else None
+        resources.append(
+            {
+                "address": key[0],
+                "action": key[1],
+                "baseline_s": old,
+                "current_s": new,
+                "delta_s": new - old if old is not None and new is not None else None,
+            }
+        )
+    resources.sort(key=lambda resource: abs(resource["delta_s"] or 0), reverse=True)
+    return {
+        "wall_delta_s": current["wall_s"] - baseline["wall_s"],
+        "critical_path_delta_s": current["critical_path_s"]
+        - baseline["critical_path_s"],
+        "baseline_critical_path": [
+            resource["address"] for resource in baseline["critical_path"]
+        ],
+        "current_critical_path": [
+            resource["address"] for resource in current["critical_path"]
+        ],
+        "resources": resources,
+    }
+
+
+def load_profile(path: str, dependencies: dict = None) -> dict:
+    """
+    Load a saved profile, or build one from a recorded -json log.
+
+    :param path: A profile JSON file or a terraform -json log
+    :param dependencies: Dependencies from parse_graph(). Default: None
+    :type path: str
+    :type dependencies: dict
+    :return: dict
+    """
+    with open(path, encoding="utf-8") as source:
+        text: str = source.read()
+    try:
+        profile = json.loads(text)
+        if isinstance(profile, dict) and "resources" in profile:
+            return profile
+    except ValueError:
+        pass
+    profiler = ApplyProfiler()
+    for line in text.splitlines():
+        profiler.feed(line)
+    return profiler.profile(dependencies)
+
+
+def format_profile(profile: dict, width: int = 50) -> str:
+    """
+    Render the timeline as text bars, marking the critical path with *.
+
+    :param profile: The profile
+    :param width: The width of the bars. Default: 50
+    :type profile: dict
+    :type width: int
+    :return: str
+    """
+    wall: float = profile["wall_s"] or 1.0
+    critical: set = {get_key(resource) for resource in profile["critical_path"]}
+    lines: list = []
+    for resource in profile["resources"]:
+        start: int = int(resource["start_s"] / wall * width)
+        length: int = max(1, int(resource["duration_s"] / wall * width))
+        marker: str = "*" if get_key(resource) in critical else " "
+        bars: str = " " * start + "#" * length
+        lines.append(
+            f"{marker} {bars.ljust(width)} {resource['duration_s']:8.1f}s "
+            f"{resource['action']} {resource['address']}"
+        )
+    lines.append(
+        f"wall {profile['wall_s']:.1f}s, critical path {profile['critical_path_s']:.1f}s, "
+        f"parallelism {profile['parallelism']:.2f}"
+    )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """
+    Profile a terraform apply or destroy from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(
+        description="Profile terraform apply -json output."
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    record = subparsers.add_parser("record", help="Profile a live or recorded log")
+    record.add_argument("log", nargs="?", default="-", help="Default: - for stdin")
+    record.add_argument("--graph", help="`terraform graph` output for dependencies")
+    record.add_argument("--output", help="Write the profile JSON to this file")
+    record.add_argument("--echo", action="store_true", help="Print @message lines")
+    diff = subparsers.add_parser("compare", help="Compare two profiles or logs")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    if args.action == "compare":
+        print(
+            json.dumps(
+                compare(load_profile(args.baseline), load_profile(args.current)),
+                indent=2,
+            )
+        )
+        return 0
+
+    dependencies: dict = None
+    if args.graph is not None:
+        with open(args.graph, encoding="utf-8") as graph:
+            dependencies = parse_graph(graph)
+    profiler = ApplyProfiler()
+
+    def feed(lines) -> None:
+        for line in lines:
+            message: dict = profiler.feed(line)
+            if args.echo and message is not None:
+                print(message.get("@message", ""), file=sys.stderr, flush=True)
+
+    if args.log == "-":
+        feed(sys.stdin)
+    else:
+        with open(args.log, encoding="utf-8") as log:
+            feed(log)
+    profile: dict = profiler.profile(dependencies)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(profile, output, indent=2)
+    print(format_profile(profile))
+    errored: bool = any(
+        resource["status"] == "errored" for resource in profile["resources"]
+    )
+    return 1 if errored else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Async RDS
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+import psycopg2
+
+import rds
+
+
+class AsyncQA(rds.QA):
+    """
+    Class for QA test cases with overlapping AWS and database I/O.
+
+    The accessors are inherited from QA and read the cached description. The
+    blocking boto3 and psycopg2 calls run on worker threads, so independent
+    calls are in flight at the same time.
+    """
+
+    async def load(self) -> bool:
+        """
+        Describe the QA instance and, as soon as its secret ARN is known,
+        fetch the master user secret.
+
+        :return: bool
+        """
+        exists: bool = await asyncio.to_thread(self.refresh)
+        if not exists:
+            return False
+        return await asyncio.to_thread(self.secretsmanager_exist)
+
+    async def check_database(self) -> bool:
+        """
+        Connect to the database and execute a simple query.
+
+        :return: bool
+        """
+        try:
+            return await asyncio.to_thread(self.connect_to_database)
+        except psycopg2.Error as error:
+            logging.error(error)
+            return False
+
+    async def verify(self) -> dict:
+        """
+        Run the instance describe and secret fetch concurrently with the
+        CloudWatch log group lookup, then the database round trip.
+
+        :return: dict
+        """
+        start: float = time.perf_counter()
+        secret_exist, log_groups = await asyncio.gather(
+            self.load(), asyncio.to_thread(self.get_log_group_names)
+        )
+        database_connected: bool = False
+        if secret_exist:
+            database_connected = await self.check_database()
+        elapsed: float = time.perf_counter() - start
+        logging.info(f"Verified {self.identifier} in {elapsed:.2f}s")
+        return {
+            "instance_exist": self.instance_exist(),
+            "is_instance_available": self.is_instance_available(),
+            "secretsmanager_exist": secret_exist,
+            "log_groups": sorted(log_groups),
+            "database_connected": database_connected,
+            "elapsed_s": elapsed,
+        }
+
+
+async def verify_all(identifiers: list, **kwargs) -> list:
+    """
+    Verify several QA instances concurrently. An instance whose verification
+    fails is reported with the error instead of failing the others.
+
+    :param identifiers: The DB instance identifiers
+    :param kwargs: Passed on to the AsyncQA constructor
+    :type identifiers: list
+    :return: list
+    """
+    results: list = await asyncio.gather(
+        *(
+            AsyncQA(identifier=identifier, **kwargs).verify()
+            for identifier in identifiers
+        ),
+        return_exceptions=True,
+    )
+    reports: list = []
+    for identifier, result in zip(identifiers, results):
+        if isinstance(result, Exception):
+            logging.error(f"Verifying {identifier} failed: {result}")
+            result = {
+                "database_connected": False,
+                "error": f"{type(result).__name__}: {result}",
+            }
+        reports.append(result)
+    return reports
+
+
+def main() -> int:
+    """
+    Verify QA instances from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Verify QA instances concurrently.")
+    parser.add_argument("identifiers", nargs="*", default=["qa"])
+    parser.add_argument("--database", default="postgres")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    args = parser.parse_args()
+
+    results: list = asyncio.run(
+        verify_all(
+            args.identifiers,
+            database=args.database,
+            region=args.region,
+            endpoint_url=args.endpoint_url,
+        )
+    )
+    print(json.dumps(dict(zip(args.identifiers, results)), indent=2))
+    ok: bool = all(result["database_connected"] for result in results)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0913,R0914
+"""
+Cluster
+"""
+
+import argparse
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import psycopg2
+from botocore.exceptions import ClientError
+
+import rds
+from secret_cache import SHARED_CACHE
+from snapshot import ClusterSnapshot, InstanceSnapshot
+from stats import summarize
+
+# Returns the instance a connection to an Aurora PostgreSQL endpoint landed on.
+SERVER_IDENTITY_QUERY: str = "SELECT aurora_db_instance_identifier()"
+
+# Replica lag as seen by the writer, per replica.
+REPLICA_STATUS_QUERY: str = (
+    "SELECT server_id, replica_lag_in_msec FROM aurora_replica_status() "
+    "WHERE session_id <> 'MASTER_SESSION_ID'"
+)
+
+# The table written by the lag load, dropped when the measurement ends.
+LOAD_TABLE: str = "qa_cluster_load"
+
+
+def describe_cluster_members(client, identifier: str):
+    """
+    Describe every instance of a cluster with a single server side filter,
+    following the pages until the end.
+
+    :param client: A boto3 RDS client
+    :param identifier: The DB cluster identifier
+    :type identifier: str
+    :return: generator of dict
+    """
+    paginator = client.get_paginator("describe_db_instances")
+    for page in paginator.paginate(
+        Filters=[{"Name": "db-cluster-id", "Values": [identifier]}]
+    ):
+        yield from page.get("DBInstances", [])
+
+
+def add_lag_samples(samples: dict, unknown: dict, rows: list) -> None:
+    """
+    Add the replica lags of an aurora_replica_status() sample in seconds. A
+    replica reports no lag, i.e. NULL, while it is starting or catching up,
+    which is counted as unknown instead.
+
+    :param samples: The lags in seconds per replica, extended in place
+    :param unknown: The number of samples without a lag per replica, updated in place
+    :param rows: The server_id and replica_lag_in_msec rows
+    :type samples: dict
+    :type unknown: dict
+    :type rows: list
+    """
+    for server, lag in rows:
+        if lag is None:
+            unknown[server] = unknown.get(server, 0) + 1
+        else:
+            samples.setdefault(server, []).append(lag / 1000)
+
+
+def get_balance(counts: dict, members: list) -> dict:
+    """
+    Summarize how evenly connections landed on the given members.
+
+    :param counts: The number of connections per member
+    :param members: Every member that should receive connections
+    :type counts: dict
+    :type members: list
+    :return: dict
+    """
+    total: int = sum(counts.values())
+    shares: dict = {
+        member: counts.get(member, 0) / total if total > 0 else 0.0
+        for member in members
+    }
+    expected: float = 1 / len(members) if len(members) > 0 else 0.0
+    return {
+        "connections": dict(counts),
+        "shares": shares,
+        "expected_share": expected,
+        "max_deviation": max(
+            (abs(share - expected) for share in shares.values()), default=0.0
+        ),
+        "unused": [member for member in members if counts.get(member, 0) == 0],
+    }
+
+
+class ClusterQA:
+    """
+    Class for QA test cases of an Aurora cluster
+    """
+
+    def __init__(
+        self,
+        identifier: str = "qa",
+        database: str = "postgres",
+        region: str = "eu-central-1",
+        log_level: int = logging.INFO,
+        endpoint_url: str = None,
+    ) -> None:
+        """Class constructor.
+
+        :param identifier: The identifier of the QA DB cluster. Default: qa
+        :param database: The name of the QA database. Default: postgres
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :param log_level: A valid log level from the logging module. Default: logging.INFO
+        :param endpoint_url: Send the AWS API calls to this endpoint. Default: None
+        :type identifier: str
+        :type database: str
+        :type region: str
+        :type log_level: int
+        :type endpoint_url: str
+        """
+        logging.basicConfig(
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            level=log_level,
+        )
+        self.identifier: str = identifier
+        self.database: str = database
+        self.session = boto3.session.Session()
+        self.client = self.session.client(
+            service_name="rds", region_name=region, endpoint_url=endpoint_url
+        )
+        self.secrets_client = self.session.client(
+            service_name="secretsmanager", region_name=region, endpoint_url=endpoint_url
+        )
+        self.cluster: ClusterSnapshot = None
+        self.members: dict = {}
+
+    def refresh(self) -> ClusterSnapshot:
+        """
+        Describe the cluster, then all of its instances in one filtered call.
+
+        :return: ClusterSnapshot, or None if the cluster doesn't exist
+        """
+        try:
+            clusters: list = self.client.describe_db_clusters(
+                DBClusterIdentifier=self.identifier
+            )["DBClusters"]
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "DBClusterNotFoundFault":
+                raise
+            clusters = []
+        self.cluster = (
+            ClusterSnapshot.from_description(clusters[0]) if len(clusters) > 0 else None
+        )
+        self.members = {}
+        if self.cluster is not None:
+            self.members = {
+                instance["DBInstanceIdentifier"]: InstanceSnapshot.from_description(
+                    instance
+                )
+                for instance in describe_cluster_members(self.client, self.identifier)
+            }
+        return self.cluster
+
+    def get_cluster(self) -> ClusterSnapshot:
+        """
+        Return the cached cluster snapshot, describing it on first use.
+
+        :return: ClusterSnapshot
+        """
+        if self.cluster is None:
+            self.refresh()
+        return self.cluster
+
+    def get_writer(self) -> str:
+        """
+        Return the identifier of the writer instance.
+
+        :return: str
+        """
+        return next(
+            (
+                member.identifier
+                for member in self.get_cluster().members
+                if member.is_writer
+            ),
+            None,
+        )
+
+    def get_readers(self) -> list:
+        """
+        Return the identifiers of the reader instances.
+
+        :return: list
+        """
+        return sorted(
+            member.identifier
+            for member in self.get_cluster().members
+            if not member.is_writer
+        )
+
+    def verify(self) -> list:
+        """
+        Check that the cluster and all of its members are available, that it
+        has exactly one writer and that the cluster and instance descriptions
+        agree on the members. Return the problems found.
+
+        :return: list of str
+        """
+        cluster: ClusterSnapshot = self.refresh()
+        if cluster is None:
+            return [f"Cluster {self.identifier} doesn't exist"]
+        problems: list = []
+        if cluster.status != "available":
+            problems.append(f"Cluster {cluster.identifier} is {cluster.status}")
+        writers: list = [member for member in cluster.members if member.is_writer]
+        if len(writers) != 1:
+            problems.append(f"Cluster has {len(writers)} writers, expected 1")
+        for member in cluster.members:
+            instance: InstanceSnapshot = self.members.get(member.identifier, None)
+            if instance is None:
+                problems.append(f"Member {member.identifier} wasn't described")
+            elif instance.status != "available":
+                problems.append(f"Member {member.identifier} is {instance.status}")
+        return problems
+
+    def invalidate_secret(self) -> None:
+        """
+        Drop the cached master user secret, so the next use fetches it again.
+        """
+        cluster: ClusterSnapshot = self.get_cluster()
+        if cluster is not None and cluster.master_user_secret_arn is not None:
+            SHARED_CACHE.invalidate(cluster.master_user_secret_arn)
+
+    def get_connection_parameters(self, reader: bool = False) -> dict:
+        """
+        Return the psycopg2 connection parameters for the writer or the reader
+        endpoint, using the master user secret of the cluster. The connection
+        factory fetches the secret again when a login is rejected, so long
+        runs survive a rotation of the secret.
+
+        :param reader: Connect through the reader endpoint. Default: False
+        :type reader: bool
+        :return: dict
+        :raises ValueError: If the cluster doesn't exist or RDS doesn't manage
+            its master user password
+        """
+        cluster: ClusterSnapshot = self.get_cluster()
+        if cluster is None:
+            raise ValueError(f"Cluster {self.identifier} doesn't exist")
+        if cluster.master_user_secret_arn is None:
+            raise ValueError(
+                f"Cluster {self.identifier} has no master user secret, "
+                "set manage_master_user_password"
+            )
+        secret: dict = SHARED_CACHE.get(
+            self.secrets_client, cluster.master_user_secret_arn
+        )
+        return {
+            "dbname": self.database,
+            "user": secret.get("username", None),
+            "password": secret.get("password", None),
+            "host": cluster.reader_endpoint if reader else cluster.endpoint,
+            "port": cluster.port,
+            "sslmode": "verify-full",
+            "connection_factory": functools.partial(rds.connect_with_secret, qa=self),
+        }
+
+    def measure_reader_distribution(
+        self, connections: int = 100, clients: int = 8, query: str = "SELECT 1"
+    ) -> dict:
+        """
+        Open new connections through the reader endpoint, run a query on each
+        and count which replica served it.
+
+        :param connections: The number of connections to open. Default: 100
+        :param clients: The number of concurrent clients. Default: 8
+        :param query: The read query to run per connection. Default: SELECT 1
+        :type connections: int
+        :type clients: int
+        :type query: str
+        :return: dict
+        """
+        parameters: dict = self.get_connection_parameters(reader=True)
+
+        def read(_index: int) -> str:
+            conn = psycopg2.connect(**parameters)
+            try:
+                with conn.cursor() as sql:
+                    sql.execute(SERVER_IDENTITY_QUERY)
+                    server: str = sql.fetchone()[0]
+                    sql.execute(query)
+                return server
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            counts: Counter = Counter(executor.map(read, range(connections)))
+        balance: dict = get_balance(counts, self.get_readers())
+        logging.info(
+            f"Reader endpoint spread {connections} connections over "
+            f"{len(counts)} replicas, max deviation {balance['max_deviation']:.1%}"
+        )
+        return balance
+
+    def measure_replica_lag(
+        self, duration: float = 60, writers: int = 4, interval: float = 1.0
+    ) -> dict:
+        """
+        Run an insert load on the writer and sample the lag of every replica
+        from aurora_replica_status() while it runs.
+
+        :param duration: The run time in seconds. Default: 60
+        :param writers: The number of concurrent writing clients. Default: 4
+        :param interval: Seconds between lag samples. Default: 1.0
+        :type duration: float
+        :type writers: int
+        :type interval: float
+        :return: dict of replica to lag statistics in milliseconds
+        """
+        parameters: dict = self.get_connection_parameters()
+        conn = psycopg2.connect(**parameters)
+        conn.autocommit = True
+        with conn.cursor() as sql:
+            sql.execute(
+                f"CREATE TABLE IF NOT EXISTS {LOAD_TABLE} "
+                "(id bigserial PRIMARY KEY, payload text, created_at timestamptz DEFAULT now())"
+            )
+        stop = threading.Event()
+        written: list = [0] * writers
+
+        def write(index: int) -> None:
+            writer = psycopg2.connect(**parameters)
+            try:
+                while not stop.is_set():
+                    with writer.cursor() as sql:
+                        sql.execute(
+                            f"INSERT INTO {LOAD_TABLE} (payload) "
+                            "SELECT repeat('x', 512) FROM generate_series(1, 100)"
+                        )
+                    writer.commit()
+                    written[index] += 100
+            finally:
+                writer.close()
+
+        samples: dict = {}
+        unknown: dict = {}
+        executor = ThreadPoolExecutor(max_workers=writers)
+        futures: list = [executor.submit(write, index) for index in range(writers)]
+        try:
+            deadline: float = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                with conn.cursor() as sql:
+                    sql.execute(REPLICA_STATUS_QUERY)
+                    add_lag_samples(samples, unknown, sql.fetchall())
+                time.sleep(interval)
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+            try:
+                with conn.cursor() as sql:
+                    sql.execute(f"DROP TABLE IF EXISTS {LOAD_TABLE}")
+            finally:
+                conn.close()
+        for future in futures:
+            future.result()
+        return {
+            "rows_per_second": sum(written) / duration,
+            "replicas": {
+                server: dict(
+                    summarize(samples.get(server, [])), unknown=unknown.get(server, 0)
+                )
+                for server in sorted(set(samples) | set(unknown))
+            },
+        }
+
+    def __probe_writer(self, parameters: dict) -> str:
+        """
+        Connect to the writer endpoint and return the instance that accepts
+        writes there, or None while the endpoint is unavailable.
+
+        :return: str
+        """
+        try:
+            conn = psycopg2.connect(connect_timeout=2, **parameters)
+        except psycopg2.OperationalError:
+            return None
+        try:
+            with conn.cursor() as sql:
+                sql.execute("SELECT pg_is_in_recovery()")
+                if sql.fetchone()[0]:
+                    return None
+                sql.execute(SERVER_IDENTITY_QUERY)
+                return sql.fetchone()[0]
+        except psycopg2.Error:
+            return None
+        finally:
+            conn.close()
+
+    def measure_failover(
+        self, target: str = None, timeout: float = 600, interval: float = 0.5
+    ) -> dict:
+        """
+        Fail over the cluster and time how long the writer endpoint can't
+        accept writes, i.e. from the first failed probe until a new writer
+        answers it.
+
+        :param target: The reader to promote. Default: None, chosen by RDS
+        :param timeout: The maximum number of seconds to wait. Default: 600
+        :param interval: Seconds between probes. Default: 0.5
+        :type target: str
+        :type timeout: float
+        :type interval: float
+        :return: dict
+        """
+        parameters: dict = self.get_connection_parameters()
+        old_writer: str = self.get_writer()
+        arguments: dict = {"DBClusterIdentifier": self.identifier}
+        if target is not None:
+            arguments["TargetDBInstanceIdentifier"] = target
+        start: float = time.perf_counter()
+        self.client.failover_db_cluster(**arguments)
+        first_failure: float = None
+        new_writer: str = None
+        while time.perf_counter() - start < timeout:
+            writer: str = self.__probe_writer(parameters)
+            now: float = time.perf_counter()
+            if writer is None and first_failure is None:
+                first_failure = now
+            if writer is not None and writer != old_writer:
+                new_writer = writer
+                break
+            time.sleep(interval)
+        recovered: float = time.perf_counter()
+        self.refresh()
+        result: dict = {
+            "old_writer": old_writer,
+            "new_writer": new_writer,
+            "completed": new_writer is not None,
+            "total_s": recovered - start,
+            "unavailable_s": (
+                recovered - first_failure if first_failure is not None else 0.0
+            ),
+        }
+        logging.info(
+            f"Failover from {old_writer} to {new_writer} took {result['total_s']:.1f}s, "
+            f"writes unavailable for {result['unavailable_s']:.1f}s"
+        )
+        return result
+
+
+def main() -> int:
+    """
+    Verify and measure the QA Aurora cluster from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Verify the QA Aurora cluster.")
+    parser.add_argument("action", choices=["verify", "distribution", "lag", "failover"])
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--database", default="postgres")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--target", help="The reader to promote on failover")
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    args = parser.parse_args()
+
+    qa = ClusterQA(
+        identifier=args.identifier,
+        database=args.database,
+        region=args.region,
+        endpoint_url=args.endpoint_url,
+    )
+    if args.action == "verify":
+        problems: list = qa.verify()
+        for problem in problems:
+            logging.error(problem)
+        if qa.cluster is not None:
+            print(
+                json.dumps(
+                    {"writer": qa.get_writer(), "readers": qa.get_readers()}, indent=2
+                )
+            )
+        return 0 if len(problems) == 0 else 1
+    try:
+        if args.action == "distribution":
+            result: dict = qa.measure_reader_distribution(
+                args.connections, args.clients
+            )
+        elif args.action == "lag":
+            result = qa.measure_replica_lag(args.duration, args.clients)
+        else:
+            result = qa.measure_failover(args.target)
+    except ValueError as error:
+        logging.error(error)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,755 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0912,R0914
+"""
+Config
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+import spec
+
+QA_MAIN: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "tests", "qa", "main.tf"
+)
+MODULE_VARIABLES: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "variables.tf"
+)
+
+ENVIRONMENTS: tuple = ("dev", "test", "staging", "uat", "training", "prod")
+STORAGE_TYPES: tuple = ("standard", "gp2", "gp3", "io1")
+LOG_EXPORTS: tuple = ("postgresql", "upgrade")
+MONITORING_INTERVALS: tuple = (0, 1, 5, 10, 15, 30, 60)
+# 7 days, a number of months of 31 days up to 23, or 2 years.
+PERFORMANCE_INSIGHTS_RETENTION: tuple = (
+    (7,) + tuple(31 * n for n in range(1, 24)) + (731,)
+)
+
+# The config map of locals.tf.
+CONFIG: dict = {
+    "prod": {
+        "instance_class": "db.t3.micro",
+        "allocated_storage": 20,
+        "max_allocated_storage": 50,
+        "instance_is_multi_az": True,
+        "skip_final_snapshot": False,
+        "performance_insights_enabled": True,
+        "performance_insights_retention_period": 7,
+        "delete_automated_backups": False,
+        "enable_default_backup": True,
+        "enabled_cloudwatch_logs_exports": ["postgresql", "upgrade"],
+        "cloudwatch_log_group_retention_in_days": 7,
+    },
+    "non-prod": {
+        "instance_class": "db.t3.micro",
+        "allocated_storage": 20,
+        "max_allocated_storage": 0,
+        "instance_is_multi_az": False,
+        "skip_final_snapshot": True,
+        "performance_insights_enabled": False,
+        "performance_insights_retention_period": None,
+        "delete_automated_backups": True,
+        "enable_default_backup": False,
+        "enabled_cloudwatch_logs_exports": [],
+        "cloudwatch_log_group_retention_in_days": 1,
+    },
+}
+
+# The default matrix: every environment, storage type and proxy setting.
+DEFAULT_AXES: dict = {
+    "environment": list(ENVIRONMENTS),
+    "storage_type": list(STORAGE_TYPES),
+    "is_proxy_included": [False, True],
+}
+
+# aws_db_instance attributes in a plan, mapped to the resolved field names.
+PLAN_ATTRIBUTES: dict = {
+    "instance_class": "instance_class",
+    "allocated_storage": "allocated_storage",
+    "max_allocated_storage": "max_allocated_storage",
+    "storage_type": "storage_type",
+    "iops": "iops",
+    "storage_throughput": "storage_throughput",
+    "storage_encrypted": "storage_encrypted",
+    "multi_az": "multi_az",
+    "publicly_accessible": "publicly_accessible",
+    "iam_database_authentication_enabled": "iam_database_authentication_enabled",
+    "performance_insights_enabled": "performance_insights_enabled",
+    "performance_insights_retention_period": "performance_insights_retention_period",
+    "deletion_protection": "deletion_protection",
+    "auto_minor_version_upgrade": "auto_minor_version_upgrade",
+    "ca_cert_identifier": "ca_identifier",
+    "username": "master_username",
+    "db_name": "db_name",
+    "engine": "engine",
+    "maintenance_window": "preferred_maintenance_window",
+    "enabled_cloudwatch_logs_exports": "cloudwatch_logs_exports",
+    "skip_final_snapshot": "skip_final_snapshot",
+    "delete_automated_backups": "delete_automated_backups",
+    "monitoring_interval": "monitoring_interval",
+    "tags": "tags",
+}
+
+# The instance fields expected to match the resolved module arguments.
+DERIVED_EXPECTATIONS: tuple = (
+    "allocated_storage",
+    "auto_minor_version_upgrade",
+    "ca_identifier",
+    "cloudwatch_logs_exports",
+    "db_name",
+    "deletion_protection",
+    "engine",
+    "iam_database_authentication_enabled",
+    "instance_class",
+    "master_username",
+    "multi_az",
+    "performance_insights_enabled",
+    "performance_insights_retention_period",
+    "preferred_maintenance_window",
+    "publicly_accessible",
+    "storage_encrypted",
+    "storage_type",
+)
+
+# A `key = value` assignment in a terraform block.
+ASSIGNMENT = re.compile(r"^\s*(?P<name>\w+)\s*=\s*(?P<value>.+?)\s*$")
+
+
+def fallback(value, default):
+    """
+    Return the value, or the default when it is null, as `x != null ? x : y`.
+
+    :param value: The variable value
+    :param default: The default config value
+    :return: The resolved value
+    """
+    return value if value is not None else default
+
+
+def resolve(variables: dict) -> dict:
+    """
+    Resolve the settings of the DB instance the way locals.tf and main.tf do,
+    without calling AWS. Values known only after apply, e.g. the random part
+    of the final snapshot identifier, are left as placeholders.
+
+    :param variables: The module variables. Missing ones get their defaults
+    :type variables: dict
+    :return: dict of resolved settings, named like the snapshot fields
+    """
+    var: dict = dict(DEFAULT_VARIABLES, **variables)
+    environment: str = "prod" if var["environment"] == "prod" else "non-prod"
+    default: dict = CONFIG[environment]
+    skip_final_snapshot: bool = fallback(
+        var["skip_final_snapshot"], default["skip_final_snapshot"]
+    )
+    performance_insights_enabled: bool = fallback(
+        var["performance_insights_enabled"], default["performance_insights_enabled"]
+    )
+    retention: int = fallback(
+        var["performance_insights_retention_period"],
+        default["performance_insights_retention_period"],
+    )
+    if performance_insights_enabled and retention is None:
+        # RDS keeps 7 days of Performance Insights data unless told otherwise.
+        retention = 7
+    exports: list = var["enabled_cloudwatch_logs_exports"] or list(
+        default["enabled_cloudwatch_logs_exports"]
+    )
+    iops = var["iops"]
+    if var["is_cluster"] and iops is None and var["storage_type"] == "io1":
+        # Only the cluster gets local.iops; the instance gets var.iops.
+        iops = 1000
+    enable_default_backup: bool = fallback(
+        var["enable_default_backup"], default["enable_default_backup"]
+    )
+    tags: dict = {
+        "dfds.env": var["environment"],
+        "dfds.cost.centre": var.get("cost_centre", None),
+        "dfds.service.availability": var.get("service_availability", None),
+        "dfds.library.name": "blueprints",
+        "dfds.automation.tool": "Terraform",
+        "dfds.automation.initiator.location": var["automation_initiator_location"],
+    }
+    tags.update(var["optional_tags"])
+    if var["resource_owner_contact_email"] is not None:
+        tags["dfds.owner"] = var["resource_owner_contact_email"]
+    if var["pipeline_location"] is not None:
+        tags["dfds.automation.initiator.pipeline"] = var["pipeline_location"]
+    data_tags: dict = {"dfds.data.classification": var.get("data_classification")}
+    data_tags.update(var["optional_data_specific_tags"])
+    if var["additional_backup_retention"] is not None:
+        data_tags["dfds.data.backup.retention"] = var["additional_backup_retention"]
+    if enable_default_backup:
+        data_tags["dfds.data.backup"] = "true"
+    parameters: list = ["rds.force_ssl"] + [
+        parameter["name"] for parameter in var["instance_parameters"]
+    ]
+    if var["environment"] == "prod":
+        parameters.append("log_connections")
+    resolved: dict = {
+        "identifier": var.get("identifier", None),
+        "environment": var["environment"],
+        "config": environment,
+        "engine": "postgres",
+        "instance_class": fallback(var["instance_class"], default["instance_class"]),
+        "allocated_storage": fallback(
+            var["allocated_storage"], default["allocated_storage"]
+        ),
+        "max_allocated_storage": fallback(
+            var["max_allocated_storage"], default["max_allocated_storage"]
+        ),
+        "storage_type": var["storage_type"],
+        "iops": iops,
+        "storage_throughput": var["storage_throughput"],
+        "storage_encrypted": True,
+        "multi_az": fallback(
+            var["instance_is_multi_az"], default["instance_is_multi_az"]
+        ),
+        "publicly_accessible": var["is_publicly_accessible"],
+        "iam_database_authentication_enabled": var[
+            "iam_database_authentication_enabled"
+        ],
+        "performance_insights_enabled": performance_insights_enabled,
+        "performance_insights_retention_period": (
+            retention if performance_insights_enabled else None
+        ),
+        "deletion_protection": var["deletion_protection"],
+        "auto_minor_version_upgrade": var["auto_minor_version_upgrade"],
+        "master_username": var.get("username", None),
+        "db_name": var["db_name"],
+        "preferred_maintenance_window": var["maintenance_window"].lower(),
+        "cloudwatch_logs_exports": exports,
+        "create_cloudwatch_log_group": len(exports) > 0,
+        "cloudwatch_log_group_retention_in_days": (
+            var["cloudwatch_log_group_retention_in_days"]
+            if var["cloudwatch_log_group_retention_in_days"] >= 0
+            else default["cloudwatch_log_group_retention_in_days"]
+        ),
+        "skip_final_snapshot": skip_final_snapshot,
+        "final_snapshot_identifier": (
+            None
+            if skip_final_snapshot
+            else f"{var['final_snapshot_identifier_prefix']}-"
+            f"{var.get('identifier', None)}-<random>"
+        ),
+        "delete_automated_backups": fallback(
+            var["delete_automated_backups"], default["delete_automated_backups"]
+        ),
+        "monitoring_interval": var["enhanced_monitoring_interval"],
+        "create_monitoring_role": var["enhanced_monitoring_interval"] > 0,
+        "password": None if var["manage_master_user_password"] else var["password"],
+        "proxy": var["is_proxy_included"],
+        "proxy_secret_managed": var["is_proxy_included"]
+        and var["manage_master_user_password"],
+        "public_access_rules": (
+            len([ip for ip in var["public_access_ip_whitelist"] if ip is not None])
+            if var["is_publicly_accessible"]
+            else 0
+        ),
+        "instance_parameters": parameters,
+        "tags": tags,
+        "data_tags": data_tags,
+    }
+    if var["ca_cert_identifier"] is not None:
+        resolved["ca_identifier"] = var["ca_cert_identifier"]
+    return resolved
+
+
+def validate(resolved: dict) -> list:
+    """
+    Return the problems AWS or the module would report for resolved settings.
+
+    :param resolved: Settings from resolve() or read_plan()
+    :type resolved: dict
+    :return: list of str
+    """
+    problems: list = []
+    environment: str = resolved.get("environment", None)
+    if environment is not None and environment not in ENVIRONMENTS:
+        problems.append(f"environment {environment} isn't one of {ENVIRONMENTS}")
+    storage_type: str = resolved["storage_type"]
+    storage: int = resolved["allocated_storage"]
+    iops: int = resolved["iops"]
+    if storage_type not in STORAGE_TYPES:
+        problems.append(f"storage_type {storage_type} isn't one of {STORAGE_TYPES}")
+    if storage_type == "io1":
+        if iops is None:
+            problems.append("storage_type io1 needs iops, which has no default")
+        elif not 1000 <= iops <= 256000 or not 0.5 <= iops / storage <= 50:
+            problems.append(
+                f"{iops} IOPS on {storage} GiB of io1: IOPS must be 1000-256000 "
+                "and 0.5-50 per GiB"
+            )
+    elif storage_type == "gp3":
+        if storage < 400 and (iops is not None or resolved["storage_throughput"]):
+            problems.append(
+                f"gp3 IOPS and throughput can only be set from 400 GiB, not {storage}"
+            )
+    elif iops is not None:
+        problems.append(f"iops can't be set for {storage_type} storage")
+    if storage_type != "gp3" and resolved["storage_throughput"] is not None:
+        problems.append(f"storage_throughput can't be set for {storage_type} storage")
+    maximum: int = resolved["max_allocated_storage"]
+    if maximum not in (None, 0) and maximum < storage:
+        problems.append(
+            f"max_allocated_storage {maximum} is below allocated_storage {storage}"
+        )
+    retention: int = resolved["performance_insights_retention_period"]
+    if resolved["performance_insights_enabled"]:
+        if retention not in PERFORMANCE_INSIGHTS_RETENTION:
+            problems.append(
+                f"performance_insights_retention_period {retention} must be 7 or "
+                "a multiple of 31 up to 731"
+            )
+    elif retention is not None:
+        problems.append(
+            "performance_insights_retention_period is set but Performance "
+            "Insights is disabled"
+        )
+    if not resolved["skip_final_snapshot"] and not resolved.get(
+        "final_snapshot_identifier", True
+    ):
+        problems.append("skip_final_snapshot is false without a final snapshot id")
+    unknown: list = sorted(set(resolved["cloudwatch_logs_exports"]) - set(LOG_EXPORTS))
+    if unknown:
+        problems.append(f"Unknown CloudWatch log exports: {unknown}")
+    if resolved.get("monitoring_interval", 0) not in MONITORING_INTERVALS:
+        problems.append(
+            f"enhanced_monitoring_interval {resolved['monitoring_interval']} "
+            f"isn't one of {MONITORING_INTERVALS}"
+        )
+    if resolved.get("proxy", False) and not resolved["proxy_secret_managed"]:
+        problems.append(
+            "The proxy authenticates with the master user secret, which needs "
+            "manage_master_user_password"
+        )
+    classification = resolved.get("data_tags", {}).get("dfds.data.classification")
+    if "data_tags" in resolved and classification is None:
+        problems.append("data_classification is required for the data tags")
+    return problems
+
+
+def check_expectations(plan: spec.CheckPlan, rows: dict) -> list:
+    """
+    Evaluate an expectation spec against resolved settings. Expectations on
+    fields that are only known after apply, e.g. status, are skipped.
+
+    :param plan: The compiled expectations
+    :param rows: The resolved settings per label
+    :type plan: spec.CheckPlan
+    :type rows: dict
+    :return: list of dict, one per failed expectation
+    """
+    frame = pd.DataFrame(list(rows.values()), index=list(rows))
+    failures: list = []
+    for expectation in plan.expectations:
+        if expectation.field not in frame.columns:
+            continue
+        passed: pd.Series = expectation.evaluate(frame[expectation.field])
+        for label in passed.index[~passed]:
+            failures.append(
+                {
+                    "label": label,
+                    "field": expectation.field,
+                    "expected": expectation.describe(),
+                    "actual": frame.at[label, expectation.field],
+                }
+            )
+    return failures
+
+
+def get_label(combination: dict) -> str:
+    """
+    Return a readable label of a variable combination.
+
+    :param combination: The variables that vary
+    :type combination: dict
+    :return: str
+    """
+    return ",".join(f"{name}={value}" for name, value in combination.items())
+
+
+def evaluate_matrix(base: dict, axes: dict = None) -> list:
+    """
+    Resolve and validate every combination of the axis values.
+
+    :param base: The variables shared by every combination
+    :param axes: The values per varying variable. Default: DEFAULT_AXES
+    :type base: dict
+    :type axes: dict
+    :return: list of dict with the combination, settings and problems
+    """
+    axes = axes or DEFAULT_AXES
+    results: list = []
+    for values in itertools.product(*axes.values()):
+        combination: dict = dict(zip(axes, values))
+        resolved: dict = resolve(dict(base, **combination))
+        results.append(
+            {
+                "label": get_label(combination),
+                "variables": combination,
+                "resolved": resolved,
+                "problems": validate(resolved),
+            }
+        )
+    return results
+
+
+def parse_value(text: str, names: dict):
+    """
+    Parse a literal terraform value: a bool, number, string, null, list of
+    literals, or a reference to a literal local.
+
+    :param text: The value text
+    :param names: Known local values by reference, e.g. local.name
+    :type text: str
+    :type names: dict
+    :return: The value
+    :raises ValueError: when the value isn't a literal
+    """
+    text = re.sub(r"\s+#.*$", "", text).strip()
+    if text in names:
+        return names[text]
+    if text == "null":
+        return None
+    return json.loads(text)
+
+
+def read_variable_defaults(path: str = MODULE_VARIABLES) -> dict:
+    """
+    Read the defaults of the variable blocks of the module, e.g. variables.tf.
+    Descriptions are skipped, and a multi-line map default is read as a dict
+    of its literal entries. Variables without a default are left out.
+
+    :param path: The terraform file. Default: variables.tf of the module
+    :type path: str
+    :return: dict
+    """
+    with open(path, encoding="utf-8") as source:
+        lines: list = source.read().splitlines()
+    defaults: dict = {}
+    name: str = None
+    depth: int = 0
+    heredoc: str = None
+    entries: dict = None
+    for line in lines:
+        if heredoc is not None:
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        header = re.match(r'^variable\s+"(?P<name>[^"]+)"\s*\{', line)
+        if header is not None:
+            name, depth = header.group("name"), 1
+            continue
+        if name is None:
+            continue
+        match = ASSIGNMENT.match(line)
+        if entries is not None:
+            if line.strip() == "}":
+                defaults[name], entries = entries, None
+                depth -= 1
+            elif match is not None:
+                entries[match.group("name")] = parse_value(match.group("value"), {})
+            continue
+        if match is not None and depth == 1 and match.group("name") == "default":
+            if match.group("value") == "{":
+                entries = {}
+                depth += 1
+                continue
+            defaults[name] = parse_value(match.group("value"), {})
+            continue
+        document = re.search(r"<<-?(?P<marker>\w+)\s*$", line)
+        if document is not None:
+            heredoc = document.group("marker")
+            continue
+        code: str = re.sub(r'"(?:[^"\\]|\\.)*"', '""', line)
+        depth += code.count("{") - code.count("}")
+        if depth <= 0:
+            name = None
+    return defaults
+
+
+# The defaults of the module variables, from variables.tf.
+DEFAULT_VARIABLES: dict = read_variable_defaults()
+
+
+def read_module_variables(path: str = QA_MAIN, module: str = None) -> dict:
+    """
+    Read the literal arguments of a module block, e.g. the QA instance in
+    tests/qa/main.tf. Arguments that reference other resources are left out.
+
+    :param path: The terraform file. Default: tests/qa/main.tf
+    :param module: The module name. Default: None, the first module block
+    :type path: str
+    :type module: str
+    :return: dict
+    """
+    with open(path, encoding="utf-8") as source:
+        lines: list = source.read().splitlines()
+    names: dict = {}
+    variables: dict = {}
+    block: str = None
+    for line in lines:
+        header = re.match(r'^(?P<kind>module|locals)\s*("(?P<name>[^"]+)")?\s*\{', line)
+        if header is not None:
+            if header.group("kind") == "locals":
+                block = "locals"
+            elif block != "done" and module in (None, header.group("name")):
+                block = "module"
+            continue
+        if line.startswith("}"):
+            block = "done" if block == "module" else None
+            continue
+        match = ASSIGNMENT.match(line)
+        if block not in ("locals", "module") or match is None:
+            continue
+        try:
+            value = parse_value(match.group("value"), names)
+        except ValueError:
+            logging.debug(f"Skipping non-literal {match.group('name')}")
+            continue
+        if block == "locals":
+            names[f"local.{match.group('name')}"] = value
+        else:
+            variables[match.group("name")] = value
+    return variables
+
+
+def get_expectations(
+    path: str = QA_MAIN,
+    module: str = None,
+    expectations: str = spec.DEFAULT_EXPECTATIONS,
+) -> dict:
+    """
+    Return the expectation spec of an instance: the DERIVED_EXPECTATIONS
+    resolved from the module arguments, and the expectations file for the
+    fields that are only known after apply. The file wins where both have a
+    field.
+
+    :param path: The terraform file. Default: tests/qa/main.tf
+    :param module: The module name. Default: None, the first module block
+    :param expectations: The expectations file. Default: expectations.json
+    :type path: str
+    :type module: str
+    :type expectations: str
+    :return: dict
+    """
+    resolved: dict = resolve(read_module_variables(path, module))
+    derived: dict = {field: resolved[field] for field in DERIVED_EXPECTATIONS}
+    with open(expectations, encoding="utf-8") as spec_file:
+        derived.update(json.load(spec_file))
+    return derived
+
+
+def load_check_plan(
+    path: str = QA_MAIN,
+    module: str = None,
+    expectations: str = spec.DEFAULT_EXPECTATIONS,
+) -> spec.CheckPlan:
+    """
+    Compile the expectation spec from get_expectations().
+
+    :param path: The terraform file. Default: tests/qa/main.tf
+    :param module: The module name. Default: None, the first module block
+    :param expectations: The expectations file. Default: expectations.json
+    :type path: str
+    :type module: str
+    :type expectations: str
+    :return: spec.CheckPlan
+    """
+    return spec.CheckPlan.compile(get_expectations(path, module, expectations))
+
+
+def get_planned_instances(module: dict):
+    """
+    Yield every aws_db_instance in a planned_values module and its children.
+
+    :param module: A module of the planned_values
+    :type module: dict
+    :return: generator of dict
+    """
+    for resource in module.get("resources", []):
+        if resource.get("type") == "aws_db_instance":
+            yield resource
+    for child in module.get("child_modules", []):
+        yield from get_planned_instances(child)
+
+
+def read_plan(plan: dict) -> dict:
+    """
+    Return the planned settings of every DB instance in `terraform show -json`
+    output, named like resolve() names them. Values that are only known after
+    apply are missing.
+
+    :param plan: The parsed plan JSON
+    :type plan: dict
+    :return: dict of address to settings
+    """
+    instances: dict = {}
+    root: dict = plan.get("planned_values", {}).get("root_module", {})
+    for resource in get_planned_instances(root):
+        values: dict = resource.get("values", {})
+        settings: dict = {
+            field: values[attribute]
+            for attribute, field in PLAN_ATTRIBUTES.items()
+            if attribute in values
+        }
+        if settings.get("preferred_maintenance_window") is not None:
+            settings["preferred_maintenance_window"] = settings[
+                "preferred_maintenance_window"
+            ].lower()
+        instances[resource["address"]] = settings
+    return instances
+
+
+def get_plan_variables(plan: dict, module: str = None) -> dict:
+    """
+    Return the module variables of a plan: the root variables, or the literal
+    arguments of a module call such as the QA instance.
+
+    :param plan: The parsed plan JSON
+    :param module: The module call name. Default: None, the root module
+    :type plan: dict
+    :type module: str
+    :return: dict
+    """
+    if module is None:
+        return {
+            name: variable.get("value", None)
+            for name, variable in plan.get("variables", {}).items()
+        }
+    calls: dict = plan["configuration"]["root_module"].get("module_calls", {})
+    expressions: dict = calls[module].get("expressions", {})
+    return {
+        name: expression["constant_value"]
+        for name, expression in expressions.items()
+        if isinstance(expression, dict) and "constant_value" in expression
+    }
+
+
+def compare_plan(plan: dict, module: str = None) -> dict:
+    """
+    Compare the settings planned by terraform with the ones this model
+    resolves from the same variables, and validate the planned settings.
+
+    :param plan: The parsed plan JSON
+    :param module: The module call name. Default: None, the root module
+    :type plan: dict
+    :type module: str
+    :return: dict of address to differences and problems
+    """
+    resolved: dict = resolve(get_plan_variables(plan, module))
+    report: dict = {}
+    for address, planned in read_plan(plan).items():
+        differences: list = [
+            {"field": field, "planned": value, "model": resolved.get(field, None)}
+            for field, value in planned.items()
+            if field in resolved
+            and field != "tags"
+            and spec.normalize(value) != spec.normalize(resolved[field])
+        ]
+        report[address] = {
+            "differences": differences,
+            "problems": validate(dict(resolved, **planned)),
+        }
+    return report
+
+
+def parse_assignments(values: list) -> dict:
+    """
+    Parse name=value arguments, with JSON values and plain strings.
+
+    :param values: The arguments
+    :type values: list
+    :return: dict
+    """
+    parsed: dict = {}
+    for value in values:
+        name, _, text = value.partition("=")
+        try:
+            parsed[name] = json.loads(text)
+        except ValueError:
+            parsed[name] = text
+    return parsed
+
+
+def main() -> int:
+    """
+    Validate the module settings offline from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Validate resolved module settings.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    for name in ("check", "matrix"):
+        subparser = subparsers.add_parser(name)
+        subparser.add_argument("--main", default=QA_MAIN, help="Default: tests/qa")
+        subparser.add_argument("--module", help="Default: the first module block")
+        subparser.add_argument(
+            "--set", nargs="*", default=[], help="name=value variable overrides"
+        )
+    subparsers.choices["check"].add_argument(
+        "--expectations", default=spec.DEFAULT_EXPECTATIONS
+    )
+    subparsers.choices["matrix"].add_argument(
+        "--axis",
+        nargs="*",
+        default=[],
+        help='name=[values] axes, e.g. storage_type=["gp2","io1"]. '
+        "Default: environment x storage_type x is_proxy_included",
+    )
+    plan_parser = subparsers.add_parser("plan")
+    plan_parser.add_argument("plan", help="terraform show -json output")
+    plan_parser.add_argument("--module", help="Module call, e.g. rds_instance_test")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    start: float = time.perf_counter()
+    if args.action == "plan":
+        with open(args.plan, encoding="utf-8") as plan_file:
+            report: dict = compare_plan(json.load(plan_file), args.module)
+        failed: bool = any(
+            item["differences"] or item["problems"] for item in report.values()
+        )
+    else:
+        base: dict = read_module_variables(args.main, args.module)
+        base.update(parse_assignments(args.set))
+        if args.action == "check":
+            resolved: dict = resolve(base)
+            report = {
+                "resolved": resolved,
+                "problems": validate(resolved),
+                "mismatches": check_expectations(
+                    spec.CheckPlan.load(args.expectations), {"qa": resolved}
+                ),
+            }
+            failed = bool(report["problems"] or report["mismatches"])
+        else:
+            results: list = evaluate_matrix(base, parse_assignments(args.axis) or None)
+            report = {
+                "combinations": len(results),
+                "problems": {
+                    result["label"]: result["problems"]
+                    for result in results
+                    if result["problems"]
+                },
+            }
+            failed = len(report["problems"]) > 0
+    logging.info(f"Evaluated in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(json.dumps(report, indent=2, default=str))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0902,R0913
+"""
+Drift
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from snapshot import InstanceSnapshot
+
+# RDS event source types watched per tracked resource kind.
+SOURCE_TYPES: dict = {
+    "instance": "db-instance",
+    "parameter_group": "db-parameter-group",
+    "proxy": "db-proxy",
+}
+
+# Proxy description fields compared between polls.
+PROXY_FIELDS: tuple = (
+    "Status",
+    "EngineFamily",
+    "RequireTLS",
+    "IdleClientTimeout",
+    "DebugLogging",
+    "VpcSecurityGroupIds",
+    "Auth",
+)
+
+
+def diff(old: dict, new: dict) -> list:
+    """
+    Return the fields that differ between two flat descriptions.
+
+    :param old: The last known fields
+    :param new: The current fields
+    :type old: dict
+    :type new: dict
+    :return: list of dict with field, old and new
+    """
+    changes: list = []
+    for field in sorted(set(old) | set(new)):
+        before = old.get(field, None)
+        after = new.get(field, None)
+        if before != after:
+            changes.append({"field": field, "old": before, "new": after})
+    return changes
+
+
+def get_proxy_fields(proxy: dict) -> dict:
+    """
+    Flatten the compared fields of a describe_db_proxies element.
+
+    :param proxy: The proxy description
+    :type proxy: dict
+    :return: dict
+    """
+    fields: dict = {}
+    for name in PROXY_FIELDS:
+        value = proxy.get(name, None)
+        if name == "Auth" and value is not None:
+            value = [
+                {
+                    key: item.get(key, None)
+                    for key in ("UserName", "IAMAuth", "AuthScheme")
+                }
+                for item in value
+            ]
+        fields[name] = value
+    return fields
+
+
+class EventCursor:
+    """
+    Time cursor over describe_events per source type. Events at the cursor's
+    time are remembered, since the next call starts at that time again.
+    """
+
+    def __init__(self, start: datetime.datetime) -> None:
+        """Class constructor.
+
+        :param start: The time to read events from
+        :type start: datetime.datetime
+        """
+        self.positions: dict = {
+            source_type: {"time": start, "seen": set()}
+            for source_type in SOURCE_TYPES.values()
+        }
+
+    @staticmethod
+    def __get_key(event: dict) -> tuple:
+        """
+        Return the identity of an event.
+
+        :return: tuple
+        """
+        return (event["SourceIdentifier"], event["Date"].isoformat(), event["Message"])
+
+    def advance(self, source_type: str, events: list) -> list:
+        """
+        Move past the events of a source type and return the new ones.
+
+        :param source_type: The RDS event source type
+        :param events: The events returned from the cursor's time on
+        :type source_type: str
+        :type events: list
+        :return: list of dict
+        """
+        position: dict = self.positions[source_type]
+        fresh: list = [
+            event for event in events if self.__get_key(event) not in position["seen"]
+        ]
+        for event in fresh:
+            if event["Date"] > position["time"]:
+                position["time"] = event["Date"]
+                position["seen"] = set()
+            if event["Date"] == position["time"]:
+                position["seen"].add(self.__get_key(event))
+        return fresh
+
+    def to_dict(self) -> dict:
+        """
+        Return the cursor as JSON serialisable values.
+
+        :return: dict
+        """
+        return {
+            source_type: {
+                "time": position["time"].isoformat(),
+                "seen": sorted(list(key) for key in position["seen"]),
+            }
+            for source_type, position in self.positions.items()
+        }
+
+    def load(self, state: dict) -> None:
+        """
+        Restore the positions saved with to_dict().
+
+        :param state: The saved cursor
+        :type state: dict
+        """
+        for source_type, position in state.items():
+            if source_type in self.positions:
+                self.positions[source_type] = {
+                    "time": datetime.datetime.fromisoformat(position["time"]),
+                    "seen": {tuple(key) for key in position["seen"]},
+                }
+
+
+class DriftMonitor:
+    """
+    Class for following the configuration of instances, their parameter
+    groups and proxies through RDS events, describing a resource again only
+    when it produced an event
+    """
+
+    def __init__(
+        self,
+        client,
+        identifiers: list,
+        proxies: list = None,
+        state_path: str = None,
+        start: datetime.datetime = None,
+    ) -> None:
+        """Class constructor.
+
+        :param client: A boto3 RDS client
+        :param identifiers: The DB instance identifiers to track
+        :param proxies: The proxy names to track. Default: None
+        :param state_path: JSON file keeping the snapshots and the cursor
+            between runs. Default: None, not kept
+        :param start: Read events from this time. Default: None, now
+        :type identifiers: list
+        :type proxies: list
+        :type state_path: str
+        :type start: datetime.datetime
+        """
+        self.client = client
+        self.identifiers: list = list(identifiers)
+        self.proxies: list = list(proxies or [])
+        self.state_path: str = state_path
+        self.cursor = EventCursor(start or datetime.datetime.now(datetime.timezone.utc))
+        self.instances: dict = {}
+        self.parameter_groups: dict = {}
+        self.proxy_fields: dict = {}
+        self.calls: dict = {}
+        if state_path is not None and os.path.exists(state_path):
+            self.__load()
+
+    def __call(self, operation: str, **arguments) -> dict:
+        """
+        Call an RDS operation and count it.
+
+        :return: dict
+        """
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        return getattr(self.client, operation)(**arguments)
+
+    def __describe_instances(self, identifiers: list) -> dict:
+        """
+        Describe instances with one filtered, paginated call, counting every
+        page. A single instance is requested by its identifier.
+
+        :return: dict of identifier to flat fields
+        """
+        if len(identifiers) == 1:
+            arguments: dict = {"DBInstanceIdentifier": identifiers[0]}
+        else:
+            arguments = {
+                "Filters": [{"Name": "db-instance-id", "Values": list(identifiers)}]
+            }
+        described: dict = {}
+        while True:
+            try:
+                response: dict = self.__call("describe_db_instances", **arguments)
+            except ClientError as error:
+                if error.response["Error"]["Code"] == "DBInstanceNotFound":
+                    return described
+                raise
+            for instance in response.get("DBInstances", []):
+                described[instance["DBInstanceIdentifier"]] = (
+                    InstanceSnapshot.from_description(instance).to_dict()
+                )
+            if "Marker" not in response:
+                return described
+            arguments["Marker"] = response["Marker"]
+
+    def __describe_parameter_group(self, name: str) -> dict:
+        """
+        Return the user-set parameters of a parameter group.
+
+        :return: dict of parameter name to value and apply method
+        """
+        parameters: dict = {}
+        arguments: dict = {"DBParameterGroupName": name, "Source": "user"}
+        while True:
+            response: dict = self.__call("describe_db_parameters", **arguments)
+            for parameter in response.get("Parameters", []):
+                parameters[parameter["ParameterName"]] = (
+                    f"{parameter.get('ParameterValue', None)} "
+                    f"({parameter.get('ApplyMethod', None)})"
+                )
+            if "Marker" not in response:
+                return parameters
+            arguments["Marker"] = response["Marker"]
+
+    def __describe_proxy(self, name: str) -> dict:
+        """
+        Return the compared fields of a proxy, or an empty dict when it's gone.
+
+        :return: dict
+        """
+        try:
+            response: dict = self.__call("describe_db_proxies", DBProxyName=name)
+        except ClientError as error:
+            if error.response["Error"]["Code"] == "DBProxyNotFoundFault":
+                return {}
+            raise
+        return get_proxy_fields(response["DBProxies"][0])
+
+    def __get_parameter_group_names(self) -> set:
+        """
+        Return the parameter groups attached to the tracked instances.
+
+        :return: set
+        """
+        return {
+            group[0]
+            for fields in self.instances.values()
+            for group in fields.get("parameter_groups", None) or []
+        }
+
+    def baseline(self) -> None:
+        """
+        Describe every tracked resource once.
+        """
+        self.instances, self.parameter_groups, self.proxy_fields = {}, {}, {}
+        self.__describe_missing()
+
+    def __describe_missing(self) -> None:
+        """
+        Describe the tracked resources that have no snapshot yet, e.g. the ones
+        added since the state was saved, then save the state. An instance or
+        proxy that doesn't exist is kept as empty fields, so it is described
+        again only when it produces an event.
+        """
+        missing: list = [
+            identifier
+            for identifier in self.identifiers
+            if identifier not in self.instances
+        ]
+        if missing:
+            described: dict = self.__describe_instances(missing)
+            for identifier in missing:
+                self.instances[identifier] = described.get(identifier, {})
+        for name in sorted(
+            self.__get_parameter_group_names() - set(self.parameter_groups)
+        ):
+            self.parameter_groups[name] = self.__describe_parameter_group(name)
+        for name in self.proxies:
+            if name not in self.proxy_fields:
+                self.proxy_fields[name] = self.__describe_proxy(name)
+        self.save()
+
+    def __read_events(self) -> dict:
+        """
+        Return the new events of the tracked resources per resource kind, with
+        one paginated describe_events call per source type.
+
+        :return: dict of kind to dict of resource to list of messages
+        """
+        tracked: dict = {
+            "instance": set(self.identifiers),
+            "parameter_group": set(self.parameter_groups),
+            "proxy": set(self.proxies),
+        }
+        events: dict = {}
+        for kind, source_type in SOURCE_TYPES.items():
+            if not tracked[kind]:
+                continue
+            arguments: dict = {
+                "SourceType": source_type,
+                "StartTime": self.cursor.positions[source_type]["time"],
+            }
+            page_events: list = []
+            while True:
+                response: dict = self.__call("describe_events", **arguments)
+                page_events += response.get("Events", [])
+                if "Marker" not in response:
+                    break
+                arguments["Marker"] = response["Marker"]
+            for event in self.cursor.advance(source_type, page_events):
+                if event["SourceIdentifier"] in tracked[kind]:
+                    events.setdefault(kind, {}).setdefault(
+                        event["SourceIdentifier"], []
+                    ).append(event["Message"])
+        return events
+
+    def poll(self) -> list:
+        """
+        Read the new events and describe again only the resources that
+        produced them. An event on a parameter group also refreshes the
+        instances using it, since their parameter apply status may change.
+
+        :return: list of dict, one per changed resource
+        """
+        events: dict = self.__read_events()
+        changes: list = []
+        now: str = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        def record(kind: str, name: str, old: dict, new: dict) -> None:
+            fields: list = diff(old, new)
+            if fields:
+                changes.append(
+                    {
+                        "time": now,
+                        "kind": kind,
+                        "resource": name,
+                        "events": events.get(kind, {}).get(name, []),
+                        "changes": fields,
+                    }
+                )
+
+        for name in sorted(events.get("parameter_group", {})):
+            parameters: dict = self.__describe_parameter_group(name)
+            record(
+                "parameter_group", name, self.parameter_groups.get(name, {}), parameters
+            )
+            self.parameter_groups[name] = parameters
+        stale: set = set(events.get("instance", {}))
+        if "parameter_group" in events:
+            stale |= {
+                identifier
+                for identifier, fields in self.instances.items()
+                if any(
+                    group[0] in events["parameter_group"]
+                    for group in fields.get("parameter_groups", None) or []
+                )
+            }
+        if stale:
+            described: dict = self.__describe_instances(sorted(stale))
+            for identifier in sorted(stale):
+                new: dict = described.get(identifier, {})
+                record("instance", identifier, self.instances.get(identifier, {}), new)
+                self.instances[identifier] = new
+            for name in self.__get_parameter_group_names() - set(self.parameter_groups):
+                self.parameter_groups[name] = self.__describe_parameter_group(name)
+        for name in sorted(events.get("proxy", {})):
+            fields: dict = self.__describe_proxy(name)
+            record("proxy", name, self.proxy_fields.get(name, {}), fields)
+            self.proxy_fields[name] = fields
+        self.save()
+        return changes
+
+    def run(self, interval: float = 60, polls: int = None) -> None:
+        """
+        Describe the tracked resources missing from the saved state, then poll
+        for changes until interrupted, printing one JSON line per change.
+
+        :param interval: Seconds between polls. Default: 60
+        :param polls: Stop after this many polls. Default: None, until interrupted
+        :type interval: float
+        :type polls: int
+        """
+        self.__describe_missing()
+        count: int = 0
+        try:
+            while polls is None or count < polls:
+                for change in self.poll():
+                    print(json.dumps(change, default=str), flush=True)
+                count += 1
+                if polls is None or count < polls:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            logging.info("Interrupted, stopping the monitor")
+        logging.info(f"API calls: {self.calls}")
+
+    def save(self) -> None:
+        """
+        Write the snapshots and the cursor to the state file, if there is one.
+        """
+        if self.state_path is None:
+            return
+        state: dict = {
+            "cursor": self.cursor.to_dict(),
+            "instances": self.instances,
+            "parameter_groups": self.parameter_groups,
+            "proxies": self.proxy_fields,
+        }
+        temporary: str = f"{self.state_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file, default=str)
+        os.replace(temporary, self.state_path)
+
+    def __load(self) -> None:
+        """
+        Restore the snapshots and the cursor from the state file.
+        """
+        with open(self.state_path, encoding="utf-8") as state_file:
+            state: dict = json.load(state_file)
+        self.cursor.load(state["cursor"])
+        self.instances = {
+            identifier: fields
+            for identifier, fields in state["instances"].items()
+            if identifier in self.identifiers
+        }
+        self.parameter_groups = state["parameter_groups"]
+        self.proxy_fields = {
+            name: fields
+            for name, fields in state["proxies"].items()
+            if name in self.proxies
+        }
+
+
+def main() -> int:
+    """
+    Monitor the QA instances for configuration drift from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Monitor configuration drift.")
+    parser.add_argument("--identifiers", nargs="*", default=["qa"])
+    parser.add_argument("--proxies", nargs="*", default=[])
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--polls", type=int, help="Default: until interrupted")
+    parser.add_argument("--state", help="JSON file to resume from and save to")
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    client = boto3.session.Session().client(
+        service_name="rds", region_name=args.region, endpoint_url=args.endpoint_url
+    )
+    DriftMonitor(
+        client, args.identifiers, proxies=args.proxies, state_path=args.state
+    ).run(args.interval, args.polls)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
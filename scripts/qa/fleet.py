@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Fleet
+"""
+
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pandas as pd
+
+import config
+import rds
+from snapshot import InstanceSnapshot
+from spec import DEFAULT_EXPECTATIONS, CheckPlan
+
+# Maximum number of values RDS accepts in a single describe filter.
+DESCRIBE_BATCH_SIZE: int = 100
+
+
+class Fleet:
+    """
+    Class for verifying many QA instances concurrently
+    """
+
+    def __init__(
+        self,
+        database: str = "postgres",
+        region: str = "eu-central-1",
+        log_level: int = logging.INFO,
+        max_workers: int = 16,
+        expectations: str = DEFAULT_EXPECTATIONS,
+    ) -> None:
+        """Class constructor.
+
+        :param database: The name of the QA database. Default: postgres
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :param log_level: A valid log level from the logging module. Default: logging.INFO
+        :param max_workers: The size of the verification worker pool. Default: 16
+        :param expectations: The expectations only known after apply, next to the
+            ones derived from tests/qa/main.tf. Default: expectations.json
+        :type database: str
+        :type region: str
+        :type log_level: int
+        :type max_workers: int
+        :type expectations: str
+        """
+        logging.basicConfig(
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            level=log_level,
+        )
+        self.database: str = database
+        self.region: str = region
+        self.log_level: int = log_level
+        self.max_workers: int = max_workers
+        self.plan: CheckPlan = config.load_check_plan(expectations=expectations)
+        self.session = boto3.session.Session()
+        self.elapsed: float = None
+
+    def get_identifiers_by_tag(self, key: str, value: str) -> list:
+        """
+        Return the ARNs of the RDS Instances carrying the given tag.
+
+        :param key: The tag key, e.g. dfds.test.scope
+        :param value: The tag value, e.g. qa
+        :type key: str
+        :type value: str
+        :return: list
+        """
+        client = self.session.client(
+            service_name="resourcegroupstaggingapi", region_name=self.region
+        )
+        paginator = client.get_paginator("get_resources")
+        arns: list = []
+        for page in paginator.paginate(
+            TagFilters=[{"Key": key, "Values": [value]}],
+            ResourceTypeFilters=["rds:db"],
+        ):
+            for mapping in page.get("ResourceTagMappingList", []):
+                arns.append(mapping["ResourceARN"])
+        logging.debug(f"Found {len(arns)} instances tagged {key}={value}")
+        return arns
+
+    def describe(self, identifiers: list) -> dict:
+        """
+        Describe the given RDS Instances in batched, paginated calls and return
+        their snapshots keyed by DB instance identifier.
+
+        :param identifiers: The DB instance identifiers or ARNs
+        :type identifiers: list
+        :return: dict
+        """
+        client = self.session.client(service_name="rds", region_name=self.region)
+        descriptions: dict = {}
+        for start in range(0, len(identifiers), DESCRIBE_BATCH_SIZE):
+            end: int = start + DESCRIBE_BATCH_SIZE
+            for db in rds.describe_instances(client, identifiers[start:end]):
+                descriptions[db["DBInstanceIdentifier"]] = (
+                    InstanceSnapshot.from_description(db)
+                )
+        return descriptions
+
+    def secretsmanager_exist(self, identifier: str, instance: InstanceSnapshot) -> bool:
+        """
+        Check if the master user secret of an instance exists.
+
+        :param identifier: The DB instance identifier
+        :param instance: The instance snapshot
+        :type identifier: str
+        :type instance: InstanceSnapshot
+        :return: bool
+        """
+        qa = rds.QA(
+            database=self.database,
+            region=self.region,
+            log_level=self.log_level,
+            identifier=identifier,
+            instance=instance,
+        )
+        try:
+            return qa.secretsmanager_exist()
+        except Exception as error:  # pylint: disable=W0718
+            logging.error(f"{identifier}: secretsmanager_exist failed with {error}")
+            return False
+
+    def verify(self, identifiers: list) -> pd.DataFrame:
+        """
+        Verify all the given instances and return a pass/fail matrix with one
+        row per instance and one column per check. The expectation plan is
+        evaluated over all snapshots at once, and the checks that need further
+        AWS calls run on a bounded worker pool.
+
+        :param identifiers: The DB instance identifiers or ARNs
+        :type identifiers: list
+        :return: pd.DataFrame
+        """
+        start: float = time.perf_counter()
+        snapshots: dict = self.describe(identifiers)
+        # An instance given twice, e.g. by name and by ARN, is verified once.
+        names: list = list(
+            dict.fromkeys(identifier.split(":")[-1] for identifier in identifiers)
+        )
+        found: list = [name for name in names if name in snapshots]
+        for name in set(names) - set(found):
+            logging.error(f"{name}: instance not found")
+
+        matrix: pd.DataFrame = self.plan.evaluate([snapshots[name] for name in found])
+        matrix = matrix.reindex(names, fill_value=False)
+        matrix.insert(0, "instance_exist", [name in snapshots for name in names])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            secrets: list = list(
+                executor.map(
+                    lambda name: self.secretsmanager_exist(name, snapshots[name]),
+                    found,
+                )
+            )
+        matrix["secretsmanager_exist"] = False
+        matrix.loc[found, "secretsmanager_exist"] = secrets
+        self.elapsed = time.perf_counter() - start
+        matrix.index.name = "instance"
+        logging.info(f"Verified {len(names)} instances in {self.elapsed:.2f}s")
+        return matrix
+
+
+def main() -> int:
+    """
+    Verify a fleet of QA instances from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Verify a fleet of QA instances.")
+    selector = parser.add_mutually_exclusive_group(required=True)
+    selector.add_argument("--identifiers", nargs="+", help="DB instance identifiers")
+    selector.add_argument("--tag", help="Tag selector, e.g. dfds.test.scope=qa")
+    parser.add_argument("--database", default="postgres")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    fleet = Fleet(
+        database=args.database,
+        region=args.region,
+        log_level=logging.ERROR,
+        max_workers=args.workers,
+    )
+    if args.tag is not None:
+        key, _, value = args.tag.partition("=")
+        identifiers: list = fleet.get_identifiers_by_tag(key, value)
+    else:
+        identifiers: list = args.identifiers
+
+    matrix: pd.DataFrame = fleet.verify(identifiers)
+    print(matrix.T.to_string())
+    print(f"\n{len(matrix)} instances verified in {fleet.elapsed:.2f}s")
+    return 0 if matrix.to_numpy().all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0913,R0914
+"""
+Benchmark history
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+
+import rds
+from workload import get_instance_metadata
+
+HISTORY_PATH: str = "history.sqlite"
+METADATA_FIELDS: tuple = (
+    "identifier",
+    "instance_class",
+    "engine_version",
+    "storage_type",
+    "allocated_storage",
+    "iops",
+    "storage_throughput",
+    "multi_az",
+)
+SCHEMA: str = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    label TEXT,
+    git_revision TEXT,
+    {", ".join(f"{field} TEXT" for field in METADATA_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric)
+);
+"""
+# Whether a larger value of a metric is worse (1) or better (-1), by the last
+# part of its name. Maxima are a single sample and too noisy to compare. Rates
+# are checked before durations, connections_per_s ends in _s too.
+DIRECTIONS: tuple = (
+    (re.compile(r"^max_"), 0),
+    (re.compile(r"(?:per_s|tps|qps|rps|throughput|_rate)$"), -1),
+    (re.compile(r"(?:_ms|_s|seconds|latency|lag|errors|failures|timeouts)$"), 1),
+)
+# Label list items in reports by one of these keys rather than their index.
+ITEM_KEYS: tuple = ("profile", "name", "address", "metric", "fingerprint")
+
+
+def flatten(report, prefix: str = "") -> dict:
+    """
+    Flatten the numeric values of a JSON report into metric paths, e.g.
+    runs.read_only.latency.p95_ms. Items of lists are named by their profile
+    or name when they have one.
+
+    :param report: The parsed JSON report
+    :param prefix: The path of the report. Default: ""
+    :type prefix: str
+    :return: dict of metric to float
+    """
+    metrics: dict = {}
+    if isinstance(report, bool):
+        return metrics
+    if isinstance(report, (int, float)):
+        if math.isfinite(report):
+            metrics[prefix] = float(report)
+    elif isinstance(report, dict):
+        for key, value in report.items():
+            metrics.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(report, list):
+        for index, item in enumerate(report):
+            name = index
+            if isinstance(item, dict):
+                name = next(
+                    (item[key] for key in ITEM_KEYS if isinstance(item.get(key), str)),
+                    index,
+                )
+            metrics.update(flatten(item, f"{prefix}.{name}" if prefix else str(name)))
+    return metrics
+
+
+def get_direction(metric: str) -> int:
+    """
+    Return whether a larger value of the metric is worse (1), better (-1) or
+    neither (0), e.g. for counts.
+
+    :param metric: The metric path
+    :type metric: str
+    :return: int
+    """
+    name: str = metric.rsplit(".", 1)[-1]
+    for pattern, direction in DIRECTIONS:
+        if pattern.search(name) is not None:
+            return direction
+    return 0
+
+
+def get_git_revision() -> str:
+    """
+    Return the module revision, from the pipeline or the checkout.
+
+    :return: str
+    """
+    if os.environ.get("GITHUB_SHA"):
+        return os.environ["GITHUB_SHA"]
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class History:
+    """
+    Class for keeping benchmark results in a SQLite database.
+
+    Every run of a tool is a row with the instance settings and the module
+    revision it ran against, and every numeric value of its report is a
+    measurement of the run.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH) -> None:
+        """Class constructor.
+
+        :param path: The SQLite database file. Default: history.sqlite
+        :type path: str
+        """
+        self.path: str = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        self.conn.close()
+
+    def record(
+        self,
+        tool: str,
+        report: dict,
+        metadata: dict,
+        git_revision: str = None,
+        label: str = None,
+        recorded_at: datetime.datetime = None,
+    ) -> int:
+        """
+        Record the measurements of a report.
+
+        :param tool: The tool that produced the report, e.g. probe
+        :param report: The parsed JSON report
+        :param metadata: The instance settings, see get_instance_metadata()
+        :param git_revision: The module revision. Default: None
+        :param label: A free form label, e.g. the pipeline run. Default: None
+        :param recorded_at: The time of the run. Default: None, now
+        :type tool: str
+        :type report: dict
+        :type metadata: dict
+        :type git_revision: str
+        :type label: str
+        :type recorded_at: datetime.datetime
+        :return: int the run id
+        """
+        recorded_at = recorded_at or datetime.datetime.now(datetime.timezone.utc)
+        values: list = [
+            None if metadata.get(field) is None else str(metadata[field])
+            for field in METADATA_FIELDS
+        ]
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO runs (recorded_at, tool, label, git_revision, "
+                f"{', '.join(METADATA_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (len(METADATA_FIELDS) + 4))})",
+                [recorded_at.isoformat(), tool, label, git_revision] + values,
+            )
+            run_id: int = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO measurements (run_id, metric, value) VALUES (?, ?, ?)",
+                [(run_id, metric, value) for metric, value in flatten(report).items()],
+            )
+        return run_id
+
+    def get_measurements(self, tool: str = None) -> pd.DataFrame:
+        """
+        Return the measurements with the settings of their runs.
+
+        :param tool: Only the runs of this tool. Default: None, all tools
+        :type tool: str
+        :return: pd.DataFrame with one row per measurement
+        """
+        query: str = (
+            "SELECT runs.*, measurements.metric, measurements.value "
+            "FROM runs JOIN measurements ON measurements.run_id = runs.id"
+        )
+        parameters: tuple = ()
+        if tool is not None:
+            query += " WHERE runs.tool = ?"
+            parameters = (tool,)
+        return pd.read_sql_query(
+            query + " ORDER BY runs.id", self.conn, params=parameters
+        )
+
+
+def compare_run(
+    frame: pd.DataFrame,
+    run_id: int,
+    match: tuple = ("instance_class", "storage_type"),
+    window: int = 20,
+    minimum: int = 10,
+    threshold: float = 0.1,
+    z_limit: float = 3.5,
+) -> list:
+    """
+    Compare the measurements of a run with a rolling baseline of the runs of
+    the same tool on the same settings before it. A measurement is worse when
+    it is worse than the baseline median by more than the threshold and by
+    more than z_limit robust standard deviations, estimated from the median
+    absolute deviation, so a single noisy baseline run doesn't hide or cause
+    a regression.
+
+    :param frame: The measurements, see History.get_measurements()
+    :param run_id: The run to compare
+    :param match: The settings the baseline runs share with the run.
+        Default: instance class and storage type
+    :param window: The number of baseline runs. Default: 20
+    :param minimum: The baseline runs needed to compare a metric. Default: 10
+    :param threshold: The relative change that matters. Default: 0.1
+    :param z_limit: The robust z-score that is significant. Default: 3.5
+    :type frame: pd.DataFrame
+    :type run_id: int
+    :type match: tuple
+    :type window: int
+    :type minimum: int
+    :type threshold: float
+    :type z_limit: float
+    :return: list of dict with a row per compared metric
+    """
+    candidate: pd.DataFrame = frame[frame["id"] == run_id]
+    if candidate.empty:
+        return []
+    first: pd.Series = candidate.iloc[0]
+    previous: pd.DataFrame = frame[
+        (frame["tool"] == first["tool"]) & (frame["id"] < run_id)
+    ]
+    for field in match:
+        if pd.isna(first[field]):
+            previous = previous[previous[field].isna()]
+        else:
+            previous = previous[previous[field] == first[field]]
+    baseline_ids: list = sorted(previous["id"].unique())[-window:]
+    previous = previous[previous["id"].isin(baseline_ids)]
+    rows: list = []
+    for metric, value in zip(candidate["metric"], candidate["value"]):
+        direction: int = get_direction(metric)
+        history: pd.Series = previous.loc[previous["metric"] == metric, "value"]
+        if direction == 0 or len(history) < minimum:
+            continue
+        median: float = float(history.median())
+        deviation: float = 1.4826 * float((history - median).abs().median())
+        # A floor keeps a perfectly stable baseline from flagging noise.
+        scale: float = max(deviation, abs(median) * 0.01, 1e-9)
+        z_score: float = direction * (value - median) / scale
+        change: float = direction * (value - median) / abs(median) if median else 0.0
+        rows.append(
+            {
+                "run_id": int(run_id),
+                "tool": first["tool"],
+                "metric": metric,
+                "value": float(value),
+                "baseline_median": median,
+                "baseline_runs": int(len(history)),
+                "z_score": z_score,
+                "change": change,
+                "worse": bool(z_score > z_limit and change > threshold),
+            }
+        )
+    return rows
+
+
+def compare(
+    frame: pd.DataFrame, run_id: int = None, consecutive: int = 2, **parameters
+) -> list:
+    """
+    Compare the latest run of every tool, or the given run, with its rolling
+    baseline. Summaries of a few dozen samples have long tails, so a metric
+    regressed only when it was worse in the last consecutive runs of the
+    tool, each against the runs before it.
+
+    :param frame: The measurements, see History.get_measurements()
+    :param run_id: The run to compare. Default: None, the latest of each tool
+    :param consecutive: The runs a metric has to be worse in. Default: 2
+    :param parameters: The baseline settings, see compare_run()
+    :type frame: pd.DataFrame
+    :type run_id: int
+    :type consecutive: int
+    :return: list of dict with a row per compared metric of the run
+    """
+    if frame.empty:
+        return []
+    if run_id is None:
+        run_ids: list = frame.groupby("tool")["id"].max().tolist()
+    else:
+        run_ids = [run_id]
+    rows: list = []
+    for candidate_id in run_ids:
+        tool: str = frame.loc[frame["id"] == candidate_id, "tool"].iloc[0]
+        earlier: list = [
+            earlier_id
+            for earlier_id in sorted(frame.loc[frame["tool"] == tool, "id"].unique())
+            if earlier_id < candidate_id
+        ]
+        del earlier[: max(0, len(earlier) - consecutive + 1)]
+        worse: dict = {}
+        for earlier_id in earlier:
+            for row in compare_run(frame, earlier_id, **parameters):
+                worse[row["metric"]] = worse.get(row["metric"], 0) + row["worse"]
+        for row in compare_run(frame, candidate_id, **parameters):
+            row["worse_runs"] = worse.get(row["metric"], 0) + row["worse"]
+            row["regressed"] = row["worse_runs"] >= consecutive
+            rows.append(row)
+    return rows
+
+
+def get_metadata(args: argparse.Namespace, report: dict) -> dict:
+    """
+    Return the instance settings of a run: the ones the report carries, the
+    described QA instance, or those given on the command line.
+
+    :param args: The parsed command line arguments
+    :param report: The parsed JSON report
+    :type args: argparse.Namespace
+    :type report: dict
+    :return: dict
+    """
+    metadata: dict = {}
+    if isinstance(report, dict) and isinstance(report.get("instance"), dict):
+        metadata = dict(report["instance"])
+    elif args.identifier is not None:
+        metadata = get_instance_metadata(
+            rds.QA(
+                region=args.region, log_level=logging.ERROR, identifier=args.identifier
+            ).get_snapshot()
+        )
+    else:
+        metadata = get_instance_metadata(None)
+    for field in METADATA_FIELDS:
+        if getattr(args, field, None) is not None:
+            metadata[field] = getattr(args, field)
+    return metadata
+
+
+def main() -> int:
+    """
+    Record benchmark reports and compare them with their history from the
+    command line.
+
+    :return: int 1 when a measurement regressed
+    """
+    parser = argparse.ArgumentParser(description="Keep and compare benchmark results.")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record a JSON report")
+    record_parser.add_argument("--tool", required=True, help="e.g. probe or workload")
+    record_parser.add_argument("--report", default="-", help="Default: stdin")
+    record_parser.add_argument(
+        "--identifier", help="Describe this QA instance for the settings"
+    )
+    record_parser.add_argument("--region", default="eu-central-1")
+    for field in ("instance_class", "engine_version", "storage_type"):
+        record_parser.add_argument(f"--{field.replace('_', '-')}")
+    record_parser.add_argument("--git-revision", default=get_git_revision())
+    record_parser.add_argument("--label")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare runs with their rolling baseline"
+    )
+    compare_parser.add_argument("--tool", help="Default: the latest run of each tool")
+    compare_parser.add_argument("--run-id", type=int)
+    compare_parser.add_argument(
+        "--match", nargs="*", default=["instance_class", "storage_type"]
+    )
+    compare_parser.add_argument("--window", type=int, default=20)
+    compare_parser.add_argument("--minimum", type=int, default=10)
+    compare_parser.add_argument("--consecutive", type=int, default=2)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.add_argument("--z-limit", type=float, default=3.5)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    history = History(args.history)
+    try:
+        if args.command == "record":
+            if args.report == "-":
+                report = json.load(sys.stdin)
+            else:
+                with open(args.report, encoding="utf-8") as source:
+                    report = json.load(source)
+            run_id: int = history.record(
+                args.tool,
+                report,
+                get_metadata(args, report),
+                git_revision=args.git_revision,
+                label=args.label,
+            )
+            logging.info(f"Recorded run {run_id} of {args.tool} in {args.history}")
+            return 0
+        rows: list = compare(
+            history.get_measurements(args.tool),
+            run_id=args.run_id,
+            consecutive=args.consecutive,
+            match=tuple(args.match),
+            window=args.window,
+            minimum=args.minimum,
+            threshold=args.threshold,
+            z_limit=args.z_limit,
+        )
+    finally:
+        history.close()
+    regressed: list = [row for row in rows if row["regressed"]]
+    for row in regressed:
+        logging.warning(
+            f"{row['tool']} {row['metric']} is {row['value']:.4g}, "
+            f"{row['change']:.0%} worse than the median {row['baseline_median']:.4g} "
+            f"of {row['baseline_runs']} runs"
+        )
+    logging.info(f"Compared {len(rows)} measurements, {len(regressed)} regressed")
+    print(json.dumps({"compared": len(rows), "regressions": regressed}, indent=2))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+IAM authentication benchmark
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import psycopg2
+from psycopg2 import sql as pgsql
+
+import probe
+import rds
+from stats import summarize
+from token_cache import IamConnectionPool, TokenCache
+
+
+def create_iam_user(parameters: dict, user: str) -> None:
+    """
+    Create a database user that logs in with IAM authentication. A user with
+    the rds_iam role can't log in with a password anymore, so the benchmark
+    uses its own user rather than the master user.
+
+    :param parameters: psycopg2 connection parameters of a privileged user
+    :param user: The user to create
+    :type parameters: dict
+    :type user: str
+    """
+    conn = psycopg2.connect(**parameters)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as sql:
+            sql.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (user,))
+            if sql.fetchone() is None:
+                sql.execute(pgsql.SQL("CREATE USER {}").format(pgsql.Identifier(user)))
+            sql.execute("SELECT 1 FROM pg_roles WHERE rolname = 'rds_iam'")
+            if sql.fetchone() is not None:
+                sql.execute(
+                    pgsql.SQL("GRANT rds_iam TO {}").format(pgsql.Identifier(user))
+                )
+            sql.execute(
+                pgsql.SQL("GRANT CONNECT ON DATABASE {} TO {}").format(
+                    pgsql.Identifier(parameters["dbname"]), pgsql.Identifier(user)
+                )
+            )
+    finally:
+        conn.close()
+
+
+class AuthBenchmark:
+    """
+    Class for comparing the connect rate of password and IAM authentication
+    """
+
+    def __init__(self, clients: int = 20, iterations: int = 50) -> None:
+        """Class constructor.
+
+        :param clients: The number of concurrent clients. Default: 20
+        :param iterations: The number of connections per client. Default: 50
+        :type clients: int
+        :type iterations: int
+        """
+        self.clients: int = clients
+        self.iterations: int = iterations
+
+    def run(self, connect, release=None) -> dict:
+        """
+        Let every client open, use and close a new connection per iteration.
+
+        :param connect: Returns a new psycopg2 connection
+        :param release: Closes a connection. Default: None, conn.close()
+        :return: dict
+        """
+
+        def client() -> tuple:
+            latencies: list = []
+            errors: int = 0
+            for _ in range(self.iterations):
+                start: float = time.perf_counter()
+                try:
+                    conn = connect()
+                except psycopg2.Error as error:
+                    errors += 1
+                    logging.debug(error)
+                    continue
+                latencies.append(time.perf_counter() - start)
+                try:
+                    with conn.cursor() as sql:
+                        sql.execute("SELECT 1")
+                except psycopg2.Error as error:
+                    errors += 1
+                    logging.debug(error)
+                finally:
+                    # Return the pool slot even when the query failed.
+                    if release is None:
+                        conn.close()
+                    else:
+                        release(conn)
+            return latencies, errors
+
+        start: float = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.clients) as executor:
+            results: list = list(executor.map(lambda _: client(), range(self.clients)))
+        elapsed: float = time.perf_counter() - start
+        latencies: list = [latency for result in results for latency in result[0]]
+        return {
+            "connect": summarize(latencies),
+            "errors": sum(result[1] for result in results),
+            "connections_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def run_pool(self, pool: IamConnectionPool) -> dict:
+        """
+        Borrow, use and close pooled connections, so every borrow opens a new
+        connection with a token from the pool's cache.
+
+        :param pool: The pool, with maxconn of at least the number of clients
+        :type pool: IamConnectionPool
+        :return: dict
+        """
+        return self.run(pool.getconn, lambda conn: pool.putconn(conn, close=True))
+
+
+def main() -> int:
+    """
+    Compare password and IAM authentication from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Benchmark IAM authentication.")
+    probe.add_connection_arguments(parser)
+    parser.add_argument("--iam-user", default="qa_iam")
+    parser.add_argument(
+        "--iam-host", help="Log in through this endpoint, e.g. the proxy"
+    )
+    parser.add_argument("--create-iam-user", action="store_true")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = probe.parse_arguments(parser)
+    password: dict = probe.get_connection_parameters(args)
+    if args.host is not None:
+        client = boto3.session.Session().client("rds", region_name=args.region)
+    else:
+        client = rds.QA(
+            region=args.region, log_level=logging.ERROR, identifier=args.identifier
+        ).get_client("rds")
+    if args.create_iam_user:
+        create_iam_user(password, args.iam_user)
+    iam: dict = {
+        key: value
+        for key, value in password.items()
+        if key not in ("password", "connection_factory")
+    }
+    iam["user"] = args.iam_user
+    if args.iam_host is not None:
+        iam["host"] = args.iam_host
+
+    cache = TokenCache()
+    per_connection = TokenCache(lifetime=0, margin=0)
+
+    def connect_with(tokens: TokenCache):
+        return lambda: psycopg2.connect(
+            **dict(
+                iam, password=tokens.get(client, iam["host"], iam["port"], iam["user"])
+            )
+        )
+
+    benchmark = AuthBenchmark(clients=args.clients, iterations=args.iterations)
+    report: dict = {}
+    logging.info("Benchmarking password authentication")
+    report["password"] = benchmark.run(lambda: psycopg2.connect(**password))
+    logging.info("Benchmarking IAM authentication with cached tokens")
+    report["iam_cached"] = benchmark.run(connect_with(cache))
+    report["iam_cached"]["signings"] = cache.signings
+    logging.info("Benchmarking IAM authentication with a token per connection")
+    report["iam_per_connection"] = benchmark.run(connect_with(per_connection))
+    report["iam_per_connection"]["signings"] = per_connection.signings
+    logging.info("Benchmarking an IAM connection pool")
+    pool = IamConnectionPool(0, args.clients, client, cache=cache, **iam)
+    try:
+        report["iam_pool"] = benchmark.run_pool(pool)
+    finally:
+        pool.closeall()
+    report["iam_pool"]["signings"] = cache.signings - report["iam_cached"]["signings"]
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,534 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0902,R0903,R0913
+"""
+Log analyzer
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+
+import boto3
+from botocore.exceptions import ClientError
+
+from stats import StreamingHistogram
+
+# The default RDS for PostgreSQL log_line_prefix, %t:%r:%u@%d:[%p]:
+# The %r client is a host name or an IPv4 or IPv6 address with the port in
+# parentheses, so it may contain colons itself.
+LOG_RECORD = re.compile(
+    r"^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?(?: [+-]?\w+)?):"
+    r"(?P<client>[^:]*|[0-9A-Fa-f:.]+(?:\(\d*\))?):"
+    r"(?P<user>[^@:]*)@(?P<database>[^:]*):\[(?P<pid>\d+)\]:"
+    r"(?P<level>[A-Z0-9]+):\s+(?P<message>.*)$",
+    re.DOTALL,
+)
+DURATION = re.compile(
+    r"^duration: (?P<ms>[\d.]+) ms"
+    r"(?:\s+(?:statement|(?:execute|parse|bind) [^:]*): (?P<statement>.*))?$",
+    re.DOTALL,
+)
+# A numeric %t zone, which PostgreSQL prints for zones without a name.
+ZONE_OFFSET = re.compile(r"^(?P<sign>[+-])(?P<hours>\d\d):?(?P<minutes>\d\d)?$")
+SESSION_TIME = re.compile(r"session time: (?P<h>\d+):(?P<m>\d\d):(?P<s>[\d.]+)")
+
+# Fingerprint rules, applied in order.
+FINGERPRINT_RULES: tuple = (
+    (re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+"), r"\1"),
+    (re.compile(r"\s+"), " "),
+)
+FINGERPRINT_LENGTH: int = 500
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so that executions with different literals match:
+    comments are dropped, literals and parameters become ?, lists of values
+    collapse to one and whitespace and case are normalized.
+
+    :param statement: The SQL statement
+    :type statement: str
+    :return: str
+    """
+    text: str = statement
+    for pattern, replacement in FINGERPRINT_RULES:
+        text = pattern.sub(replacement, text)
+    return text.strip().rstrip(";").strip().lower()[:FINGERPRINT_LENGTH]
+
+
+def parse_time(value: str) -> float:
+    """
+    Parse the %t timestamp of a log record into epoch seconds. The zone is
+    the log_timezone of the instance, UTC on RDS by default. UTC, GMT and
+    numeric offsets are honoured. Zone names are ambiguous, e.g. IST, so a
+    log written with one is rejected.
+
+    :param value: e.g. 2024-05-01 12:00:00 UTC or 2024-05-01 14:00:00 +02
+    :type value: str
+    :return: float
+    :raises ValueError: If the zone is a name other than UTC or GMT
+    """
+    date, clock, *zone = value.split(" ")
+    parsed = datetime.datetime.fromisoformat(f"{date} {clock}")
+    name: str = zone[0] if zone else "UTC"
+    offset = ZONE_OFFSET.match(name)
+    if offset is not None:
+        delta = datetime.timedelta(
+            hours=int(offset.group("hours")), minutes=int(offset.group("minutes") or 0)
+        )
+        tz = datetime.timezone(-delta if offset.group("sign") == "-" else delta)
+    elif name in ("UTC", "GMT"):
+        tz = datetime.timezone.utc
+    else:
+        raise ValueError(
+            f"Can't resolve the log time zone {name}, set log_timezone to UTC"
+        )
+    return parsed.replace(tzinfo=tz).timestamp()
+
+
+def read_records(lines):
+    """
+    Join the lines of a downloaded log file into records. Lines that don't
+    start with the log_line_prefix continue the previous record.
+
+    :param lines: The log lines
+    :return: generator of str
+    """
+    record: str = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if LOG_RECORD.match(line) is not None:
+            if record is not None:
+                yield record
+            record = line
+        elif record is not None:
+            record += "\n" + line
+    if record is not None:
+        yield record
+
+
+class FingerprintStats:
+    """
+    Durations of the executions of one statement fingerprint
+    """
+
+    __slots__ = ("fingerprint", "example", "histogram")
+
+    def __init__(self, text: str, example: str) -> None:
+        """Class constructor.
+
+        :param text: The fingerprint
+        :param example: The first statement seen with it
+        :type text: str
+        :type example: str
+        """
+        self.fingerprint: str = text
+        self.example: str = example[:FINGERPRINT_LENGTH]
+        self.histogram = StreamingHistogram(buckets=100)
+
+    def summarize(self) -> dict:
+        """
+        Return the execution statistics.
+
+        :return: dict
+        """
+        return dict(
+            self.histogram.summarize(),
+            total_ms=self.histogram.total * 1000,
+            fingerprint=self.fingerprint,
+            example=self.example,
+        )
+
+
+class LogAnalyzer:
+    """
+    Class for aggregating postgresql log records into slow query and
+    connection summaries in bounded memory
+    """
+
+    def __init__(
+        self,
+        window: int = 60,
+        windows: int = 60,
+        max_fingerprints: int = 500,
+        storm_factor: float = 5,
+        storm_minimum: int = 50,
+    ) -> None:
+        """Class constructor.
+
+        :param window: The rolling window length in seconds. Default: 60
+        :param windows: The number of recent windows kept. Default: 60
+        :param max_fingerprints: The fingerprints tracked at most. Default: 500
+        :param storm_factor: A window with this many times the median connection
+            rate of the recent windows is a connection storm. Default: 5
+        :param storm_minimum: Fewer connections per window are never a storm.
+            Default: 50
+        :type window: int
+        :type windows: int
+        :type max_fingerprints: int
+        :type storm_factor: float
+        :type storm_minimum: int
+        """
+        self.window: int = window
+        self.windows: deque = deque(maxlen=windows)
+        self.max_fingerprints: int = max_fingerprints
+        self.storm_factor: float = storm_factor
+        self.storm_minimum: int = storm_minimum
+        self.fingerprints: dict = {}
+        self.evicted: dict = {"fingerprints": 0, "executions": 0, "total_ms": 0.0}
+        self.durations = StreamingHistogram()
+        self.sessions = StreamingHistogram()
+        self.levels: dict = {}
+        self.totals: dict = {"records": 0, "connections": 0, "disconnections": 0}
+        self.storms: deque = deque(maxlen=100)
+
+    def __get_window(self, timestamp: float) -> dict:
+        """
+        Return the window of a timestamp, starting a new one when needed.
+
+        :return: dict
+        """
+        start: int = int(timestamp // self.window * self.window)
+        if self.windows and self.windows[-1]["start"] == start:
+            return self.windows[-1]
+        for window in reversed(self.windows):
+            if window["start"] == start:
+                return window
+        if self.windows and start < self.windows[-1]["start"]:
+            # Out of order by more than a window: count it in the latest one.
+            return self.windows[-1]
+        if self.windows:
+            storm: dict = self.__check_storm(self.windows[-1])
+            if storm is not None:
+                self.storms.append(storm)
+        window: dict = {
+            "start": start,
+            "connections": 0,
+            "disconnections": 0,
+            "slow_queries": 0,
+            "slow_ms": 0.0,
+            "errors": 0,
+        }
+        self.windows.append(window)
+        return window
+
+    def __check_storm(self, window: dict) -> dict:
+        """
+        Return a window as a connection storm when its connection count
+        stands out from the other recent windows.
+
+        :return: dict or None
+        """
+        earlier: list = sorted(
+            item["connections"] for item in self.windows if item is not window
+        )
+        median: float = earlier[len(earlier) // 2] if earlier else 0
+        count: int = window["connections"]
+        if count < self.storm_minimum or count <= self.storm_factor * median:
+            return None
+        return {
+            "start": datetime.datetime.fromtimestamp(
+                window["start"], datetime.timezone.utc
+            ).isoformat(),
+            "connections": count,
+            "median_connections": median,
+        }
+
+    def __evict(self) -> None:
+        """
+        Evict the tenth of the fingerprints with the least total time, so the
+        table is sorted once per many new fingerprints rather than per one.
+        """
+        ranked: list = sorted(
+            self.fingerprints.values(), key=lambda item: item.histogram.total
+        )
+        for smallest in ranked[: max(1, len(ranked) // 10)]:
+            del self.fingerprints[smallest.fingerprint]
+            self.evicted["fingerprints"] += 1
+            self.evicted["executions"] += int(smallest.histogram.counts.sum())
+            self.evicted["total_ms"] += smallest.histogram.total * 1000
+
+    def __add_duration(self, milliseconds: float, statement: str) -> None:
+        """
+        Count a statement duration overall and for its fingerprint.
+        """
+        self.durations.add(milliseconds / 1000)
+        if statement is None:
+            return
+        text: str = fingerprint(statement)
+        stats: FingerprintStats = self.fingerprints.get(text, None)
+        if stats is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                self.__evict()
+            stats = FingerprintStats(text, statement)
+            self.fingerprints[text] = stats
+        stats.histogram.add(milliseconds / 1000)
+
+    def feed(self, record: str, timestamp: float = None) -> bool:
+        """
+        Process one log record.
+
+        :param record: The record, with its log_line_prefix
+        :param timestamp: The epoch seconds of the record. Default: None, from the prefix
+        :type record: str
+        :type timestamp: float
+        :return: bool, False when the record doesn't have the expected prefix
+        """
+        match = LOG_RECORD.match(record)
+        if match is None:
+            return False
+        if timestamp is None:
+            timestamp = parse_time(match.group("time"))
+        self.totals["records"] += 1
+        window: dict = self.__get_window(timestamp)
+        level: str = match.group("level")
+        self.levels[level] = self.levels.get(level, 0) + 1
+        if level in ("ERROR", "FATAL", "PANIC"):
+            window["errors"] += 1
+        message: str = match.group("message")
+        if message.startswith("duration: "):
+            duration = DURATION.match(message)
+            if duration is not None:
+                milliseconds: float = float(duration.group("ms"))
+                window["slow_queries"] += 1
+                window["slow_ms"] += milliseconds
+                self.__add_duration(milliseconds, duration.group("statement"))
+        elif message.startswith("connection received"):
+            window["connections"] += 1
+            self.totals["connections"] += 1
+        elif message.startswith("disconnection"):
+            window["disconnections"] += 1
+            self.totals["disconnections"] += 1
+            session = SESSION_TIME.search(message)
+            if session is not None:
+                self.sessions.add(
+                    int(session.group("h")) * 3600
+                    + int(session.group("m")) * 60
+                    + float(session.group("s"))
+                )
+        return True
+
+    def summarize(self, top: int = 20) -> dict:
+        """
+        Return the slow query, fingerprint and connection summaries.
+
+        :param top: The number of fingerprints by total time. Default: 20
+        :type top: int
+        :return: dict
+        """
+        hottest: list = sorted(
+            self.fingerprints.values(),
+            key=lambda item: item.histogram.total,
+            reverse=True,
+        )[:top]
+        recent: list = list(self.windows)
+        storms: list = list(self.storms)
+        if recent and self.__check_storm(recent[-1]) is not None:
+            # The current window isn't finished, but already stands out.
+            storms.append(self.__check_storm(recent[-1]))
+        return {
+            "records": self.totals["records"],
+            "levels": self.levels,
+            "durations": self.durations.summarize(),
+            "fingerprints": [stats.summarize() for stats in hottest],
+            "evicted": self.evicted,
+            "connections": {
+                "received": self.totals["connections"],
+                "disconnections": self.totals["disconnections"],
+                "peak_per_s": max(
+                    (window["connections"] / self.window for window in recent),
+                    default=0.0,
+                ),
+                "session_time": self.sessions.summarize(),
+                "storms": storms,
+            },
+            "windows": [
+                dict(
+                    window,
+                    start=datetime.datetime.fromtimestamp(
+                        window["start"], datetime.timezone.utc
+                    ).isoformat(),
+                )
+                for window in recent
+            ],
+        }
+
+
+class LogCursor:
+    """
+    Resumable position in a CloudWatch log group, saved as JSON after every
+    page so an interrupted or scheduled run continues where the last stopped
+    """
+
+    def __init__(self, log_group: str, start_time: int, path: str = None) -> None:
+        """Class constructor.
+
+        :param log_group: The log group name
+        :param start_time: Epoch milliseconds to start from without a saved cursor
+        :param path: The JSON file to save the cursor in. Default: None, not saved
+        :type log_group: str
+        :type start_time: int
+        :type path: str
+        """
+        self.path: str = path
+        self.state: dict = {
+            "log_group": log_group,
+            "start_time": start_time,
+            "next_token": None,
+            "seen": [],
+        }
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as cursor_file:
+                saved: dict = json.load(cursor_file)
+            if saved.get("log_group") == log_group:
+                self.state.update(saved)
+
+    def advance(self, events: list, next_token: str) -> list:
+        """
+        Move past a page of events and return the ones not seen before. The
+        ids of events at the last timestamp are kept, since a restart from the
+        timestamp returns them again.
+
+        :param events: The events of the page
+        :param next_token: The nextToken of the page, None after the last page
+        :type events: list
+        :type next_token: str
+        :return: list of dict
+        """
+        seen: set = set(self.state["seen"])
+        fresh: list = [event for event in events if event["eventId"] not in seen]
+        for event in fresh:
+            if event["timestamp"] > self.state["start_time"]:
+                self.state["start_time"] = event["timestamp"]
+                seen = set()
+            seen.add(event["eventId"])
+        self.state["seen"] = sorted(seen)
+        self.state["next_token"] = next_token
+        self.save()
+        return fresh
+
+    def save(self) -> None:
+        """
+        Write the cursor to its file, if it has one.
+        """
+        if self.path is None:
+            return
+        temporary: str = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as cursor_file:
+            json.dump(self.state, cursor_file)
+        os.replace(temporary, self.path)
+
+
+def stream_events(client, cursor: LogCursor, end_time: int = None):
+    """
+    Yield the events of a log group page by page from the cursor on. When a
+    saved nextToken has expired, the read restarts from the cursor's time.
+
+    :param client: A boto3 CloudWatch Logs client
+    :param cursor: The cursor to read from and advance
+    :param end_time: Epoch milliseconds to stop at. Default: None, now
+    :type cursor: LogCursor
+    :type end_time: int
+    :return: generator of dict
+    """
+    while True:
+        arguments: dict = {
+            "logGroupName": cursor.state["log_group"],
+            "startTime": cursor.state["start_time"],
+        }
+        if end_time is not None:
+            arguments["endTime"] = end_time
+        if cursor.state["next_token"] is not None:
+            arguments["nextToken"] = cursor.state["next_token"]
+        try:
+            response: dict = client.filter_log_events(**arguments)
+        except ClientError as error:
+            code: str = error.response["Error"]["Code"]
+            if code == "InvalidParameterException" and "nextToken" in arguments:
+                logging.info("The saved nextToken expired, restarting from its time")
+                cursor.state["next_token"] = None
+                continue
+            raise
+        yield from cursor.advance(
+            response.get("events", []), response.get("nextToken", None)
+        )
+        if cursor.state["next_token"] is None:
+            return
+
+
+def main() -> int:
+    """
+    Analyze the exported postgresql log of the QA instance from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Analyze postgresql logs.")
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--log-type", default="postgresql")
+    parser.add_argument("--minutes", type=int, default=60, help="Without a cursor")
+    parser.add_argument("--cursor", help="JSON file to resume from and save to")
+    parser.add_argument("--follow", action="store_true", help="Poll until interrupted")
+    parser.add_argument("--poll-interval", type=float, default=30)
+    parser.add_argument("--file", help="Analyze a downloaded log file instead")
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    parser.add_argument("--output", help="Write the JSON summary to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    analyzer = LogAnalyzer(window=args.window)
+    if args.file is not None:
+        with open(args.file, encoding="utf-8", errors="replace") as log_file:
+            for record in read_records(log_file):
+                analyzer.feed(record)
+    else:
+        client = boto3.session.Session().client(
+            service_name="logs",
+            region_name=args.region,
+            endpoint_url=args.endpoint_url,
+        )
+        start: datetime.datetime = datetime.datetime.now(
+            datetime.timezone.utc
+        ) - datetime.timedelta(minutes=args.minutes)
+        cursor = LogCursor(
+            f"/aws/rds/instance/{args.identifier}/{args.log_type}",
+            int(start.timestamp() * 1000),
+            args.cursor,
+        )
+        try:
+            while True:
+                for event in stream_events(client, cursor):
+                    for record in read_records(event["message"].splitlines()):
+                        analyzer.feed(record, event["timestamp"] / 1000)
+                if not args.follow:
+                    break
+                print(json.dumps(analyzer.summarize(args.top)["windows"][-1:]))
+                time.sleep(args.poll_interval)
+        except KeyboardInterrupt:
+            logging.info("Interrupted, summarizing what was read")
+
+    summary: dict = analyzer.summarize(args.top)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            json.dump(summary, report_file, indent=2)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Log groups
+"""
+
+import argparse
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from retry import call_with_retry
+
+
+def list_log_groups(client, identifier: str) -> list:
+    """
+    Return the CloudWatch log groups of an RDS instance and its proxy, i.e.
+    /aws/rds/instance/<identifier>/* and /aws/rds/proxy/<identifier>.
+    The groups are looked up by name prefix and paginated.
+
+    :param client: A boto3 CloudWatch Logs client
+    :param identifier: The DB instance identifier
+    :type identifier: str
+    :return: list of dict
+    """
+    instance_prefix: str = f"/aws/rds/instance/{identifier}/"
+    proxy_name: str = f"/aws/rds/proxy/{identifier}"
+    paginator = client.get_paginator("describe_log_groups")
+    log_groups: list = []
+    for prefix in (instance_prefix, proxy_name):
+        for page in paginator.paginate(logGroupNamePrefix=prefix):
+            for log_group in page.get("logGroups", []):
+                name: str = log_group["logGroupName"]
+                if name.startswith(instance_prefix) or name == proxy_name:
+                    log_groups.append(log_group)
+    return log_groups
+
+
+class LogGroupManager:
+    """
+    Class for verifying and cleaning up the CloudWatch log groups of a QA instance
+    """
+
+    def __init__(
+        self,
+        identifier: str = "qa",
+        region: str = "eu-central-1",
+        max_workers: int = 8,
+        endpoint_url: str = None,
+    ) -> None:
+        """Class constructor.
+
+        :param identifier: The identifier of the QA RDS instance. Default: qa
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :param max_workers: The number of concurrent delete calls. Default: 8
+        :param endpoint_url: Send the AWS API calls to this endpoint. Default: None
+        :type identifier: str
+        :type region: str
+        :type max_workers: int
+        :type endpoint_url: str
+        """
+        self.identifier: str = identifier
+        self.max_workers: int = max_workers
+        self.client = boto3.session.Session().client(
+            service_name="logs",
+            region_name=region,
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=max_workers),
+        )
+
+    def get_log_groups(self) -> list:
+        """
+        Return the log groups of the QA instance and its proxy.
+
+        :return: list of dict
+        """
+        return list_log_groups(self.client, self.identifier)
+
+    def verify(
+        self,
+        exports: list,
+        proxy: bool = True,
+        retention_in_days: int = None,
+    ) -> list:
+        """
+        Check that a log group exists for every exported log and the proxy,
+        optionally with the given retention, and return the problems found.
+
+        :param exports: The exported logs, e.g. ["postgresql", "upgrade"]
+        :param proxy: Whether the proxy log group is expected. Default: True
+        :param retention_in_days: The expected retention. Default: None, not checked
+        :type exports: list
+        :type proxy: bool
+        :type retention_in_days: int
+        :return: list of str
+        """
+        expected: list = [
+            f"/aws/rds/instance/{self.identifier}/{log}" for log in exports
+        ]
+        if proxy:
+            expected.append(f"/aws/rds/proxy/{self.identifier}")
+        found: dict = {
+            log_group["logGroupName"]: log_group for log_group in self.get_log_groups()
+        }
+        problems: list = []
+        for name in expected:
+            log_group: dict = found.get(name, None)
+            if log_group is None:
+                problems.append(f"{name} is missing")
+            elif (
+                retention_in_days is not None
+                and log_group.get("retentionInDays", None) != retention_in_days
+            ):
+                problems.append(
+                    f"{name} retains {log_group.get('retentionInDays', None)} days, "
+                    f"expected {retention_in_days}"
+                )
+        return problems
+
+    def __delete_log_group(self, name: str) -> bool:
+        """
+        Delete a single log group, retrying while throttled.
+
+        :return: bool
+        """
+        try:
+            call_with_retry(lambda: self.client.delete_log_group(logGroupName=name))
+        except ClientError as error:
+            if error.response["Error"]["Code"] == "ResourceNotFoundException":
+                return True
+            logging.error(f"Deleting log group {name} failed: {error}")
+            return False
+        logging.info(f"Deleted log group: {name}")
+        return True
+
+    def delete(self) -> dict:
+        """
+        Delete the log groups of the QA instance and its proxy in parallel.
+
+        :return: dict of log group name to whether it was deleted
+        """
+        names: list = [log_group["logGroupName"] for log_group in self.get_log_groups()]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results: list = list(executor.map(self.__delete_log_group, names))
+        return dict(zip(names, results))
+
+
+def main() -> int:
+    """
+    Verify or delete the QA log groups from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Manage the QA log groups.")
+    parser.add_argument("action", choices=["verify", "delete"])
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--exports", nargs="*", default=["postgresql", "upgrade"])
+    parser.add_argument("--no-proxy", action="store_true")
+    parser.add_argument("--retention-in-days", type=int)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    manager = LogGroupManager(
+        identifier=args.identifier,
+        region=args.region,
+        max_workers=args.workers,
+        endpoint_url=args.endpoint_url,
+    )
+    if args.action == "delete":
+        results: dict = manager.delete()
+        return 0 if all(results.values()) else 1
+
+    problems: list = manager.verify(
+        args.exports,
+        proxy=not args.no_proxy,
+        retention_in_days=args.retention_in_days,
+    )
+    for problem in problems:
+        logging.error(problem)
+    return 0 if len(problems) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0903
+"""
+Monitoring
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+import rds
+
+# Performance Insights groups DBLoad is broken down by, and the dimension
+# naming each group member.
+LOAD_GROUPS: dict = {
+    "db.wait_event": "db.wait_event.name",
+    "db.sql_tokenized": "db.sql_tokenized.statement",
+}
+
+# Enhanced Monitoring OS metrics kept per sample, as column name to the path
+# in the RDSOSMetrics message. Per-device lists are summed.
+OS_METRICS: dict = {
+    "cpu_total": ("cpuUtilization", "total"),
+    "cpu_wait": ("cpuUtilization", "wait"),
+    "load_one": ("loadAverageMinute", "one"),
+    "memory_free_kb": ("memory", "free"),
+    "memory_cached_kb": ("memory", "cached"),
+    "disk_read_iops": ("diskIO", "readIOsPS"),
+    "disk_write_iops": ("diskIO", "writeIOsPS"),
+    "disk_read_kb_s": ("diskIO", "readKbPS"),
+    "disk_write_kb_s": ("diskIO", "writeKbPS"),
+    "disk_queue_length": ("diskIO", "avgQueueLen"),
+    "network_rx_bytes_s": ("network", "rx"),
+    "network_tx_bytes_s": ("network", "tx"),
+}
+
+ENHANCED_MONITORING_LOG_GROUP: str = "RDSOSMetrics"
+
+
+def get_metric_query(
+    metric_id: str,
+    metric_name: str,
+    dimension: dict,
+    stat: str = "Average",
+    period: int = 60,
+) -> dict:
+    """
+    Return a GetMetricData query of an AWS/RDS CloudWatch metric.
+
+    :param metric_id: The query id, e.g. read_iops
+    :param metric_name: The metric name, e.g. ReadIOPS
+    :param dimension: The dimension name and value, e.g. {"DBInstanceIdentifier": "qa"}
+    :param stat: The statistic. Default: Average
+    :param period: The period in seconds. Default: 60
+    :type metric_id: str
+    :type metric_name: str
+    :type dimension: dict
+    :type stat: str
+    :type period: int
+    :return: dict
+    """
+    return {
+        "Id": metric_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": "AWS/RDS",
+                "MetricName": metric_name,
+                "Dimensions": [
+                    {"Name": name, "Value": value} for name, value in dimension.items()
+                ],
+            },
+            "Period": period,
+            "Stat": stat,
+        },
+    }
+
+
+def get_os_metric(message: dict, path: tuple) -> float:
+    """
+    Read a metric from an RDSOSMetrics message. Per-device lists are summed,
+    missing metrics are NaN.
+
+    :param message: The parsed RDSOSMetrics message
+    :param path: The section and the metric name
+    :type message: dict
+    :type path: tuple
+    :return: float
+    """
+    section, name = path
+    value = message.get(section, {})
+    if isinstance(value, list):
+        values: list = [device[name] for device in value if name in device]
+        return float(sum(values)) if len(values) > 0 else np.nan
+    return float(value.get(name, np.nan))
+
+
+def summarize_frame(frame: pd.DataFrame) -> dict:
+    """
+    Return the mean, p95 and maximum of every column.
+
+    :param frame: The samples, one column per metric
+    :type frame: pd.DataFrame
+    :return: dict of column to statistics
+    """
+    if frame.empty:
+        return {}
+    statistics: pd.DataFrame = frame.agg(["mean", "max"])
+    statistics.loc["p95"] = frame.quantile(0.95)
+    return {
+        column: {name: float(value) for name, value in statistics[column].items()}
+        for column in frame.columns
+    }
+
+
+class PerformanceInsightsCollector:
+    """
+    Class for collecting the Performance Insights DBLoad of an instance
+    """
+
+    def __init__(self, client, resource_id: str) -> None:
+        """Class constructor.
+
+        :param client: A boto3 Performance Insights client
+        :param resource_id: The DbiResourceId of the instance
+        :type resource_id: str
+        """
+        self.client = client
+        self.resource_id: str = resource_id
+
+    def get_db_load(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        period: int = 60,
+        limit: int = 10,
+    ) -> pd.DataFrame:
+        """
+        Return the average DBLoad over time, in total and for the top wait
+        events and SQL statements. All breakdowns are requested in one batch
+        of metric queries and the pages are followed until the end.
+
+        :param start: The start of the window
+        :param end: The end of the window
+        :param period: The data point granularity in seconds. Default: 60
+        :param limit: The number of top members per group. Default: 10
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :type period: int
+        :type limit: int
+        :return: pd.DataFrame with timestamp, group, member and load columns
+        """
+        queries: list = [{"Metric": "db.load.avg"}] + [
+            {"Metric": "db.load.avg", "GroupBy": {"Group": group, "Limit": limit}}
+            for group in LOAD_GROUPS
+        ]
+        columns: dict = {"timestamp": [], "group": [], "member": [], "load": []}
+        arguments: dict = {
+            "ServiceType": "RDS",
+            "Identifier": self.resource_id,
+            "MetricQueries": queries,
+            "StartTime": start,
+            "EndTime": end,
+            "PeriodInSeconds": period,
+        }
+        while True:
+            response: dict = self.client.get_resource_metrics(**arguments)
+            for metric in response.get("MetricList", []):
+                group, member = self.__get_member(metric["Key"].get("Dimensions", {}))
+                for point in metric.get("DataPoints", []):
+                    columns["timestamp"].append(point["Timestamp"])
+                    columns["group"].append(group)
+                    columns["member"].append(member)
+                    columns["load"].append(point.get("Value", np.nan))
+            if "NextToken" not in response:
+                break
+            arguments["NextToken"] = response["NextToken"]
+        frame = pd.DataFrame(columns)
+        frame["load"] = frame["load"].astype(float)
+        return frame
+
+    @staticmethod
+    def __get_member(dimensions: dict) -> tuple:
+        """
+        Return the group and member a metric key belongs to.
+
+        :return: tuple of (group, member)
+        """
+        for group, dimension in LOAD_GROUPS.items():
+            if dimension in dimensions:
+                return group, dimensions[dimension]
+        return "total", "total"
+
+    @staticmethod
+    def summarize(frame: pd.DataFrame) -> dict:
+        """
+        Summarize a DBLoad frame into the average and peak load per member and
+        its share of the total load.
+
+        :param frame: The frame returned by get_db_load
+        :type frame: pd.DataFrame
+        :return: dict of group to list of dict, sorted by average load
+        """
+        total: float = frame.loc[frame["group"] == "total", "load"].mean()
+        summary: dict = {}
+        for group, rows in frame.groupby("group"):
+            loads: pd.DataFrame = (
+                rows.groupby("member")["load"]
+                .agg(["mean", "max"])
+                .sort_values("mean", ascending=False)
+            )
+            summary[group] = [
+                {
+                    "member": member,
+                    "average_load": float(row["mean"]),
+                    "max_load": float(row["max"]),
+                    "share": float(row["mean"] / total) if total > 0 else None,
+                }
+                for member, row in loads.iterrows()
+            ]
+        return summary
+
+
+class EnhancedMonitoringCollector:
+    """
+    Class for collecting the Enhanced Monitoring OS metrics of an instance
+    """
+
+    def __init__(self, client, resource_id: str) -> None:
+        """Class constructor.
+
+        :param client: A boto3 CloudWatch Logs client
+        :param resource_id: The DbiResourceId, which names the log stream
+        :type resource_id: str
+        """
+        self.client = client
+        self.resource_id: str = resource_id
+
+    def get_os_metrics(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> pd.DataFrame:
+        """
+        Return the OS metrics sampled between start and end, one row per
+        sample, read page by page from the RDSOSMetrics log group. The frame
+        is empty when Enhanced Monitoring is off.
+
+        :param start: The start of the window
+        :param end: The end of the window
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :return: pd.DataFrame indexed by timestamp
+        """
+        columns: dict = {name: [] for name in OS_METRICS}
+        timestamps: list = []
+        paginator = self.client.get_paginator("filter_log_events")
+        try:
+            for page in paginator.paginate(
+                logGroupName=ENHANCED_MONITORING_LOG_GROUP,
+                logStreamNames=[self.resource_id],
+                startTime=int(start.timestamp() * 1000),
+                endTime=int(end.timestamp() * 1000),
+            ):
+                for event in page.get("events", []):
+                    message: dict = json.loads(event["message"])
+                    timestamps.append(message.get("timestamp", None))
+                    for name, path in OS_METRICS.items():
+                        columns[name].append(get_os_metric(message, path))
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+            logging.info(f"No Enhanced Monitoring data for {self.resource_id}")
+        frame = pd.DataFrame(
+            {name: np.asarray(values, dtype=float) for name, values in columns.items()},
+            index=pd.to_datetime(timestamps),
+        )
+        return frame.sort_index()
+
+
+def collect(
+    identifier: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    region: str = "eu-central-1",
+    endpoint_url: str = None,
+) -> dict:
+    """
+    Collect the summarized DBLoad and OS metrics of the instance for a window.
+    Sources that aren't enabled on the instance are left out.
+
+    :param identifier: The DB instance identifier
+    :param start: The start of the window
+    :param end: The end of the window
+    :param region: The AWS region. Default: eu-central-1
+    :param endpoint_url: Send the AWS API calls to this endpoint. Default: None
+    :type identifier: str
+    :type start: datetime.datetime
+    :type end: datetime.datetime
+    :type region: str
+    :type endpoint_url: str
+    :return: dict
+    :raises ValueError: If the instance doesn't exist
+    """
+    qa = rds.QA(
+        region=region,
+        log_level=logging.ERROR,
+        identifier=identifier,
+        endpoint_url=endpoint_url,
+    )
+    snapshot = qa.get_snapshot()
+    if snapshot is None:
+        raise ValueError(f"Instance {identifier} doesn't exist")
+    summary: dict = {"start": start.isoformat(), "end": end.isoformat()}
+    if snapshot.performance_insights_enabled:
+        collector = PerformanceInsightsCollector(
+            qa.get_client("pi"), snapshot.resource_id
+        )
+        summary["db_load"] = collector.summarize(collector.get_db_load(start, end))
+    os_metrics: pd.DataFrame = EnhancedMonitoringCollector(
+        qa.get_client("logs"), snapshot.resource_id
+    ).get_os_metrics(start, end)
+    if not os_metrics.empty:
+        summary["os"] = summarize_frame(os_metrics)
+    return summary
+
+
+def main() -> int:
+    """
+    Print the server-side metrics of the QA instance for the last minutes.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Collect server-side metrics.")
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--endpoint-url", help="AWS endpoint, e.g. a moto server")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    end: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+    start: datetime.datetime = end - datetime.timedelta(minutes=args.minutes)
+    try:
+        summary: dict = collect(
+            args.identifier, start, end, args.region, args.endpoint_url
+        )
+    except ValueError as error:
+        logging.error(error)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
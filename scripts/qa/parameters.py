@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0914
+"""
+Parameters
+"""
+
+import argparse
+import json
+import sys
+
+import boto3
+import psycopg2
+
+import probe
+from snapshot import ClusterSnapshot
+
+# Memory in GIB per instance size, for the instance families used with this module.
+BURSTABLE_MEMORY: dict = {
+    "micro": 1,
+    "small": 2,
+    "medium": 4,
+    "large": 8,
+    "xlarge": 16,
+    "2xlarge": 32,
+}
+GENERAL_PURPOSE_MEMORY: dict = {
+    "large": 8,
+    "xlarge": 16,
+    "2xlarge": 32,
+    "4xlarge": 64,
+    "8xlarge": 128,
+    "12xlarge": 192,
+    "16xlarge": 256,
+    "24xlarge": 384,
+}
+INSTANCE_FAMILY_MEMORY: dict = {
+    "t3": BURSTABLE_MEMORY,
+    "t4g": BURSTABLE_MEMORY,
+    "m5": GENERAL_PURPOSE_MEMORY,
+    "m6g": GENERAL_PURPOSE_MEMORY,
+    "m6i": GENERAL_PURPOSE_MEMORY,
+    "m7g": GENERAL_PURPOSE_MEMORY,
+    "r5": {size: memory * 2 for size, memory in GENERAL_PURPOSE_MEMORY.items()},
+    "r6g": {size: memory * 2 for size, memory in GENERAL_PURPOSE_MEMORY.items()},
+    "r6i": {size: memory * 2 for size, memory in GENERAL_PURPOSE_MEMORY.items()},
+    "r7g": {size: memory * 2 for size, memory in GENERAL_PURPOSE_MEMORY.items()},
+}
+
+# Bytes per pg_settings unit.
+UNITS: dict = {
+    "B": 1,
+    "kB": 1024,
+    "8kB": 8192,
+    "MB": 1024**2,
+    "16MB": 16 * 1024**2,
+    "GB": 1024**3,
+}
+
+TUNED_SETTINGS: tuple = (
+    "shared_buffers",
+    "work_mem",
+    "max_connections",
+    "random_page_cost",
+)
+
+GIB: int = 1024**3
+
+# Memory per Aurora capacity unit.
+ACU_MEMORY: int = 2 * GIB
+
+
+def get_declared_parameters(environment: str, instance_parameters: list) -> list:
+    """
+    Return the instance parameters the module applies, mirroring
+    instance_parameters in locals.tf: rds.force_ssl, then the user parameters,
+    then log_connections in prod.
+
+    :param environment: The environment variable of the module
+    :param instance_parameters: The instance_parameters variable of the module
+    :type environment: str
+    :type instance_parameters: list
+    :return: list of dict
+    """
+    declared: list = [
+        {"name": "rds.force_ssl", "value": 1, "apply_method": "immediate"}
+    ]
+    declared.extend(instance_parameters)
+    if environment == "prod":
+        declared.append(
+            {"name": "log_connections", "value": 1, "apply_method": "immediate"}
+        )
+    return declared
+
+
+def get_instance_memory(
+    instance_class: str, region: str = "eu-central-1", cluster_identifier: str = None
+) -> int:
+    """
+    Return the memory of an instance class in bytes. Unknown classes are
+    looked up through the EC2 instance type with the same name. A
+    db.serverless instance has the memory of the maximum capacity of its
+    cluster.
+
+    :param instance_class: The instance class, e.g. db.t3.micro
+    :param region: The AWS region. Default: eu-central-1
+    :param cluster_identifier: The cluster of a db.serverless instance. Default: None
+    :type instance_class: str
+    :type region: str
+    :type cluster_identifier: str
+    :return: int
+    :raises ValueError: For db.serverless without a cluster with a capacity range
+    """
+    session = boto3.session.Session()
+    if instance_class == "db.serverless":
+        capacity: float = None
+        if cluster_identifier is not None:
+            client = session.client(service_name="rds", region_name=region)
+            clusters: dict = client.describe_db_clusters(
+                DBClusterIdentifier=cluster_identifier
+            )
+            capacity = ClusterSnapshot.from_description(
+                clusters["DBClusters"][0]
+            ).serverless_max_capacity
+        if capacity is None:
+            raise ValueError(f"No serverless capacity for cluster {cluster_identifier}")
+        return int(capacity * ACU_MEMORY)
+    _, family, size = instance_class.split(".", 2)
+    memory: int = INSTANCE_FAMILY_MEMORY.get(family, {}).get(size, None)
+    if memory is not None:
+        return memory * GIB
+    client = session.client(service_name="ec2", region_name=region)
+    types: dict = client.describe_instance_types(InstanceTypes=[f"{family}.{size}"])
+    return types["InstanceTypes"][0]["MemoryInfo"]["SizeInMiB"] * 1024**2
+
+
+def normalize_value(value, vartype: str = None) -> str:
+    """
+    Normalize a parameter value, so values from Terraform, the parameter group
+    and pg_settings can be compared.
+
+    :param value: The parameter value
+    :param vartype: The pg_settings vartype, if known. Default: None
+    :type vartype: str
+    :return: str
+    """
+    text: str = str(value).strip().lower()
+    if vartype == "bool" or text in ("on", "off", "true", "false"):
+        return "on" if text in ("1", "on", "true", "yes") else "off"
+    try:
+        number: float = float(text)
+    except ValueError:
+        return text
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+def to_bytes(setting: str, unit: str) -> int:
+    """
+    Convert a pg_settings memory setting to bytes.
+
+    :param setting: The setting value
+    :param unit: The setting unit, e.g. 8kB
+    :type setting: str
+    :type unit: str
+    :return: int
+    """
+    return int(float(setting) * UNITS.get(unit, 1))
+
+
+class ParameterVerifier:
+    """
+    Class for comparing declared parameters with the parameter group and the running engine
+    """
+
+    def __init__(self, parameters: dict, region: str = "eu-central-1") -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :type parameters: dict
+        :type region: str
+        """
+        self.parameters: dict = parameters
+        self.region: str = region
+
+    def get_pg_settings(self, names: list) -> dict:
+        """
+        Read the given settings from pg_settings.
+
+        :param names: The setting names
+        :type names: list
+        :return: dict of name to (setting, unit, vartype, pending_restart)
+        """
+        conn = psycopg2.connect(**self.parameters)
+        try:
+            with conn.cursor() as sql:
+                sql.execute(
+                    "SELECT name, setting, unit, vartype, pending_restart "
+                    "FROM pg_settings WHERE name = ANY(%s)",
+                    (list(names),),
+                )
+                rows: list = sql.fetchall()
+        finally:
+            conn.close()
+        return {row[0]: row[1:] for row in rows}
+
+    def get_group_parameters(self, group_name: str) -> dict:
+        """
+        Read the user modified parameters of a DB parameter group.
+
+        :param group_name: The DB parameter group name
+        :type group_name: str
+        :return: dict of name to parameter description
+        """
+        client = boto3.session.Session().client(
+            service_name="rds", region_name=self.region
+        )
+        paginator = client.get_paginator("describe_db_parameters")
+        parameters: dict = {}
+        for page in paginator.paginate(DBParameterGroupName=group_name, Source="user"):
+            for parameter in page.get("Parameters", []):
+                parameters[parameter["ParameterName"]] = parameter
+        return parameters
+
+    def verify(self, declared: list, snapshot=None) -> list:
+        """
+        Diff the declared parameters against the parameter group of the
+        instance and the values the engine actually uses.
+
+        :param declared: The declared parameters, see get_declared_parameters()
+        :param snapshot: The instance snapshot. Default: None, only pg_settings is checked
+        :type declared: list
+        :return: list of dict, one per declared parameter
+        """
+        settings: dict = self.get_pg_settings([item["name"] for item in declared])
+        group: dict = {}
+        group_pending_reboot: bool = False
+        if snapshot is not None:
+            for parameter_group in snapshot.parameter_groups:
+                group.update(self.get_group_parameters(parameter_group.name))
+                if parameter_group.apply_status == "pending-reboot":
+                    group_pending_reboot = True
+
+        results: list = []
+        for item in declared:
+            name: str = item["name"]
+            setting: tuple = settings.get(name, None)
+            vartype: str = setting[2] if setting is not None else None
+            expected: str = normalize_value(item["value"], vartype)
+            live: str = None
+            pending_restart: bool = False
+            if setting is not None:
+                live = normalize_value(setting[0], vartype)
+                pending_restart = bool(setting[3])
+            result: dict = {
+                "name": name,
+                "declared": expected,
+                "live": live,
+                "live_matches": live == expected,
+                "pending_restart": pending_restart,
+            }
+            if snapshot is not None:
+                in_group: dict = group.get(name, {})
+                group_value: str = in_group.get("ParameterValue", None)
+                if group_value is not None:
+                    group_value = normalize_value(group_value, vartype)
+                result["group"] = group_value
+                result["group_matches"] = group_value == expected
+                result["apply_method"] = in_group.get("ApplyMethod", None)
+                result["pending_restart"] = pending_restart or (
+                    group_pending_reboot and live != expected
+                )
+            results.append(result)
+        return results
+
+
+class TuningAdvisor:
+    """
+    Class for turning pg_stat observations into parameter sizing suggestions
+    """
+
+    def __init__(self, parameters: dict, memory: int, storage_type: str = None) -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param memory: The instance class memory in bytes
+        :param storage_type: The storage type, e.g. gp3. Default: None
+        :type parameters: dict
+        :type memory: int
+        :type storage_type: str
+        """
+        self.parameters: dict = parameters
+        self.memory: int = memory
+        self.storage_type: str = storage_type
+
+    def observe(self) -> dict:
+        """
+        Collect the statistics and current settings the advice is based on.
+
+        :return: dict
+        """
+        conn = psycopg2.connect(**self.parameters)
+        try:
+            with conn.cursor() as sql:
+                sql.execute(
+                    "SELECT blks_hit, blks_read, temp_files, temp_bytes "
+                    "FROM pg_stat_database WHERE datname = current_database()"
+                )
+                blks_hit, blks_read, temp_files, temp_bytes = sql.fetchone()
+                sql.execute(
+                    "SELECT count(*) FROM pg_stat_activity WHERE backend_type = 'client backend'"
+                )
+                (connections,) = sql.fetchone()
+                sql.execute(
+                    "SELECT name, setting, unit FROM pg_settings WHERE name = ANY(%s)",
+                    (list(TUNED_SETTINGS),),
+                )
+                settings: dict = {row[0]: (row[1], row[2]) for row in sql.fetchall()}
+        finally:
+            conn.close()
+        reads: int = blks_hit + blks_read
+        return {
+            "cache_hit_ratio": blks_hit / reads if reads > 0 else None,
+            "temp_files": temp_files,
+            "temp_bytes": temp_bytes,
+            "connections": connections,
+            "shared_buffers": to_bytes(*settings["shared_buffers"]),
+            "work_mem": to_bytes(*settings["work_mem"]),
+            "max_connections": int(settings["max_connections"][0]),
+            "random_page_cost": float(settings["random_page_cost"][0]),
+        }
+
+    def advise(self, observations: dict) -> list:
+        """
+        Return sizing suggestions for shared_buffers, work_mem,
+        max_connections and random_page_cost.
+
+        :param observations: The observations, see observe()
+        :type observations: dict
+        :return: list of dict
+        """
+        suggestions: list = []
+        shared_buffers: int = observations["shared_buffers"]
+        hit_ratio: float = observations["cache_hit_ratio"]
+        if (
+            hit_ratio is not None
+            and hit_ratio < 0.99
+            and shared_buffers < self.memory * 0.4
+        ):
+            suggestions.append(
+                {
+                    "parameter": "shared_buffers",
+                    "current": shared_buffers,
+                    "suggested": int(self.memory * 0.4),
+                    "reason": f"cache hit ratio is {hit_ratio:.3f}, below 0.99",
+                }
+            )
+
+        max_connections: int = observations["max_connections"]
+        connections: int = observations["connections"]
+        if connections > max_connections * 0.8:
+            suggestions.append(
+                {
+                    "parameter": "max_connections",
+                    "current": max_connections,
+                    "suggested": int(connections * 1.5),
+                    "reason": f"{connections} connections in use, consider RDS Proxy",
+                }
+            )
+        elif connections < max_connections * 0.25 and max_connections > 100:
+            suggestions.append(
+                {
+                    "parameter": "max_connections",
+                    "current": max_connections,
+                    "suggested": max(100, connections * 4),
+                    "reason": f"only {connections} connections in use",
+                }
+            )
+
+        temp_files: int = observations["temp_files"]
+        if temp_files > 0:
+            spill: int = observations["temp_bytes"] // temp_files
+            budget: int = int(
+                (self.memory - shared_buffers) * 0.5 / max(connections, 1)
+            )
+            suggested: int = min(spill, budget)
+            if suggested > observations["work_mem"]:
+                suggestions.append(
+                    {
+                        "parameter": "work_mem",
+                        "current": observations["work_mem"],
+                        "suggested": suggested,
+                        "reason": f"{temp_files} sorts or hashes spilled "
+                        f"{spill} bytes on average to disk",
+                    }
+                )
+
+        if self.storage_type in ("gp2", "gp3", "io1", "io2"):
+            if observations["random_page_cost"] > 1.1:
+                suggestions.append(
+                    {
+                        "parameter": "random_page_cost",
+                        "current": observations["random_page_cost"],
+                        "suggested": 1.1,
+                        "reason": f"{self.storage_type} is SSD storage",
+                    }
+                )
+        return suggestions
+
+
+def main() -> int:
+    """
+    Verify the instance parameters or print tuning advice from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Verify and tune instance parameters.")
+    parser.add_argument("action", choices=["verify", "advise"])
+    probe.add_connection_arguments(parser)
+    parser.add_argument("--environment", default="test")
+    parser.add_argument(
+        "--instance-parameters", help="JSON file with the instance_parameters variable"
+    )
+    parser.add_argument(
+        "--instance-class", default="db.t3.micro", help="Class of a local stand-in"
+    )
+    args = probe.parse_arguments(parser)
+    parameters, snapshot = probe.get_target(args)
+
+    if args.action == "verify":
+        instance_parameters: list = []
+        if args.instance_parameters is not None:
+            with open(args.instance_parameters, encoding="utf-8") as parameters_file:
+                instance_parameters = json.load(parameters_file)
+        declared: list = get_declared_parameters(args.environment, instance_parameters)
+        results: list = ParameterVerifier(parameters, args.region).verify(
+            declared, snapshot
+        )
+        print(json.dumps(results, indent=2))
+        failed: bool = any(
+            not result["live_matches"] or not result.get("group_matches", True)
+            for result in results
+        )
+        return 1 if failed else 0
+
+    instance_class: str = args.instance_class
+    storage_type: str = None
+    cluster_identifier: str = None
+    if snapshot is not None:
+        instance_class = snapshot.instance_class
+        storage_type = snapshot.storage_type
+        cluster_identifier = snapshot.cluster_identifier
+    advisor = TuningAdvisor(
+        parameters,
+        get_instance_memory(instance_class, args.region, cluster_identifier),
+        storage_type,
+    )
+    observations: dict = advisor.observe()
+    print(
+        json.dumps(
+            {
+                "instance_class": instance_class,
+                "observations": observations,
+                "suggestions": advisor.advise(observations),
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0913
+"""
+Probe
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import socket
+import ssl
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+import rds
+from stats import summarize
+
+# The SSLRequest message a PostgreSQL client sends before the TLS handshake.
+SSL_REQUEST: bytes = struct.pack("!ii", 8, 80877103)
+
+
+def measure_handshake(
+    host: str,
+    port: int,
+    sslmode: str = "verify-full",
+    sslrootcert: str = None,
+    timeout: float = 10,
+    source_address: str = None,
+) -> tuple:
+    """
+    Open a raw connection to a PostgreSQL server and time the TCP connect and
+    the TLS handshake separately. The TLS time is 0 when sslmode is disable.
+
+    :param host: The server host
+    :param port: The server port
+    :param sslmode: The libpq sslmode. Default: verify-full
+    :param sslrootcert: The CA bundle used to verify the server. Default: ~/.postgresql/root.crt
+    :param timeout: The socket timeout in seconds. Default: 10
+    :param source_address: The local address to connect from. Default: None, any
+    :type host: str
+    :type port: int
+    :type sslmode: str
+    :type sslrootcert: str
+    :type timeout: float
+    :type source_address: str
+    :return: tuple of (tcp seconds, tls seconds)
+    """
+    start: float = time.perf_counter()
+    sock = socket.create_connection(
+        (host, port),
+        timeout=timeout,
+        source_address=None if source_address is None else (source_address, 0),
+    )
+    tcp: float = time.perf_counter() - start
+    tls: float = 0.0
+    try:
+        if sslmode == "disable":
+            return tcp, tls
+        start = time.perf_counter()
+        sock.sendall(SSL_REQUEST)
+        if sock.recv(1) != b"S":
+            if sslmode in ("require", "verify-ca", "verify-full"):
+                raise ssl.SSLError(f"{host}:{port} does not accept SSL connections")
+            return tcp, time.perf_counter() - start
+        if sslmode in ("verify-ca", "verify-full"):
+            if sslrootcert is None:
+                sslrootcert = os.path.expanduser("~/.postgresql/root.crt")
+            context = ssl.create_default_context(cafile=sslrootcert)
+            context.check_hostname = sslmode == "verify-full"
+        else:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+            tls = time.perf_counter() - start
+            tls_sock.unwrap()
+        return tcp, tls
+    finally:
+        sock.close()
+
+
+class LatencyProbe:
+    """
+    Class for measuring connect and query latency against a PostgreSQL database
+    """
+
+    def __init__(
+        self,
+        parameters: dict,
+        clients: int = 4,
+        queries: int = 1000,
+        query: str = "SELECT 1",
+    ) -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param clients: The number of concurrent clients. Default: 4
+        :param queries: The total number of queries across all clients. Default: 1000
+        :param query: The query each client executes. Default: SELECT 1
+        :type parameters: dict
+        :type clients: int
+        :type queries: int
+        :type query: str
+        """
+        self.parameters: dict = parameters
+        self.clients: int = clients
+        self.queries: int = queries
+        self.query: str = query
+
+    def measure_connect(self, samples: int = 10) -> dict:
+        """
+        Time a number of sequential connections and split each one into
+        TCP connect, TLS handshake and authentication. The split is measured on
+        a raw socket just before each full connection, so the authentication
+        time is the full connect time minus the TCP and TLS times.
+
+        :param samples: The number of connections to time. Default: 10
+        :type samples: int
+        :return: dict
+        """
+        tcp_samples: list = []
+        tls_samples: list = []
+        auth_samples: list = []
+        total_samples: list = []
+        for _ in range(samples):
+            tcp, tls = measure_handshake(
+                self.parameters["host"],
+                self.parameters["port"],
+                self.parameters.get("sslmode", "prefer"),
+                self.parameters.get("sslrootcert", None),
+            )
+            start: float = time.perf_counter()
+            conn = psycopg2.connect(**self.parameters)
+            total: float = time.perf_counter() - start
+            conn.close()
+            tcp_samples.append(tcp)
+            tls_samples.append(tls)
+            auth_samples.append(max(total - tcp - tls, 0.0))
+            total_samples.append(total)
+        return {
+            "tcp": summarize(tcp_samples),
+            "tls": summarize(tls_samples),
+            "auth": summarize(auth_samples),
+            "total": summarize(total_samples),
+        }
+
+    def __run_client(self, pool: ThreadedConnectionPool, queries: int) -> list:
+        """
+        Run queries through connections borrowed from the pool and return
+        the latency of each query.
+
+        :return: list
+        """
+        latencies: list = []
+        for _ in range(queries):
+            conn = pool.getconn()
+            try:
+                start: float = time.perf_counter()
+                with conn.cursor() as sql:
+                    sql.execute(self.query)
+                    sql.fetchall()
+                conn.rollback()
+                latencies.append(time.perf_counter() - start)
+            finally:
+                pool.putconn(conn)
+        return latencies
+
+    def measure_queries(self) -> dict:
+        """
+        Run the queries across the concurrent clients on a pool of warm
+        connections and return the query latency and throughput.
+
+        :return: dict
+        """
+        pool = ThreadedConnectionPool(self.clients, self.clients, **self.parameters)
+        share, rest = divmod(self.queries, self.clients)
+        shares: list = [share + (1 if i < rest else 0) for i in range(self.clients)]
+        try:
+            results, elapsed = run_clients(
+                functools.partial(self.__run_client, pool), shares
+            )
+        finally:
+            pool.closeall()
+        latencies: list = [latency for result in results for latency in result]
+        return {
+            "latency": summarize(latencies),
+            "throughput_qps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "elapsed_s": elapsed,
+        }
+
+    def run(self, connect_samples: int = 10) -> dict:
+        """
+        Run the connect and query probes and return the full report.
+
+        :param connect_samples: The number of connections to time. Default: 10
+        :type connect_samples: int
+        :return: dict
+        """
+        logging.info(
+            f"Probing {self.parameters['host']}:{self.parameters['port']} with "
+            f"{self.clients} clients and {self.queries} queries"
+        )
+        return {
+            "clients": self.clients,
+            "queries": self.queries,
+            "connect": self.measure_connect(connect_samples),
+            "query": self.measure_queries(),
+        }
+
+
+def run_clients(client, arguments: list) -> tuple:
+    """
+    Run client(argument) for every argument on its own thread, all at once.
+
+    :param client: The client function
+    :param arguments: One argument per client, e.g. range(clients)
+    :type arguments: list
+    :return: tuple of (results in argument order, elapsed seconds)
+    """
+    arguments = list(arguments)
+    start: float = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(arguments))) as executor:
+        results: list = list(executor.map(client, arguments))
+    return results, time.perf_counter() - start
+
+
+def add_connection_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments selecting either the QA instance or a local stand-in database.
+
+    :param parser: The argument parser to extend
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--database", default="postgres")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--host", help="Use a local stand-in instead of RDS")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default=os.environ.get("PGPASSWORD"))
+    parser.add_argument("--sslmode", default="prefer")
+
+
+def parse_arguments(parser: argparse.ArgumentParser) -> argparse.Namespace:
+    """
+    Parse the command line and set up logging for a benchmark script.
+
+    :param parser: The argument parser
+    :type parser: argparse.ArgumentParser
+    :return: argparse.Namespace
+    """
+    args: argparse.Namespace = parser.parse_args()
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    return args
+
+
+def get_qa(args: argparse.Namespace) -> rds.QA:
+    """
+    Return the QA object of the instance selected on the command line.
+
+    :param args: The parsed command line arguments
+    :type args: argparse.Namespace
+    :return: rds.QA
+    """
+    return rds.QA(
+        database=args.database,
+        region=args.region,
+        log_level=logging.ERROR,
+        identifier=args.identifier,
+    )
+
+
+def get_qa_parameters(qa: rds.QA) -> dict:
+    """
+    Return the connection parameters of a QA instance with a connection
+    factory that fetches the master user secret again when a login is
+    rejected, so long runs survive a rotation of the secret.
+
+    :param qa: The QA instance
+    :type qa: rds.QA
+    :return: dict
+    """
+    parameters: dict = qa.get_connection_parameters()
+    if parameters is None:
+        return None
+    return dict(
+        parameters,
+        connection_factory=functools.partial(rds.connect_with_secret, qa=qa),
+    )
+
+
+def get_target(args: argparse.Namespace) -> tuple:
+    """
+    Return the connection parameters and the snapshot of the QA instance,
+    describing it once, or the parameters of the stand-in database and None
+    when --host is given.
+
+    :param args: The parsed command line arguments
+    :type args: argparse.Namespace
+    :return: tuple of (dict, InstanceSnapshot)
+    """
+    if args.host is not None:
+        parameters: dict = {
+            "dbname": args.database,
+            "user": args.user,
+            "password": args.password,
+            "host": args.host,
+            "port": args.port,
+            "sslmode": args.sslmode,
+        }
+        return parameters, None
+    qa: rds.QA = get_qa(args)
+    snapshot = qa.get_snapshot()
+    if snapshot is not None:
+        logging.info(f"Instance class is {snapshot.instance_class}")
+    return get_qa_parameters(qa), snapshot
+
+
+def get_connection_parameters(args: argparse.Namespace) -> dict:
+    """
+    Return the connection parameters for the stand-in database when --host is
+    given, otherwise for the QA instance.
+
+    :param args: The parsed command line arguments
+    :type args: argparse.Namespace
+    :return: dict
+    """
+    return get_target(args)[0]
+
+
+def write_report(report: dict, path: str = None) -> None:
+    """
+    Print a JSON report and write it to a file if a path is given.
+
+    :param report: The report
+    :param path: The output file. Default: None
+    :type report: dict
+    :type path: str
+    """
+    output: str = json.dumps(report, indent=2)
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as report_file:
+            report_file.write(output)
+    print(output)
+
+
+def main() -> int:
+    """
+    Probe the latency of the QA database from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Probe QA database latency.")
+    add_connection_arguments(parser)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--connect-samples", type=int, default=10)
+    parser.add_argument("--budget-p95-ms", type=float, help="Fail above this p95")
+    args = parse_arguments(parser)
+
+    parameters: dict = get_connection_parameters(args)
+    if parameters is None:
+        logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+        return 1
+    probe = LatencyProbe(parameters, clients=args.clients, queries=args.queries)
+    report: dict = probe.run(connect_samples=args.connect_samples)
+    write_report(report)
+
+    if args.budget_p95_ms is not None:
+        p95: float = report["query"]["latency"]["p95_ms"]
+        if p95 > args.budget_p95_ms:
+            logging.error(f"Query p95 {p95:.2f}ms exceeds {args.budget_p95_ms}ms")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Proxy benchmark
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+
+import boto3
+import psycopg2
+
+import probe
+from monitoring import get_metric_query
+from stats import summarize
+
+# Error messages returned when no pooled connection could be borrowed in time,
+# by RDS Proxy and by PgBouncer respectively.
+BORROW_TIMEOUT_MESSAGES: tuple = (
+    "timed-out waiting to acquire database connection",
+    "query_wait_timeout",
+)
+
+
+# The proxy metrics are gauges sampled every minute, which reach CloudWatch
+# with a delay.
+METRIC_PERIOD: int = 60
+METRIC_DELAY: float = 60.0
+
+
+def get_pinned_session_rate(pinned: dict, connections: dict) -> float:
+    """
+    Return the highest share of client connections that were pinned to a
+    database connection in any period. Both gauges are averaged per period,
+    so the ratio compares the same period rather than sums over the window.
+
+    :param pinned: The average pinned sessions keyed by period timestamp
+    :param connections: The average client connections keyed by period timestamp
+    :type pinned: dict
+    :type connections: dict
+    :return: float, None if there were no client connections
+    """
+    rates: list = [
+        pinned.get(timestamp, 0.0) / count
+        for timestamp, count in connections.items()
+        if count > 0
+    ]
+    if len(rates) == 0:
+        return None
+    return max(rates)
+
+
+def classify_error(error: psycopg2.Error) -> str:
+    """
+    Return borrow_timeout if a database error was caused by the pool borrow
+    timeout, otherwise other.
+
+    :param error: The error raised by psycopg2
+    :type error: psycopg2.Error
+    :return: str
+    """
+    message: str = str(error).lower()
+    if any(timeout in message for timeout in BORROW_TIMEOUT_MESSAGES):
+        return "borrow_timeout"
+    return "other"
+
+
+class ProxyBenchmark:
+    """
+    Class for comparing workloads through the instance endpoint and the proxy endpoint
+    """
+
+    def __init__(
+        self,
+        targets: dict,
+        clients: int = 50,
+        iterations: int = 20,
+    ) -> None:
+        """Class constructor.
+
+        :param targets: The psycopg2 connection parameters keyed by target name
+        :param clients: The number of concurrent clients. Default: 50
+        :param iterations: The number of connections or transactions per client. Default: 20
+        :type targets: dict
+        :type clients: int
+        :type iterations: int
+        """
+        self.targets: dict = targets
+        self.clients: int = clients
+        self.iterations: int = iterations
+
+    def __run_clients(self, client) -> tuple:
+        """
+        Run the client function on every client concurrently and merge the
+        latencies and error counters.
+
+        :return: tuple of (latencies, errors, elapsed seconds)
+        """
+        results, elapsed = probe.run_clients(lambda _: client(), range(self.clients))
+        latencies: list = []
+        errors: dict = {"borrow_timeout": 0, "other": 0}
+        for client_latencies, client_errors in results:
+            latencies.extend(client_latencies)
+            for kind, count in client_errors.items():
+                errors[kind] += count
+        return latencies, errors, elapsed
+
+    def connection_storm(self, parameters: dict) -> dict:
+        """
+        Let every client open, use and close a new connection per iteration.
+
+        :param parameters: The psycopg2 connection parameters
+        :type parameters: dict
+        :return: dict
+        """
+
+        def client() -> tuple:
+            latencies: list = []
+            errors: dict = {"borrow_timeout": 0, "other": 0}
+            for _ in range(self.iterations):
+                conn = None
+                start: float = time.perf_counter()
+                try:
+                    conn = psycopg2.connect(**parameters)
+                    latencies.append(time.perf_counter() - start)
+                    with conn.cursor() as sql:
+                        sql.execute("SELECT 1")
+                except psycopg2.Error as error:
+                    errors[classify_error(error)] += 1
+                    logging.debug(error)
+                finally:
+                    if conn is not None:
+                        conn.close()
+            return latencies, errors
+
+        latencies, errors, elapsed = self.__run_clients(client)
+        return {
+            "connect": summarize(latencies),
+            "errors": errors,
+            "connections_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def short_transactions(self, parameters: dict) -> dict:
+        """
+        Let every client run short write transactions on its own connection.
+
+        :param parameters: The psycopg2 connection parameters
+        :type parameters: dict
+        :return: dict
+        """
+
+        def client() -> tuple:
+            latencies: list = []
+            errors: dict = {"borrow_timeout": 0, "other": 0}
+            try:
+                conn = psycopg2.connect(**parameters)
+            except psycopg2.Error as error:
+                errors[classify_error(error)] += 1
+                return latencies, errors
+            try:
+                for _ in range(self.iterations):
+                    start: float = time.perf_counter()
+                    try:
+                        with conn.cursor() as sql:
+                            sql.execute("SELECT txid_current()")
+                        conn.commit()
+                        latencies.append(time.perf_counter() - start)
+                    except psycopg2.Error as error:
+                        errors[classify_error(error)] += 1
+                        if not conn.closed:
+                            conn.rollback()
+            finally:
+                conn.close()
+            return latencies, errors
+
+        latencies, errors, elapsed = self.__run_clients(client)
+        return {
+            "transaction": summarize(latencies),
+            "errors": errors,
+            "tps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def run(self) -> dict:
+        """
+        Run both workloads against every target and return the report.
+
+        :return: dict
+        """
+        report: dict = {}
+        for name, parameters in self.targets.items():
+            logging.info(
+                f"Benchmarking {name} with {self.clients} clients "
+                f"and {self.iterations} iterations"
+            )
+            report[name] = {
+                "connection_storm": self.connection_storm(parameters),
+                "short_transactions": self.short_transactions(parameters),
+            }
+        return report
+
+
+class ProxyMetrics:
+    """
+    Class for reading the RDS Proxy configuration and its CloudWatch metrics
+    """
+
+    def __init__(self, name: str, region: str = "eu-central-1") -> None:
+        """Class constructor.
+
+        :param name: The RDS Proxy name, which equals the instance identifier
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :type name: str
+        :type region: str
+        """
+        self.name: str = name
+        self.region: str = region
+        self.session = boto3.session.Session()
+
+    def get_endpoint(self) -> str:
+        """
+        Return the default endpoint of the proxy.
+
+        :return: str
+        """
+        client = self.session.client(service_name="rds", region_name=self.region)
+        proxies: dict = client.describe_db_proxies(DBProxyName=self.name)
+        return proxies["DBProxies"][0]["Endpoint"]
+
+    def get_connection_pool_config(self) -> dict:
+        """
+        Return the connection pool configuration of the default target group.
+
+        :return: dict
+        """
+        client = self.session.client(service_name="rds", region_name=self.region)
+        groups: dict = client.describe_db_proxy_target_groups(DBProxyName=self.name)
+        for group in groups["TargetGroups"]:
+            if group.get("IsDefault", False):
+                return group.get("ConnectionPoolConfig", {})
+        return {}
+
+    def get_metrics(self, start: datetime.datetime, end: datetime.datetime) -> dict:
+        """
+        Return the per-period averages of the pinned sessions and the client
+        connections between start and end, keyed by metric and timestamp.
+
+        :param start: The start of the measurement window
+        :param end: The end of the measurement window
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :return: dict
+        """
+        client = self.session.client(service_name="cloudwatch", region_name=self.region)
+        queries: list = [
+            get_metric_query(
+                metric_id, metric_name, {"ProxyName": self.name}, period=METRIC_PERIOD
+            )
+            for metric_id, metric_name in (
+                ("pinned", "DatabaseConnectionsCurrentlySessionPinned"),
+                ("connections", "ClientConnections"),
+            )
+        ]
+        metrics: dict = {"pinned": {}, "connections": {}}
+        paginator = client.get_paginator("get_metric_data")
+        for page in paginator.paginate(
+            MetricDataQueries=queries, StartTime=start, EndTime=end
+        ):
+            for result in page["MetricDataResults"]:
+                metrics[result["Id"]].update(
+                    zip(result["Timestamps"], result["Values"])
+                )
+        return metrics
+
+    def wait_for_pinned_session_rate(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        timeout: float = 300.0,
+        interval: float = 30.0,
+    ) -> float:
+        """
+        Wait until CloudWatch has the client connections of the last period
+        before end, then return the pinned session rate between start and end.
+        After the timeout the rate of the periods published so far is returned.
+
+        :param start: The start of the measurement window
+        :param end: The end of the measurement window
+        :param timeout: Seconds to wait for the last period. Default: 300
+        :param interval: Seconds between the attempts. Default: 30
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :type timeout: float
+        :type interval: float
+        :return: float
+        """
+        last: datetime.datetime = end.replace(second=0, microsecond=0)
+        time.sleep(
+            max(
+                0.0,
+                METRIC_DELAY
+                - (datetime.datetime.now(end.tzinfo) - end).total_seconds(),
+            )
+        )
+        deadline: float = time.monotonic() + timeout
+        while True:
+            metrics: dict = self.get_metrics(
+                start, end + datetime.timedelta(seconds=METRIC_PERIOD)
+            )
+            if any(timestamp >= last for timestamp in metrics["connections"]):
+                break
+            if time.monotonic() >= deadline:
+                logging.warning(
+                    f"CloudWatch has no proxy metrics after {last} within {timeout}s"
+                )
+                break
+            time.sleep(interval)
+        return get_pinned_session_rate(metrics["pinned"], metrics["connections"])
+
+
+def main() -> int:
+    """
+    Compare the instance endpoint with the proxy endpoint from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Benchmark direct vs RDS Proxy.")
+    probe.add_connection_arguments(parser)
+    parser.add_argument("--proxy-host", help="Use a local pooler instead of RDS Proxy")
+    parser.add_argument("--proxy-port", type=int, default=6432)
+    parser.add_argument(
+        "--proxy-sslmode",
+        default="require",
+        help="The proxy certificate is issued by ACM, not the RDS CA",
+    )
+    parser.add_argument(
+        "--proxy-sslrootcert",
+        help="The Amazon Trust Services roots, to use --proxy-sslmode verify-full",
+    )
+    parser.add_argument("--metrics-timeout", type=float, default=300.0)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = probe.parse_arguments(parser)
+    direct: dict = probe.get_connection_parameters(args)
+    if direct is None:
+        logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+        return 1
+    proxy: dict = dict(direct)
+    metrics: ProxyMetrics = None
+    if args.proxy_host is not None:
+        proxy.update(host=args.proxy_host, port=args.proxy_port)
+    else:
+        metrics = ProxyMetrics(args.identifier, args.region)
+        proxy.pop("sslrootcert", None)
+        proxy.update(host=metrics.get_endpoint(), sslmode=args.proxy_sslmode)
+        if args.proxy_sslrootcert is not None:
+            proxy["sslrootcert"] = args.proxy_sslrootcert
+
+    start = datetime.datetime.now(datetime.timezone.utc)
+    benchmark = ProxyBenchmark(
+        {"direct": direct, "proxy": proxy},
+        clients=args.clients,
+        iterations=args.iterations,
+    )
+    report: dict = benchmark.run()
+    end = datetime.datetime.now(datetime.timezone.utc)
+
+    if metrics is not None:
+        report["proxy"]["connection_pool_config"] = metrics.get_connection_pool_config()
+        report["proxy"]["pinned_session_rate"] = metrics.wait_for_pinned_session_rate(
+            start - datetime.timedelta(minutes=1), end, timeout=args.metrics_timeout
+        )
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,118 @@
 #!/usr/bin/env python
-# pylint: disable=W1203,R0902,R0904
+# pylint: disable=W1203,R0902,R0904,R0913
 """
 RDS
 """
 
-import json
 import logging
+import threading
+import time
 
 import boto3
 import psycopg2
 from botocore.exceptions import ClientError
+from psycopg2.extensions import connection, make_dsn, parse_dsn
+
+from log_groups import list_log_groups
+from retry import backoff_delays
+from secret_cache import SHARED_CACHE, SecretCache, is_authentication_failure
+from snapshot import EndpointRecord, InstanceSnapshot
+from token_cache import SHARED_TOKEN_CACHE, TokenCache
+
+# Error codes RDS returns when it rejects the lookup itself, e.g. a filter
+# that isn't supported, rather than failing to serve it.
+LOOKUP_REJECTED_ERRORS: tuple = (
+    "InvalidParameterCombination",
+    "InvalidParameterValue",
+)
+
+
+def describe_instances(client, identifiers: list):
+    """
+    Describe the given RDS Instances and yield their configurations one by one.
+
+    The identifiers are matched server side. A single identifier is requested
+    through DBInstanceIdentifier, several identifiers through a db-instance-id
+    filter, and the results are paginated so no instance is lost past the first page.
+
+    :param client: A boto3 RDS client
+    :param identifiers: The DB instance identifiers (or ARNs) to describe
+    :type identifiers: list
+    :return: generator of dict
+    """
+    if len(identifiers) == 0:
+        return
+    if len(identifiers) == 1:
+        try:
+            response: dict = client.describe_db_instances(
+                DBInstanceIdentifier=identifiers[0]
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] == "DBInstanceNotFound":
+                return
+            raise
+        yield from response.get("DBInstances", [])
+        return
+
+    paginator = client.get_paginator("describe_db_instances")
+    pages = paginator.paginate(
+        Filters=[{"Name": "db-instance-id", "Values": list(identifiers)}]
+    )
+    for page in pages:
+        yield from page.get("DBInstances", [])
+
+
+def scan_instances(client):
+    """
+    Stream every RDS Instance in the account page by page.
+    Pages are only requested while the caller keeps consuming the generator.
+
+    :param client: A boto3 RDS client
+    :return: generator of dict
+    """
+    paginator = client.get_paginator("describe_db_instances")
+    for page in paginator.paginate():
+        yield from page.get("DBInstances", [])
+
+
+def get_secret_dsn(dsn: str, qa: "QA") -> str:
+    """
+    Return the connection string with the cached master user password of a
+    QA instance or cluster, or unchanged when it logs in as another user.
+
+    :param dsn: The connection string built by psycopg2.connect()
+    :param qa: The QA instance or cluster whose secret to use
+    :type dsn: str
+    :type qa: QA or cluster.ClusterQA
+    :return: str
+    """
+    secret: dict = qa.get_connection_parameters()
+    if secret is None or secret["user"] != parse_dsn(dsn).get("user", None):
+        return dsn
+    return make_dsn(dsn, password=secret["password"])
+
+
+def connect_with_secret(dsn: str, *args, qa: "QA" = None, **kwargs) -> connection:
+    """
+    psycopg2 connection factory that logs in with the cached master user
+    password and fetches the secret again when the login is rejected, e.g.
+    after a rotation. Used as the connection_factory of psycopg2.connect()
+    and of the connection pools.
+
+    :param dsn: The connection string built by psycopg2.connect()
+    :param qa: The QA instance or cluster whose secret to use
+    :type dsn: str
+    :type qa: QA or cluster.ClusterQA
+    :return: connection
+    """
+    try:
+        return connection(get_secret_dsn(dsn, qa), *args, **kwargs)
+    except psycopg2.OperationalError as error:
+        if not is_authentication_failure(error):
+            raise
+        logging.info("Authentication failed, fetching the rotated secret")
+        qa.invalidate_secret()
+        return connection(get_secret_dsn(dsn, qa), *args, **kwargs)
 
 
 class QA:
@@ -22,14 +125,28 @@ class QA:
         database: str = "postgres",
         region: str = "eu-central-1",
         log_level: int = logging.INFO,
+        identifier: str = "qa",
+        instance=None,
+        cache_ttl: float = None,
+        endpoint_url: str = None,
     ) -> None:
         """Class constructor.
 
         :param database: The name of the QA database. Default: postgres
         :param region: The AWS region with the QA resources. Default: eu-central-1
         :param log_level: A valid log level from the logging module. Default: logging.INFO
+        :param identifier: The identifier of the QA RDS instance. Default: qa
+        :param instance: An already fetched instance description or snapshot. Default: None
+        :param cache_ttl: Seconds before the instance description is fetched again.
+            Default: None, the description is cached until refresh() is called
+        :param endpoint_url: Send the AWS API calls to this endpoint, e.g. a moto server.
+            Default: None
         :type region: str
         :type log_level: int
+        :type identifier: str
+        :type instance: dict or InstanceSnapshot
+        :type cache_ttl: float
+        :type endpoint_url: str
         """
         logging.basicConfig(
             format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -38,46 +155,180 @@ class QA:
         self.region: str = region
         self.log_level: int = log_level
         self.database: str = database
-        self.endpoint: dict = None
-        self.secret: dict = None
-        self.instance: dict = None
+        self.identifier: str = identifier
+        self.endpoint: EndpointRecord = None
+        self.secret_cache: SecretCache = SHARED_CACHE
+        self.token_cache: TokenCache = SHARED_TOKEN_CACHE
+        if isinstance(instance, dict):
+            instance = InstanceSnapshot.from_description(instance)
+        self.instance: InstanceSnapshot = instance
+        self.cache_ttl: float = cache_ttl
+        self.instance_fetched_at: float = time.monotonic()
+        self.endpoint_url: str = endpoint_url
         self.session = boto3.session.Session()
+        self.clients: dict = {}
+        self.clients_lock = threading.Lock()
         logging.debug("Class initialized")
 
-    def __get_all_instances(self) -> dict:
+    def get_client(self, service_name: str):
+        """
+        Return a boto3 client for the given service. Clients are created once
+        and shared, since the session itself is not thread safe.
+
+        :param service_name: The AWS service name, e.g. rds
+        :type service_name: str
+        :return: A boto3 client
         """
-        Get a list of RDS Instances and return them stored inside a dictionary.
+        with self.clients_lock:
+            if service_name not in self.clients:
+                self.clients[service_name] = self.session.client(
+                    service_name=service_name,
+                    region_name=self.region,
+                    endpoint_url=self.endpoint_url,
+                )
+            return self.clients[service_name]
 
+    def __get_all_instances(self, identifiers: list = None) -> dict:
+        """
+        Get the RDS Instances with the given identifiers and return them stored
+        inside a dictionary. The identifiers are filtered server side.
+
+        :param identifiers: The DB instance identifiers. Default: the QA identifier
+        :type identifiers: list
         :return: dict
         """
-        client = self.session.client(service_name="rds", region_name=self.region)
-        databases: dict = client.describe_db_instances()
+        if identifiers is None:
+            identifiers = [self.identifier]
+        client = self.get_client("rds")
+        databases: dict = {"DBInstances": list(describe_instances(client, identifiers))}
         return databases
 
-    def __get_instance(self) -> dict:
+    def __get_instance(self) -> InstanceSnapshot:
         """
-        Check if there is a QA instance among the RDS Instances and return
-        its configuration as a dictionary.
+        Look up the QA instance by its identifier and return
+        its configuration as a snapshot. If the filtered lookup is rejected,
+        the instances are streamed page by page until the first match. Other
+        errors, e.g. throttling, are raised, as a scan would make them worse.
 
-        :return: dict
+        :return: InstanceSnapshot
         """
-        instance: dict = self.instance
-        if instance is None:
-            dbs: dict = self.__get_all_instances()
-            for db in dbs["DBInstances"]:
-                if db["DBInstanceIdentifier"] == "qa":
-                    self.__set_instance(db)
-                    logging.debug(db)
-                    return db
-        else:
-            return instance
-        return None
+        instance: InstanceSnapshot = self.instance
+        if instance is None or self.__is_instance_expired():
+            try:
+                dbs: dict = self.__get_all_instances()
+                db: dict = next(iter(dbs["DBInstances"]), None)
+            except ClientError as error:
+                if error.response["Error"]["Code"] not in LOOKUP_REJECTED_ERRORS:
+                    raise
+                logging.debug(f"Filtered lookup failed, scanning instances: {error}")
+                client = self.get_client("rds")
+                db: dict = next(
+                    (
+                        candidate
+                        for candidate in scan_instances(client)
+                        if candidate["DBInstanceIdentifier"] == self.identifier
+                    ),
+                    None,
+                )
+            if db is not None:
+                logging.debug(db)
+                db = InstanceSnapshot.from_description(db)
+                self.__set_instance(db)
+            return db
+        return instance
 
-    def __set_instance(self, instance: dict) -> None:
+    def __is_instance_expired(self) -> bool:
+        """
+        Check if the cached instance description is older than the cache TTL.
+
+        :return: bool
+        """
+        if self.cache_ttl is None:
+            return False
+        return time.monotonic() - self.instance_fetched_at > self.cache_ttl
+
+    def __set_instance(self, instance: InstanceSnapshot) -> None:
         """
         Set the instance value for the instance of the class.
         """
         self.instance = instance
+        self.instance_fetched_at = time.monotonic()
+        self.endpoint = None
+
+    def refresh(self) -> bool:
+        """
+        Describe the QA instance again and replace the cached description.
+        Only the QA instance is described.
+
+        :return: bool
+        """
+        client = self.get_client("rds")
+        db: dict = next(describe_instances(client, [self.identifier]), None)
+        if db is not None:
+            db = InstanceSnapshot.from_description(db)
+        self.__set_instance(db)
+        return db is not None
+
+    def get_snapshot(self) -> InstanceSnapshot:
+        """
+        Return the snapshot of the QA instance.
+
+        :return: InstanceSnapshot
+        """
+        return self.__get_instance()
+
+    def get_instance_status(self) -> str:
+        """
+        Return the status of the instance.
+
+        :return: str
+        """
+        instance: InstanceSnapshot = self.__get_instance()
+        if instance is not None:
+            return instance.status
+        return None
+
+    def wait_until(
+        self,
+        status: str = "available",
+        timeout: float = 1800,
+        base_delay: float = 5,
+        max_delay: float = 60,
+    ) -> bool:
+        """
+        Poll the QA instance until it reaches the given status, backing off
+        exponentially with jitter between the describe calls.
+
+        :param status: The DB instance status to wait for. Default: available
+        :param timeout: The maximum number of seconds to wait. Default: 1800
+        :param base_delay: The first backoff window in seconds. Default: 5
+        :param max_delay: The largest backoff window in seconds. Default: 60
+        :type status: str
+        :type timeout: float
+        :type base_delay: float
+        :type max_delay: float
+        :return: bool
+        """
+        deadline: float = time.monotonic() + timeout
+        delays = backoff_delays(base=base_delay, cap=max_delay)
+        while True:
+            self.refresh()
+            current: str = self.get_instance_status()
+            if current == status:
+                logging.info(f"Instance {self.identifier} is {status}")
+                return True
+            remaining: float = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error(
+                    f"Instance {self.identifier} is {current} after {timeout}s, "
+                    f"expected {status}"
+                )
+                return False
+            delay: float = min(next(delays), remaining)
+            logging.debug(
+                f"Instance {self.identifier} is {current}, next poll in {delay:.1f}s"
+            )
+            time.sleep(delay)
 
     def instance_exist(self) -> bool:
         """
@@ -85,11 +336,8 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
-        if instance is not None:
-            logging.debug(instance)
-            return True
-        return False
+        instance: InstanceSnapshot = self.__get_instance()
+        return instance is not None
 
     def is_instance_available(self) -> bool:
         """
@@ -97,11 +345,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            instance_status: str = instance.get("DBInstanceStatus", None)
-            if instance_status == "available":
-                return True
+            return instance.status == "available"
         return False
 
     def get_username_from_instance(self) -> str:
@@ -110,11 +356,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            username: str = instance.get("MasterUsername", None)
-            if username is not None:
-                return username
+            return instance.master_username
         return None
 
     def get_storage_size_from_instance(self) -> int:
@@ -123,10 +367,11 @@ class QA:
 
         :return: int
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            storage_size: int = instance.get("AllocatedStorage", -1)
-            return storage_size
+            if instance.allocated_storage is None:
+                return -1
+            return instance.allocated_storage
         return None
 
     def get_backup_retention_period(self) -> int:
@@ -135,10 +380,11 @@ class QA:
 
         :return: int
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            retention_period: int = instance.get("BackupRetentionPeriod", -1)
-            return retention_period
+            if instance.backup_retention_period is None:
+                return -1
+            return instance.backup_retention_period
         return None
 
     def is_multi_az(self) -> bool:
@@ -147,11 +393,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            multi_az: bool = instance.get("MultiAZ", False)
-            if multi_az:
-                return True
+            return bool(instance.multi_az)
         return False
 
     def get_storage_type_from_instance(self) -> str:
@@ -160,11 +404,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            storage: str = instance.get("StorageType", None)
-            if storage is not None:
-                return storage
+            return instance.storage_type
         return None
 
     def get_engine_from_instance(self) -> str:
@@ -173,11 +415,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            engine: str = instance.get("Engine", None)
-            if engine is not None:
-                return engine
+            return instance.engine
         return None
 
     def get_database_name_from_instance(self) -> str:
@@ -186,11 +426,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            db_name: str = instance.get("DBName", None)
-            if db_name is not None:
-                return db_name
+            return instance.db_name
         return None
 
     def get_instance_class_from_instance(self) -> str:
@@ -199,11 +437,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            instance_class: str = instance.get("DBInstanceClass", None)
-            if instance_class is not None:
-                return instance_class
+            return instance.instance_class
         return None
 
     def get_preferred_maintenance_window_instance(self) -> str:
@@ -212,13 +448,9 @@ class QA:
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            preferred_maintenance_window: str = instance.get(
-                "PreferredMaintenanceWindow", None
-            )
-            if preferred_maintenance_window is not None:
-                return preferred_maintenance_window
+            return instance.preferred_maintenance_window
         return None
 
     def is_auto_minor_version_upgrade(self) -> bool:
@@ -227,13 +459,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            auto_minor_version_upgrade: bool = instance.get(
-                "AutoMinorVersionUpgrade", False
-            )
-            if auto_minor_version_upgrade:
-                return True
+            return bool(instance.auto_minor_version_upgrade)
         return False
 
     def is_publicly_available(self) -> bool:
@@ -242,11 +470,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            publicly_available: bool = instance.get("PubliclyAccessible", False)
-            if publicly_available:
-                return True
+            return bool(instance.publicly_accessible)
         return False
 
     def is_iam_db_auth_enabled(self) -> bool:
@@ -255,13 +481,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            iam_db_auth_enabled: bool = instance.get(
-                "IAMDatabaseAuthenticationEnabled", False
-            )
-            if iam_db_auth_enabled:
-                return True
+            return bool(instance.iam_database_authentication_enabled)
         return False
 
     def is_performance_insights_enabled(self) -> bool:
@@ -270,13 +492,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            performance_insights_enabled: bool = instance.get(
-                "PerformanceInsightsEnabled", False
-            )
-            if performance_insights_enabled:
-                return True
+            return bool(instance.performance_insights_enabled)
         return False
 
     def get_performance_insights_retention_period_from_instance(self) -> int:
@@ -285,12 +503,11 @@ class QA:
 
         :return: int
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            performance_insights_retention_period: int = instance.get(
-                "PerformanceInsightsRetentionPeriod", -1
-            )
-            return performance_insights_retention_period
+            if instance.performance_insights_retention_period is None:
+                return -1
+            return instance.performance_insights_retention_period
         return None
 
     def is_delete_protection_enabled(self) -> bool:
@@ -299,11 +516,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            delete_protection_enabled: bool = instance.get("DeletionProtection", False)
-            if delete_protection_enabled:
-                return True
+            return bool(instance.deletion_protection)
         return False
 
     def has_dedicated_log_volume(self) -> bool:
@@ -312,11 +527,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            dedicated_log_volume: bool = instance.get("DedicatedLogVolume", False)
-            if dedicated_log_volume:
-                return True
+            return bool(instance.dedicated_log_volume)
         return False
 
     def is_customer_owned_ip_enabled(self) -> bool:
@@ -325,13 +538,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            customer_owned_ip_enabled: bool = instance.get(
-                "CustomerOwnedIpEnabled", False
-            )
-            if customer_owned_ip_enabled:
-                return True
+            return bool(instance.customer_owned_ip_enabled)
         return False
 
     def get_cloudwatch_logs_exports(self) -> list:
@@ -340,12 +549,10 @@ class QA:
 
         :return: list
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            cloudwatch_logs_exports: list = instance.get(
-                "EnabledCloudwatchLogsExports", []
-            )
-        return cloudwatch_logs_exports
+            return list(instance.cloudwatch_logs_exports)
+        return []
 
     def has_storage_config_upgrade_available(self) -> bool:
         """
@@ -353,13 +560,9 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            customer_owned_ip_enabled: bool = instance.get(
-                "IsStorageConfigUpgradeAvailable", False
-            )
-            if customer_owned_ip_enabled:
-                return True
+            return bool(instance.storage_config_upgrade_available)
         return False
 
     def has_active_subnets(self) -> bool:
@@ -368,31 +571,22 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
-        ret_val: bool = False
-        if instance is not None:
-            subnet_group: dict = instance.get("DBSubnetGroup", None)
-            if subnet_group is not None:
-                subnets: list = subnet_group.get("Subnets", [])
-                ret_val = True
-                for subnet_i in subnets:
-                    subnet: dict = subnet_i
-                    subnet_status: str = subnet.get("SubnetStatus", None)
-                    if subnet_status != "Active":
-                        return False
-        return ret_val
+        instance: InstanceSnapshot = self.__get_instance()
+        if instance is None or instance.subnet_group is None:
+            return False
+        return all(
+            subnet.status == "Active" for subnet in instance.subnet_group.subnets
+        )
 
     def get_certificate_ca(self) -> str:
         """
         Return the Certificate CA Identifier from the instance.
+
+        :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            cert_details: str = instance.get("CertificateDetails", None)
-            if cert_details is not None:
-                ca: str = cert_details.get("CAIdentifier", None)
-                if ca is not None:
-                    return ca
+            return instance.ca_identifier
         return None
 
     def is_storage_encrypted(self) -> bool:
@@ -401,34 +595,29 @@ class QA:
 
         :return: bool
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            storage_encrypted: bool = instance.get("StorageEncrypted", False)
-            if storage_encrypted:
-                return True
+            return bool(instance.storage_encrypted)
         return False
 
-    def __get_secretsmanager(self) -> str:
+    def get_log_group_names(self) -> list:
+        """
+        Return the names of the CloudWatch log groups of the instance and its proxy.
+
+        :return: list
         """
-        Get the secret name from Secrets Manager.
-        The Secret ARN contains a value that consists of the
-        Secret Name and -abcdef, where 'abcdef' seems like random characters.
-        In order to retrieve the Secret Name, we need to do some black magic
-        with split and join to remove 'abcdef' from the results.
+        log_groups: list = list_log_groups(self.get_client("logs"), self.identifier)
+        return [log_group["logGroupName"] for log_group in log_groups]
+
+    def __get_secret_arn(self) -> str:
+        """
+        Get the ARN of the master user secret managed by RDS.
 
         :return: str
         """
-        instance: dict = self.__get_instance()
+        instance: InstanceSnapshot = self.__get_instance()
         if instance is not None:
-            mus: dict = instance.get("MasterUserSecret", None)
-            if mus is not None:
-                arn: str = mus.get("SecretArn", None)
-            if arn is not None:
-                try:
-                    arn_part = arn.split(":")[6]
-                    return "-".join(arn_part.split("-")[0:-1])
-                except IndexError:
-                    return None
+            return instance.master_user_secret_arn
         return None
 
     def secretsmanager_exist(self) -> bool:
@@ -437,115 +626,167 @@ class QA:
 
         :return: bool
         """
-        secretsmanager: str = self.__get_secretsmanager()
-        if secretsmanager is not None:
-            secret = self.__get_secret()
-            if secret is None:
-                secret = self.__get_secret()
-                self.__set_secret(secret)
-        if secret is not None:
-            return True
-        return False
+        return self.__get_secret() is not None
 
     def __get_secret(self) -> dict:
         """
-        Get the username and password to RDS from a Secrets Manager
+        Get the username and password to RDS from a Secrets Manager.
+        The value is served from the shared secret cache.
 
         :return: dict
         """
-        secret: dict = self.secret
-        if secret is None:
-            client = self.session.client(
-                service_name="secretsmanager", region_name=self.region
-            )
-
-            secret_name: str = self.__get_secretsmanager()
-
-            try:
-                logging.info("Connected to Secrets Manager")
-                get_secret_value_response = client.get_secret_value(
-                    SecretId=secret_name
-                )
-            except ClientError:
-                return None
+        arn: str = self.__get_secret_arn()
+        if arn is None:
+            return None
+        try:
+            return self.secret_cache.get(self.get_client("secretsmanager"), arn)
+        except ClientError as error:
+            logging.error(error)
+            return None
 
-            secret = json.loads(get_secret_value_response["SecretString"])
-            if secret is None:
-                return None
-            self.__set_secret(secret)
-        return secret
-
-    def __set_secret(self, secret: dict) -> None:
+    def invalidate_secret(self) -> None:
         """
-        Set the secret value for the instance of the class.
+        Drop the cached master user secret, so the next use fetches it again.
         """
-        self.secret = secret
+        arn: str = self.__get_secret_arn()
+        if arn is not None:
+            self.secret_cache.invalidate(arn)
 
-    def __get_endpoint(self) -> dict:
+    def __get_endpoint(self) -> EndpointRecord:
         """
         Get the RDS instance endpoint.
 
-        :return: dict
+        :return: EndpointRecord
         """
-        endpoint: dict = self.endpoint
+        endpoint: EndpointRecord = self.endpoint
         if endpoint is None:
-            instance: dict = self.__get_instance()
+            instance: InstanceSnapshot = self.__get_instance()
             if instance is not None:
-                endpoint = instance.get("Endpoint", None)
+                endpoint = instance.endpoint
                 if endpoint is not None:
                     self.__set_endpoint(endpoint)
                     return endpoint
                 return None
         return endpoint
 
-    def __set_endpoint(self, endpoint: dict) -> None:
+    def __set_endpoint(self, endpoint: EndpointRecord) -> None:
         """
         Set the endpoint value
         """
         self.endpoint = endpoint
 
-    def connect_to_database(self) -> None:
+    def get_connection_parameters(self) -> dict:
         """
-        Connect to the database and execute a simple query
+        Return the psycopg2 connection parameters for the QA database,
+        using the instance endpoint and the Secrets Manager credentials.
+
+        :return: dict
         """
-        endpoint: dict = self.__get_endpoint()
+        endpoint: EndpointRecord = self.__get_endpoint()
         if endpoint is None:
-            endpoint: dict = self.__get_endpoint()
-            self.__set_endpoint(endpoint)
-
-        address = endpoint.get("Address", None)
-        port = endpoint.get("Port", 0)
+            return None
 
         secret: dict = self.__get_secret()
         if secret is None:
-            secret: dict = self.__get_secret()
-            self.__set_secret(secret)
+            return None
+
+        return {
+            "dbname": self.database,
+            "user": secret.get("username", None),
+            "password": secret.get("password", None),
+            "host": endpoint.address,
+            "port": endpoint.port,
+            "sslmode": "verify-full",
+        }
+
+    def get_iam_connection_parameters(self, user: str) -> dict:
+        """
+        Return the psycopg2 connection parameters for the QA database with an
+        IAM authentication token instead of the Secrets Manager password.
+        The token is served from the shared token cache.
+
+        :param user: A database user with the rds_iam role. The master user
+            doesn't have it, as the role stops password logins
+        :type user: str
+        :return: dict
+        """
+        endpoint: EndpointRecord = self.__get_endpoint()
+        if endpoint is None:
+            return None
 
-        username = secret.get("username", None)
-        password = secret.get("password", None)
+        return {
+            "dbname": self.database,
+            "user": user,
+            "password": self.token_cache.get(
+                self.get_client("rds"), endpoint.address, endpoint.port, user
+            ),
+            "host": endpoint.address,
+            "port": endpoint.port,
+            "sslmode": "verify-full",
+        }
 
-        logging.info(f"Connecting to {address}:{port} as {username}")
+    def connect_to_database(self, iam_user: str = None) -> bool:
+        """
+        Connect to the database and execute a simple query
+
+        :param iam_user: Log in as this user with IAM authentication. Default: None,
+            the master user with the Secrets Manager password
+        :type iam_user: str
+        :return: bool, False when the instance has no endpoint or secret yet,
+            e.g. while it is being created, or the query failed
+        """
+        if iam_user is not None:
+            parameters: dict = self.get_iam_connection_parameters(iam_user)
+        else:
+            parameters = self.get_connection_parameters()
+        if parameters is None:
+            logging.error(f"Instance {self.identifier} has no endpoint or secret yet")
+            return False
 
-        conn = psycopg2.connect(
-            dbname=self.database,
-            user=username,
-            password=password,
-            host=address,
-            port=port,
-            sslmode="verify-full",
+        logging.info(
+            f"Connecting to {parameters['host']}:{parameters['port']} as {parameters['user']}"
         )
 
+        try:
+            conn = psycopg2.connect(**parameters)
+        except psycopg2.OperationalError as error:
+            if not is_authentication_failure(error):
+                raise
+            if iam_user is not None:
+                logging.info("Authentication failed, signing a new token")
+                self.token_cache.invalidate(
+                    parameters["host"], parameters["port"], iam_user
+                )
+                parameters = self.get_iam_connection_parameters(iam_user)
+            else:
+                logging.info("Authentication failed, fetching the rotated secret")
+                self.invalidate_secret()
+                parameters = self.get_connection_parameters()
+            if parameters is None:
+                logging.error(
+                    f"Instance {self.identifier} has no endpoint or secret anymore"
+                )
+                return False
+            conn = psycopg2.connect(**parameters)
+
         logging.info("Connected to RDS")
 
         conn.autocommit = False
 
-        with conn.cursor() as sql:
-            try:
-                sql.execute(
-                    "SELECT current_user, current_database(), current_timestamp"
-                )
-                data: tuple = sql.fetchone()
-                logging.info(f"User is {data[0]} on database {data[1]} at {data[2]}")
-            except psycopg2.DatabaseError as db_error:
-                logging.error(db_error)
-        conn.close()
+        queried: bool = False
+        try:
+            with conn.cursor() as sql:
+                try:
+                    sql.execute(
+                        "SELECT current_user, current_database(), current_timestamp"
+                    )
+                    data: tuple = sql.fetchone()
+                    logging.info(
+                        f"User is {data[0]} on database {data[1]} at {data[2]}"
+                    )
+                    queried = True
+                except psycopg2.DatabaseError as db_error:
+                    logging.error(db_error)
+        finally:
+            conn.close()
+        return queried
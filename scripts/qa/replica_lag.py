@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0902,R0903,R0913,R0914
+"""
+Replica lag
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+import probe
+import rds
+from monitoring import get_metric_query
+from stats import StreamingHistogram
+
+# Commit times of this many recent heartbeats are kept to compute the lag.
+HEARTBEAT_HISTORY: int = 100000
+
+
+class HeartbeatLog:
+    """
+    Thread safe record of when each heartbeat committed on the primary.
+
+    The lag of a replica that shows heartbeat n is the age of heartbeat n + 1,
+    the oldest write it hasn't replayed yet. Times are taken from one
+    monotonic clock, so clock skew between the hosts doesn't matter.
+    """
+
+    def __init__(self, history: int = HEARTBEAT_HISTORY) -> None:
+        """Class constructor.
+
+        :param history: The number of heartbeats to remember. Default: 100000
+        :type history: int
+        """
+        self.history: int = history
+        self.committed: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.error: Exception = None
+
+    def record(self, sequence: int, committed_at: float) -> None:
+        """
+        Remember the commit time of a heartbeat.
+
+        :param sequence: The heartbeat sequence number
+        :param committed_at: The time.monotonic() after the commit
+        :type sequence: int
+        :type committed_at: float
+        """
+        with self.lock:
+            self.committed[sequence] = committed_at
+            while len(self.committed) > self.history:
+                self.committed.popitem(last=False)
+
+    def fail(self, error: Exception) -> None:
+        """
+        Mark the log as failed because the heartbeats stopped being written.
+        A replica that caught up with the last heartbeat would look current.
+
+        :param error: The error of the writer
+        :type error: Exception
+        """
+        with self.lock:
+            self.error = error
+
+    def get_lag(self, visible: int, now: float) -> float:
+        """
+        Return the lag in seconds of a replica that shows the given heartbeat.
+
+        :param visible: The latest heartbeat sequence the replica returned
+        :param now: The time.monotonic() when it was read
+        :type visible: int
+        :type now: float
+        :return: float, or None when the lag is unknown because no heartbeat
+            was recorded yet or the writer failed
+        """
+        with self.lock:
+            if self.error is not None or len(self.committed) == 0:
+                return None
+            committed_at: float = self.committed.get(visible + 1, None)
+            if committed_at is not None:
+                return max(0.0, now - committed_at)
+            if visible + 1 < next(iter(self.committed)):
+                # Older than the history: at least as old as the oldest entry.
+                return max(0.0, now - next(iter(self.committed.values())))
+            if visible >= next(reversed(self.committed)):
+                # Caught up with the last heartbeat written.
+                return 0.0
+        return None
+
+
+class ReplicaLagMonitor:
+    """
+    Class for measuring the replay lag of read replicas with heartbeat writes
+    """
+
+    def __init__(
+        self,
+        primary: dict,
+        replicas: dict,
+        interval: float = 0.05,
+        readers: int = 2,
+        report_interval: float = 10,
+    ) -> None:
+        """Class constructor.
+
+        :param primary: The psycopg2 connection parameters of the primary
+        :param replicas: The connection parameters per replica identifier
+        :param interval: Seconds between heartbeat writes and reads. Default: 0.05
+        :param readers: The number of pooled reading clients per replica. Default: 2
+        :param report_interval: Seconds between streamed reports. Default: 10
+        :type primary: dict
+        :type replicas: dict
+        :type interval: float
+        :type readers: int
+        :type report_interval: float
+        """
+        self.primary: dict = primary
+        self.replicas: dict = replicas
+        self.interval: float = interval
+        self.readers: int = readers
+        self.report_interval: float = report_interval
+        self.log = HeartbeatLog()
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.totals: dict = {name: StreamingHistogram() for name in replicas}
+        self.windows: dict = {name: StreamingHistogram() for name in replicas}
+        self.errors: dict = {name: 0 for name in replicas}
+        self.invalid: dict = {name: 0 for name in replicas}
+
+    def __write_heartbeats(self) -> None:
+        """
+        Update the heartbeat row on the primary until stopped. An error fails
+        the heartbeat log and stops the monitor.
+        """
+        try:
+            self.__write()
+        except Exception as error:  # pylint: disable=W0718
+            logging.error(f"The heartbeat writer failed: {error}")
+            self.log.fail(error)
+            self.stop.set()
+
+    def __write(self) -> None:
+        """
+        Write a new heartbeat sequence number every interval.
+        """
+        conn = psycopg2.connect(**self.primary)
+        conn.autocommit = True
+        sequence: int = 0
+        try:
+            with conn.cursor() as sql:
+                sql.execute("SELECT coalesce(max(sequence), 0) FROM qa_heartbeat")
+                sequence = sql.fetchone()[0]
+                self.log.record(sequence, time.monotonic())
+                while not self.stop.is_set():
+                    sequence += 1
+                    sql.execute(
+                        "INSERT INTO qa_heartbeat VALUES (1, %s, clock_timestamp()) "
+                        "ON CONFLICT (id) DO UPDATE SET sequence = EXCLUDED.sequence, "
+                        "written_at = EXCLUDED.written_at",
+                        (sequence,),
+                    )
+                    self.log.record(sequence, time.monotonic())
+                    self.stop.wait(self.interval)
+        finally:
+            conn.close()
+
+    def __read_heartbeats(self, name: str, pool: ThreadedConnectionPool) -> None:
+        """
+        Read the heartbeat from a replica through the pool until stopped.
+        """
+        while not self.stop.is_set():
+            try:
+                conn = pool.getconn()
+            except psycopg2.Error as error:
+                logging.debug(f"{name}: {error}")
+                with self.lock:
+                    self.errors[name] += 1
+                self.stop.wait(self.interval)
+                continue
+            broken: bool = False
+            try:
+                with conn.cursor() as sql:
+                    sql.execute("SELECT max(sequence) FROM qa_heartbeat")
+                    visible = sql.fetchone()[0]
+                now: float = time.monotonic()
+                conn.rollback()
+                if visible is not None:
+                    lag: float = self.log.get_lag(visible, now)
+                    with self.lock:
+                        if lag is None:
+                            self.invalid[name] += 1
+                        else:
+                            self.totals[name].add(lag)
+                            self.windows[name].add(lag)
+            except psycopg2.Error as error:
+                logging.debug(f"{name}: {error}")
+                broken = True
+                with self.lock:
+                    self.errors[name] += 1
+            finally:
+                pool.putconn(conn, close=broken)
+            self.stop.wait(self.interval)
+
+    def __get_wal_position(self, conn) -> int:
+        """
+        Return the current WAL position of the primary in bytes.
+
+        :return: int
+        """
+        with conn.cursor() as sql:
+            sql.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")
+            return int(sql.fetchone()[0])
+
+    def __report(self, wal_rate: float) -> dict:
+        """
+        Return the lag percentiles since the last report and start a new window.
+
+        :return: dict
+        """
+        with self.lock:
+            windows: dict = self.windows
+            self.windows = {name: StreamingHistogram() for name in self.replicas}
+        report: dict = {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "wal_mb_s": wal_rate / 1024**2,
+            "replicas": {name: window.summarize() for name, window in windows.items()},
+        }
+        print(json.dumps(report), flush=True)
+        return report
+
+    def run(self, duration: float = None) -> dict:
+        """
+        Write and read heartbeats for the given duration, or until interrupted,
+        printing one JSON line of lag percentiles per report interval along
+        with the primary's WAL write rate.
+
+        :param duration: The run time in seconds. Default: None, until interrupted
+        :type duration: float
+        :return: dict with the overall percentiles and every report
+        """
+        pools: dict = {
+            name: ThreadedConnectionPool(1, self.readers, **parameters)
+            for name, parameters in self.replicas.items()
+        }
+        monitor = psycopg2.connect(**self.primary)
+        monitor.autocommit = True
+        with monitor.cursor() as sql:
+            sql.execute(
+                "CREATE TABLE IF NOT EXISTS qa_heartbeat "
+                "(id int PRIMARY KEY, sequence bigint, written_at timestamptz)"
+            )
+        threads: list = [threading.Thread(target=self.__write_heartbeats, daemon=True)]
+        for name, pool in pools.items():
+            threads += [
+                threading.Thread(
+                    target=self.__read_heartbeats, args=(name, pool), daemon=True
+                )
+                for _ in range(self.readers)
+            ]
+        for thread in threads:
+            thread.start()
+        reports: list = []
+        start: float = time.monotonic()
+        try:
+            position: int = self.__get_wal_position(monitor)
+            reported_at: float = start
+            while not self.stop.is_set() and (
+                duration is None or time.monotonic() - start < duration
+            ):
+                self.stop.wait(self.report_interval)
+                current: int = self.__get_wal_position(monitor)
+                now: float = time.monotonic()
+                reports.append(
+                    self.__report((current - position) / (now - reported_at))
+                )
+                position, reported_at = current, now
+        except KeyboardInterrupt:
+            logging.info("Interrupted, stopping the monitor")
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools.values():
+                pool.closeall()
+            monitor.close()
+        summary: dict = {
+            "duration_s": time.monotonic() - start,
+            "replicas": {
+                name: dict(
+                    total.summarize(),
+                    errors=self.errors[name],
+                    invalid=self.invalid[name],
+                )
+                for name, total in self.totals.items()
+            },
+            "reports": reports,
+        }
+        if self.log.error is not None:
+            summary["error"] = str(self.log.error)
+        return summary
+
+
+def get_replica_lag_metrics(
+    qa: rds.QA,
+    replicas: list,
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> dict:
+    """
+    Return the average and maximum CloudWatch ReplicaLag of every replica
+    between start and end, in milliseconds, using one batched query.
+
+    :param qa: The QA object of the primary
+    :param replicas: The replica identifiers
+    :param start: The start of the window
+    :param end: The end of the window
+    :type qa: rds.QA
+    :type replicas: list
+    :type start: datetime.datetime
+    :type end: datetime.datetime
+    :return: dict
+    """
+    client = qa.get_client("cloudwatch")
+    queries: list = [
+        get_metric_query(
+            f"{statistic.lower()}{index}",
+            "ReplicaLag",
+            {"DBInstanceIdentifier": replica},
+            stat=statistic,
+        )
+        for index, replica in enumerate(replicas)
+        for statistic in ("Average", "Maximum")
+    ]
+    values: dict = {query["Id"]: [] for query in queries}
+    paginator = client.get_paginator("get_metric_data")
+    for page in paginator.paginate(
+        MetricDataQueries=queries, StartTime=start, EndTime=end
+    ):
+        for result in page["MetricDataResults"]:
+            values[result["Id"]] += result["Values"]
+    metrics: dict = {}
+    for index, replica in enumerate(replicas):
+        averages: list = values[f"average{index}"]
+        maximums: list = values[f"maximum{index}"]
+        metrics[replica] = {
+            "average_ms": sum(averages) / len(averages) * 1000 if averages else None,
+            "max_ms": max(maximums) * 1000 if maximums else None,
+        }
+    return metrics
+
+
+def main() -> int:
+    """
+    Monitor the replica lag of the QA instance from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Monitor read replica lag.")
+    probe.add_connection_arguments(parser)
+    parser.add_argument("--duration", type=float, help="Default: until interrupted")
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--report-interval", type=float, default=10)
+    parser.add_argument(
+        "--replica-hosts",
+        nargs="*",
+        default=[],
+        help="Replicas of a local --host as host:port",
+    )
+    parser.add_argument("--output", help="Write the JSON summary to this file")
+    args = probe.parse_arguments(parser)
+    qa = None
+    if args.host is not None:
+        primary: dict = probe.get_connection_parameters(args)
+        replicas: dict = {}
+        for replica in args.replica_hosts:
+            host, port = replica.rsplit(":", 1)
+            replicas[replica] = dict(primary, host=host, port=int(port))
+    else:
+        qa = probe.get_qa(args)
+        primary = probe.get_qa_parameters(qa)
+        identifiers: list = list(qa.get_snapshot().read_replica_identifiers)
+        if len(identifiers) == 0:
+            logging.error("No read replicas to monitor")
+            return 1
+        client = qa.get_client("rds")
+        replicas = {
+            instance["DBInstanceIdentifier"]: dict(
+                primary,
+                host=instance["Endpoint"]["Address"],
+                port=instance["Endpoint"]["Port"],
+            )
+            for instance in rds.describe_instances(client, identifiers)
+            if "Endpoint" in instance
+        }
+    if len(replicas) == 0:
+        logging.error("No read replicas to monitor")
+        return 1
+
+    start: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+    summary: dict = ReplicaLagMonitor(
+        primary,
+        replicas,
+        interval=args.interval,
+        readers=args.readers,
+        report_interval=args.report_interval,
+    ).run(args.duration)
+    if qa is not None:
+        summary["cloudwatch"] = get_replica_lag_metrics(
+            qa, list(replicas), start, datetime.datetime.now(datetime.timezone.utc)
+        )
+
+    output: str = json.dumps(
+        {key: value for key, value in summary.items() if key != "reports"}
+    )
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            report_file.write(json.dumps(summary, indent=2))
+    print(output)
+    if "error" in summary:
+        logging.error(f"The lag samples are incomplete: {summary['error']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Retry
+"""
+
+import logging
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+
+def backoff_delays(base: float = 1.0, cap: float = 30.0, factor: float = 2.0):
+    """
+    Yield exponentially growing delays with jitter, for polling and retrying.
+    Each delay is drawn from the upper half of the current backoff window, so
+    concurrent pollers spread out without ever polling in a tight loop.
+
+    :param base: The first backoff window in seconds. Default: 1.0
+    :param cap: The largest backoff window in seconds. Default: 30.0
+    :param factor: The growth factor between attempts. Default: 2.0
+    :type base: float
+    :type cap: float
+    :type factor: float
+    :return: generator of float
+    """
+    window: float = base
+    while True:
+        yield window / 2 + random.uniform(0, window / 2)
+        window = min(cap, window * factor)
+
+
+# Error codes AWS returns when a caller is being rate limited.
+THROTTLING_ERRORS: tuple = (
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "LimitExceededException",
+)
+
+
+def call_with_retry(
+    function,
+    attempts: int = 8,
+    base: float = 0.5,
+    cap: float = 20.0,
+    retryable_errors: tuple = THROTTLING_ERRORS,
+):
+    """
+    Call a function and retry it with exponential backoff and jitter while
+    AWS answers with a throttling error.
+
+    :param function: The function to call, without arguments
+    :param attempts: The maximum number of calls. Default: 8
+    :param base: The first backoff window in seconds. Default: 0.5
+    :param cap: The largest backoff window in seconds. Default: 20.0
+    :param retryable_errors: The error codes that are retried. Default: THROTTLING_ERRORS
+    :type attempts: int
+    :type base: float
+    :type cap: float
+    :type retryable_errors: tuple
+    :return: The return value of the function
+    """
+    delays = backoff_delays(base=base, cap=cap)
+    for attempt in range(1, attempts + 1):
+        try:
+            return function()
+        except ClientError as error:
+            code: str = error.response["Error"]["Code"]
+            if code not in retryable_errors or attempt == attempts:
+                raise
+            delay: float = next(delays)
+            logging.debug(f"{code} on attempt {attempt}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return None
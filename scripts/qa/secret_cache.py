@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# pylint: disable=W1203
+"""
+Secret cache
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+
+# Server messages for a rejected password, e.g. after the secret was rotated.
+AUTHENTICATION_FAILURES: tuple = (
+    "password authentication failed",
+    "pam authentication failed",
+)
+
+
+def is_authentication_failure(error: psycopg2.Error) -> bool:
+    """
+    Check if a connection error was caused by rejected credentials.
+
+    :param error: The error raised by psycopg2
+    :type error: psycopg2.Error
+    :return: bool
+    """
+    message: str = str(error).lower()
+    return any(failure in message for failure in AUTHENTICATION_FAILURES)
+
+
+def drop_key_lock(key_locks: dict, key: tuple) -> None:
+    """
+    Forget the lock serializing the fetches of a key that is no longer cached,
+    unless a fetch holds it. Called with the cache lock held.
+
+    :param key_locks: The locks keyed like the cache entries
+    :param key: The cache key
+    :type key_locks: dict
+    :type key: tuple
+    """
+    key_lock: threading.Lock = key_locks.get(key, None)
+    if key_lock is not None and not key_lock.locked():
+        del key_locks[key]
+
+
+class SecretCache:
+    """
+    Thread safe, size bounded cache of Secrets Manager secret values.
+
+    Entries are keyed by secret ARN and version stage, expire after the TTL and
+    the least recently used entry is evicted when the cache is full. Concurrent
+    lookups of the same secret wait for a single get_secret_value call.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 128) -> None:
+        """Class constructor.
+
+        :param ttl: Seconds before a cached secret is fetched again. Default: 300
+        :param max_entries: The maximum number of cached secrets. Default: 128
+        :type ttl: float
+        :type max_entries: int
+        """
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks: dict = {}
+        self.fetches: int = 0
+
+    def __get_key_lock(self, key: tuple) -> threading.Lock:
+        """
+        Return the lock serializing the fetches of a single secret.
+
+        :return: threading.Lock
+        """
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def __lookup(self, key: tuple) -> dict:
+        """
+        Return a cached secret that hasn't expired, or None.
+
+        :return: dict
+        """
+        with self.lock:
+            entry: tuple = self.entries.get(key, None)
+            if entry is None:
+                return None
+            fetched_at, secret = entry
+            if time.monotonic() - fetched_at > self.ttl:
+                del self.entries[key]
+                drop_key_lock(self.key_locks, key)
+                return None
+            self.entries.move_to_end(key)
+            return secret
+
+    def __store(self, key: tuple, secret: dict) -> None:
+        """
+        Cache a secret and evict the least recently used entries.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic(), secret)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                self.key_locks.pop(evicted, None)
+
+    def get(self, client, secret_id: str, version_stage: str = "AWSCURRENT") -> dict:
+        """
+        Return the parsed JSON value of a secret, fetching it only when it
+        isn't cached or has expired.
+
+        :param client: A boto3 Secrets Manager client
+        :param secret_id: The secret ARN or name
+        :param version_stage: The version stage to fetch. Default: AWSCURRENT
+        :type secret_id: str
+        :type version_stage: str
+        :return: dict
+        """
+        key: tuple = (secret_id, version_stage)
+        secret: dict = self.__lookup(key)
+        if secret is not None:
+            return secret
+        with self.__get_key_lock(key):
+            secret = self.__lookup(key)
+            if secret is not None:
+                return secret
+            logging.info("Connected to Secrets Manager")
+            response: dict = client.get_secret_value(
+                SecretId=secret_id, VersionStage=version_stage
+            )
+            with self.lock:
+                self.fetches += 1
+            secret = json.loads(response["SecretString"])
+            self.__store(key, secret)
+            return secret
+
+    def invalidate(self, secret_id: str) -> None:
+        """
+        Drop every cached version of a secret, e.g. after it was rotated.
+
+        :param secret_id: The secret ARN or name
+        :type secret_id: str
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == secret_id]:
+                del self.entries[key]
+            for key in [key for key in self.key_locks if key[0] == secret_id]:
+                drop_key_lock(self.key_locks, key)
+        logging.debug(f"Invalidated cached secret {secret_id}")
+
+
+# Shared by every QA object in the process, so a fleet check fetches each
+# secret once per TTL window.
+SHARED_CACHE: SecretCache = SecretCache()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0903,R0913,R0914
+"""
+Security groups
+"""
+
+import argparse
+import ipaddress
+import json
+import logging
+import socket
+import ssl
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import rds
+from probe import measure_handshake
+from stats import summarize
+
+
+def describe_ingress_rules(client, group_ids: list) -> list:
+    """
+    Return the ingress rules of the given security groups, fetched with one
+    group-id filtered describe_security_group_rules call and its pages.
+
+    :param client: A boto3 EC2 client
+    :param group_ids: The security group ids
+    :type group_ids: list
+    :return: list of dict
+    """
+    paginator = client.get_paginator("describe_security_group_rules")
+    rules: list = []
+    for page in paginator.paginate(
+        Filters=[{"Name": "group-id", "Values": list(group_ids)}]
+    ):
+        rules += [
+            rule for rule in page.get("SecurityGroupRules", []) if not rule["IsEgress"]
+        ]
+    return rules
+
+
+def get_expected_cidrs(
+    vpc_cidr: str,
+    whitelist: list = None,
+    publicly_accessible: bool = False,
+    peering_cidrs: list = None,
+    additional_rules: list = None,
+    port: int = None,
+) -> set:
+    """
+    Return the CIDR blocks the module opens the database port to, as built
+    in main.tf and locals.tf: the VPC, the peered VPCs, the ingress_rules of
+    additional_rds_security_group_rules and, for a publicly accessible
+    instance, the public_access_ip_whitelist.
+
+    :param vpc_cidr: The CIDR block of the instance's VPC
+    :param whitelist: The public_access_ip_whitelist. Default: None
+    :param publicly_accessible: The is_publicly_accessible variable. Default: False
+    :param peering_cidrs: The CIDR blocks of peered VPCs. Default: None
+    :param additional_rules: The ingress_rules of additional_rds_security_group_rules. Default: None
+    :param port: Only count the additional rules covering this port. Default: None, all
+    :type vpc_cidr: str
+    :type whitelist: list
+    :type publicly_accessible: bool
+    :type peering_cidrs: list
+    :type additional_rules: list
+    :type port: int
+    :return: set
+    """
+    expected: set = {vpc_cidr} | set(peering_cidrs or [])
+    for rule in additional_rules or []:
+        protocol: str = str(rule.get("protocol", "tcp"))
+        if port is not None and protocol not in ("-1", "all"):
+            if protocol not in ("tcp", "6") or not (
+                int(rule.get("from_port", -1)) <= port <= int(rule.get("to_port", -1))
+            ):
+                continue
+        # The module splits the comma separated cidr_blocks string of a rule.
+        expected |= {
+            cidr.strip()
+            for cidr in str(rule.get("cidr_blocks", "")).split(",")
+            if cidr.strip()
+        }
+    if publicly_accessible:
+        expected |= {cidr for cidr in whitelist or [] if cidr is not None}
+    return {str(ipaddress.ip_network(cidr, strict=False)) for cidr in expected}
+
+
+def verify_rules(rules: list, port: int, expected: set) -> list:
+    """
+    Check that exactly the expected CIDR blocks can reach the database port.
+    Rules referencing security groups or prefix lists are left alone.
+
+    :param rules: The ingress rules from describe_ingress_rules
+    :param port: The database port
+    :param expected: The expected CIDR blocks
+    :type rules: list
+    :type port: int
+    :type expected: set
+    :return: list of str
+    """
+    problems: list = []
+    allowed: set = set()
+    for rule in rules:
+        cidr: str = rule.get("CidrIpv4", None) or rule.get("CidrIpv6", None)
+        if cidr is None:
+            continue
+        cidr = str(ipaddress.ip_network(cidr, strict=False))
+        protocol: str = rule.get("IpProtocol", None)
+        from_port: int = rule.get("FromPort", -1)
+        to_port: int = rule.get("ToPort", -1)
+        if protocol == "-1" or (
+            protocol in ("tcp", "6") and from_port <= port <= to_port
+        ):
+            allowed.add(cidr)
+            if protocol == "-1" or (from_port, to_port) != (port, port):
+                problems.append(
+                    f"{rule['SecurityGroupRuleId']} opens {protocol} "
+                    f"{from_port}-{to_port} to {cidr}, wider than port {port}"
+                )
+    for cidr in sorted(allowed - expected):
+        problems.append(f"Port {port} is open to {cidr}, which isn't whitelisted")
+    for cidr in sorted(expected - allowed):
+        problems.append(f"Port {port} isn't open to whitelisted {cidr}")
+    return problems
+
+
+def classify_failure(error: Exception) -> str:
+    """
+    Name the likely cause of a failed probe. A timeout usually means the
+    packets were dropped by a security group or a network ACL.
+
+    :param error: The error raised by the probe
+    :type error: Exception
+    :return: str
+    """
+    if isinstance(error, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    if isinstance(error, ssl.SSLError):
+        return "tls"
+    return type(error).__name__
+
+
+class ReachabilityProbe:
+    """
+    Class for measuring TCP and TLS connect latency from several sources to
+    several targets concurrently
+    """
+
+    def __init__(
+        self,
+        targets: dict,
+        sources: dict = None,
+        samples: int = 5,
+        sslmode: str = "require",
+        timeout: float = 5,
+    ) -> None:
+        """Class constructor.
+
+        :param targets: The (host, port) per target name
+        :param sources: The local address per source name. Default: None, the default route
+        :param samples: The number of handshakes per pair. Default: 5
+        :param sslmode: The libpq sslmode of the handshake. Default: require
+        :param timeout: The connect timeout in seconds. Default: 5
+        :type targets: dict
+        :type sources: dict
+        :type samples: int
+        :type sslmode: str
+        :type timeout: float
+        """
+        self.targets: dict = targets
+        self.sources: dict = sources or {"default": None}
+        self.samples: int = samples
+        self.sslmode: str = sslmode
+        self.timeout: float = timeout
+
+    def __probe(self, pair: tuple) -> dict:
+        """
+        Run the handshakes of one source and target pair.
+
+        :return: dict
+        """
+        source, target = pair
+        host, port = self.targets[target]
+        tcp: list = []
+        tls: list = []
+        failures: dict = {}
+        for _ in range(self.samples):
+            try:
+                tcp_time, tls_time = measure_handshake(
+                    host,
+                    port,
+                    sslmode=self.sslmode,
+                    timeout=self.timeout,
+                    source_address=self.sources[source],
+                )
+            except (OSError, ssl.SSLError) as error:
+                cause: str = classify_failure(error)
+                failures[cause] = failures.get(cause, 0) + 1
+                logging.debug(f"{source} -> {target}: {error}")
+                continue
+            tcp.append(tcp_time)
+            tls.append(tls_time)
+        return {
+            "source": source,
+            "target": target,
+            "reachable": len(tcp) > 0,
+            "tcp": summarize(tcp),
+            "tls": summarize(tls),
+            "failures": failures,
+        }
+
+    def run(self) -> list:
+        """
+        Probe every source and target pair concurrently.
+
+        :return: list of dict, one per pair
+        """
+        pairs: list = [
+            (source, target) for source in self.sources for target in self.targets
+        ]
+        if len(pairs) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+            return list(executor.map(self.__probe, pairs))
+
+
+def parse_address(value: str, default_port: int = 5432) -> tuple:
+    """
+    Parse a name=host[:port] argument.
+
+    :param value: The argument value
+    :param default_port: The port when none is given. Default: 5432
+    :type value: str
+    :type default_port: int
+    :return: tuple of (name, host, port)
+    """
+    name, _, address = value.partition("=")
+    if address == "":
+        name, address = value, value
+    host, _, port = address.partition(":")
+    return name, host, int(port) if port != "" else default_port
+
+
+def main() -> int:
+    """
+    Verify the security group rules and reachability of the QA instance.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Verify security group rules.")
+    parser.add_argument("--identifier", default="qa")
+    parser.add_argument("--region", default="eu-central-1")
+    parser.add_argument("--whitelist", nargs="*", default=[])
+    parser.add_argument("--peering-cidrs", nargs="*", default=[])
+    parser.add_argument(
+        "--additional-rules",
+        type=json.loads,
+        default={},
+        help="The additional_rds_security_group_rules as JSON",
+    )
+    parser.add_argument("--vpc-cidr", help="Default: looked up from the instance's VPC")
+    parser.add_argument(
+        "--targets",
+        nargs="*",
+        default=[],
+        help="Extra name=host:port targets, e.g. a local listener",
+    )
+    parser.add_argument(
+        "--sources",
+        nargs="*",
+        default=[],
+        help="name=address local addresses to probe from",
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--sslmode", default="require")
+    parser.add_argument(
+        "--offline", action="store_true", help="Only probe the --targets"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    problems: list = []
+    targets: dict = {}
+    for value in args.targets:
+        name, host, port = parse_address(value)
+        targets[name] = (host, port)
+    if not args.offline:
+        qa = rds.QA(
+            region=args.region, log_level=logging.ERROR, identifier=args.identifier
+        )
+        snapshot = qa.get_snapshot()
+        client = qa.get_client("ec2")
+        vpc_cidr: str = args.vpc_cidr
+        if vpc_cidr is None:
+            vpc_cidr = client.describe_vpcs(VpcIds=[snapshot.subnet_group.vpc_id])[
+                "Vpcs"
+            ][0]["CidrBlock"]
+        expected: set = get_expected_cidrs(
+            vpc_cidr,
+            args.whitelist,
+            snapshot.publicly_accessible,
+            args.peering_cidrs,
+            args.additional_rules.get("ingress_rules", []),
+            snapshot.endpoint.port,
+        )
+        rules: list = describe_ingress_rules(client, snapshot.vpc_security_group_ids)
+        problems = verify_rules(rules, snapshot.endpoint.port, expected)
+        targets[snapshot.identifier] = (
+            snapshot.endpoint.address,
+            snapshot.endpoint.port,
+        )
+
+    sources: dict = {}
+    for value in args.sources:
+        name, address, _ = parse_address(value)
+        sources[name] = address
+    matrix: list = ReachabilityProbe(
+        targets, sources or None, samples=args.samples, sslmode=args.sslmode
+    ).run()
+    for result in matrix:
+        if not result["reachable"]:
+            problems.append(
+                f"{result['target']} isn't reachable from {result['source']}: "
+                f"{result['failures']}"
+            )
+    for problem in problems:
+        logging.error(problem)
+    print(json.dumps({"problems": problems, "matrix": matrix}, indent=2))
+    return 0 if len(problems) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,553 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0903,R0914
+"""
+Seed
+"""
+
+import argparse
+import datetime
+import functools
+import io
+import logging
+import random
+import resource
+import sys
+import time
+
+import psycopg2
+from botocore.exceptions import ClientError
+
+import probe
+import rds
+from retry import backoff_delays
+
+MIB: int = 1024**2
+
+# Rows are joined into chunks of about this size before they are handed to COPY.
+CHUNK_BYTES: int = 256 * 1024
+
+STATUSES: tuple = ("new", "paid", "shipped", "delivered", "returned")
+
+TABLE_SCHEMA: str = (
+    "CREATE TABLE {table} (id bigint, customer_id int, amount numeric(10, 2), "
+    "status text, created_at timestamptz, note text)"
+)
+
+COPY_ESCAPES: dict = {
+    ord("\\"): "\\\\",
+    ord("\t"): "\\t",
+    ord("\n"): "\\n",
+    ord("\r"): "\\r",
+}
+
+
+def generate_rows(start: int = 1, seed: int = 0):
+    """
+    Yield synthetic order rows without end, starting at the given id.
+
+    :param start: The id of the first row. Default: 1
+    :param seed: The random seed, so that runs are reproducible. Default: 0
+    :type start: int
+    :type seed: int
+    :return: generator of tuple
+    """
+    rng = random.Random(seed)
+    epoch: datetime.datetime = datetime.datetime(
+        2024, 1, 1, tzinfo=datetime.timezone.utc
+    )
+    notes: list = [
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz ", k=rng.randint(20, 120)))
+        for _ in range(1024)
+    ]
+    # Drawing from pools of preformatted values keeps generation faster than COPY.
+    timestamps: list = [
+        (epoch + datetime.timedelta(seconds=rng.randint(0, 31536000))).isoformat()
+        for _ in range(4096)
+    ]
+    draw = rng.random
+    identifier: int = start
+    while True:
+        yield (
+            identifier,
+            int(draw() * 1000000) + 1,
+            f"{draw() * 100000:.2f}",
+            STATUSES[int(draw() * len(STATUSES))],
+            timestamps[int(draw() * len(timestamps))],
+            notes[int(draw() * len(notes))],
+        )
+        identifier += 1
+
+
+def encode_value(value) -> str:
+    """
+    Encode a single value in the COPY text format. None becomes NULL.
+
+    :param value: The column value
+    :return: str
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
+
+def encode_rows(rows):
+    """
+    Encode rows in the COPY text format, one line per row.
+
+    :param rows: The rows as tuples
+    :return: generator of str
+    """
+    for row in rows:
+        yield "\t".join(map(encode_value, row)) + "\n"
+
+
+def chunk_lines(lines, limit_bytes: int, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Join lines into encoded chunks and stop once limit_bytes have been yielded
+    or the lines run out.
+
+    :param lines: The COPY lines
+    :param limit_bytes: The total amount of data to yield
+    :param chunk_bytes: The approximate chunk size. Default: 256 KiB
+    :type limit_bytes: int
+    :type chunk_bytes: int
+    :return: generator of bytes
+    """
+    total: int = 0
+    buffer: list = []
+    size: int = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes or total + size >= limit_bytes:
+            chunk: bytes = "".join(buffer).encode()
+            total += len(chunk)
+            yield chunk
+            buffer, size = [], 0
+            if total >= limit_bytes:
+                return
+    if len(buffer) > 0:
+        yield "".join(buffer).encode()
+
+
+class IteratorReader(io.RawIOBase):
+    """
+    Read-only file object over an iterator of byte chunks, so that COPY FROM
+    STDIN consumes a generator while holding at most one chunk in memory.
+    """
+
+    def __init__(self, chunks) -> None:
+        """Class constructor.
+
+        :param chunks: The byte chunks to read
+        """
+        super().__init__()
+        self.chunks = iter(chunks)
+        self.pending: bytes = b""
+        self.bytes_read: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while len(self.pending) == 0:
+            try:
+                self.pending = next(self.chunks)
+            except StopIteration:
+                return b""
+        if size < 0:
+            size = len(self.pending)
+        data: bytes = self.pending[:size]
+        self.pending = self.pending[size:]
+        self.bytes_read += len(data)
+        return data
+
+
+def get_peak_memory_mb() -> float:
+    """
+    Return the peak resident memory of this process in MiB.
+
+    :return: float
+    """
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+class Seeder:
+    """
+    Class for loading synthetic data into a database with streaming COPY
+    """
+
+    def __init__(self, parameters: dict, table: str = "qa_seed") -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param table: The table to load. Default: qa_seed
+        :type parameters: dict
+        :type table: str
+        """
+        self.parameters: dict = parameters
+        self.table: str = table
+
+    def seed(self, size_mb: int, seed: int = 0, replace: bool = True) -> dict:
+        """
+        Stream about size_mb of generated rows into the table with a single
+        COPY FROM STDIN. Memory use doesn't grow with the size.
+
+        :param size_mb: The amount of COPY data to load in MiB
+        :param seed: The random seed. Default: 0
+        :param replace: Recreate the table instead of appending. Default: True
+        :type size_mb: int
+        :type seed: int
+        :type replace: bool
+        :return: dict
+        """
+        conn = psycopg2.connect(**self.parameters)
+        try:
+            with conn.cursor() as sql:
+                if replace:
+                    sql.execute(f"DROP TABLE IF EXISTS {self.table}")
+                sql.execute("SELECT to_regclass(%s) IS NOT NULL", (self.table,))
+                if not sql.fetchone()[0]:
+                    sql.execute(TABLE_SCHEMA.format(table=self.table))
+                sql.execute(f"SELECT coalesce(max(id), 0) FROM {self.table}")
+                start: int = sql.fetchone()[0] + 1
+                reader = IteratorReader(
+                    chunk_lines(encode_rows(generate_rows(start, seed)), size_mb * MIB)
+                )
+                started: float = time.perf_counter()
+                sql.copy_expert(
+                    f"COPY {self.table} FROM STDIN", reader, size=CHUNK_BYTES
+                )
+                rows: int = sql.rowcount
+            conn.commit()
+            elapsed: float = time.perf_counter() - started
+            with conn.cursor() as sql:
+                sql.execute("SELECT pg_total_relation_size(%s)", (self.table,))
+                table_bytes: int = sql.fetchone()[0]
+        finally:
+            conn.close()
+        logging.info(f"Loaded {rows} rows into {self.table} in {elapsed:.2f}s")
+        return {
+            "rows": rows,
+            "loaded_mb": reader.bytes_read / MIB,
+            "table_mb": table_bytes / MIB,
+            "elapsed_s": elapsed,
+            "mb_s": reader.bytes_read / MIB / elapsed,
+            "peak_memory_mb": get_peak_memory_mb(),
+        }
+
+
+class SnapshotTimer:
+    """
+    Class for timing the snapshot and restore of the QA instance. The
+    snapshots and instances it creates are remembered for cleanup().
+    """
+
+    def __init__(
+        self,
+        identifier: str = "qa",
+        region: str = "eu-central-1",
+        timeout: float = 7200,
+        endpoint_url: str = None,
+    ) -> None:
+        """Class constructor.
+
+        :param identifier: The identifier of the QA RDS instance. Default: qa
+        :param region: The AWS region with the QA resources. Default: eu-central-1
+        :param timeout: The maximum number of seconds to wait per step. Default: 7200
+        :param endpoint_url: Send the AWS API calls to this endpoint. Default: None
+        :type identifier: str
+        :type region: str
+        :type timeout: float
+        :type endpoint_url: str
+        """
+        self.region: str = region
+        self.timeout: float = timeout
+        self.endpoint_url: str = endpoint_url
+        self.qa = rds.QA(
+            region=region,
+            log_level=logging.ERROR,
+            identifier=identifier,
+            endpoint_url=endpoint_url,
+        )
+        self.client = self.qa.get_client("rds")
+        self.snapshots: list = []
+        self.instances: list = []
+
+    def get_snapshot_identifier(self, prefix: str = "final") -> str:
+        """
+        Return a snapshot name following final_snapshot_identifier in the module,
+        i.e. <prefix>-<identifier>-<random hex>.
+
+        :param prefix: The final_snapshot_identifier_prefix. Default: final
+        :type prefix: str
+        :return: str
+        """
+        return f"{prefix}-{self.qa.identifier}-{random.getrandbits(32):08x}"
+
+    def __wait_for_snapshot(self, snapshot_identifier: str) -> bool:
+        """
+        Poll a DB snapshot with backoff until it is available.
+
+        :return: bool
+        """
+        deadline: float = time.monotonic() + self.timeout
+        delays = backoff_delays(base=5, cap=60)
+        while time.monotonic() < deadline:
+            snapshots: list = self.client.describe_db_snapshots(
+                DBSnapshotIdentifier=snapshot_identifier
+            )["DBSnapshots"]
+            if snapshots[0]["Status"] == "available":
+                return True
+            logging.debug(
+                f"Snapshot {snapshot_identifier} is {snapshots[0]['Status']}, "
+                f"{snapshots[0].get('PercentProgress', 0)}% done"
+            )
+            time.sleep(min(next(delays), max(0, deadline - time.monotonic())))
+        logging.error(
+            f"Snapshot {snapshot_identifier} isn't available after {self.timeout}s"
+        )
+        return False
+
+    def __wait_for_connection_parameters(self, restored: rds.QA) -> dict:
+        """
+        Poll a restored instance with backoff until its endpoint and master
+        user secret are published, which can lag behind the available status.
+
+        :return: dict, None when they aren't published within the timeout
+        """
+        deadline: float = time.monotonic() + self.timeout
+        delays = backoff_delays(base=5, cap=60)
+        while True:
+            parameters: dict = restored.get_connection_parameters()
+            if parameters is not None:
+                return parameters
+            remaining: float = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error(
+                    f"Instance {restored.identifier} has no endpoint or secret "
+                    f"after {self.timeout}s"
+                )
+                return None
+            time.sleep(min(next(delays), remaining))
+            restored.refresh()
+
+    def create(self, snapshot_identifier: str) -> dict:
+        """
+        Create a manual snapshot of the QA instance and time it until available.
+
+        :param snapshot_identifier: The snapshot name
+        :type snapshot_identifier: str
+        :return: dict
+        """
+        start: float = time.perf_counter()
+        self.client.create_db_snapshot(
+            DBSnapshotIdentifier=snapshot_identifier,
+            DBInstanceIdentifier=self.qa.identifier,
+        )
+        self.snapshots.append(snapshot_identifier)
+        available: bool = self.__wait_for_snapshot(snapshot_identifier)
+        elapsed: float = time.perf_counter() - start
+        logging.info(f"Snapshot {snapshot_identifier} took {elapsed:.0f}s")
+        return {
+            "snapshot_identifier": snapshot_identifier,
+            "available": available,
+            "elapsed_s": elapsed,
+        }
+
+    def restore(
+        self,
+        snapshot_identifier: str,
+        target: str,
+        table: str = None,
+        database: str = None,
+    ) -> dict:
+        """
+        Restore a snapshot into a new instance configured like the QA instance
+        and time it until the instance is available, then until the first
+        connection succeeds. The connection waits for the master user secret
+        of the restored instance and is skipped when it isn't published. When
+        a table is given, also time a full scan of it, which includes loading
+        the restored blocks from S3 on first access.
+
+        :param snapshot_identifier: The snapshot to restore
+        :param target: The identifier of the restored instance
+        :param table: A seeded table to scan after the restore. Default: None
+        :param database: The database the table was seeded into.
+            Default: None, the database created with the instance
+        :type snapshot_identifier: str
+        :type target: str
+        :type table: str
+        :type database: str
+        :return: dict
+        """
+        source = self.qa.get_snapshot()
+        arguments: dict = {
+            "DBInstanceIdentifier": target,
+            "DBSnapshotIdentifier": snapshot_identifier,
+            "DBInstanceClass": source.instance_class,
+            "StorageType": source.storage_type,
+            "MultiAZ": source.multi_az,
+            "PubliclyAccessible": source.publicly_accessible,
+            "VpcSecurityGroupIds": source.vpc_security_group_ids,
+            "ManageMasterUserPassword": True,
+            "DeletionProtection": False,
+        }
+        if source.subnet_group is not None:
+            arguments["DBSubnetGroupName"] = source.subnet_group.name
+        if len(source.parameter_groups) > 0:
+            arguments["DBParameterGroupName"] = source.parameter_groups[0].name
+        start: float = time.perf_counter()
+        self.client.restore_db_instance_from_db_snapshot(**arguments)
+        self.instances.append(target)
+        restored = rds.QA(
+            database=database or source.db_name or "postgres",
+            region=self.region,
+            log_level=logging.ERROR,
+            identifier=target,
+            endpoint_url=self.endpoint_url,
+        )
+        result: dict = {"target": target}
+        result["available"] = restored.wait_until("available", timeout=self.timeout)
+        result["available_s"] = time.perf_counter() - start
+        if not result["available"]:
+            return result
+        parameters: dict = self.__wait_for_connection_parameters(restored)
+        if parameters is None:
+            return result
+        conn = psycopg2.connect(**parameters)
+        try:
+            result["connect_s"] = time.perf_counter() - start
+            if table is not None:
+                scan_start: float = time.perf_counter()
+                with conn.cursor() as sql:
+                    sql.execute(f"SELECT count(*) FROM {table}")
+                    result["rows"] = sql.fetchone()[0]
+                result["first_scan_s"] = time.perf_counter() - scan_start
+        finally:
+            conn.close()
+        logging.info(f"Restored {target} in {result['available_s']:.0f}s")
+        return result
+
+    def __delete(self, delete, wait, codes: tuple, **arguments) -> bool:
+        """
+        Call a delete API, waiting once for a resource that is still being
+        created. A resource that doesn't exist counts as deleted.
+
+        :param delete: The boto3 delete method
+        :param wait: Waits until the resource can be deleted
+        :param codes: The error codes of a missing and of a busy resource
+        :return: bool
+        """
+        not_found, busy = codes
+        for attempt in range(2):
+            try:
+                delete(**arguments)
+                return True
+            except ClientError as error:
+                code: str = error.response["Error"]["Code"]
+                if code == not_found:
+                    return True
+                if code != busy or attempt > 0:
+                    logging.error(f"Couldn't delete {arguments}: {error}")
+                    return False
+                wait()
+        return False
+
+    def cleanup(self) -> list:
+        """
+        Delete the restored instances and the snapshots created for the timing.
+        Each is deleted on its own, so one failure doesn't leak the others.
+
+        :return: list of the identifiers that are left to delete by hand
+        """
+        leftovers: list = []
+        for target in self.instances:
+            restored = rds.QA(
+                region=self.region,
+                log_level=logging.ERROR,
+                identifier=target,
+                endpoint_url=self.endpoint_url,
+            )
+            if not self.__delete(
+                self.client.delete_db_instance,
+                functools.partial(
+                    restored.wait_until, "available", timeout=self.timeout
+                ),
+                ("DBInstanceNotFound", "InvalidDBInstanceState"),
+                DBInstanceIdentifier=target,
+                SkipFinalSnapshot=True,
+                DeleteAutomatedBackups=True,
+            ):
+                leftovers.append(target)
+        for snapshot_identifier in self.snapshots:
+            if not self.__delete(
+                self.client.delete_db_snapshot,
+                functools.partial(self.__wait_for_snapshot, snapshot_identifier),
+                ("DBSnapshotNotFound", "InvalidDBSnapshotState"),
+                DBSnapshotIdentifier=snapshot_identifier,
+            ):
+                leftovers.append(snapshot_identifier)
+        self.instances, self.snapshots = [], []
+        return leftovers
+
+
+def main() -> int:
+    """
+    Seed the QA database and optionally time a snapshot and restore of it.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Seed the QA database.")
+    probe.add_connection_arguments(parser)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--table", default="qa_seed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--append", action="store_true")
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Time a snapshot and restore after seeding",
+    )
+    parser.add_argument("--final-snapshot-identifier-prefix", default="final")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the snapshot and restore"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = probe.parse_arguments(parser)
+    parameters: dict = probe.get_connection_parameters(args)
+    if parameters is None:
+        logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+        return 1
+    report: dict = {
+        "seed": Seeder(parameters, table=args.table).seed(
+            args.size_mb, seed=args.seed, replace=not args.append
+        )
+    }
+    if args.snapshot and args.host is None:
+        timer = SnapshotTimer(identifier=args.identifier, region=args.region)
+        snapshot_identifier: str = timer.get_snapshot_identifier(
+            args.final_snapshot_identifier_prefix
+        )
+        target: str = f"{args.identifier}-restore"
+        try:
+            report["snapshot"] = timer.create(snapshot_identifier)
+            if report["snapshot"]["available"]:
+                report["restore"] = timer.restore(
+                    snapshot_identifier, target, args.table, database=args.database
+                )
+        finally:
+            if not args.keep:
+                leftovers: list = timer.cleanup()
+                if len(leftovers) > 0:
+                    logging.error(f"Delete {', '.join(leftovers)} by hand")
+
+    probe.write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
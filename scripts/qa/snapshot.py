@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+# pylint: disable=R0902,R0903
+"""
+Snapshot
+"""
+
+
+class Record:
+    """
+    Base class for compact records parsed from the RDS API responses.
+
+    Subclasses only declare __slots__ and a from_description() parser. The
+    compact form is a list of the slot values in declaration order, with
+    nested records in their own compact form.
+    """
+
+    __slots__ = ()
+    # Slots holding a nested record, or a tuple of them, mapped to the record class.
+    nested: dict = {}
+    nested_tuples: dict = {}
+
+    def __init__(self, **values) -> None:
+        """Class constructor.
+
+        :param values: A value for every slot of the record
+        """
+        for name in self.__slots__:
+            setattr(self, name, values.get(name, None))
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.to_compact() == other.to_compact()
+
+    def __hash__(self) -> int:
+        return hash(repr(self.to_compact()))
+
+    def __repr__(self) -> str:
+        values: str = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({values})"
+
+    def to_compact(self) -> list:
+        """
+        Return the record as a JSON serialisable list of slot values.
+
+        :return: list
+        """
+        compact: list = []
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                value = value.to_compact()
+            elif isinstance(value, tuple):
+                value = [
+                    item.to_compact() if isinstance(item, Record) else item
+                    for item in value
+                ]
+            compact.append(value)
+        return compact
+
+    @classmethod
+    def from_compact(cls, compact: list):
+        """
+        Rebuild a record from its compact form.
+
+        :param compact: The list returned by to_compact()
+        :type compact: list
+        :return: Record
+        """
+        values: dict = {}
+        for name, value in zip(cls.__slots__, compact):
+            if value is not None and name in cls.nested:
+                value = cls.nested[name].from_compact(value)
+            elif value is not None and name in cls.nested_tuples:
+                record_class = cls.nested_tuples[name]
+                value = tuple(record_class.from_compact(item) for item in value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            values[name] = value
+        return cls(**values)
+
+    def to_dict(self) -> dict:
+        """
+        Return the record as a flat dictionary, with nested records flattened
+        into dotted keys. Useful for diffing two snapshots field by field.
+
+        :return: dict
+        """
+        flat: dict = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                for key, nested_value in value.to_dict().items():
+                    flat[f"{name}.{key}"] = nested_value
+            elif isinstance(value, tuple):
+                flat[name] = [
+                    item.to_compact() if isinstance(item, Record) else item
+                    for item in value
+                ]
+            else:
+                flat[name] = value
+        return flat
+
+
+class EndpointRecord(Record):
+    """
+    The connection endpoint of an instance
+    """
+
+    __slots__ = ("address", "port")
+    # The slots set by Record, declared for static analysis.
+    address: str
+    port: int
+
+    @classmethod
+    def from_description(cls, endpoint: dict):
+        """
+        Parse the Endpoint element of an instance description.
+
+        :param endpoint: The Endpoint element, or None
+        :type endpoint: dict
+        :return: EndpointRecord
+        """
+        if endpoint is None:
+            return None
+        return cls(address=endpoint.get("Address", None), port=endpoint.get("Port", 0))
+
+
+class SubnetRecord(Record):
+    """
+    A subnet of a database subnet group
+    """
+
+    __slots__ = ("identifier", "availability_zone", "status")
+    # The slots set by Record, declared for static analysis.
+    identifier: str
+    availability_zone: str
+    status: str
+
+    @classmethod
+    def from_description(cls, subnet: dict):
+        """
+        Parse a Subnets element of a database subnet group.
+
+        :param subnet: The subnet element
+        :type subnet: dict
+        :return: SubnetRecord
+        """
+        return cls(
+            identifier=subnet.get("SubnetIdentifier", None),
+            availability_zone=subnet.get("SubnetAvailabilityZone", {}).get(
+                "Name", None
+            ),
+            status=subnet.get("SubnetStatus", None),
+        )
+
+
+class SubnetGroupRecord(Record):
+    """
+    The database subnet group of an instance
+    """
+
+    __slots__ = ("name", "vpc_id", "subnets")
+    nested_tuples: dict = {"subnets": SubnetRecord}
+    # The slots set by Record, declared for static analysis.
+    name: str
+    vpc_id: str
+    subnets: tuple
+
+    @classmethod
+    def from_description(cls, subnet_group: dict):
+        """
+        Parse the DBSubnetGroup element of an instance description.
+
+        :param subnet_group: The DBSubnetGroup element, or None
+        :type subnet_group: dict
+        :return: SubnetGroupRecord
+        """
+        if subnet_group is None:
+            return None
+        return cls(
+            name=subnet_group.get("DBSubnetGroupName", None),
+            vpc_id=subnet_group.get("VpcId", None),
+            subnets=tuple(
+                SubnetRecord.from_description(subnet)
+                for subnet in subnet_group.get("Subnets", [])
+            ),
+        )
+
+
+class ParameterGroupRecord(Record):
+    """
+    A parameter group attached to an instance
+    """
+
+    __slots__ = ("name", "apply_status")
+    # The slots set by Record, declared for static analysis.
+    name: str
+    apply_status: str
+
+    @classmethod
+    def from_description(cls, parameter_group: dict):
+        """
+        Parse a DBParameterGroups element of an instance description.
+
+        :param parameter_group: The parameter group element
+        :type parameter_group: dict
+        :return: ParameterGroupRecord
+        """
+        return cls(
+            name=parameter_group.get("DBParameterGroupName", None),
+            apply_status=parameter_group.get("ParameterApplyStatus", None),
+        )
+
+
+class InstanceSnapshot(Record):
+    """
+    The fields of an RDS Instance description used by the QA harness
+    """
+
+    __slots__ = (
+        "identifier",
+        "arn",
+        "resource_id",
+        "status",
+        "engine",
+        "engine_version",
+        "instance_class",
+        "db_name",
+        "master_username",
+        "master_user_secret_arn",
+        "allocated_storage",
+        "max_allocated_storage",
+        "storage_type",
+        "iops",
+        "storage_throughput",
+        "storage_encrypted",
+        "multi_az",
+        "backup_retention_period",
+        "preferred_maintenance_window",
+        "auto_minor_version_upgrade",
+        "publicly_accessible",
+        "iam_database_authentication_enabled",
+        "performance_insights_enabled",
+        "performance_insights_retention_period",
+        "deletion_protection",
+        "dedicated_log_volume",
+        "customer_owned_ip_enabled",
+        "storage_config_upgrade_available",
+        "cloudwatch_logs_exports",
+        "ca_identifier",
+        "vpc_security_group_ids",
+        "read_replica_source",
+        "read_replica_identifiers",
+        "cluster_identifier",
+        "endpoint",
+        "subnet_group",
+        "parameter_groups",
+    )
+    nested: dict = {"endpoint": EndpointRecord, "subnet_group": SubnetGroupRecord}
+    nested_tuples: dict = {"parameter_groups": ParameterGroupRecord}
+    # The slots set by Record, declared for static analysis.
+    identifier: str
+    arn: str
+    resource_id: str
+    status: str
+    engine: str
+    engine_version: str
+    instance_class: str
+    db_name: str
+    master_username: str
+    master_user_secret_arn: str
+    allocated_storage: int
+    max_allocated_storage: int
+    storage_type: str
+    iops: int
+    storage_throughput: int
+    storage_encrypted: bool
+    multi_az: bool
+    backup_retention_period: int
+    preferred_maintenance_window: str
+    auto_minor_version_upgrade: bool
+    publicly_accessible: bool
+    iam_database_authentication_enabled: bool
+    performance_insights_enabled: bool
+    performance_insights_retention_period: int
+    deletion_protection: bool
+    dedicated_log_volume: bool
+    customer_owned_ip_enabled: bool
+    storage_config_upgrade_available: bool
+    cloudwatch_logs_exports: tuple
+    ca_identifier: str
+    vpc_security_group_ids: tuple
+    read_replica_source: str
+    read_replica_identifiers: tuple
+    cluster_identifier: str
+    endpoint: EndpointRecord
+    subnet_group: SubnetGroupRecord
+    parameter_groups: tuple
+
+    @classmethod
+    def from_description(cls, instance: dict):
+        """
+        Parse an element of DBInstances from describe_db_instances.
+
+        :param instance: The instance description
+        :type instance: dict
+        :return: InstanceSnapshot
+        """
+        return cls(
+            identifier=instance.get("DBInstanceIdentifier", None),
+            arn=instance.get("DBInstanceArn", None),
+            resource_id=instance.get("DbiResourceId", None),
+            status=instance.get("DBInstanceStatus", None),
+            engine=instance.get("Engine", None),
+            engine_version=instance.get("EngineVersion", None),
+            instance_class=instance.get("DBInstanceClass", None),
+            db_name=instance.get("DBName", None),
+            master_username=instance.get("MasterUsername", None),
+            master_user_secret_arn=instance.get("MasterUserSecret", {}).get(
+                "SecretArn", None
+            ),
+            allocated_storage=instance.get("AllocatedStorage", None),
+            max_allocated_storage=instance.get("MaxAllocatedStorage", None),
+            storage_type=instance.get("StorageType", None),
+            iops=instance.get("Iops", None),
+            storage_throughput=instance.get("StorageThroughput", None),
+            storage_encrypted=instance.get("StorageEncrypted", False),
+            multi_az=instance.get("MultiAZ", False),
+            backup_retention_period=instance.get("BackupRetentionPeriod", None),
+            preferred_maintenance_window=instance.get(
+                "PreferredMaintenanceWindow", None
+            ),
+            auto_minor_version_upgrade=instance.get("AutoMinorVersionUpgrade", False),
+            publicly_accessible=instance.get("PubliclyAccessible", False),
+            iam_database_authentication_enabled=instance.get(
+                "IAMDatabaseAuthenticationEnabled", False
+            ),
+            performance_insights_enabled=instance.get(
+                "PerformanceInsightsEnabled", False
+            ),
+            performance_insights_retention_period=instance.get(
+                "PerformanceInsightsRetentionPeriod", None
+            ),
+            deletion_protection=instance.get("DeletionProtection", False),
+            dedicated_log_volume=instance.get("DedicatedLogVolume", False),
+            customer_owned_ip_enabled=instance.get("CustomerOwnedIpEnabled", False),
+            storage_config_upgrade_available=instance.get(
+                "IsStorageConfigUpgradeAvailable", False
+            ),
+            cloudwatch_logs_exports=tuple(
+                instance.get("EnabledCloudwatchLogsExports", [])
+            ),
+            ca_identifier=instance.get("CertificateDetails", {}).get(
+                "CAIdentifier", None
+            ),
+            vpc_security_group_ids=tuple(
+                group["VpcSecurityGroupId"]
+                for group in instance.get("VpcSecurityGroups", [])
+            ),
+            read_replica_source=instance.get(
+                "ReadReplicaSourceDBInstanceIdentifier", None
+            ),
+            read_replica_identifiers=tuple(
+                instance.get("ReadReplicaDBInstanceIdentifiers", [])
+            ),
+            cluster_identifier=instance.get("DBClusterIdentifier", None),
+            endpoint=EndpointRecord.from_description(instance.get("Endpoint", None)),
+            subnet_group=SubnetGroupRecord.from_description(
+                instance.get("DBSubnetGroup", None)
+            ),
+            parameter_groups=tuple(
+                ParameterGroupRecord.from_description(parameter_group)
+                for parameter_group in instance.get("DBParameterGroups", [])
+            ),
+        )
+
+
+class ClusterMemberRecord(Record):
+    """
+    An instance of an Aurora cluster and its role
+    """
+
+    __slots__ = ("identifier", "is_writer", "promotion_tier")
+    # The slots set by Record, declared for static analysis.
+    identifier: str
+    is_writer: bool
+    promotion_tier: int
+
+    @classmethod
+    def from_description(cls, member: dict):
+        """
+        Parse a DBClusterMembers element of a cluster description.
+
+        :param member: The cluster member element
+        :type member: dict
+        :return: ClusterMemberRecord
+        """
+        return cls(
+            identifier=member.get("DBInstanceIdentifier", None),
+            is_writer=member.get("IsClusterWriter", False),
+            promotion_tier=member.get("PromotionTier", None),
+        )
+
+
+class ClusterSnapshot(Record):
+    """
+    The fields of an Aurora cluster description used by the QA harness
+    """
+
+    __slots__ = (
+        "identifier",
+        "arn",
+        "status",
+        "engine",
+        "engine_version",
+        "engine_mode",
+        "database_name",
+        "master_username",
+        "master_user_secret_arn",
+        "port",
+        "endpoint",
+        "reader_endpoint",
+        "multi_az",
+        "storage_encrypted",
+        "serverless_min_capacity",
+        "serverless_max_capacity",
+        "members",
+    )
+    nested_tuples: dict = {"members": ClusterMemberRecord}
+    # The slots set by Record, declared for static analysis.
+    identifier: str
+    arn: str
+    status: str
+    engine: str
+    engine_version: str
+    engine_mode: str
+    database_name: str
+    master_username: str
+    master_user_secret_arn: str
+    port: int
+    endpoint: str
+    reader_endpoint: str
+    multi_az: bool
+    storage_encrypted: bool
+    serverless_min_capacity: float
+    serverless_max_capacity: float
+    members: tuple
+
+    @classmethod
+    def from_description(cls, cluster: dict):
+        """
+        Parse an element of DBClusters from describe_db_clusters.
+
+        :param cluster: The cluster description
+        :type cluster: dict
+        :return: ClusterSnapshot
+        """
+        scaling: dict = cluster.get("ServerlessV2ScalingConfiguration", {})
+        return cls(
+            identifier=cluster.get("DBClusterIdentifier", None),
+            arn=cluster.get("DBClusterArn", None),
+            status=cluster.get("Status", None),
+            engine=cluster.get("Engine", None),
+            engine_version=cluster.get("EngineVersion", None),
+            engine_mode=cluster.get("EngineMode", None),
+            database_name=cluster.get("DatabaseName", None),
+            master_username=cluster.get("MasterUsername", None),
+            master_user_secret_arn=cluster.get("MasterUserSecret", {}).get(
+                "SecretArn", None
+            ),
+            port=cluster.get("Port", None),
+            endpoint=cluster.get("Endpoint", None),
+            reader_endpoint=cluster.get("ReaderEndpoint", None),
+            multi_az=cluster.get("MultiAZ", False),
+            storage_encrypted=cluster.get("StorageEncrypted", False),
+            serverless_min_capacity=scaling.get("MinCapacity", None),
+            serverless_max_capacity=scaling.get("MaxCapacity", None),
+            members=tuple(
+                ClusterMemberRecord.from_description(member)
+                for member in cluster.get("DBClusterMembers", [])
+            ),
+        )
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# pylint: disable=R0903
+"""
+Spec
+"""
+
+import json
+import os
+
+import pandas as pd
+
+from snapshot import EndpointRecord, InstanceSnapshot, SubnetGroupRecord
+
+DEFAULT_EXPECTATIONS: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "expectations.json"
+)
+
+# Fields computed from a snapshot rather than read from a single slot.
+DERIVED_FIELDS: dict = {
+    "subnets_active": lambda snapshot: snapshot.subnet_group is not None
+    and all(subnet.status == "Active" for subnet in snapshot.subnet_group.subnets),
+}
+
+OPERATORS: tuple = ("equals", "in", "min", "max")
+
+
+def get_known_fields() -> set:
+    """
+    Return the field names an expectation can refer to.
+
+    :return: set
+    """
+    fields: set = set(InstanceSnapshot.__slots__) | set(DERIVED_FIELDS)
+    for name, record_class in (
+        ("endpoint", EndpointRecord),
+        ("subnet_group", SubnetGroupRecord),
+    ):
+        fields |= {f"{name}.{slot}" for slot in record_class.__slots__}
+    return fields
+
+
+def normalize(value):
+    """
+    Make list values comparable regardless of their order.
+
+    :param value: A snapshot field value or an expected value
+    :return: The normalized value
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(sorted(value, key=str))
+    return value
+
+
+def to_row(snapshot: InstanceSnapshot) -> dict:
+    """
+    Flatten a snapshot and add the derived fields.
+
+    :param snapshot: The instance snapshot
+    :type snapshot: InstanceSnapshot
+    :return: dict
+    """
+    row: dict = snapshot.to_dict()
+    for name, derive in DERIVED_FIELDS.items():
+        row[name] = derive(snapshot)
+    return row
+
+
+class Expectation:
+    """
+    A single compiled expectation on a snapshot field
+    """
+
+    __slots__ = ("field", "operator", "expected")
+
+    def __init__(self, field: str, operator: str, expected) -> None:
+        """Class constructor.
+
+        :param field: The snapshot field, e.g. storage_type or endpoint.port
+        :param operator: One of equals, in, min or max
+        :param expected: The expected value
+        :type field: str
+        :type operator: str
+        """
+        self.field: str = field
+        self.operator: str = operator
+        if operator == "in":
+            expected = [normalize(value) for value in expected]
+        self.expected = normalize(expected)
+
+    def evaluate(self, column: pd.Series) -> pd.Series:
+        """
+        Evaluate the expectation on a whole column of snapshots at once.
+
+        :param column: The field values, one per instance
+        :type column: pd.Series
+        :return: pd.Series of bool
+        """
+        if self.operator == "min":
+            return pd.to_numeric(column, errors="coerce").ge(self.expected)
+        if self.operator == "max":
+            return pd.to_numeric(column, errors="coerce").le(self.expected)
+        values: pd.Series = column.map(normalize)
+        if self.operator == "in":
+            return values.map(lambda value: value in self.expected).astype(bool)
+        if self.expected is None:
+            return values.isna()
+        return values.map(lambda value: value == self.expected).astype(bool)
+
+    def describe(self) -> str:
+        """
+        Return a readable form of the expectation.
+
+        :return: str
+        """
+        if self.operator == "equals":
+            return repr(self.expected)
+        return f"{self.operator} {self.expected!r}"
+
+
+class CheckPlan:
+    """
+    Class for evaluating a compiled expectation spec against many snapshots
+    """
+
+    def __init__(self, expectations: list) -> None:
+        """Class constructor.
+
+        :param expectations: The compiled expectations
+        :type expectations: list
+        """
+        self.expectations: list = expectations
+        self.fields: list = [expectation.field for expectation in expectations]
+
+    @classmethod
+    def compile(cls, spec: dict):
+        """
+        Compile an expectation spec. Every key is a snapshot field and every
+        value is either the expected value, or a single-key object with one of
+        the operators in, min or max.
+
+        :param spec: The expectation spec
+        :type spec: dict
+        :return: CheckPlan
+        """
+        known: set = get_known_fields()
+        expectations: list = []
+        for field, expected in spec.items():
+            if field not in known:
+                raise ValueError(f"Unknown field in expectation spec: {field}")
+            operator: str = "equals"
+            if isinstance(expected, dict):
+                if len(expected) != 1 or next(iter(expected)) not in OPERATORS:
+                    raise ValueError(f"Invalid expectation for {field}: {expected}")
+                operator, expected = next(iter(expected.items()))
+            expectations.append(Expectation(field, operator, expected))
+        return cls(expectations)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_EXPECTATIONS):
+        """
+        Compile an expectation spec from a JSON file.
+
+        :param path: The JSON file. Default: expectations.json next to this module
+        :type path: str
+        :return: CheckPlan
+        """
+        with open(path, encoding="utf-8") as spec_file:
+            return cls.compile(json.load(spec_file))
+
+    def frame(self, snapshots: list) -> pd.DataFrame:
+        """
+        Return the planned fields of all snapshots as a data frame with one
+        row per instance.
+
+        :param snapshots: The instance snapshots
+        :type snapshots: list
+        :return: pd.DataFrame
+        """
+        rows: list = [to_row(snapshot) for snapshot in snapshots]
+        index: list = [snapshot.identifier for snapshot in snapshots]
+        return pd.DataFrame(rows, index=index).reindex(columns=self.fields)
+
+    def evaluate(self, snapshots: list) -> pd.DataFrame:
+        """
+        Evaluate every expectation in one pass over the snapshots and return a
+        pass/fail matrix with one row per instance and one column per field.
+
+        :param snapshots: The instance snapshots
+        :type snapshots: list
+        :return: pd.DataFrame
+        """
+        frame: pd.DataFrame = self.frame(snapshots)
+        return pd.DataFrame(
+            {
+                expectation.field: expectation.evaluate(frame[expectation.field])
+                for expectation in self.expectations
+            },
+            index=frame.index,
+        )
+
+    def mismatches(self, snapshots: list) -> list:
+        """
+        Return every failed expectation with the expected and actual values.
+
+        :param snapshots: The instance snapshots
+        :type snapshots: list
+        :return: list of dict
+        """
+        frame: pd.DataFrame = self.frame(snapshots)
+        failures: list = []
+        for expectation in self.expectations:
+            column: pd.Series = frame[expectation.field]
+            passed: pd.Series = expectation.evaluate(column)
+            # By position, as two snapshots can share an identifier.
+            for identifier, ok, actual in zip(frame.index, passed, column):
+                if not ok:
+                    failures.append(
+                        {
+                            "instance": identifier,
+                            "field": expectation.field,
+                            "expected": expectation.describe(),
+                            "actual": actual,
+                        }
+                    )
+        return failures
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Stats
+"""
+
+import math
+
+import numpy as np
+
+
+def summarize(samples: list) -> dict:
+    """
+    Summarize latency samples given in seconds. The result is in milliseconds.
+
+    :param samples: The latency samples in seconds
+    :type samples: list
+    :return: dict
+    """
+    if len(samples) == 0:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=float) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+def mann_whitney(a: list, b: list) -> dict:
+    """
+    Two-sided Mann-Whitney U test of whether samples of a tend to be larger or
+    smaller than samples of b. Latencies are skewed and have long tails, so a
+    rank test is more robust than comparing means. The p-value uses the normal
+    approximation with tie and continuity correction, which is accurate from
+    about 20 samples per side.
+
+    :param a: The first samples
+    :param b: The second samples
+    :type a: list
+    :type b: list
+    :return: dict with u, z, p_value and effect, the probability that a sample
+        of a is larger than a sample of b
+    """
+    x = np.asarray(a, dtype=float)
+    y = np.asarray(b, dtype=float)
+    n1, n2 = x.size, y.size
+    if n1 == 0 or n2 == 0:
+        return {"u": None, "z": None, "p_value": None, "effect": None}
+    _, inverse, counts = np.unique(
+        np.concatenate([x, y]), return_inverse=True, return_counts=True
+    )
+    # Tied values share the average of the ranks they span.
+    ranks = (np.cumsum(counts) - (counts - 1) / 2.0)[inverse.ravel()]
+    u: float = float(ranks[:n1].sum() - n1 * (n1 + 1) / 2.0)
+    n: int = n1 + n2
+    ties: float = float((counts**3 - counts).sum())
+    variance: float = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    delta: float = u - n1 * n2 / 2.0
+    if variance <= 0:
+        z: float = 0.0
+    else:
+        z = (delta - math.copysign(min(0.5, abs(delta)), delta)) / math.sqrt(variance)
+    return {
+        "u": u,
+        "z": z,
+        "p_value": math.erfc(abs(z) / math.sqrt(2)),
+        "effect": u / (n1 * n2),
+    }
+
+
+def holm(p_values: list) -> list:
+    """
+    Adjust p-values for testing many hypotheses at once with the Holm-Bonferroni
+    method, so comparing hundreds of fingerprints doesn't flag some by chance.
+
+    :param p_values: The unadjusted p-values, None for untested hypotheses
+    :type p_values: list
+    :return: list of adjusted p-values in the same order
+    """
+    tested: list = sorted(
+        (value, index) for index, value in enumerate(p_values) if value is not None
+    )
+    adjusted: list = [None] * len(p_values)
+    running: float = 0.0
+    for rank, (value, index) in enumerate(tested):
+        running = max(running, min(1.0, (len(tested) - rank) * value))
+        adjusted[index] = running
+    return adjusted
+
+
+class StreamingHistogram:
+    """
+    Fixed-memory histogram of samples in seconds with log-spaced buckets, for
+    percentiles over runs too long to keep every sample. Percentiles are
+    accurate to the bucket width, about 5%.
+    """
+
+    def __init__(
+        self, low: float = 1e-4, high: float = 3600, buckets: int = 400
+    ) -> None:
+        """Class constructor.
+
+        :param low: The smallest distinguished value in seconds. Default: 0.1 ms
+        :param high: The largest distinguished value in seconds. Default: 1 hour
+        :param buckets: The number of buckets. Default: 400
+        :type low: float
+        :type high: float
+        :type buckets: int
+        """
+        self.edges = np.geomspace(low, high, buckets)
+        self.counts = np.zeros(buckets + 1, dtype=np.int64)
+        self.total: float = 0.0
+        self.maximum: float = 0.0
+
+    def add(self, sample: float) -> None:
+        """
+        Count a sample.
+
+        :param sample: The sample in seconds
+        :type sample: float
+        """
+        self.counts[np.searchsorted(self.edges, sample)] += 1
+        self.total += sample
+        self.maximum = max(self.maximum, sample)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Return the upper edge of the bucket holding the given percentile.
+
+        :param percent: The percentile, between 0 and 100
+        :type percent: float
+        :return: float seconds
+        """
+        count: int = int(self.counts.sum())
+        if count == 0:
+            return None
+        index: int = int(np.searchsorted(np.cumsum(self.counts), count * percent / 100))
+        return float(min(self.edges[min(index, len(self.edges) - 1)], self.maximum))
+
+    def summarize(self) -> dict:
+        """
+        Summarize the samples like summarize().
+
+        :return: dict
+        """
+        count: int = int(self.counts.sum())
+        if count == 0:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean_ms": self.total / count * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.maximum * 1000,
+        }
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0914
+"""
+Storage
+"""
+
+import argparse
+import datetime
+import io
+import logging
+import random
+import sys
+import threading
+import time
+
+import boto3
+import psycopg2
+
+import probe
+from monitoring import get_metric_query
+from parameters import get_instance_memory
+from stats import summarize
+
+MIB: int = 1024**2
+
+# Size of the COPY buffer sent per call during the bulk load.
+COPY_BLOCK_BYTES: int = 4 * MIB
+
+# Width of the padding column, so that about seven rows fit in an 8 KiB page.
+ROW_PAYLOAD: int = 1000
+
+# gp3 baseline below and above 400 GiB of allocated storage.
+GP3_BASELINE: dict = {
+    "small": {"iops": 3000, "throughput": 125},
+    "large": {"iops": 12000, "throughput": 500},
+}
+
+CLOUDWATCH_METRICS: tuple = (
+    ("read_iops", "ReadIOPS"),
+    ("write_iops", "WriteIOPS"),
+    ("read_throughput", "ReadThroughput"),
+    ("write_throughput", "WriteThroughput"),
+)
+
+
+def get_provisioned_storage(snapshot) -> dict:
+    """
+    Return the provisioned IOPS and throughput (MiB/s) of an instance. Values
+    the instance description leaves out are filled in with the storage type's
+    baseline. The result is None when the instance isn't known.
+
+    :param snapshot: The instance snapshot
+    :return: dict
+    """
+    if snapshot is None:
+        return None
+    iops: int = snapshot.iops
+    throughput: int = snapshot.storage_throughput
+    if snapshot.storage_type == "gp3":
+        baseline: dict = GP3_BASELINE[
+            "large" if snapshot.allocated_storage >= 400 else "small"
+        ]
+        iops = iops or baseline["iops"]
+        throughput = throughput or baseline["throughput"]
+    elif snapshot.storage_type == "gp2" and iops is None:
+        iops = min(max(100, 3 * snapshot.allocated_storage), 16000)
+    return {
+        "storage_type": snapshot.storage_type,
+        "allocated_storage": snapshot.allocated_storage,
+        "iops": iops,
+        "throughput_mb_s": throughput,
+    }
+
+
+def make_copy_block(size: int) -> bytes:
+    """
+    Return single column rows of about the given size for COPY FROM STDIN.
+
+    :param size: The block size in bytes
+    :type size: int
+    :return: bytes
+    """
+    row: str = "x" * ROW_PAYLOAD + "\n"
+    return (row * max(1, size // len(row))).encode()
+
+
+class StorageBenchmark:
+    """
+    Class for measuring the sustained storage throughput and IOPS of a database
+    """
+
+    def __init__(
+        self, parameters: dict, clients: int = 8, duration: float = 60
+    ) -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param clients: The number of concurrent clients. Default: 8
+        :param duration: The run time of the timed stages in seconds. Default: 60
+        :type parameters: dict
+        :type clients: int
+        :type duration: float
+        """
+        self.parameters: dict = parameters
+        self.clients: int = clients
+        self.duration: float = duration
+
+    def __execute(self, *statements: str) -> list:
+        """
+        Run statements in autocommit mode and return the first row of the last one.
+
+        :return: list
+        """
+        conn = psycopg2.connect(**self.parameters)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as sql:
+                for statement in statements:
+                    sql.execute(statement)
+                return sql.fetchone() if sql.description is not None else None
+        finally:
+            conn.close()
+
+    def __get_database_counters(self) -> dict:
+        """
+        Return the block read counter of the database and the current WAL position.
+
+        :return: dict
+        """
+        blocks_read, lsn = self.__execute(
+            "SELECT blks_read, pg_current_wal_lsn()::text FROM pg_stat_database "
+            "WHERE datname = current_database()"
+        )
+        return {"blocks_read": blocks_read, "lsn": lsn}
+
+    def __get_wal_bytes(self, start_lsn: str) -> int:
+        """
+        Return the WAL bytes written since the given position.
+
+        :return: int
+        """
+        return int(
+            self.__execute(
+                f"SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '{start_lsn}')"
+            )[0]
+        )
+
+    def __run_clients(self, work) -> tuple:
+        """
+        Run work(conn, rng) in a loop on every client until the duration is over.
+
+        :return: tuple of (latencies, elapsed seconds)
+        """
+        deadline: float = time.perf_counter() + self.duration
+        lock = threading.Lock()
+        latencies: list = []
+
+        def run_client(seed: int) -> None:
+            rng = random.Random(seed)
+            samples: list = []
+            conn = psycopg2.connect(**self.parameters)
+            try:
+                while time.perf_counter() < deadline:
+                    start: float = time.perf_counter()
+                    work(conn, rng)
+                    samples.append(time.perf_counter() - start)
+            finally:
+                conn.close()
+            with lock:
+                latencies.extend(samples)
+
+        _, elapsed = probe.run_clients(run_client, range(self.clients))
+        return latencies, elapsed
+
+    def bulk_load(self, size_mb: int) -> dict:
+        """
+        Load rows with COPY FROM STDIN in a single transaction and measure the
+        sustained sequential write rate.
+
+        :param size_mb: The amount of data to load in MiB
+        :type size_mb: int
+        :return: dict
+        """
+        self.__execute(
+            "DROP TABLE IF EXISTS qa_storage_bulk",
+            "CREATE TABLE qa_storage_bulk (payload text)",
+        )
+        block: bytes = make_copy_block(COPY_BLOCK_BYTES)
+        sent: int = 0
+        start: float = time.perf_counter()
+        conn = psycopg2.connect(**self.parameters)
+        try:
+            with conn.cursor() as sql:
+                while sent < size_mb * MIB:
+                    sql.copy_expert(
+                        "COPY qa_storage_bulk FROM STDIN", io.BytesIO(block)
+                    )
+                    sent += len(block)
+            conn.commit()
+        finally:
+            conn.close()
+        elapsed: float = time.perf_counter() - start
+        table_bytes: int = self.__execute(
+            "SELECT pg_total_relation_size('qa_storage_bulk')"
+        )[0]
+        logging.info(f"Loaded {sent / MIB:.0f} MiB in {elapsed:.2f}s")
+        return {
+            "loaded_mb": sent / MIB,
+            "table_mb": table_bytes / MIB,
+            "elapsed_s": elapsed,
+            "mb_s": sent / MIB / elapsed,
+        }
+
+    def prepare_random_reads(self, size_mb: int) -> float:
+        """
+        Create the indexed table read by the random read stage. Make it larger
+        than the instance memory, so that most lookups have to go to storage.
+
+        :param size_mb: The approximate table size in MiB
+        :type size_mb: int
+        :return: float table size in MiB
+        """
+        rows: int = size_mb * MIB // (ROW_PAYLOAD + 170)
+        self.__execute(
+            "DROP TABLE IF EXISTS qa_storage_random",
+            "CREATE TABLE qa_storage_random (id bigint, payload text) "
+            "WITH (autovacuum_enabled = false)",
+            "INSERT INTO qa_storage_random "
+            f"SELECT id, repeat('x', {ROW_PAYLOAD}) FROM generate_series(1, {rows}) AS id",
+            "ALTER TABLE qa_storage_random ADD PRIMARY KEY (id)",
+            "ANALYZE qa_storage_random",
+        )
+        return self.__execute("SELECT pg_relation_size('qa_storage_random')")[0] / MIB
+
+    def random_reads(self) -> dict:
+        """
+        Look up random rows through the primary key index from every client and
+        measure the achieved read operations and block reads.
+
+        :return: dict
+        """
+        rows: int = self.__execute("SELECT max(id) FROM qa_storage_random")[0]
+
+        def read(conn, rng: random.Random) -> None:
+            with conn.cursor() as sql:
+                sql.execute(
+                    "SELECT length(payload) FROM qa_storage_random WHERE id = %s",
+                    (rng.randint(1, rows),),
+                )
+                sql.fetchone()
+            conn.rollback()
+
+        before: dict = self.__get_database_counters()
+        latencies, elapsed = self.__run_clients(read)
+        blocks: int = (
+            self.__get_database_counters()["blocks_read"] - before["blocks_read"]
+        )
+        return {
+            "ops_s": len(latencies) / elapsed,
+            "block_reads_s": blocks / elapsed,
+            "read_mb_s": blocks * 8192 / MIB / elapsed,
+            "latency": summarize(latencies),
+        }
+
+    def wal_inserts(self) -> dict:
+        """
+        Insert and commit single rows from every client, so every transaction
+        waits for a WAL flush, and measure the commit and WAL write rates.
+
+        :return: dict
+        """
+        self.__execute(
+            "DROP TABLE IF EXISTS qa_storage_wal",
+            "CREATE TABLE qa_storage_wal (id bigserial PRIMARY KEY, payload text)",
+        )
+        payload: str = "x" * 512
+
+        def insert(conn, _rng: random.Random) -> None:
+            with conn.cursor() as sql:
+                sql.execute(
+                    "INSERT INTO qa_storage_wal (payload) VALUES (%s)", (payload,)
+                )
+            conn.commit()
+
+        start_lsn: str = self.__get_database_counters()["lsn"]
+        latencies, elapsed = self.__run_clients(insert)
+        wal_bytes: int = self.__get_wal_bytes(start_lsn)
+        return {
+            "commits_s": len(latencies) / elapsed,
+            "wal_mb_s": wal_bytes / MIB / elapsed,
+            "latency": summarize(latencies),
+        }
+
+
+def get_storage_metrics(
+    identifier: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    region: str = "eu-central-1",
+) -> dict:
+    """
+    Return the peak one-minute averages of the instance's storage metrics
+    between start and end. Throughput values are converted to MiB/s. Stages
+    shorter than a few minutes yield few or no data points.
+
+    :param identifier: The DB instance identifier
+    :param start: The start of the measurement window
+    :param end: The end of the measurement window
+    :param region: The AWS region. Default: eu-central-1
+    :type identifier: str
+    :type start: datetime.datetime
+    :type end: datetime.datetime
+    :type region: str
+    :return: dict
+    """
+    client = boto3.session.Session().client(
+        service_name="cloudwatch", region_name=region
+    )
+    queries: list = [
+        get_metric_query(metric_id, metric_name, {"DBInstanceIdentifier": identifier})
+        for metric_id, metric_name in CLOUDWATCH_METRICS
+    ]
+    peaks: dict = {metric_id: None for metric_id, _ in CLOUDWATCH_METRICS}
+    paginator = client.get_paginator("get_metric_data")
+    for page in paginator.paginate(
+        MetricDataQueries=queries, StartTime=start, EndTime=end
+    ):
+        for result in page["MetricDataResults"]:
+            values: list = result["Values"]
+            if result["Id"].endswith("throughput"):
+                values = [value / MIB for value in values]
+            if len(values) > 0:
+                peaks[result["Id"]] = max(values + [peaks[result["Id"]] or 0])
+    return peaks
+
+
+def main() -> int:
+    """
+    Run the storage benchmark stages from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the storage of the QA database."
+    )
+    probe.add_connection_arguments(parser)
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=["bulk", "random", "wal"],
+        default=["bulk", "random", "wal"],
+    )
+    parser.add_argument("--bulk-mb", type=int, default=1024)
+    parser.add_argument(
+        "--random-mb",
+        type=int,
+        help="Size of the random read table. Default: twice the instance memory",
+    )
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = probe.parse_arguments(parser)
+    parameters, snapshot = probe.get_target(args)
+    if parameters is None:
+        logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+        return 1
+    random_mb: int = args.random_mb or 256
+    if snapshot is not None and args.random_mb is None:
+        memory: int = get_instance_memory(
+            snapshot.instance_class, args.region, snapshot.cluster_identifier
+        )
+        random_mb = 2 * memory // MIB
+
+    benchmark = StorageBenchmark(
+        parameters, clients=args.clients, duration=args.duration
+    )
+    report: dict = {"provisioned": get_provisioned_storage(snapshot), "stages": {}}
+    for stage in args.stages:
+        start: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        if stage == "bulk":
+            result: dict = benchmark.bulk_load(args.bulk_mb)
+        elif stage == "random":
+            table_mb: float = benchmark.prepare_random_reads(random_mb)
+            start = datetime.datetime.now(datetime.timezone.utc)
+            result = benchmark.random_reads()
+            result["table_mb"] = table_mb
+        else:
+            result = benchmark.wal_inserts()
+        if snapshot is not None:
+            result["cloudwatch"] = get_storage_metrics(
+                snapshot.identifier,
+                start,
+                datetime.datetime.now(datetime.timezone.utc),
+                args.region,
+            )
+        report["stages"][stage] = result
+
+    probe.write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Apply profile test cases.
+"""
+
+import json
+import unittest
+
+import apply_profile
+
+SUBNET_GROUP = "module.db_subnet_group.aws_db_subnet_group.this[0]"
+LOG_GROUP = "module.db_proxy[0].aws_cloudwatch_log_group.this"
+INSTANCE = "module.db_instance[0].aws_db_instance.this"
+PROXY = "module.db_proxy[0].aws_db_proxy.this"
+
+
+def message(second, kind, address=None, action="create"):
+    line = {
+        "@level": "info",
+        "@message": f"{address}: {kind}",
+        "@timestamp": f"2024-05-01T12:{second // 60:02d}:{second % 60:02d}.000000Z",
+        "type": kind,
+    }
+    if address is not None:
+        line["hook"] = {"resource": {"addr": address}, "action": action}
+    return json.dumps(line)
+
+
+# A recorded apply: the log group and the instance run in parallel, the
+# proxy waits for the log group.
+APPLY_LOG = [
+    json.dumps({"@timestamp": "2024-05-01T12:00:00.000000Z", "type": "version"}),
+    message(0, "apply_start", SUBNET_GROUP),
+    message(2, "apply_complete", SUBNET_GROUP),
+    message(2, "apply_start", LOG_GROUP),
+    message(2, "apply_start", INSTANCE),
+    message(3, "apply_complete", LOG_GROUP),
+    message(3, "apply_start", PROXY),
+    message(200, "apply_complete", PROXY),
+    message(600, "apply_complete", INSTANCE),
+    "not json from a wrapper script",
+]
+
+# The instance reaches the subnet group through a module variable and output,
+# as in `terraform graph`.
+GRAPH = [
+    "digraph {",
+    '  "[root] module.db_proxy.aws_db_proxy.this (expand)" -> '
+    '"[root] module.db_proxy.aws_cloudwatch_log_group.this (expand)"',
+    '  "[root] module.db_proxy.aws_db_proxy.this (expand)" -> '
+    '"[root] provider[\\"registry.terraform.io/hashicorp/aws\\"]"',
+    '  "[root] module.db_instance.aws_db_instance.this (expand)" -> '
+    '"[root] module.db_instance.var.db_subnet_group_name (expand)"',
+    '  "[root] module.db_instance.var.db_subnet_group_name (expand)" -> '
+    '"[root] module.db_instance (expand)"',
+    '  "[root] module.db_instance.var.db_subnet_group_name (expand)" -> '
+    '"[root] module.db_subnet_group.output.db_subnet_group_id (expand)"',
+    '  "[root] module.db_subnet_group.output.db_subnet_group_id (expand)" -> '
+    '"[root] module.db_subnet_group.aws_db_subnet_group.this (expand)"',
+    '  "[root] module.db_subnet_group.output.db_subnet_group_id (expand)" -> '
+    '"[root] module.db_subnet_group (expand)"',
+    "}",
+]
+
+# A replaced instance: deleted first, then created again.
+REPLACE_LOG = [
+    message(0, "apply_start", INSTANCE, action="delete"),
+    message(100, "apply_complete", INSTANCE, action="delete"),
+    message(100, "apply_start", INSTANCE),
+    message(700, "apply_complete", INSTANCE),
+]
+
+
+def profile(lines, dependencies=None):
+    profiler = apply_profile.ApplyProfiler()
+    for line in lines:
+        profiler.feed(line)
+    return profiler.profile(dependencies)
+
+
+class TestApplyProfiler(unittest.TestCase):
+    """
+    Test cases for the ApplyProfiler class.
+    """
+
+    def test_timeline(self):
+        result = profile(APPLY_LOG)
+        self.assertEqual(result["wall_s"], 600)
+        durations = {
+            item["address"]: item["duration_s"] for item in result["resources"]
+        }
+        self.assertEqual(durations[INSTANCE], 598)
+        self.assertEqual(durations[PROXY], 197)
+        self.assertAlmostEqual(result["parallelism"], 798 / 600)
+
+    def test_unfinished_resources_are_in_progress(self):
+        result = profile(APPLY_LOG[:7])
+        statuses = {item["address"]: item["status"] for item in result["resources"]}
+        self.assertEqual(statuses[PROXY], "in_progress")
+        self.assertEqual(statuses[SUBNET_GROUP], "complete")
+
+    def test_inferred_critical_path(self):
+        path = [item["address"] for item in profile(APPLY_LOG)["critical_path"]]
+        self.assertEqual(path, [SUBNET_GROUP, INSTANCE])
+
+    def test_parse_graph(self):
+        self.assertEqual(
+            apply_profile.parse_graph(GRAPH),
+            {
+                "module.db_proxy.aws_db_proxy.this": {
+                    "module.db_proxy.aws_cloudwatch_log_group.this"
+                },
+                "module.db_instance.aws_db_instance.this": {
+                    "module.db_subnet_group.aws_db_subnet_group.this"
+                },
+            },
+        )
+
+    def test_graph_critical_path(self):
+        dependencies = apply_profile.parse_graph(GRAPH)
+        result = profile(APPLY_LOG, dependencies)
+        self.assertEqual(
+            [item["address"] for item in result["critical_path"]],
+            [SUBNET_GROUP, INSTANCE],
+        )
+        self.assertEqual(result["critical_path_s"], 600)
+
+    def test_replaced_resource(self):
+        result = profile(REPLACE_LOG, apply_profile.parse_graph(GRAPH))
+        self.assertEqual(
+            [(item["action"], item["duration_s"]) for item in result["resources"]],
+            [("delete", 100), ("create", 600)],
+        )
+        self.assertEqual(
+            [item["action"] for item in result["critical_path"]], ["delete", "create"]
+        )
+        self.assertEqual(result["critical_path_s"], 700)
+
+    def test_compare(self):
+        faster = [line.replace("12:10:00", "12:05:00") for line in APPLY_LOG]
+        comparison = apply_profile.compare(profile(APPLY_LOG), profile(faster))
+        self.assertEqual(comparison["wall_delta_s"], -300)
+        self.assertEqual(comparison["resources"][0]["address"], INSTANCE)
+        self.assertEqual(comparison["resources"][0]["delta_s"], -300)
+
+
+if __name__ == "__main__":
+    unittest.main()
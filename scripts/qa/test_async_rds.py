@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Async RDS test cases.
+"""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import async_rds
+import rds
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+get_log_group_names = rds.QA.get_log_group_names
+
+
+def fail_for_broken(qa) -> list:
+    if qa.identifier == "broken":
+        raise ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+            "DescribeLogGroups",
+        )
+    return get_log_group_names(qa)
+
+
+@mock_aws
+class TestVerifyAll(unittest.TestCase):
+    """
+    The concurrent verification against a moto RDS backend, where no
+    database endpoint resolves.
+    """
+
+    def setUp(self):
+        client = boto3.client("rds", region_name="eu-central-1")
+        create_instance(client, "qa", managed=True)
+        # Without a managed secret there are no connection parameters.
+        create_instance(client, "plain")
+
+    def test_verify_all(self):
+        qa, missing = asyncio.run(async_rds.verify_all(["qa", "missing"]))
+        self.assertTrue(qa["instance_exist"])
+        self.assertTrue(qa["secretsmanager_exist"])
+        self.assertFalse(qa["database_connected"])
+        self.assertFalse(missing["instance_exist"])
+        self.assertFalse(missing["database_connected"])
+
+    def test_no_connection_parameters(self):
+        self.assertFalse(async_rds.AsyncQA(identifier="plain").connect_to_database())
+
+    def test_failure_is_reported_per_instance(self):
+        with mock.patch.object(
+            rds.QA, "get_log_group_names", autospec=True, side_effect=fail_for_broken
+        ):
+            qa, broken = asyncio.run(async_rds.verify_all(["qa", "broken"]))
+        self.assertTrue(qa["instance_exist"])
+        self.assertFalse(broken["database_connected"])
+        self.assertIn("ThrottlingException", broken["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Cluster test cases.
+"""
+
+import json
+import os
+import unittest
+from unittest import mock
+
+import boto3
+import psycopg2
+from moto import mock_aws
+from psycopg2.extensions import parse_dsn
+
+import cluster
+import rds
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+class TestLagSamples(unittest.TestCase):
+    """
+    The replica lags sampled from aurora_replica_status().
+    """
+
+    def test_null_lag_is_unknown(self):
+        samples, unknown = {}, {}
+        cluster.add_lag_samples(samples, unknown, [("qa-2", 20.0), ("qa-3", None)])
+        cluster.add_lag_samples(samples, unknown, [("qa-2", None), ("qa-3", 5.0)])
+        self.assertEqual(samples, {"qa-2": [0.02], "qa-3": [0.005]})
+        self.assertEqual(unknown, {"qa-2": 1, "qa-3": 1})
+
+    def test_balance(self):
+        balance = cluster.get_balance({"qa-2": 3, "qa-3": 1}, ["qa-2", "qa-3", "qa-4"])
+        self.assertEqual(balance["unused"], ["qa-4"])
+        self.assertAlmostEqual(balance["max_deviation"], 0.75 - 1 / 3)
+
+
+@mock_aws
+class TestClusterQA(unittest.TestCase):
+    """
+    The cluster lookups against a moto RDS backend.
+    """
+
+    def setUp(self):
+        client = boto3.client("rds", region_name="eu-central-1")
+        client.create_db_cluster(
+            DBClusterIdentifier="qa",
+            Engine="aurora-postgresql",
+            MasterUsername="qa",
+            ManageMasterUserPassword=True,
+        )
+        for identifier in ("qa-1", "qa-2", "qa-3"):
+            client.create_db_instance(
+                DBInstanceIdentifier=identifier,
+                DBInstanceClass="db.r6g.large",
+                Engine="aurora-postgresql",
+                DBClusterIdentifier="qa",
+            )
+        client.create_db_cluster(
+            DBClusterIdentifier="plain",
+            Engine="aurora-postgresql",
+            MasterUsername="qa",
+            MasterUserPassword="password",
+        )
+
+    def test_verify(self):
+        qa = cluster.ClusterQA()
+        self.assertEqual(qa.verify(), [])
+        self.assertEqual(qa.get_writer(), "qa-1")
+        self.assertEqual(qa.get_readers(), ["qa-2", "qa-3"])
+
+    def test_missing_cluster(self):
+        qa = cluster.ClusterQA(identifier="missing")
+        self.assertEqual(qa.verify(), ["Cluster missing doesn't exist"])
+        with self.assertRaises(ValueError):
+            qa.get_connection_parameters()
+
+    def test_connection_parameters(self):
+        parameters = cluster.ClusterQA().get_connection_parameters(reader=True)
+        self.assertIn("cluster-ro-", parameters["host"])
+        self.assertIsNotNone(parameters["password"])
+
+    def test_no_master_user_secret(self):
+        with self.assertRaises(ValueError):
+            cluster.ClusterQA(identifier="plain").get_connection_parameters()
+
+    def test_rotated_secret(self):
+        qa = cluster.ClusterQA()
+        parameters = qa.get_connection_parameters()
+        secrets = boto3.client("secretsmanager", region_name="eu-central-1")
+        secret_id = qa.get_cluster().master_user_secret_arn
+        secret = json.loads(
+            secrets.get_secret_value(SecretId=secret_id)["SecretString"]
+        )
+        secrets.put_secret_value(
+            SecretId=secret_id,
+            SecretString=json.dumps(dict(secret, password="rotated")),
+        )
+        failure = psycopg2.OperationalError(
+            'FATAL:  password authentication failed for user "qa"'
+        )
+        with mock.patch.object(
+            rds, "connection", side_effect=[failure, mock.sentinel.conn]
+        ) as connection:
+            self.assertIs(psycopg2.connect(**parameters), mock.sentinel.conn)
+        passwords = [
+            parse_dsn(call.args[0])["password"] for call in connection.mock_calls
+        ]
+        self.assertEqual(passwords, [secret["password"], "rotated"])
+
+
+if __name__ == "__main__":
+    unittest.main()
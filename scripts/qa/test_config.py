@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Config test cases.
+"""
+
+import unittest
+
+import config
+import spec
+
+REQUIRED: dict = {
+    "environment": "dev",
+    "identifier": "qa",
+    "username": "qa_user",
+    "cost_centre": "ti-platform",
+    "service_availability": "low",
+    "data_classification": "public",
+}
+
+
+def make_plan(values: dict) -> dict:
+    return {
+        "variables": {
+            name: {"value": value}
+            for name, value in dict(REQUIRED, environment="prod").items()
+        },
+        "planned_values": {
+            "root_module": {
+                "child_modules": [
+                    {
+                        "address": "module.db_instance[0]",
+                        "resources": [
+                            {
+                                "address": "module.db_instance[0].aws_db_instance.this",
+                                "type": "aws_db_instance",
+                                "values": values,
+                            }
+                        ],
+                    }
+                ]
+            }
+        },
+    }
+
+
+class TestResolve(unittest.TestCase):
+    """
+    Test cases for resolving the locals.tf defaults.
+    """
+
+    def test_non_prod_defaults(self):
+        resolved = config.resolve(REQUIRED)
+        self.assertEqual(resolved["config"], "non-prod")
+        self.assertFalse(resolved["multi_az"])
+        self.assertTrue(resolved["skip_final_snapshot"])
+        self.assertIsNone(resolved["final_snapshot_identifier"])
+        self.assertEqual(resolved["cloudwatch_logs_exports"], [])
+        self.assertNotIn("dfds.data.backup", resolved["data_tags"])
+        self.assertEqual(config.validate(resolved), [])
+
+    def test_prod_defaults(self):
+        resolved = config.resolve(dict(REQUIRED, environment="prod"))
+        self.assertTrue(resolved["multi_az"])
+        # variables.tf defaults both to true, overriding the prod config map.
+        self.assertTrue(resolved["skip_final_snapshot"])
+        self.assertIsNone(resolved["final_snapshot_identifier"])
+        self.assertTrue(resolved["delete_automated_backups"])
+        self.assertEqual(resolved["performance_insights_retention_period"], 7)
+        self.assertEqual(resolved["data_tags"]["dfds.data.backup"], "true")
+        self.assertIn("log_connections", resolved["instance_parameters"])
+
+    def test_variables_override_defaults(self):
+        resolved = config.resolve(
+            dict(REQUIRED, environment="prod", instance_is_multi_az=False)
+        )
+        self.assertFalse(resolved["multi_az"])
+        resolved = config.resolve(
+            dict(REQUIRED, environment="prod", skip_final_snapshot=False)
+        )
+        self.assertEqual(resolved["final_snapshot_identifier"], "final-qa-<random>")
+
+    def test_variable_defaults(self):
+        defaults = config.read_variable_defaults()
+        self.assertNotIn("identifier", defaults)
+        self.assertTrue(defaults["skip_final_snapshot"])
+        self.assertTrue(defaults["delete_automated_backups"])
+        self.assertIsNone(defaults["enable_default_backup"])
+        self.assertEqual(defaults["maintenance_window"], "Sat:18:00-Sat:20:00")
+        self.assertEqual(
+            defaults["proxy_additional_security_group_rules"], {"ingress_rules": []}
+        )
+
+    def test_performance_insights_retention(self):
+        for retention, valid in ((7, True), (62, True), (731, True), (30, False)):
+            resolved = config.resolve(
+                dict(
+                    REQUIRED,
+                    performance_insights_enabled=True,
+                    performance_insights_retention_period=retention,
+                )
+            )
+            self.assertEqual(not config.validate(resolved), valid, retention)
+
+    def test_io1_iops(self):
+        instance = config.resolve(dict(REQUIRED, storage_type="io1"))
+        self.assertIn(
+            "storage_type io1 needs iops, which has no default",
+            config.validate(instance),
+        )
+        cluster = config.resolve(dict(REQUIRED, storage_type="io1", is_cluster=True))
+        self.assertEqual(cluster["iops"], 1000)
+        self.assertEqual(config.validate(cluster), [])
+
+    def test_proxy_needs_managed_password(self):
+        resolved = config.resolve(
+            dict(REQUIRED, is_proxy_included=True, manage_master_user_password=False)
+        )
+        self.assertEqual(len(config.validate(resolved)), 1)
+
+
+class TestMatrix(unittest.TestCase):
+    """
+    Test cases for evaluating variable combinations.
+    """
+
+    def test_default_axes(self):
+        results = config.evaluate_matrix(REQUIRED)
+        self.assertEqual(len(results), 6 * 4 * 2)
+        failing = {
+            result["variables"]["storage_type"]
+            for result in results
+            if result["problems"]
+        }
+        self.assertEqual(failing, {"io1"})
+
+    def test_expectations(self):
+        plan = spec.CheckPlan.compile(
+            {"status": "available", "multi_az": True, "storage_type": "gp3"}
+        )
+        rows = {
+            result["label"]: result["resolved"]
+            for result in config.evaluate_matrix(
+                REQUIRED, {"environment": ["dev", "prod"]}
+            )
+        }
+        mismatches = config.check_expectations(plan, rows)
+        self.assertEqual(
+            [(item["label"], item["field"]) for item in mismatches],
+            [("environment=dev", "multi_az")],
+        )
+
+    def test_qa_expectations(self):
+        expectations = config.get_expectations()
+        self.assertTrue(set(config.DERIVED_EXPECTATIONS) <= set(expectations))
+        self.assertEqual(expectations["instance_class"], "db.t3.micro")
+        self.assertEqual(expectations["master_username"], "qa_user")
+        self.assertEqual(expectations["status"], "available")
+        self.assertIn("subnets_active", config.load_check_plan().fields)
+
+
+class TestPlan(unittest.TestCase):
+    """
+    Test cases for reading terraform show -json plans.
+    """
+
+    def test_plan_matches_model(self):
+        plan = make_plan(
+            {
+                "instance_class": "db.t3.micro",
+                "multi_az": True,
+                "storage_type": "gp3",
+                "maintenance_window": "Sat:18:00-Sat:20:00",
+                "enabled_cloudwatch_logs_exports": ["upgrade", "postgresql"],
+            }
+        )
+        report = config.compare_plan(plan)
+        self.assertEqual(
+            report["module.db_instance[0].aws_db_instance.this"],
+            {"differences": [], "problems": []},
+        )
+
+    def test_plan_differences(self):
+        report = config.compare_plan(make_plan({"multi_az": False}))
+        differences = report["module.db_instance[0].aws_db_instance.this"][
+            "differences"
+        ]
+        self.assertEqual(
+            differences, [{"field": "multi_az", "planned": False, "model": True}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
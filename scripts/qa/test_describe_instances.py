@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Instance lookup test cases.
+"""
+
+import os
+import unittest
+
+import boto3
+from moto import mock_aws
+
+import rds
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+def create_instance(client, identifier: str, managed: bool = False) -> None:
+    # With managed, RDS keeps the master user password in Secrets Manager.
+    password: dict = (
+        {"ManageMasterUserPassword": True}
+        if managed
+        else {"MasterUserPassword": "password"}
+    )
+    client.create_db_instance(
+        DBInstanceIdentifier=identifier,
+        DBInstanceClass="db.t3.micro",
+        Engine="postgres",
+        AllocatedStorage=20,
+        MasterUsername="qa",
+        **password,
+    )
+
+
+def identifiers(instances) -> list:
+    return sorted(instance["DBInstanceIdentifier"] for instance in instances)
+
+
+@mock_aws
+class TestDescribeInstances(unittest.TestCase):
+    """
+    The lookups against a moto RDS backend.
+    """
+
+    def setUp(self):
+        self.client = boto3.client("rds", region_name="eu-central-1")
+        for identifier in ("qa", "qa2"):
+            create_instance(self.client, identifier)
+
+    def test_empty(self):
+        self.assertEqual(list(rds.describe_instances(self.client, [])), [])
+
+    def test_single(self):
+        self.assertEqual(
+            identifiers(rds.describe_instances(self.client, ["qa"])), ["qa"]
+        )
+
+    def test_single_not_found(self):
+        self.assertEqual(list(rds.describe_instances(self.client, ["missing"])), [])
+
+    def test_filter(self):
+        self.assertEqual(
+            identifiers(rds.describe_instances(self.client, ["qa", "qa2", "missing"])),
+            ["qa", "qa2"],
+        )
+
+    def test_filter_paginated(self):
+        # More instances than fit on the default page of 100.
+        names = [f"fleet-{index:03d}" for index in range(105)]
+        for name in names:
+            create_instance(self.client, name)
+        self.assertEqual(identifiers(rds.describe_instances(self.client, names)), names)
+
+
+if __name__ == "__main__":
+    unittest.main()
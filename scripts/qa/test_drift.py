@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Drift test cases.
+"""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from botocore.exceptions import ClientError
+
+import drift
+
+START = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def at(minutes):
+    return START + datetime.timedelta(minutes=minutes)
+
+
+def instance(identifier, storage=20, apply_status="in-sync"):
+    return {
+        "DBInstanceIdentifier": identifier,
+        "DBInstanceStatus": "available",
+        "AllocatedStorage": storage,
+        "DBParameterGroups": [
+            {"DBParameterGroupName": "qa-pg", "ParameterApplyStatus": apply_status}
+        ],
+    }
+
+
+def event(source_type, identifier, minutes, message):
+    return {
+        "SourceType": source_type,
+        "SourceIdentifier": identifier,
+        "Date": at(minutes),
+        "Message": message,
+    }
+
+
+class RecordedClient:
+    """
+    Serves instances, parameters and recorded events like the RDS API.
+    """
+
+    def __init__(self):
+        self.instances = {"qa": instance("qa"), "qa2": instance("qa2")}
+        self.parameters = {"rds.force_ssl": "1"}
+        self.events = []
+        self.calls = []
+
+    def describe_db_instances(
+        self, DBInstanceIdentifier=None, Filters=None, Marker=None
+    ):  # pylint: disable=C0103
+        if DBInstanceIdentifier is not None:
+            self.calls.append(("describe_db_instances", DBInstanceIdentifier))
+            if DBInstanceIdentifier not in self.instances:
+                raise ClientError(
+                    {"Error": {"Code": "DBInstanceNotFound", "Message": "gone"}},
+                    "DescribeDBInstances",
+                )
+            return {"DBInstances": [self.instances[DBInstanceIdentifier]]}
+        # One instance per page, so that the filtered calls are paginated.
+        values = Filters[0]["Values"]
+        self.calls.append(("describe_db_instances", tuple(values), Marker))
+        found = [name for name in values if name in self.instances]
+        index = int(Marker or 0)
+        response = {"DBInstances": [self.instances[name] for name in found[index:][:1]]}
+        if index + 1 < len(found):
+            response["Marker"] = str(index + 1)
+        return response
+
+    def describe_db_parameters(
+        self, DBParameterGroupName, Source
+    ):  # pylint: disable=C0103
+        self.calls.append(("describe_db_parameters", DBParameterGroupName, Source))
+        return {
+            "Parameters": [
+                {
+                    "ParameterName": name,
+                    "ParameterValue": value,
+                    "ApplyMethod": "immediate",
+                }
+                for name, value in self.parameters.items()
+            ]
+        }
+
+    def describe_db_proxies(self, DBProxyName):  # pylint: disable=C0103
+        self.calls.append(("describe_db_proxies", DBProxyName))
+        return {"DBProxies": [{"DBProxyName": DBProxyName, "RequireTLS": True}]}
+
+    def describe_events(self, SourceType, StartTime):  # pylint: disable=C0103
+        self.calls.append(("describe_events", SourceType))
+        return {
+            "Events": [
+                item
+                for item in self.events
+                if item["SourceType"] == SourceType and item["Date"] >= StartTime
+            ]
+        }
+
+
+class TestDriftMonitor(unittest.TestCase):
+    """
+    Test cases for the DriftMonitor class.
+    """
+
+    def setUp(self):
+        self.client = RecordedClient()
+        self.monitor = drift.DriftMonitor(self.client, ["qa", "qa2"], start=START)
+        self.monitor.baseline()
+        self.client.calls = []
+
+    def test_quiet_poll_only_reads_events(self):
+        self.assertEqual(self.monitor.poll(), [])
+        self.assertEqual(
+            self.client.calls,
+            [
+                ("describe_events", "db-instance"),
+                ("describe_events", "db-parameter-group"),
+            ],
+        )
+
+    def test_only_resources_with_events_are_described(self):
+        self.client.instances["qa2"] = instance("qa2", storage=40)
+        self.client.events.append(
+            event(
+                "db-instance",
+                "qa2",
+                1,
+                "Finished applying modification to allocated storage",
+            )
+        )
+        self.client.events.append(event("db-instance", "other", 1, "Not tracked"))
+        changes = self.monitor.poll()
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]["resource"], "qa2")
+        self.assertEqual(
+            changes[0]["changes"],
+            [{"field": "allocated_storage", "old": 20, "new": 40}],
+        )
+        self.assertIn(("describe_db_instances", "qa2"), self.client.calls)
+
+        # The same events aren't reported twice.
+        self.client.calls = []
+        self.assertEqual(self.monitor.poll(), [])
+        self.assertNotIn(("describe_db_instances", "qa2"), self.client.calls)
+
+    def test_parameter_group_event_refreshes_its_instances(self):
+        self.client.parameters["log_connections"] = "1"
+        for identifier in ("qa", "qa2"):
+            self.client.instances[identifier] = instance(
+                identifier, apply_status="pending-reboot"
+            )
+        self.client.events.append(
+            event("db-parameter-group", "qa-pg", 2, "Updated parameter log_connections")
+        )
+        changes = self.monitor.poll()
+        self.assertEqual(
+            [(change["kind"], change["resource"]) for change in changes],
+            [("parameter_group", "qa-pg"), ("instance", "qa"), ("instance", "qa2")],
+        )
+        self.assertEqual(
+            changes[0]["changes"],
+            [{"field": "log_connections", "old": None, "new": "1 (immediate)"}],
+        )
+        self.assertEqual(changes[1]["changes"][0]["field"], "parameter_groups")
+
+    def test_state_is_resumed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "drift.json")
+            monitor = drift.DriftMonitor(
+                self.client, ["qa", "qa2"], state_path=path, start=START
+            )
+            monitor.baseline()
+            self.client.events.append(event("db-instance", "qa", 3, "Rebooted"))
+            self.client.instances["qa"] = instance("qa", storage=30)
+            self.assertEqual(len(monitor.poll()), 1)
+
+            resumed = drift.DriftMonitor(self.client, ["qa", "qa2"], state_path=path)
+            self.assertEqual(resumed.instances["qa"]["allocated_storage"], 30)
+            self.assertEqual(resumed.poll(), [])
+
+    def test_calls_are_counted_per_page(self):
+        monitor = drift.DriftMonitor(self.client, ["qa", "qa2"], start=START)
+        monitor.baseline()
+        self.assertEqual(monitor.calls["describe_db_instances"], 2)
+        self.assertEqual(
+            self.client.calls[:2],
+            [
+                ("describe_db_instances", ("qa", "qa2"), None),
+                ("describe_db_instances", ("qa", "qa2"), "1"),
+            ],
+        )
+        self.assertEqual(sorted(monitor.instances), ["qa", "qa2"])
+
+    def test_missing_resources_are_described_on_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "drift.json")
+            drift.DriftMonitor(
+                self.client, ["qa"], state_path=path, start=START
+            ).baseline()
+            self.client.calls = []
+            resumed = drift.DriftMonitor(
+                self.client, ["qa", "qa2", "gone"], proxies=["qa"], state_path=path
+            )
+            resumed.run(polls=1)
+            self.assertEqual(
+                [call for call in self.client.calls if call[0] != "describe_events"],
+                [
+                    ("describe_db_instances", ("qa2", "gone"), None),
+                    ("describe_db_proxies", "qa"),
+                ],
+            )
+            self.assertEqual(resumed.instances["qa2"]["allocated_storage"], 20)
+            self.assertEqual(resumed.instances["gone"], {})
+            self.assertTrue(resumed.proxy_fields["qa"]["RequireTLS"])
+
+            # The instance that doesn't exist isn't described on every start.
+            self.client.calls = []
+            drift.DriftMonitor(
+                self.client, ["qa", "qa2", "gone"], proxies=["qa"], state_path=path
+            ).run(polls=1)
+            self.assertEqual(
+                {call[0] for call in self.client.calls}, {"describe_events"}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Fleet test cases.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import boto3
+from moto import mock_aws
+
+import fleet
+import rds
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+TAG: dict = {"Key": "dfds.test.scope", "Value": "qa"}
+
+
+@mock_aws
+class TestFleet(unittest.TestCase):
+    """
+    The selection, description and verification of many instances against a
+    moto backend.
+    """
+
+    def setUp(self):
+        self.client = boto3.client("rds", region_name="eu-central-1")
+        self.arns = {}
+        for identifier in ("qa-1", "qa-2", "qa-3", "qa-4", "other"):
+            create_instance(self.client, identifier, managed=identifier != "other")
+            self.arns[identifier] = self.client.describe_db_instances(
+                DBInstanceIdentifier=identifier
+            )["DBInstances"][0]["DBInstanceArn"]
+        for identifier in ("qa-1", "qa-2"):
+            self.client.add_tags_to_resource(
+                ResourceName=self.arns[identifier], Tags=[TAG]
+            )
+        self.fleet = fleet.Fleet(max_workers=4)
+
+    def test_identifiers_by_tag(self):
+        self.assertEqual(
+            sorted(self.fleet.get_identifiers_by_tag(TAG["Key"], TAG["Value"])),
+            [self.arns["qa-1"], self.arns["qa-2"]],
+        )
+
+    def test_identifiers_by_unused_tag(self):
+        self.assertEqual(self.fleet.get_identifiers_by_tag(TAG["Key"], "prod"), [])
+
+    def test_describe_in_batches(self):
+        identifiers = ["qa-1", self.arns["qa-2"], "qa-3", "qa-4", "other"]
+        with mock.patch.object(fleet, "DESCRIBE_BATCH_SIZE", 2), mock.patch.object(
+            rds, "describe_instances", wraps=rds.describe_instances
+        ) as describe:
+            snapshots = self.fleet.describe(identifiers)
+        self.assertEqual(
+            [call.args[1] for call in describe.call_args_list],
+            [identifiers[0:2], identifiers[2:4], identifiers[4:]],
+        )
+        self.assertEqual(sorted(snapshots), ["other", "qa-1", "qa-2", "qa-3", "qa-4"])
+
+    def test_verify(self):
+        with self.assertLogs(level="ERROR"):
+            matrix = self.fleet.verify(
+                [self.arns["qa-1"], "qa-1", "qa-2", "other", "missing"]
+            )
+        self.assertEqual(list(matrix.index), ["qa-1", "qa-2", "other", "missing"])
+        self.assertEqual(list(matrix["instance_exist"]), [True, True, True, False])
+        self.assertEqual(
+            list(matrix["secretsmanager_exist"]), [True, True, False, False]
+        )
+        self.assertFalse(matrix.loc["missing"].any())
+        self.assertIsNotNone(self.fleet.elapsed)
+
+    def test_secret_check_runs_once_per_instance(self):
+        with mock.patch.object(
+            rds.QA, "secretsmanager_exist", autospec=True, return_value=True
+        ) as exist:
+            self.fleet.verify(["qa-1", self.arns["qa-1"], "qa-2", "qa-3"])
+        self.assertEqual(
+            sorted(call.args[0].identifier for call in exist.call_args_list),
+            ["qa-1", "qa-2", "qa-3"],
+        )
+
+    def test_secret_check_failure(self):
+        with mock.patch.object(
+            rds.QA, "secretsmanager_exist", side_effect=RuntimeError("boom")
+        ), self.assertLogs(level="ERROR"):
+            matrix = self.fleet.verify(["qa-1", "qa-2"])
+        self.assertFalse(matrix["secretsmanager_exist"].any())
+        self.assertTrue(matrix["instance_exist"].all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Benchmark history test cases.
+"""
+
+import unittest
+
+import history
+
+METADATA = {"instance_class": "db.t3.micro", "storage_type": "gp3"}
+
+
+def report(p95_ms: float, tps: float) -> dict:
+    return {
+        "instance": METADATA,
+        "runs": [{"profile": "read_only", "tps": tps, "latency": {"p95_ms": p95_ms}}],
+        "clients": 8,
+    }
+
+
+class TestFlatten(unittest.TestCase):
+    """
+    The flat metric names of a report and the direction that is better.
+    """
+
+    def test_flatten(self):
+        self.assertEqual(
+            history.flatten(
+                {
+                    "runs": [{"profile": "read_only", "tps": 10}, {"tps": 5}],
+                    "ok": True,
+                    "mean_ms": float("nan"),
+                    "name": "x",
+                }
+            ),
+            {"runs.read_only.tps": 10.0, "runs.1.tps": 5.0},
+        )
+
+    def test_direction(self):
+        self.assertEqual(history.get_direction("query.latency.p95_ms"), 1)
+        self.assertEqual(history.get_direction("password.connections_per_s"), -1)
+        self.assertEqual(history.get_direction("query.latency.max_ms"), 0)
+        self.assertEqual(history.get_direction("clients"), 0)
+
+
+class TestHistory(unittest.TestCase):
+    """
+    The recorded runs and their comparison with the rolling baseline.
+    """
+
+    def setUp(self):
+        self.history = history.History(":memory:")
+
+    def tearDown(self):
+        self.history.close()
+
+    def record(self, p95_ms: float, tps: float, **metadata) -> int:
+        return self.history.record(
+            "workload",
+            report(p95_ms, tps),
+            dict(METADATA, **metadata),
+            git_revision="abc",
+        )
+
+    def regressions(self, **parameters) -> list:
+        rows = history.compare(
+            self.history.get_measurements("workload"), minimum=5, **parameters
+        )
+        return [row["metric"] for row in rows if row["regressed"]]
+
+    def test_record(self):
+        run_id = self.record(10.0, 100.0)
+        frame = self.history.get_measurements()
+        self.assertEqual(
+            sorted(frame["metric"]),
+            ["clients", "runs.read_only.latency.p95_ms", "runs.read_only.tps"],
+        )
+        self.assertEqual(set(frame["id"]), {run_id})
+        self.assertEqual(set(frame["instance_class"]), {"db.t3.micro"})
+        self.assertEqual(set(frame["git_revision"]), {"abc"})
+
+    def test_compare(self):
+        for index in range(8):
+            self.record(10.0 + index % 3 * 0.2, 100.0 - index % 2)
+        self.assertEqual(self.regressions(), [])
+        # A single slow run is noise until the next run is slow too.
+        self.record(20.0, 100.0)
+        self.assertEqual(self.regressions(), [])
+        self.assertEqual(
+            self.regressions(consecutive=1), ["runs.read_only.latency.p95_ms"]
+        )
+        self.record(20.0, 60.0)
+        self.assertEqual(self.regressions(), ["runs.read_only.latency.p95_ms"])
+
+    def test_compare_matches_settings(self):
+        for _ in range(6):
+            self.record(10.0, 100.0)
+        # Other settings have no baseline yet.
+        for _ in range(2):
+            self.record(30.0, 20.0, instance_class="db.t3.small")
+        self.assertEqual(self.regressions(), [])
+        self.assertEqual(
+            sorted(self.regressions(match=())),
+            ["runs.read_only.latency.p95_ms", "runs.read_only.tps"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
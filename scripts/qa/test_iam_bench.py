@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+IAM benchmark test cases.
+"""
+
+import unittest
+
+import psycopg2
+from psycopg2.pool import PoolError
+
+import iam_bench
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, _statement):
+        if self.conn.failing:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self, failing: bool = False):
+        self.failing = failing
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    """
+    Hands out connections up to a fixed number of slots.
+    """
+
+    def __init__(self, connections: list, slots: int = 1):
+        self.connections = connections
+        self.slots = slots
+        self.released = []
+
+    def getconn(self):
+        if self.slots == 0:
+            raise PoolError("connection pool exhausted")
+        self.slots -= 1
+        connection = self.connections.pop(0)
+        if isinstance(connection, Exception):
+            self.slots += 1
+            raise connection
+        return connection
+
+    def putconn(self, conn, close=False):
+        self.released.append((conn, close))
+        self.slots += 1
+
+
+class TestAuthBenchmark(unittest.TestCase):
+    """
+    The connections of a run are closed or returned whatever the outcome.
+    """
+
+    def test_failed_query_closes_the_connection(self):
+        connections = [FakeConnection(), FakeConnection(failing=True)]
+        report = iam_bench.AuthBenchmark(clients=1, iterations=2).run(
+            iter(connections).__next__
+        )
+        self.assertEqual(report["errors"], 1)
+        self.assertEqual(report["connect"]["count"], 2)
+        self.assertTrue(all(conn.closed for conn in connections))
+
+    def test_failed_query_returns_the_pool_slot(self):
+        failing = FakeConnection(failing=True)
+        healthy = FakeConnection()
+        pool = FakePool([failing, healthy])
+        report = iam_bench.AuthBenchmark(clients=1, iterations=2).run_pool(pool)
+        self.assertEqual(report["errors"], 1)
+        self.assertEqual(pool.released, [(failing, True), (healthy, True)])
+        self.assertEqual(pool.slots, 1)
+
+    def test_failed_connect(self):
+        pool = FakePool([psycopg2.OperationalError("PAM failure"), FakeConnection()])
+        report = iam_bench.AuthBenchmark(clients=1, iterations=2).run_pool(pool)
+        self.assertEqual(report["errors"], 1)
+        self.assertEqual(report["connect"]["count"], 1)
+        self.assertEqual(len(pool.released), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Log analyzer test cases.
+"""
+
+import os
+import tempfile
+import unittest
+
+from botocore.exceptions import ClientError
+
+import log_analyzer
+
+CLIENT = "10.0.1.5(50412)"
+SESSION = f"{CLIENT}:qa_user@qadb:[101]"
+
+# A recorded postgresql log with the RDS log_line_prefix.
+LOG = "\n".join(
+    [
+        f"2024-05-01 12:00:01 UTC:{CLIENT}:[unknown]@[unknown]:[101]:LOG:  "
+        "connection received: host=10.0.1.5 port=50412",
+        f"2024-05-01 12:00:01 UTC:{SESSION}:LOG:  "
+        "connection authorized: user=qa_user database=qadb SSL enabled",
+        f"2024-05-01 12:00:02 UTC:{SESSION}:LOG:  "
+        "duration: 120.500 ms  statement: SELECT * FROM qa_accounts",
+        "\tWHERE aid = 42",
+        f"2024-05-01 12:00:03 UTC:{SESSION}:LOG:  duration: 80.000 ms  "
+        "execute <unnamed>: SELECT * FROM qa_accounts WHERE aid = $1",
+        f"2024-05-01 12:00:04 UTC:{SESSION}:LOG:  duration: 300.000 ms  "
+        "statement: INSERT INTO qa_history VALUES (1, 2, 'x'), (3, 4, 'y')",
+        f"2024-05-01 12:00:05 UTC:{SESSION}:ERROR:  "
+        'relation "missing" does not exist at character 15',
+        f"2024-05-01 12:01:06 UTC:{SESSION}:LOG:  disconnection: session time: "
+        "0:01:05.250 user=qa_user database=qadb host=10.0.1.5 port=50412",
+    ]
+)
+
+
+def analyze(**parameters):
+    analyzer = log_analyzer.LogAnalyzer(**parameters)
+    for record in log_analyzer.read_records(LOG.splitlines()):
+        analyzer.feed(record)
+    return analyzer
+
+
+class FakeLogsClient:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def filter_log_events(self, **arguments):
+        self.calls.append(arguments)
+        token = arguments.get("nextToken", None)
+        if token == "expired":
+            raise ClientError(
+                {"Error": {"Code": "InvalidParameterException"}}, "FilterLogEvents"
+            )
+        return self.pages[token]
+
+
+def event(event_id, timestamp):
+    return {"eventId": event_id, "timestamp": timestamp, "message": "m"}
+
+
+class TestFingerprint(unittest.TestCase):
+    """
+    Test cases for the fingerprint function.
+    """
+
+    def test_literals_and_parameters_match(self):
+        self.assertEqual(
+            log_analyzer.fingerprint("SELECT * FROM t WHERE a = 42 AND b = 'x'"),
+            log_analyzer.fingerprint("select *  from t where a = $1 and b = $2;"),
+        )
+
+    def test_lists_collapse(self):
+        self.assertEqual(
+            log_analyzer.fingerprint("INSERT INTO t VALUES (1, 'a'), (2, 'b') -- x"),
+            "insert into t values (?)",
+        )
+        self.assertEqual(
+            log_analyzer.fingerprint("SELECT 1 FROM t WHERE id IN (1, 2, 3)"),
+            "select ? from t where id in (?)",
+        )
+
+
+class TestLogRecord(unittest.TestCase):
+    """
+    Test cases for the log_line_prefix and its timestamp.
+    """
+
+    def test_clients(self):
+        for client in (
+            "10.0.1.5(50412)",
+            "2001:db8::1(50412)",
+            "::1(5432)",
+            "[local]",
+            "",
+        ):
+            match = log_analyzer.LOG_RECORD.match(
+                f"2024-05-01 12:00:01 UTC:{client}:qa_user@qadb:[101]:LOG:  statement: SELECT 1"
+            )
+            self.assertIsNotNone(match, client)
+            self.assertEqual(
+                match.group("client", "user", "database", "pid"),
+                (client, "qa_user", "qadb", "101"),
+            )
+
+    def test_time_zones(self):
+        utc = log_analyzer.parse_time("2024-05-01 12:00:00 UTC")
+        self.assertEqual(utc, 1714564800)
+        self.assertEqual(log_analyzer.parse_time("2024-05-01 12:00:00 GMT"), utc)
+        self.assertEqual(log_analyzer.parse_time("2024-05-01 14:00:00 +02"), utc)
+        self.assertEqual(log_analyzer.parse_time("2024-05-01 08:30:00 -0330"), utc)
+        self.assertEqual(log_analyzer.parse_time("2024-05-01 12:00:00.250"), utc + 0.25)
+
+    def test_zone_name_is_rejected(self):
+        with self.assertRaises(ValueError):
+            log_analyzer.parse_time("2024-05-01 14:00:00 CEST")
+
+    def test_offset_record(self):
+        analyzer = log_analyzer.LogAnalyzer(window=60)
+        self.assertTrue(
+            analyzer.feed(
+                "2024-05-01 14:00:00 +02:2001:db8::1(1):[unknown]@[unknown]:[1]:LOG:  "
+                "connection received: host=2001:db8::1 port=1"
+            )
+        )
+        self.assertEqual(
+            analyzer.summarize()["windows"][0]["start"], "2024-05-01T12:00:00+00:00"
+        )
+
+
+class TestLogAnalyzer(unittest.TestCase):
+    """
+    Test cases for the LogAnalyzer class.
+    """
+
+    def test_summary(self):
+        summary = analyze().summarize()
+        self.assertEqual(summary["records"], 7)
+        self.assertEqual(summary["levels"], {"LOG": 6, "ERROR": 1})
+        self.assertEqual(summary["durations"]["count"], 3)
+        self.assertEqual(summary["connections"]["received"], 1)
+        self.assertAlmostEqual(summary["connections"]["session_time"]["max_ms"], 65250)
+        self.assertEqual(len(summary["windows"]), 2)
+        self.assertEqual(summary["windows"][0]["slow_queries"], 3)
+
+    def test_fingerprints_by_total_time(self):
+        fingerprints = analyze().summarize()["fingerprints"]
+        self.assertEqual(
+            [(item["fingerprint"], item["count"]) for item in fingerprints],
+            [
+                ("insert into qa_history values (?)", 1),
+                ("select * from qa_accounts where aid = ?", 2),
+            ],
+        )
+        self.assertAlmostEqual(fingerprints[1]["total_ms"], 200.5)
+
+    def test_fingerprint_table_is_bounded(self):
+        analyzer = analyze(max_fingerprints=1)
+        summary = analyzer.summarize()
+        self.assertEqual(len(analyzer.fingerprints), 1)
+        self.assertEqual(summary["evicted"]["fingerprints"], 1)
+        self.assertEqual(summary["fingerprints"][0]["total_ms"], 300)
+
+    def test_connection_storm(self):
+        analyzer = log_analyzer.LogAnalyzer(window=60, storm_minimum=10)
+        record = (
+            "{}:10.0.1.5(1):[unknown]@[unknown]:[1]:LOG:  connection received: host=x"
+        )
+        for minute, connections in enumerate([2, 3, 2, 40, 2]):
+            for _ in range(connections):
+                analyzer.feed(record.format(f"2024-05-01 12:{minute:02d}:00 UTC"))
+        storms = analyzer.summarize()["connections"]["storms"]
+        self.assertEqual(len(storms), 1)
+        self.assertEqual(storms[0]["connections"], 40)
+        self.assertEqual(storms[0]["start"], "2024-05-01T12:03:00+00:00")
+
+
+class TestLogCursor(unittest.TestCase):
+    """
+    Test cases for streaming events with a LogCursor.
+    """
+
+    def test_resume_skips_seen_events(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cursor.json")
+            client = FakeLogsClient(
+                {
+                    None: {"events": [event("a", 1), event("b", 2)], "nextToken": "t"},
+                    "t": {"events": [event("c", 3)]},
+                }
+            )
+            cursor = log_analyzer.LogCursor("/aws/rds/instance/qa/postgresql", 0, path)
+            ids = [
+                item["eventId"] for item in log_analyzer.stream_events(client, cursor)
+            ]
+            self.assertEqual(ids, ["a", "b", "c"])
+
+            # A later run starts at the last timestamp, which returns c again.
+            client.pages = {None: {"events": [event("c", 3), event("d", 3)]}}
+            resumed = log_analyzer.LogCursor("/aws/rds/instance/qa/postgresql", 0, path)
+            ids = [
+                item["eventId"] for item in log_analyzer.stream_events(client, resumed)
+            ]
+            self.assertEqual(ids, ["d"])
+            self.assertEqual(client.calls[-1]["startTime"], 3)
+
+    def test_expired_token_restarts_from_time(self):
+        client = FakeLogsClient({None: {"events": [event("e", 5)]}})
+        cursor = log_analyzer.LogCursor("group", 4)
+        cursor.state["next_token"] = "expired"
+        ids = [item["eventId"] for item in log_analyzer.stream_events(client, cursor)]
+        self.assertEqual(ids, ["e"])
+        self.assertEqual(cursor.state["start_time"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Log groups test cases.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import log_groups
+import retry
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+QA_GROUPS: list = [
+    "/aws/rds/instance/qa/postgresql",
+    "/aws/rds/instance/qa/upgrade",
+    "/aws/rds/proxy/qa",
+]
+
+# Groups sharing a name prefix with the QA groups, which must be left alone.
+OTHER_GROUPS: list = [
+    "/aws/rds/instance/qa2/postgresql",
+    "/aws/rds/proxy/qa2",
+]
+
+
+def client_error(code: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, "DeleteLogGroup")
+
+
+@mock_aws
+class TestLogGroupManager(unittest.TestCase):
+    """
+    The lookup, verification and deletion of the log groups against a moto
+    CloudWatch Logs backend.
+    """
+
+    def setUp(self):
+        self.client = boto3.client("logs", region_name="eu-central-1")
+        for name in QA_GROUPS + OTHER_GROUPS:
+            self.client.create_log_group(logGroupName=name)
+        self.client.put_retention_policy(
+            logGroupName="/aws/rds/instance/qa/postgresql", retentionInDays=7
+        )
+        self.manager = log_groups.LogGroupManager()
+
+    def remaining(self) -> list:
+        return sorted(
+            log_group["logGroupName"]
+            for log_group in self.client.describe_log_groups()["logGroups"]
+        )
+
+    def test_prefix_listing(self):
+        names = [
+            log_group["logGroupName"] for log_group in self.manager.get_log_groups()
+        ]
+        self.assertEqual(sorted(names), QA_GROUPS)
+
+    def test_prefix_listing_is_paginated(self):
+        for index in range(60):
+            self.client.create_log_group(
+                logGroupName=f"/aws/rds/instance/qa/log{index}"
+            )
+        self.assertEqual(len(self.manager.get_log_groups()), 63)
+
+    def test_verify(self):
+        self.assertEqual(self.manager.verify(["postgresql", "upgrade"]), [])
+
+    def test_verify_missing(self):
+        self.client.delete_log_group(logGroupName="/aws/rds/proxy/qa")
+        self.assertEqual(
+            self.manager.verify(["postgresql", "iam-db-auth-error"]),
+            [
+                "/aws/rds/instance/qa/iam-db-auth-error is missing",
+                "/aws/rds/proxy/qa is missing",
+            ],
+        )
+        self.assertEqual(self.manager.verify(["postgresql"], proxy=False), [])
+
+    def test_verify_retention(self):
+        self.assertEqual(
+            self.manager.verify(["postgresql", "upgrade"], retention_in_days=7),
+            [
+                "/aws/rds/instance/qa/upgrade retains None days, expected 7",
+                "/aws/rds/proxy/qa retains None days, expected 7",
+            ],
+        )
+
+    def test_delete(self):
+        self.assertEqual(self.manager.delete(), {name: True for name in QA_GROUPS})
+        self.assertEqual(self.remaining(), sorted(OTHER_GROUPS))
+
+    def test_delete_throttled(self):
+        delete_log_group = self.manager.client.delete_log_group
+        throttled = []
+
+        def throttle(**arguments):
+            if arguments["logGroupName"] not in throttled:
+                throttled.append(arguments["logGroupName"])
+                raise client_error("ThrottlingException")
+            return delete_log_group(**arguments)
+
+        with mock.patch.object(
+            self.manager.client, "delete_log_group", side_effect=throttle
+        ) as delete, mock.patch.object(retry.time, "sleep") as sleep:
+            self.assertTrue(all(self.manager.delete().values()))
+        self.assertEqual(delete.call_count, 2 * len(QA_GROUPS))
+        self.assertEqual(sleep.call_count, len(QA_GROUPS))
+        self.assertEqual(self.remaining(), sorted(OTHER_GROUPS))
+
+    def test_delete_already_deleted(self):
+        with mock.patch.object(
+            self.manager.client,
+            "delete_log_group",
+            side_effect=client_error("ResourceNotFoundException"),
+        ):
+            self.assertTrue(all(self.manager.delete().values()))
+
+    def test_delete_denied(self):
+        with mock.patch.object(
+            self.manager.client,
+            "delete_log_group",
+            side_effect=client_error("AccessDeniedException"),
+        ), self.assertLogs(level="ERROR"):
+            self.assertEqual(self.manager.delete(), {name: False for name in QA_GROUPS})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Monitoring test cases.
+"""
+
+import datetime
+import json
+import os
+import unittest
+
+import boto3
+from moto import mock_aws
+
+import monitoring
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+START = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+END = START + datetime.timedelta(minutes=2)
+
+
+def points(*values):
+    return [
+        {"Timestamp": START + datetime.timedelta(minutes=index), "Value": value}
+        for index, value in enumerate(values)
+    ]
+
+
+# Two pages of a recorded get_resource_metrics response.
+PI_PAGES = [
+    {
+        "MetricList": [
+            {"Key": {"Metric": "db.load.avg"}, "DataPoints": points(2.0, 4.0)},
+            {
+                "Key": {
+                    "Metric": "db.load.avg",
+                    "Dimensions": {
+                        "db.wait_event.name": "CPU",
+                        "db.wait_event.type": "CPU",
+                    },
+                },
+                "DataPoints": points(1.5, 2.5),
+            },
+        ],
+        "NextToken": "page-2",
+    },
+    {
+        "MetricList": [
+            {
+                "Key": {
+                    "Metric": "db.load.avg",
+                    "Dimensions": {"db.sql_tokenized.statement": "SELECT ?"},
+                },
+                "DataPoints": points(0.5, 1.5),
+            },
+        ],
+    },
+]
+
+
+def os_message(minute, cpu, read_iops):
+    return json.dumps(
+        {
+            "timestamp": (START + datetime.timedelta(minutes=minute)).isoformat(),
+            "cpuUtilization": {"total": cpu, "wait": 1.0},
+            "loadAverageMinute": {"one": 0.5},
+            "memory": {"free": 1024, "cached": 2048},
+            "diskIO": [
+                {"device": "rdsdev", "readIOsPS": read_iops, "writeIOsPS": 10.0},
+                {"device": "filesystem", "readIOsPS": read_iops, "writeIOsPS": 5.0},
+            ],
+            "network": [{"interface": "eth0", "rx": 100.0, "tx": 200.0}],
+        }
+    )
+
+
+class RecordingPiClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_resource_metrics(self, **arguments):
+        self.calls.append(arguments)
+        return PI_PAGES[1] if "NextToken" in arguments else PI_PAGES[0]
+
+
+class RecordingPaginator:
+    def __init__(self, pages):
+        self.pages = pages
+        self.arguments = None
+
+    def paginate(self, **arguments):
+        self.arguments = arguments
+        return iter(self.pages)
+
+
+class RecordingLogsClient:
+    def __init__(self, pages):
+        self.paginator = RecordingPaginator(pages)
+
+    def get_paginator(self, operation):
+        assert operation == "filter_log_events"
+        return self.paginator
+
+
+class TestPerformanceInsights(unittest.TestCase):
+    """
+    Test cases for the PerformanceInsightsCollector class.
+    """
+
+    def test_breakdowns_are_batched_and_paginated(self):
+        client = RecordingPiClient()
+        collector = monitoring.PerformanceInsightsCollector(client, "db-ABC")
+        frame = collector.get_db_load(START, END)
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(len(client.calls[0]["MetricQueries"]), 3)
+        self.assertEqual(client.calls[1]["NextToken"], "page-2")
+        self.assertEqual(len(frame), 6)
+
+    def test_summary_shares_of_total_load(self):
+        collector = monitoring.PerformanceInsightsCollector(
+            RecordingPiClient(), "db-ABC"
+        )
+        summary = collector.summarize(collector.get_db_load(START, END))
+        self.assertEqual(summary["total"][0]["average_load"], 3.0)
+        self.assertEqual(summary["db.wait_event"][0]["member"], "CPU")
+        self.assertAlmostEqual(summary["db.wait_event"][0]["share"], 2.0 / 3.0)
+        self.assertEqual(summary["db.sql_tokenized"][0]["max_load"], 1.5)
+
+
+class TestEnhancedMonitoring(unittest.TestCase):
+    """
+    Test cases for the EnhancedMonitoringCollector class.
+    """
+
+    def test_os_metrics_are_flattened_into_columns(self):
+        pages = [
+            {"events": [{"message": os_message(1, 30.0, 4.0)}]},
+            {"events": [{"message": os_message(0, 10.0, 2.0)}]},
+        ]
+        client = RecordingLogsClient(pages)
+        frame = monitoring.EnhancedMonitoringCollector(client, "db-ABC").get_os_metrics(
+            START, END
+        )
+        self.assertEqual(client.paginator.arguments["logStreamNames"], ["db-ABC"])
+        self.assertEqual(list(frame["cpu_total"]), [10.0, 30.0])
+        self.assertEqual(list(frame["disk_read_iops"]), [4.0, 8.0])
+        self.assertEqual(frame["disk_write_iops"].iloc[0], 15.0)
+        self.assertTrue(frame["disk_queue_length"].isna().all())
+
+    def test_summary_statistics(self):
+        pages = [
+            {"events": [{"message": os_message(minute, float(minute), 1.0)}]}
+            for minute in range(101)
+        ]
+        frame = monitoring.EnhancedMonitoringCollector(
+            RecordingLogsClient(pages), "db-ABC"
+        ).get_os_metrics(START, END)
+        summary = monitoring.summarize_frame(frame)
+        self.assertEqual(summary["cpu_total"]["mean"], 50.0)
+        self.assertEqual(summary["cpu_total"]["p95"], 95.0)
+        self.assertEqual(summary["cpu_total"]["max"], 100.0)
+
+
+@mock_aws
+class TestCollect(unittest.TestCase):
+    """
+    The collection of the metrics of an instance.
+    """
+
+    def test_missing_instance(self):
+        with self.assertRaises(ValueError):
+            monitoring.collect("missing", START, END)
+
+    def test_no_sources_enabled(self):
+        create_instance(boto3.client("rds", region_name="eu-central-1"), "qa")
+        self.assertEqual(
+            monitoring.collect("qa", START, END),
+            {"start": START.isoformat(), "end": END.isoformat()},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Parameters test cases.
+"""
+
+import os
+import unittest
+
+import boto3
+from moto import mock_aws
+
+import parameters
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+@mock_aws
+class TestInstanceMemory(unittest.TestCase):
+    """
+    The memory of provisioned and serverless instance classes.
+    """
+
+    def test_known_class(self):
+        self.assertEqual(parameters.get_instance_memory("db.t3.micro"), 1024**3)
+
+    def test_serverless(self):
+        boto3.client("rds", region_name="eu-central-1").create_db_cluster(
+            DBClusterIdentifier="qa",
+            Engine="aurora-postgresql",
+            MasterUsername="qa",
+            MasterUserPassword="password",
+            ServerlessV2ScalingConfiguration={"MinCapacity": 0.5, "MaxCapacity": 4},
+        )
+        self.assertEqual(
+            parameters.get_instance_memory("db.serverless", cluster_identifier="qa"),
+            8 * 1024**3,
+        )
+
+    def test_serverless_without_cluster(self):
+        with self.assertRaises(ValueError):
+            parameters.get_instance_memory("db.serverless")
+
+
+if __name__ == "__main__":
+    unittest.main()
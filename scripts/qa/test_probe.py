@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R1732
+"""
+Probe test cases.
+"""
+
+import datetime
+import os
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import boto3
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from moto import mock_aws
+from psycopg2.extensions import parse_dsn
+
+import probe
+import rds
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+def write_certificate(directory: str) -> tuple:
+    # A self-signed certificate for localhost, enough for sslmode=require.
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .sign(key, hashes.SHA256())
+    )
+    certfile = os.path.join(directory, "server.crt")
+    keyfile = os.path.join(directory, "server.key")
+    with open(certfile, "wb") as output:
+        output.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as output:
+        output.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    return certfile, keyfile
+
+
+class StubServer:
+    """
+    A server that answers the SSLRequest like PostgreSQL and, when it accepts
+    SSL, completes the TLS handshake.
+    """
+
+    def __init__(self, context: ssl.SSLContext = None):
+        self.context = context
+        self.requests = []
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.listener.settimeout(0.1)
+        self.port = self.listener.getsockname()[1]
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.listener.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(5)
+                request = conn.recv(8)
+                self.requests.append(request)
+                if not request:
+                    continue
+                if self.context is None:
+                    conn.sendall(b"N")
+                    continue
+                conn.sendall(b"S")
+                try:
+                    with self.context.wrap_socket(conn, server_side=True) as tls_conn:
+                        tls_conn.unwrap()
+                except OSError:
+                    # The client rejected the certificate.
+                    continue
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join(5)
+        self.listener.close()
+
+
+@mock_aws
+class TestQaParameters(unittest.TestCase):
+    """
+    The connection parameters that follow a rotation of the master user secret.
+    """
+
+    def setUp(self):
+        create_instance(
+            boto3.client("rds", region_name="eu-central-1"), "qa", managed=True
+        )
+        self.qa = rds.QA(identifier="qa")
+
+    def test_connection_factory(self):
+        parameters = probe.get_qa_parameters(self.qa)
+        self.assertEqual(parameters["connection_factory"].keywords, {"qa": self.qa})
+        self.assertEqual(parameters["host"], self.qa.get_snapshot().endpoint.address)
+
+    def test_secret_dsn(self):
+        secret = self.qa.get_connection_parameters()
+        dsn = rds.get_secret_dsn(f"host=qa user={secret['user']} password=old", self.qa)
+        self.assertEqual(parse_dsn(dsn)["password"], secret["password"])
+
+    def test_other_user(self):
+        dsn = "host=qa user=qa_iam password=token"
+        self.assertEqual(rds.get_secret_dsn(dsn, self.qa), dsn)
+
+    def test_missing_instance(self):
+        self.assertIsNone(probe.get_qa_parameters(rds.QA(identifier="missing")))
+
+
+class TestMeasureHandshake(unittest.TestCase):
+    """
+    The TCP connect and TLS handshake split against a stub server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.certfile, keyfile = write_certificate(cls.directory.name)
+        cls.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        cls.context.load_cert_chain(cls.certfile, keyfile)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def serve(self, context: ssl.SSLContext = None) -> StubServer:
+        server = StubServer(context)
+        self.addCleanup(server.close)
+        return server
+
+    def test_disable(self):
+        server = self.serve()
+        tcp, tls = probe.measure_handshake("127.0.0.1", server.port, "disable")
+        self.assertGreater(tcp, 0)
+        self.assertEqual(tls, 0)
+
+    def test_prefer_without_ssl(self):
+        server = self.serve()
+        tcp, tls = probe.measure_handshake("127.0.0.1", server.port, "prefer")
+        self.assertGreater(tcp, 0)
+        self.assertGreater(tls, 0)
+        self.assertEqual(server.requests, [probe.SSL_REQUEST])
+
+    def test_require_without_ssl(self):
+        server = self.serve()
+        with self.assertRaises(ssl.SSLError):
+            probe.measure_handshake("127.0.0.1", server.port, "require")
+
+    def test_require(self):
+        server = self.serve(self.context)
+        tcp, tls = probe.measure_handshake("127.0.0.1", server.port, "require")
+        self.assertGreater(tcp, 0)
+        self.assertGreater(tls, 0)
+
+    def test_verify_full(self):
+        server = self.serve(self.context)
+        _, tls = probe.measure_handshake(
+            "localhost", server.port, "verify-full", sslrootcert=self.certfile
+        )
+        self.assertGreater(tls, 0)
+
+    def test_verify_full_with_wrong_host(self):
+        server = self.serve(self.context)
+        with self.assertRaises(ssl.SSLCertVerificationError):
+            probe.measure_handshake(
+                "127.0.0.1", server.port, "verify-full", sslrootcert=self.certfile
+            )
+
+
+class TestLatencyProbe(unittest.TestCase):
+    """
+    The split of the connect time into TCP, TLS and authentication.
+    """
+
+    def test_measure_connect(self):
+        server = StubServer()
+        self.addCleanup(server.close)
+        parameters = {"host": "127.0.0.1", "port": server.port, "sslmode": "prefer"}
+        with mock.patch.object(probe.psycopg2, "connect") as connect:
+            report = probe.LatencyProbe(parameters).measure_connect(samples=3)
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(report["total"]["count"], 3)
+        self.assertGreater(report["tls"]["p50_ms"], 0)
+        self.assertGreaterEqual(report["auth"]["mean_ms"], 0)
+
+
+@mock_aws
+class TestMain(unittest.TestCase):
+    """
+    The exit code of the command line.
+    """
+
+    def test_missing_instance(self):
+        with mock.patch.object(sys, "argv", ["probe.py", "--identifier", "missing"]):
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(probe.main(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Proxy benchmark test cases.
+"""
+
+import datetime
+import os
+import sys
+import unittest
+from unittest import mock
+
+import boto3
+from moto import mock_aws
+
+import proxy_bench
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+class TestPinnedSessionRate(unittest.TestCase):
+    """
+    The pinned share of the client connections per period.
+    """
+
+    def test_highest_period(self):
+        self.assertEqual(
+            proxy_bench.get_pinned_session_rate(
+                {1: 5.0, 2: 40.0}, {1: 100.0, 2: 50.0, 3: 10.0}
+            ),
+            0.8,
+        )
+
+    def test_no_connections(self):
+        self.assertIsNone(proxy_bench.get_pinned_session_rate({1: 5.0}, {1: 0.0}))
+
+
+@mock_aws
+class TestProxyMetrics(unittest.TestCase):
+    """
+    The pinned session rate read from a moto CloudWatch backend.
+    """
+
+    def setUp(self):
+        self.end = datetime.datetime.now(datetime.timezone.utc).replace(
+            second=0, microsecond=0
+        ) - datetime.timedelta(minutes=5)
+        self.start = self.end - datetime.timedelta(minutes=3)
+        self.cloudwatch = boto3.client("cloudwatch", region_name="eu-central-1")
+        self.metrics = proxy_bench.ProxyMetrics("qa")
+
+    def put(self, name: str, values: list) -> None:
+        self.cloudwatch.put_metric_data(
+            Namespace="AWS/RDS",
+            MetricData=[
+                {
+                    "MetricName": name,
+                    "Dimensions": [{"Name": "ProxyName", "Value": "qa"}],
+                    "Timestamp": self.start + datetime.timedelta(minutes=minute),
+                    "Value": value,
+                }
+                for minute, value in enumerate(values)
+            ],
+        )
+
+    def test_gauges_are_averaged(self):
+        # Summing the gauges over the window would give 12 / 160.
+        self.put("DatabaseConnectionsCurrentlySessionPinned", [2.0, 10.0])
+        self.put("ClientConnections", [100.0, 20.0, 40.0])
+        self.assertEqual(
+            self.metrics.wait_for_pinned_session_rate(
+                self.start, self.end, timeout=0.0
+            ),
+            0.5,
+        )
+
+    def test_not_published(self):
+        self.assertIsNone(
+            self.metrics.wait_for_pinned_session_rate(self.start, self.end, timeout=0.0)
+        )
+
+
+@mock_aws
+class TestMain(unittest.TestCase):
+    """
+    The exit code of the command line.
+    """
+
+    def test_missing_instance(self):
+        argv = ["proxy_bench.py", "--identifier", "missing"]
+        with mock.patch.object(sys, "argv", argv), mock.patch.object(
+            proxy_bench, "ProxyBenchmark"
+        ) as benchmark:
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(proxy_bench.main(), 1)
+        benchmark.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
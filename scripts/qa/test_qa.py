@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+QA test cases against a moto backend.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import boto3
+import psycopg2
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import rds
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+AUTHENTICATION_FAILURE = psycopg2.OperationalError(
+    'FATAL:  password authentication failed for user "qa"'
+)
+
+
+def client_error(code: str) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}}, "DescribeDBInstances"
+    )
+
+
+class FakeClock:
+    """
+    A monotonic clock that only moves when the code under test sleeps.
+    """
+
+    def __init__(self, on_sleep=None):
+        self.now = 1000.0
+        self.sleeps = []
+        self.on_sleep = on_sleep
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+        if self.on_sleep is not None:
+            self.on_sleep(len(self.sleeps))
+
+
+@mock_aws
+class TestInstanceCache(unittest.TestCase):
+    """
+    The cached instance description, its TTL and refresh().
+    """
+
+    def setUp(self):
+        self.client = boto3.client("rds", region_name="eu-central-1")
+        create_instance(self.client, "qa")
+
+    def count_describes(self):
+        return mock.patch.object(
+            rds, "describe_instances", wraps=rds.describe_instances
+        )
+
+    def test_cached_without_ttl(self):
+        qa = rds.QA(identifier="qa")
+        with self.count_describes() as describe:
+            qa.get_snapshot()
+            qa.get_snapshot()
+        self.assertEqual(describe.call_count, 1)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        with mock.patch.object(rds.time, "monotonic", clock.monotonic):
+            qa = rds.QA(identifier="qa", cache_ttl=60)
+            with self.count_describes() as describe:
+                qa.get_snapshot()
+                clock.now += 30
+                qa.get_snapshot()
+                self.assertEqual(describe.call_count, 1)
+                clock.now += 31
+                qa.get_snapshot()
+                self.assertEqual(describe.call_count, 2)
+
+    def test_refresh(self):
+        qa = rds.QA(identifier="qa")
+        self.assertEqual(qa.get_backup_retention_period(), 1)
+        self.client.modify_db_instance(
+            DBInstanceIdentifier="qa", BackupRetentionPeriod=7, ApplyImmediately=True
+        )
+        self.assertEqual(qa.get_backup_retention_period(), 1)
+        self.assertTrue(qa.refresh())
+        self.assertEqual(qa.get_backup_retention_period(), 7)
+        self.client.delete_db_instance(
+            DBInstanceIdentifier="qa", SkipFinalSnapshot=True
+        )
+        self.assertFalse(qa.refresh())
+        self.assertIsNone(qa.get_snapshot())
+
+    def test_rejected_lookup_scans(self):
+        with mock.patch.object(
+            rds,
+            "describe_instances",
+            side_effect=client_error("InvalidParameterCombination"),
+        ):
+            self.assertEqual(rds.QA(identifier="qa").get_snapshot().identifier, "qa")
+
+    def test_throttling_is_raised(self):
+        with mock.patch.object(
+            rds, "describe_instances", side_effect=client_error("Throttling")
+        ), mock.patch.object(rds, "scan_instances") as scan:
+            with self.assertRaises(ClientError):
+                rds.QA(identifier="qa").get_snapshot()
+        scan.assert_not_called()
+
+
+@mock_aws
+class TestWaitUntil(unittest.TestCase):
+    """
+    The polling of the instance status with exponential backoff.
+    """
+
+    def setUp(self):
+        self.client = boto3.client("rds", region_name="eu-central-1")
+        create_instance(self.client, "qa")
+
+    def wait_until(self, clock: FakeClock, **kwargs) -> bool:
+        with mock.patch.object(
+            rds.time, "monotonic", clock.monotonic
+        ), mock.patch.object(rds.time, "sleep", clock.sleep):
+            return rds.QA(identifier="qa").wait_until(**kwargs)
+
+    def test_reached(self):
+        def stop(sleeps: int) -> None:
+            if sleeps == 2:
+                self.client.stop_db_instance(DBInstanceIdentifier="qa")
+
+        clock = FakeClock(on_sleep=stop)
+        self.assertTrue(self.wait_until(clock, status="stopped", base_delay=4))
+        self.assertEqual(len(clock.sleeps), 2)
+
+    def test_backoff_until_timeout(self):
+        clock = FakeClock()
+        self.assertFalse(
+            self.wait_until(
+                clock, status="stopped", timeout=100, base_delay=4, max_delay=16
+            )
+        )
+        windows = [4, 8, 16, 16, 16, 16, 16, 16]
+        for delay, window in zip(clock.sleeps[:-1], windows):
+            self.assertGreaterEqual(delay, window / 2)
+            self.assertLessEqual(delay, window)
+        # The last sleep is cut short at the deadline.
+        self.assertAlmostEqual(sum(clock.sleeps), 100)
+
+
+@mock_aws
+class TestConnectToDatabase(unittest.TestCase):
+    """
+    The connection check when the secret is rotated or the query fails.
+    """
+
+    def setUp(self):
+        create_instance(
+            boto3.client("rds", region_name="eu-central-1"), "qa", managed=True
+        )
+        self.qa = rds.QA(identifier="qa")
+
+    def test_secret_gone_after_rejected_login(self):
+        parameters = self.qa.get_connection_parameters()
+        with mock.patch.object(
+            rds.QA, "get_connection_parameters", side_effect=[parameters, None]
+        ), mock.patch.object(
+            rds.psycopg2, "connect", side_effect=AUTHENTICATION_FAILURE
+        ) as connect:
+            self.assertFalse(self.qa.connect_to_database())
+        self.assertEqual(connect.call_count, 1)
+
+    def test_connection_is_closed_on_failure(self):
+        conn = mock.MagicMock()
+        conn.cursor.side_effect = psycopg2.InterfaceError("connection already closed")
+        with mock.patch.object(rds.psycopg2, "connect", return_value=conn):
+            with self.assertRaises(psycopg2.InterfaceError):
+                self.qa.connect_to_database()
+        conn.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Replica lag test cases.
+"""
+
+import unittest
+
+from replica_lag import HeartbeatLog
+
+
+class TestHeartbeatLog(unittest.TestCase):
+    """
+    The lag of a replica from the commit times of the heartbeats.
+    """
+
+    def setUp(self):
+        self.log = HeartbeatLog(history=3)
+        for sequence in range(1, 6):
+            self.log.record(sequence, 100.0 + sequence)
+
+    def test_lag_of_the_next_heartbeat(self):
+        # Shows 4, so heartbeat 5 committed at 105 is the oldest one missing.
+        self.assertEqual(self.log.get_lag(4, 105.5), 0.5)
+        self.assertEqual(self.log.get_lag(3, 106.0), 2.0)
+
+    def test_caught_up(self):
+        self.assertEqual(self.log.get_lag(5, 110.0), 0.0)
+
+    def test_older_than_the_history(self):
+        # Only 3, 4 and 5 are kept, heartbeat 2 is at least as old as 3.
+        self.assertEqual(self.log.get_lag(1, 110.0), 7.0)
+
+    def test_unknown(self):
+        self.assertIsNone(HeartbeatLog().get_lag(1, 110.0))
+
+    def test_failed_writer(self):
+        self.log.fail(RuntimeError("connection lost"))
+        self.assertIsNone(self.log.get_lag(5, 110.0))
+        self.assertIsNone(self.log.get_lag(4, 110.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
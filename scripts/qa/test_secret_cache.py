@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Secret cache test cases.
+"""
+
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import secret_cache
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_secret_value(self, SecretId, VersionStage):  # pylint: disable=C0103
+        self.calls.append((SecretId, VersionStage))
+        return {"SecretString": json.dumps({"username": SecretId, "password": "x"})}
+
+
+class TestSecretCache(unittest.TestCase):
+    """
+    Test cases for the SecretCache class.
+    """
+
+    def test_one_fetch_per_secret_under_concurrency(self):
+        cache = secret_cache.SecretCache()
+        client = RecordingClient()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            secrets = list(executor.map(lambda _: cache.get(client, "arn"), range(64)))
+        self.assertEqual(len(client.calls), 1)
+        self.assertTrue(all(secret["username"] == "arn" for secret in secrets))
+
+    def test_expired_entries_are_fetched_again(self):
+        cache = secret_cache.SecretCache(ttl=0)
+        client = RecordingClient()
+        cache.get(client, "arn")
+        cache.get(client, "arn")
+        self.assertEqual(len(client.calls), 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = secret_cache.SecretCache(max_entries=2)
+        client = RecordingClient()
+        for secret_id in ("a", "b", "a", "c", "a", "b"):
+            cache.get(client, secret_id)
+        self.assertListEqual([call[0] for call in client.calls], ["a", "b", "c", "b"])
+
+    def test_invalidate_drops_every_version_stage(self):
+        cache = secret_cache.SecretCache()
+        client = RecordingClient()
+        cache.get(client, "arn")
+        cache.get(client, "arn", version_stage="AWSPENDING")
+        cache.invalidate("arn")
+        self.assertEqual(cache.key_locks, {})
+        cache.get(client, "arn")
+        self.assertEqual(len(client.calls), 3)
+
+    def test_is_authentication_failure(self):
+        self.assertTrue(
+            secret_cache.is_authentication_failure(
+                Exception('FATAL:  password authentication failed for user "qa_user"')
+            )
+        )
+        self.assertFalse(
+            secret_cache.is_authentication_failure(Exception("timeout expired"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Security groups test cases.
+"""
+
+import socket
+import threading
+import unittest
+
+import security_groups
+
+
+def rule(rule_id, cidr, from_port=5432, to_port=5432, protocol="tcp"):
+    return {
+        "SecurityGroupRuleId": rule_id,
+        "IsEgress": False,
+        "IpProtocol": protocol,
+        "FromPort": from_port,
+        "ToPort": to_port,
+        "CidrIpv4": cidr,
+    }
+
+
+class LocalListener:
+    """
+    A local stand-in for PostgreSQL that declines the SSLRequest.
+    """
+
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(8)
+                conn.sendall(b"N")
+
+    def close(self):
+        self.server.close()
+
+
+class TestVerifyRules(unittest.TestCase):
+    """
+    Test cases for the security group rule verification.
+    """
+
+    def test_expected_cidrs_follow_the_module(self):
+        expected = security_groups.get_expected_cidrs(
+            "10.0.0.0/16", ["1.2.3.4/32", None], publicly_accessible=False
+        )
+        self.assertEqual(expected, {"10.0.0.0/16"})
+        expected = security_groups.get_expected_cidrs(
+            "10.0.0.0/16", ["1.2.3.4"], publicly_accessible=True
+        )
+        self.assertEqual(expected, {"10.0.0.0/16", "1.2.3.4/32"})
+
+    def test_expected_cidrs_include_additional_rules(self):
+        additional_rules = [
+            {
+                "from_port": 5432,
+                "to_port": 5432,
+                "protocol": "tcp",
+                "cidr_blocks": "172.16.0.0/24, 172.16.1.0/24",
+            },
+            {
+                "from_port": 0,
+                "to_port": 0,
+                "protocol": "-1",
+                "cidr_blocks": "10.1.0.0/16",
+            },
+            {
+                "from_port": 443,
+                "to_port": 443,
+                "protocol": "tcp",
+                "cidr_blocks": "10.2.0.0/16",
+            },
+        ]
+        expected = security_groups.get_expected_cidrs(
+            "10.0.0.0/16", additional_rules=additional_rules, port=5432
+        )
+        self.assertEqual(
+            expected,
+            {"10.0.0.0/16", "172.16.0.0/24", "172.16.1.0/24", "10.1.0.0/16"},
+        )
+        rules = [
+            rule("sgr-1", "10.0.0.0/16"),
+            rule("sgr-2", "172.16.0.0/24"),
+            rule("sgr-3", "172.16.1.0/24"),
+            rule("sgr-4", "10.1.0.0/16", -1, -1, "-1"),
+        ]
+        # Only the all traffic rule is reported, as wider than the port.
+        problems = security_groups.verify_rules(rules, 5432, expected)
+        self.assertEqual(len(problems), 1)
+        self.assertIn("sgr-4", problems[0])
+
+    def test_matching_rules_have_no_problems(self):
+        rules = [rule("sgr-1", "10.0.0.0/16"), rule("sgr-2", "1.2.3.4/32")]
+        problems = security_groups.verify_rules(
+            rules, 5432, {"10.0.0.0/16", "1.2.3.4/32"}
+        )
+        self.assertEqual(problems, [])
+
+    def test_drift_is_reported(self):
+        rules = [
+            rule("sgr-1", "10.0.0.0/16"),
+            rule("sgr-2", "0.0.0.0/0", 0, 65535),
+            rule("sgr-3", "5.6.7.8/32", 22, 22),
+        ]
+        problems = security_groups.verify_rules(
+            rules, 5432, {"10.0.0.0/16", "1.2.3.4/32"}
+        )
+        self.assertEqual(len(problems), 3)
+        self.assertIn("sgr-2", problems[0])
+        self.assertIn("0.0.0.0/0, which isn't whitelisted", problems[1])
+        self.assertIn("isn't open to whitelisted 1.2.3.4/32", problems[2])
+
+
+class TestReachabilityProbe(unittest.TestCase):
+    """
+    Test cases for the ReachabilityProbe class.
+    """
+
+    def test_local_listener_is_reachable(self):
+        listener = LocalListener()
+        try:
+            matrix = security_groups.ReachabilityProbe(
+                {"local": ("127.0.0.1", listener.port)},
+                {"loopback": "127.0.0.1"},
+                samples=3,
+                sslmode="prefer",
+            ).run()
+        finally:
+            listener.close()
+        self.assertEqual(len(matrix), 1)
+        self.assertTrue(matrix[0]["reachable"])
+        self.assertEqual(matrix[0]["tcp"]["count"], 3)
+
+    def test_closed_port_is_refused(self):
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+        matrix = security_groups.ReachabilityProbe(
+            {"closed": ("127.0.0.1", port)}, samples=2, sslmode="prefer"
+        ).run()
+        self.assertFalse(matrix[0]["reachable"])
+        self.assertEqual(matrix[0]["failures"], {"refused": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
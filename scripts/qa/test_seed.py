@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Seed test cases.
+"""
+
+import io
+import os
+import unittest
+from unittest import mock
+
+import boto3
+from moto import mock_aws
+
+import rds
+import seed
+from test_describe_instances import create_instance
+from test_qa import FakeClock
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+class TestEncoding(unittest.TestCase):
+    """
+    The COPY text format of the generated rows.
+    """
+
+    def test_null(self):
+        self.assertEqual(seed.encode_value(None), "\\N")
+
+    def test_escapes(self):
+        self.assertEqual(seed.encode_value("a\\b\tc\nd\re"), "a\\\\b\\tc\\nd\\re")
+
+    def test_numbers(self):
+        self.assertEqual(seed.encode_value(42), "42")
+        self.assertEqual(seed.encode_value(1.5), "1.5")
+
+    def test_rows(self):
+        self.assertEqual(
+            list(seed.encode_rows([(1, "a b", None), (2, "tab\there", "x")])),
+            ["1\ta b\t\\N\n", "2\ttab\\there\tx\n"],
+        )
+
+    def test_generated_rows_are_reproducible(self):
+        first = seed.generate_rows(start=10, seed=7)
+        second = seed.generate_rows(start=10, seed=7)
+        rows = [next(first) for _ in range(3)]
+        self.assertEqual(rows, [next(second) for _ in range(3)])
+        self.assertEqual([row[0] for row in rows], [10, 11, 12])
+        self.assertIn(rows[0][3], seed.STATUSES)
+
+
+class TestChunkLines(unittest.TestCase):
+    """
+    The joining of COPY lines into chunks up to a total size.
+    """
+
+    def test_chunk_size(self):
+        chunks = list(seed.chunk_lines(["abcd\n"] * 10, 1000, chunk_bytes=10))
+        self.assertEqual(chunks, [b"abcd\nabcd\n"] * 5)
+
+    def test_limit(self):
+        chunks = list(seed.chunk_lines(iter(["abcd\n"] * 100), 12, chunk_bytes=10))
+        # The limit is checked per line, so the last chunk ends on a full line.
+        self.assertEqual(chunks, [b"abcd\nabcd\n", b"abcd\n"])
+
+    def test_endless_lines(self):
+        lines = seed.encode_rows(seed.generate_rows())
+        chunks = list(seed.chunk_lines(lines, 64 * 1024, chunk_bytes=4096))
+        total = sum(map(len, chunks))
+        self.assertGreaterEqual(total, 64 * 1024)
+        self.assertLess(total, 64 * 1024 + 4096)
+        self.assertTrue(all(chunk.endswith(b"\n") for chunk in chunks))
+
+    def test_end_of_lines(self):
+        chunks = seed.chunk_lines(["abcd\n"] * 3, 1000, chunk_bytes=8)
+        self.assertEqual(list(chunks), [b"abcd\nabcd\n", b"abcd\n"])
+
+
+class TestIteratorReader(unittest.TestCase):
+    """
+    The file object COPY FROM STDIN reads the chunks through.
+    """
+
+    def test_read_across_chunks(self):
+        reader = seed.IteratorReader([b"abc", b"", b"defg"])
+        self.assertEqual(reader.read(2), b"ab")
+        self.assertEqual(reader.read(2), b"c")
+        self.assertEqual(reader.read(), b"defg")
+        self.assertEqual(reader.read(), b"")
+        self.assertEqual(reader.bytes_read, 7)
+
+    def test_buffered(self):
+        chunks = [bytes([65 + i]) * 1000 for i in range(5)]
+        reader = seed.IteratorReader(iter(chunks))
+        self.assertEqual(io.BufferedReader(reader, 256).read(), b"".join(chunks))
+        self.assertEqual(reader.bytes_read, 5000)
+
+
+@mock_aws
+class TestRestore(unittest.TestCase):
+    """
+    The restore of a snapshot into a new instance.
+    """
+
+    def setUp(self):
+        client = boto3.client("rds", region_name="eu-central-1")
+        create_instance(client, "qa", managed=True)
+        client.create_db_snapshot(
+            DBSnapshotIdentifier="final-qa", DBInstanceIdentifier="qa"
+        )
+        self.timer = seed.SnapshotTimer(identifier="qa", timeout=100)
+
+    def test_secret_not_published(self):
+        clock = FakeClock()
+        with mock.patch.object(
+            seed.time, "monotonic", clock.monotonic
+        ), mock.patch.object(seed.time, "sleep", clock.sleep), mock.patch.object(
+            rds.QA, "get_connection_parameters", return_value=None
+        ), mock.patch.object(
+            seed.psycopg2, "connect"
+        ) as connect:
+            with self.assertLogs(level="ERROR"):
+                result = self.timer.restore("final-qa", "qa-restore")
+        self.assertTrue(result["available"])
+        self.assertNotIn("connect_s", result)
+        connect.assert_not_called()
+        self.assertAlmostEqual(sum(clock.sleeps), 100)
+        self.assertEqual(self.timer.instances, ["qa-restore"])
+
+    def test_secret_published_late(self):
+        parameters = {"host": "qa-restore", "port": 5432}
+        with mock.patch.object(seed.time, "sleep"), mock.patch.object(
+            rds.QA, "get_connection_parameters", side_effect=[None, None, parameters]
+        ), mock.patch.object(seed.psycopg2, "connect") as connect:
+            result = self.timer.restore("final-qa", "qa-restore")
+        connect.assert_called_once_with(**parameters)
+        self.assertIn("connect_s", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Snapshot test cases.
+"""
+
+import json
+import unittest
+
+from snapshot import (
+    ClusterMemberRecord,
+    ClusterSnapshot,
+    EndpointRecord,
+    InstanceSnapshot,
+    ParameterGroupRecord,
+    SubnetRecord,
+)
+
+INSTANCE: dict = {
+    "DBInstanceIdentifier": "qa",
+    "DBInstanceStatus": "available",
+    "Engine": "postgres",
+    "DBInstanceClass": "db.t3.micro",
+    "AllocatedStorage": 20,
+    "StorageType": "gp3",
+    "MultiAZ": True,
+    "MasterUserSecret": {"SecretArn": "arn:aws:secretsmanager:eu-central-1:1:qa"},
+    "EnabledCloudwatchLogsExports": ["postgresql", "upgrade"],
+    "VpcSecurityGroups": [{"VpcSecurityGroupId": "sg-1"}],
+    "Endpoint": {"Address": "qa.rds.amazonaws.com", "Port": 5432},
+    "DBSubnetGroup": {
+        "DBSubnetGroupName": "qa",
+        "VpcId": "vpc-1",
+        "Subnets": [
+            {
+                "SubnetIdentifier": "subnet-a",
+                "SubnetAvailabilityZone": {"Name": "eu-central-1a"},
+                "SubnetStatus": "Active",
+            },
+            {
+                "SubnetIdentifier": "subnet-b",
+                "SubnetAvailabilityZone": {"Name": "eu-central-1b"},
+                "SubnetStatus": "Active",
+            },
+        ],
+    },
+    "DBParameterGroups": [
+        {"DBParameterGroupName": "qa", "ParameterApplyStatus": "in-sync"}
+    ],
+}
+
+CLUSTER: dict = {
+    "DBClusterIdentifier": "qa",
+    "Status": "available",
+    "Engine": "aurora-postgresql",
+    "Port": 5432,
+    "ServerlessV2ScalingConfiguration": {"MinCapacity": 0.5, "MaxCapacity": 4.0},
+    "DBClusterMembers": [
+        {"DBInstanceIdentifier": "qa-1", "IsClusterWriter": True, "PromotionTier": 1},
+        {"DBInstanceIdentifier": "qa-2", "IsClusterWriter": False},
+    ],
+}
+
+
+def round_trip(record):
+    # Through JSON, as the compact form is meant to be stored.
+    return type(record).from_compact(json.loads(json.dumps(record.to_compact())))
+
+
+class TestInstanceSnapshot(unittest.TestCase):
+    """
+    The compact and flat forms of an instance description.
+    """
+
+    def setUp(self):
+        self.snapshot = InstanceSnapshot.from_description(INSTANCE)
+
+    def test_round_trip(self):
+        restored = round_trip(self.snapshot)
+        self.assertEqual(restored, self.snapshot)
+        self.assertEqual(
+            restored.endpoint, EndpointRecord(address="qa.rds.amazonaws.com", port=5432)
+        )
+        self.assertIsInstance(restored.subnet_group.subnets, tuple)
+        self.assertEqual(
+            restored.subnet_group.subnets[1],
+            SubnetRecord(
+                identifier="subnet-b",
+                availability_zone="eu-central-1b",
+                status="Active",
+            ),
+        )
+        self.assertEqual(
+            restored.parameter_groups,
+            (ParameterGroupRecord(name="qa", apply_status="in-sync"),),
+        )
+        self.assertEqual(restored.cloudwatch_logs_exports, ("postgresql", "upgrade"))
+        self.assertEqual(restored.vpc_security_group_ids, ("sg-1",))
+
+    def test_round_trip_without_nested_records(self):
+        snapshot = InstanceSnapshot.from_description({"DBInstanceIdentifier": "qa"})
+        restored = round_trip(snapshot)
+        self.assertEqual(restored, snapshot)
+        self.assertIsNone(restored.endpoint)
+        self.assertEqual(restored.parameter_groups, ())
+
+    def test_to_dict(self):
+        flat = self.snapshot.to_dict()
+        self.assertEqual(flat["endpoint.address"], "qa.rds.amazonaws.com")
+        self.assertEqual(flat["subnet_group.vpc_id"], "vpc-1")
+        self.assertEqual(
+            flat["subnet_group.subnets"],
+            [
+                ["subnet-a", "eu-central-1a", "Active"],
+                ["subnet-b", "eu-central-1b", "Active"],
+            ],
+        )
+        self.assertEqual(flat["parameter_groups"], [["qa", "in-sync"]])
+        self.assertEqual(flat["cloudwatch_logs_exports"], ["postgresql", "upgrade"])
+        self.assertEqual(
+            flat["master_user_secret_arn"], "arn:aws:secretsmanager:eu-central-1:1:qa"
+        )
+        self.assertNotIn("endpoint", flat)
+
+
+class TestClusterSnapshot(unittest.TestCase):
+    """
+    The compact and flat forms of a cluster description.
+    """
+
+    def setUp(self):
+        self.snapshot = ClusterSnapshot.from_description(CLUSTER)
+
+    def test_round_trip(self):
+        restored = round_trip(self.snapshot)
+        self.assertEqual(restored, self.snapshot)
+        self.assertEqual(
+            restored.members[0],
+            ClusterMemberRecord(identifier="qa-1", is_writer=True, promotion_tier=1),
+        )
+        self.assertEqual(restored.serverless_max_capacity, 4.0)
+
+    def test_to_dict(self):
+        flat = self.snapshot.to_dict()
+        self.assertEqual(flat["members"], [["qa-1", True, 1], ["qa-2", False, None]])
+        self.assertEqual(flat["serverless_min_capacity"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
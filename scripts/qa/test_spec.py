@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# pylint: disable=C0116
+"""
+Expectation spec test cases.
+"""
+
+import unittest
+
+import spec
+from snapshot import InstanceSnapshot
+
+
+def make_snapshot(identifier: str, **overrides) -> InstanceSnapshot:
+    description: dict = {
+        "DBInstanceIdentifier": identifier,
+        "DBInstanceStatus": "available",
+        "AllocatedStorage": 20,
+        "StorageType": "gp3",
+        "EnabledCloudwatchLogsExports": ["upgrade", "postgresql"],
+        "DBSubnetGroup": {"Subnets": [{"SubnetStatus": "Active"}]},
+    }
+    description.update(overrides)
+    return InstanceSnapshot.from_description(description)
+
+
+class TestCheckPlan(unittest.TestCase):
+    """
+    Test cases for the CheckPlan class.
+    """
+
+    def setUp(self):
+        self.plan = spec.CheckPlan.compile(
+            {
+                "status": "available",
+                "allocated_storage": {"min": 20},
+                "storage_type": {"in": ["gp3", "io1"]},
+                "cloudwatch_logs_exports": ["postgresql", "upgrade"],
+                "subnets_active": True,
+            }
+        )
+
+    def test_all_expectations_pass(self):
+        matrix = self.plan.evaluate([make_snapshot("qa")])
+        self.assertTrue(matrix.to_numpy().all())
+
+    def test_mismatches_are_reported_per_instance(self):
+        snapshots = [
+            make_snapshot("qa"),
+            make_snapshot("qa-2", AllocatedStorage=10, StorageType="gp2"),
+            make_snapshot(
+                "qa-3", DBSubnetGroup={"Subnets": [{"SubnetStatus": "Gone"}]}
+            ),
+        ]
+        mismatches = self.plan.mismatches(snapshots)
+        self.assertListEqual(
+            [(m["instance"], m["field"]) for m in mismatches],
+            [
+                ("qa-2", "allocated_storage"),
+                ("qa-2", "storage_type"),
+                ("qa-3", "subnets_active"),
+            ],
+        )
+
+    def test_duplicate_identifiers(self):
+        snapshots = [make_snapshot("qa"), make_snapshot("qa", AllocatedStorage=10)]
+        mismatches = self.plan.mismatches(snapshots)
+        self.assertListEqual(
+            [(m["instance"], m["field"], m["actual"]) for m in mismatches],
+            [("qa", "allocated_storage", 10)],
+        )
+
+    def test_missing_value_fails_min(self):
+        snapshot = make_snapshot("qa")
+        snapshot.allocated_storage = None
+        self.assertFalse(self.plan.evaluate([snapshot]).at["qa", "allocated_storage"])
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            spec.CheckPlan.compile({"no_such_field": 1})
+
+    def test_unknown_operator_is_rejected(self):
+        with self.assertRaises(ValueError):
+            spec.CheckPlan.compile({"allocated_storage": {"between": [1, 2]}})
+
+    def test_default_expectations_compile(self):
+        plan = spec.CheckPlan.load()
+        self.assertIn("status", plan.fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
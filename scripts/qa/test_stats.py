@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Statistics test cases.
+"""
+
+import unittest
+
+from stats import holm, mann_whitney
+
+
+class TestStats(unittest.TestCase):
+    """
+    The Mann-Whitney test and the Holm correction.
+    """
+
+    def test_mann_whitney(self):
+        result = mann_whitney([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+        self.assertEqual(result["u"], 0)
+        self.assertEqual(result["effect"], 0)
+        self.assertAlmostEqual(result["p_value"], 0.01219, places=4)
+        self.assertEqual(mann_whitney([1, 1, 1], [1, 1, 1])["p_value"], 1.0)
+        self.assertIsNone(mann_whitney([], [1])["p_value"])
+
+    def test_holm(self):
+        adjusted = holm([0.01, None, 0.04, 0.03])
+        self.assertEqual(adjusted[1], None)
+        self.assertAlmostEqual(adjusted[0], 0.03)
+        self.assertAlmostEqual(adjusted[2], 0.06)
+        self.assertAlmostEqual(adjusted[3], 0.06)
+
+
+if __name__ == "__main__":
+    unittest.main()
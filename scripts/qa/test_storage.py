@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116
+"""
+Storage test cases.
+"""
+
+import datetime
+import os
+import unittest
+
+import boto3
+from moto import mock_aws
+
+import storage
+from snapshot import InstanceSnapshot
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+def provisioned(storage_type: str, allocated_storage: int, **description) -> dict:
+    return storage.get_provisioned_storage(
+        InstanceSnapshot.from_description(
+            dict(
+                description,
+                DBInstanceIdentifier="qa",
+                StorageType=storage_type,
+                AllocatedStorage=allocated_storage,
+            )
+        )
+    )
+
+
+class TestProvisionedStorage(unittest.TestCase):
+    """
+    The provisioned IOPS and throughput per storage type.
+    """
+
+    def test_unknown_instance(self):
+        self.assertIsNone(storage.get_provisioned_storage(None))
+
+    def test_gp3_baseline(self):
+        self.assertEqual(
+            provisioned("gp3", 20),
+            {
+                "storage_type": "gp3",
+                "allocated_storage": 20,
+                "iops": 3000,
+                "throughput_mb_s": 125,
+            },
+        )
+
+    def test_gp3_baseline_from_400_gib(self):
+        self.assertEqual(provisioned("gp3", 399)["iops"], 3000)
+        result = provisioned("gp3", 400)
+        self.assertEqual((result["iops"], result["throughput_mb_s"]), (12000, 500))
+
+    def test_gp3_provisioned(self):
+        result = provisioned("gp3", 500, Iops=16000, StorageThroughput=1000)
+        self.assertEqual((result["iops"], result["throughput_mb_s"]), (16000, 1000))
+
+    def test_gp3_provisioned_iops_only(self):
+        result = provisioned("gp3", 500, Iops=16000)
+        self.assertEqual((result["iops"], result["throughput_mb_s"]), (16000, 500))
+
+    def test_gp2_burst_baseline(self):
+        # 3 IOPS per GiB, at least 100 and at most 16000.
+        self.assertEqual(provisioned("gp2", 20)["iops"], 100)
+        self.assertEqual(provisioned("gp2", 1000)["iops"], 3000)
+        self.assertEqual(provisioned("gp2", 6000)["iops"], 16000)
+        self.assertIsNone(provisioned("gp2", 1000)["throughput_mb_s"])
+
+    def test_io1(self):
+        result = provisioned("io1", 100, Iops=5000)
+        self.assertEqual((result["iops"], result["throughput_mb_s"]), (5000, None))
+
+
+class TestCopyBlock(unittest.TestCase):
+    """
+    The rows sent per COPY call during the bulk load.
+    """
+
+    def test_whole_rows(self):
+        row = storage.ROW_PAYLOAD + 1
+        block = storage.make_copy_block(storage.COPY_BLOCK_BYTES)
+        self.assertEqual(len(block), storage.COPY_BLOCK_BYTES // row * row)
+        self.assertEqual(block.count(b"\n"), storage.COPY_BLOCK_BYTES // row)
+
+    def test_at_least_one_row(self):
+        self.assertEqual(len(storage.make_copy_block(10)), storage.ROW_PAYLOAD + 1)
+
+
+@mock_aws
+class TestStorageMetrics(unittest.TestCase):
+    """
+    The peak storage metrics read from a moto CloudWatch backend.
+    """
+
+    def setUp(self):
+        self.end = datetime.datetime.now(datetime.timezone.utc).replace(
+            second=0, microsecond=0
+        )
+        self.start = self.end - datetime.timedelta(minutes=5)
+        self.cloudwatch = boto3.client("cloudwatch", region_name="eu-central-1")
+
+    def put(self, name: str, values: list) -> None:
+        self.cloudwatch.put_metric_data(
+            Namespace="AWS/RDS",
+            MetricData=[
+                {
+                    "MetricName": name,
+                    "Dimensions": [{"Name": "DBInstanceIdentifier", "Value": "qa"}],
+                    "Timestamp": self.start + datetime.timedelta(minutes=minute),
+                    "Value": value,
+                }
+                for minute, value in enumerate(values)
+            ],
+        )
+
+    def test_peaks(self):
+        self.put("ReadIOPS", [100.0, 300.0, 200.0])
+        self.put("ReadThroughput", [2.0 * storage.MIB, 4.0 * storage.MIB])
+        self.assertEqual(
+            storage.get_storage_metrics("qa", self.start, self.end),
+            {
+                "read_iops": 300.0,
+                "write_iops": None,
+                "read_throughput": 4.0,
+                "write_throughput": None,
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
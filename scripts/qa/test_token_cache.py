@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Token cache test cases.
+"""
+
+import socket
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+import token_cache
+
+
+class RecordingClient:
+    def __init__(self, region="eu-central-1"):
+        self.meta = types.SimpleNamespace(region_name=region)
+        self.calls = []
+
+    def generate_db_auth_token(
+        self, DBHostname, Port, DBUsername, Region
+    ):  # pylint: disable=C0103
+        self.calls.append((DBHostname, Port, DBUsername, Region))
+        return (
+            f"{DBHostname}:{Port}/?Action=connect&DBUser={DBUsername}&{len(self.calls)}"
+        )
+
+
+class TestTokenCache(unittest.TestCase):
+    """
+    Test cases for the TokenCache class.
+    """
+
+    def test_one_signing_per_key_under_concurrency(self):
+        cache = token_cache.TokenCache()
+        client = RecordingClient()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            tokens = set(
+                executor.map(
+                    lambda _: cache.get(client, "qa.rds", 5432, "qa_iam"), range(64)
+                )
+            )
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(len(tokens), 1)
+        self.assertEqual(cache.signings, 1)
+
+    def test_tokens_are_keyed_by_endpoint_and_user(self):
+        cache = token_cache.TokenCache()
+        client = RecordingClient()
+        for host, port, user in (
+            ("qa.rds", 5432, "a"),
+            ("qa.rds", 5432, "b"),
+            ("qa.proxy", 5432, "a"),
+            ("qa.rds", "5432", "a"),
+        ):
+            cache.get(client, host, port, user)
+        cache.get(RecordingClient("eu-west-1"), "qa.rds", 5432, "a")
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(cache.signings, 4)
+
+    def test_tokens_are_signed_again_before_expiry(self):
+        cache = token_cache.TokenCache(lifetime=900, margin=900)
+        client = RecordingClient()
+        cache.get(client, "qa.rds", 5432, "a")
+        cache.get(client, "qa.rds", 5432, "a")
+        self.assertEqual(len(client.calls), 2)
+
+    def test_invalidate(self):
+        cache = token_cache.TokenCache()
+        client = RecordingClient()
+        cache.get(client, "qa.rds", 5432, "a")
+        cache.invalidate("qa.rds", 5432, "a")
+        self.assertEqual(cache.key_locks, {})
+        cache.get(client, "qa.rds", 5432, "a")
+        self.assertEqual(len(client.calls), 2)
+
+
+class TestIamConnectionPool(unittest.TestCase):
+    """
+    Test cases for the connections of the IamConnectionPool class.
+    """
+
+    def test_dsn_gets_the_cached_token(self):
+        cache = token_cache.TokenCache()
+        client = RecordingClient()
+        dsn = "host=qa.rds port=5432 user=qa_iam dbname=qadb sslmode=verify-full"
+        first = parse_dsn(token_cache.get_iam_dsn(dsn, client, cache))
+        second = parse_dsn(token_cache.get_iam_dsn(dsn, client, cache))
+        self.assertEqual(
+            first["password"], "qa.rds:5432/?Action=connect&DBUser=qa_iam&1"
+        )
+        self.assertEqual(second, first)
+        self.assertEqual(client.calls, [("qa.rds", 5432, "qa_iam", "eu-central-1")])
+
+    def test_pool_signs_before_connecting(self):
+        # Nothing listens on the port, so every connect fails after signing.
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+        client = RecordingClient()
+        pool = token_cache.IamConnectionPool(
+            0,
+            2,
+            client,
+            cache=token_cache.TokenCache(),
+            host="127.0.0.1",
+            port=port,
+            user="qa_iam",
+            dbname="qadb",
+        )
+        for _ in range(2):
+            with self.assertRaises(psycopg2.OperationalError):
+                pool.getconn()
+        pool.closeall()
+        self.assertEqual(client.calls, [("127.0.0.1", port, "qa_iam", "eu-central-1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Upgrade regression suite test cases.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import boto3
+import numpy as np
+import psycopg2
+from moto import mock_aws
+
+import upgrade
+from test_describe_instances import create_instance
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+SESSION = "10.0.1.5(50412):qa_user@qadb:[101]"
+
+# A recorded postgresql log with a simple and an extended protocol statement.
+LOG = "\n".join(
+    [
+        f"2024-05-01 12:00:01 UTC:{SESSION}:LOG:  "
+        "duration: 1.500 ms  statement: SELECT * FROM qa_accounts WHERE aid = 42",
+        f"2024-05-01 12:00:02 UTC:{SESSION}:LOG:  duration: 0.800 ms  "
+        "execute <unnamed>: SELECT * FROM qa_accounts",
+        "\tWHERE aid = $1 AND name = $2",
+        f"2024-05-01 12:00:02 UTC:{SESSION}:DETAIL:  "
+        "parameters: $1 = '7', $2 = 'it''s'",
+        f"2024-05-01 12:00:03 UTC:{SESSION}:LOG:  statement: VACUUM qa_accounts",
+        f"2024-05-01 12:00:04 UTC:{SESSION}:LOG:  "
+        "statement: UPDATE qa_accounts SET abalance = 0 WHERE aid = $1",
+    ]
+)
+
+
+class TestCapture(unittest.TestCase):
+    """
+    The workload read from a postgresql log and the replay schedule.
+    """
+
+    def test_read_log(self):
+        capture = upgrade.WorkloadCapture()
+        self.assertEqual(capture.read_log(LOG.splitlines()), 4)
+        workload = capture.to_dict()
+        self.assertEqual(
+            workload["statements"]["select * from qa_accounts where aid = ?"],
+            {
+                "calls": 1,
+                "mean_ms": None,
+                "samples": ["SELECT * FROM qa_accounts WHERE aid = 42"],
+            },
+        )
+        self.assertEqual(
+            workload["statements"][
+                "select * from qa_accounts where aid = ? and name = ?"
+            ]["samples"],
+            ["SELECT * FROM qa_accounts\n\tWHERE aid = '7' AND name = 'it''s'"],
+        )
+        self.assertEqual(
+            workload["unreplayable"],
+            ["update qa_accounts set abalance = ? where aid = ?"],
+        )
+
+    def test_schedule(self):
+        workload = {
+            "statements": {
+                "a": {"calls": 1000, "samples": ["SELECT 1"]},
+                "b": {"calls": 1, "samples": ["SELECT 2", "SELECT 3"]},
+            }
+        }
+        items = upgrade.schedule(workload, 200, minimum=30, seed=3)
+        self.assertEqual(len(items), 200)
+        self.assertEqual(items, upgrade.schedule(workload, 200, minimum=30, seed=3))
+        self.assertGreaterEqual(sum(1 for key, _ in items if key == "b"), 30)
+
+    def test_non_transactional_statements_are_skipped(self):
+        capture = upgrade.WorkloadCapture()
+        for statement in (
+            "SELECT nextval('qa_history_id_seq')",
+            "SELECT pg_advisory_lock(42)",
+            "SELECT pg_advisory_xact_lock(42)",
+            "SELECT * FROM qa_accounts WHERE aid = 1 FOR UPDATE",
+        ):
+            capture.add_sample(statement)
+        self.assertEqual(
+            sorted(capture.to_dict()["statements"]),
+            [
+                "select * from qa_accounts where aid = ? for update",
+                "select pg_advisory_xact_lock(?)",
+            ],
+        )
+
+
+class FakeCursor:
+    def __init__(self, executed, failing):
+        self.executed = executed
+        self.failing = failing
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement):
+        self.executed.append(statement)
+        if statement in self.failing:
+            raise psycopg2.ProgrammingError("function does not exist")
+        self.description = [("column",)] if statement.startswith("SELECT") else None
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, failing=()):
+        self.executed = []
+        self.failing = failing
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self.executed, self.failing)
+
+    def close(self):
+        pass
+
+
+class TestReplayer(unittest.TestCase):
+    """
+    The replay of the statements in transactions that are rolled back.
+    """
+
+    def test_every_statement_is_rolled_back(self):
+        conn = FakeConnection(failing=("SELECT qa_missing()",))
+        items = [
+            ("read", "SELECT * FROM qa_accounts FOR UPDATE"),
+            ("write", "UPDATE qa_accounts SET abalance = 0"),
+            ("missing", "SELECT qa_missing()"),
+        ]
+        replayer = upgrade.Replayer({}, clients=1)
+        with mock.patch.object(upgrade.psycopg2, "connect", return_value=conn):
+            replayer.run(items, warmup=False)
+        self.assertTrue(conn.autocommit)
+        self.assertEqual(
+            conn.executed,
+            [
+                part
+                for _, statement in items
+                for part in ("BEGIN", statement, "ROLLBACK")
+            ],
+        )
+        self.assertEqual(sorted(replayer.latencies), ["read", "write"])
+        self.assertEqual(replayer.errors, {"missing": 1})
+
+
+class TestCompare(unittest.TestCase):
+    """
+    The per-fingerprint comparison of a target with the baseline.
+    """
+
+    def test_compare(self):
+        rng = np.random.default_rng(1)
+        baseline = {
+            "same": list(rng.lognormal(-6, 0.3, 200)),
+            "slower": list(rng.lognormal(-6, 0.3, 200)),
+        }
+        candidate = {
+            "same": list(rng.lognormal(-6, 0.3, 200)),
+            "slower": list(rng.lognormal(-5.5, 0.3, 200)),
+            "new": [0.001],
+        }
+        rows = upgrade.compare(baseline, candidate)
+        self.assertEqual(
+            [(row["fingerprint"], row["verdict"]) for row in rows],
+            [("slower", "regressed"), ("same", "unchanged")],
+        )
+        self.assertGreater(rows[0]["median_ratio"], 1.5)
+
+
+@mock_aws
+class TestTargets(unittest.TestCase):
+    """
+    The replay targets from the command line.
+    """
+
+    def parse(self, *arguments):
+        argv = ["upgrade.py", "replay", "--password", "secret", *arguments]
+        with mock.patch.object(sys, "argv", argv), mock.patch.object(
+            upgrade, "replay", return_value=0
+        ) as replay:
+            upgrade.main()
+        return replay.call_args.args[0]
+
+    def test_command_line_order(self):
+        create_instance(
+            boto3.client("rds", region_name="eu-central-1"), "qa", managed=True
+        )
+        args = self.parse(
+            "--target-identifier", "old=qa", "--target", "new=127.0.0.1:5433"
+        )
+        targets = upgrade.get_targets(args)
+        self.assertEqual([name for name, _ in targets], ["old", "new"])
+        self.assertIn("connection_factory", targets[0][1])
+        self.assertEqual(
+            (targets[1][1]["host"], targets[1][1]["port"], targets[1][1]["password"]),
+            ("127.0.0.1", 5433, "secret"),
+        )
+
+    def test_missing_instance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "workload.json")
+            with open(path, "w", encoding="utf-8") as output:
+                output.write('{"statements": {}}')
+            args = self.parse(
+                "--workload",
+                path,
+                "--target",
+                "old=127.0.0.1",
+                "--target-identifier",
+                "new",
+            )
+            self.assertIsNone(upgrade.get_targets(args)[1][1])
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(upgrade.replay(args), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# pylint: disable=C0115,C0116,R0903
+"""
+Workload test cases.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+import psycopg2
+from moto import mock_aws
+
+import workload
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+class TickingClock:
+    """
+    A clock that moves a millisecond per reading and jumps on sleep.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def perf_counter(self) -> float:
+        self.now += 0.001
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement, _arguments=None):
+        if self.conn.failures > 0:
+            self.conn.failures -= 1
+            raise psycopg2.OperationalError("server closed the connection")
+        self.conn.statements.append(statement)
+
+    def fetchone(self):
+        return (0,)
+
+
+class FakeConnection:
+    def __init__(self, failures: int = 0, broken: bool = False):
+        self.failures = failures
+        self.broken = broken
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def count_kinds(conn: FakeConnection) -> dict:
+    # The TPC-B transaction is the only one that updates tellers.
+    tpcb: int = sum(
+        statement.startswith("UPDATE qa_tellers") for statement in conn.statements
+    )
+    return {"select": conn.commits - tpcb, "tpcb": tpcb}
+
+
+class TestHistogram(unittest.TestCase):
+    """
+    The bucketing of latency samples.
+    """
+
+    def test_upper_bounds_are_inclusive(self):
+        counts = workload.histogram([0.0005, 0.001, 0.0010001, 0.002])
+        self.assertEqual(counts["le_0.5ms"], 1)
+        self.assertEqual(counts["le_1ms"], 1)
+        self.assertEqual(counts["le_2ms"], 2)
+
+    def test_overflow(self):
+        counts = workload.histogram([0.0, 1.0, 1.5, 60.0])
+        self.assertEqual(counts["le_0.5ms"], 1)
+        self.assertEqual(counts["le_1000ms"], 1)
+        self.assertEqual(counts["le_inf"], 2)
+        self.assertEqual(sum(counts.values()), 4)
+
+    def test_empty(self):
+        counts = workload.histogram([])
+        self.assertEqual(len(counts), len(workload.HISTOGRAM_BUCKETS_MS))
+        self.assertEqual(sum(counts.values()), 0)
+
+
+class TestWorkload(unittest.TestCase):
+    """
+    The transaction mix and the error accounting of a run against fake
+    connections.
+    """
+
+    def setUp(self):
+        self.clock = TickingClock()
+
+    def run_workload(self, connections: list, profile: str = "mixed") -> dict:
+        with mock.patch.object(
+            workload.time, "perf_counter", self.clock.perf_counter
+        ), mock.patch.object(
+            workload.time, "sleep", self.clock.sleep
+        ), mock.patch.object(
+            workload.psycopg2, "connect", side_effect=connections
+        ):
+            return workload.Workload({}, scale=2).run(profile, clients=1, duration=3.0)
+
+    def test_profile_selection(self):
+        for profile, mix in workload.PROFILES.items():
+            conn = FakeConnection()
+            report = self.run_workload([conn], profile)
+            kinds = count_kinds(conn)
+            self.assertEqual(report["transactions"], conn.commits)
+            self.assertGreater(min(kinds.values()), 0, msg=profile)
+            share = kinds["select"] / report["transactions"]
+            self.assertAlmostEqual(share, mix["select"], delta=0.05, msg=profile)
+            self.assertEqual(report["errors"], 0)
+            self.assertTrue(conn.closed)
+
+    def test_report(self):
+        report = self.run_workload([FakeConnection()], "read-heavy")
+        self.assertEqual(set(report["per_type"]), {"select", "tpcb"})
+        self.assertEqual(sum(report["histogram"].values()), report["transactions"])
+        self.assertEqual(report["latency"]["count"], report["transactions"])
+
+    def test_failed_transaction_keeps_the_connection(self):
+        conn = FakeConnection(failures=2)
+        report = self.run_workload([conn])
+        self.assertEqual(report["errors"], 2)
+        self.assertEqual(conn.rollbacks, 2)
+        self.assertEqual(report["transactions"], conn.commits)
+
+    def test_reconnect_after_broken_connection(self):
+        broken = FakeConnection(failures=1, broken=True)
+        replacement = FakeConnection()
+        report = self.run_workload(
+            [
+                psycopg2.OperationalError("the database system is starting up"),
+                broken,
+                replacement,
+            ]
+        )
+        # The failed connect and the failed transaction.
+        self.assertEqual(report["errors"], 2)
+        self.assertEqual(self.clock.sleeps, [workload.RECONNECT_DELAY])
+        self.assertTrue(broken.closed)
+        self.assertEqual(broken.commits, 0)
+        self.assertEqual(report["transactions"], replacement.commits)
+        self.assertTrue(replacement.closed)
+
+
+@mock_aws
+class TestMain(unittest.TestCase):
+    """
+    The exit code of the command line.
+    """
+
+    def test_missing_instance(self):
+        with mock.patch.object(sys, "argv", ["workload.py", "--identifier", "missing"]):
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(workload.main(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0903
+"""
+Token cache
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from psycopg2.extensions import connection, make_dsn, parse_dsn
+from psycopg2.pool import ThreadedConnectionPool
+
+from secret_cache import drop_key_lock
+
+# IAM database authentication tokens are valid for 15 minutes.
+TOKEN_LIFETIME: float = 900
+
+
+class TokenCache:
+    """
+    Thread safe cache of IAM database authentication tokens.
+
+    Tokens are keyed by host, port, user and region and reused until shortly
+    before they expire. generate_db_auth_token signs locally without calling
+    AWS, but signing per connection still costs CPU under a high connection
+    rate. Concurrent lookups of the same key wait for a single signing.
+    """
+
+    def __init__(self, lifetime: float = TOKEN_LIFETIME, margin: float = 60) -> None:
+        """Class constructor.
+
+        :param lifetime: Seconds a token is valid. Default: 900
+        :param margin: Seconds before the expiry a new token is signed. Default: 60
+        :type lifetime: float
+        :type margin: float
+        """
+        self.ttl: float = max(0.0, lifetime - margin)
+        self.entries: dict = {}
+        self.lock = threading.Lock()
+        self.key_locks: dict = {}
+        self.signings: int = 0
+
+    def __lookup(self, key: tuple) -> str:
+        """
+        Return a cached token that is still fresh, or None.
+
+        :return: str
+        """
+        with self.lock:
+            entry: tuple = self.entries.get(key, None)
+            if entry is None:
+                return None
+            signed_at, token = entry
+            if time.monotonic() - signed_at >= self.ttl:
+                del self.entries[key]
+                drop_key_lock(self.key_locks, key)
+                return None
+            return token
+
+    def get(self, client, host: str, port: int, user: str) -> str:
+        """
+        Return an authentication token, signing a new one only when none is
+        cached or the cached one is about to expire.
+
+        :param client: A boto3 RDS client in the region of the database
+        :param host: The instance or proxy endpoint address
+        :param port: The endpoint port
+        :param user: The database user, which needs the rds_iam role
+        :type host: str
+        :type port: int
+        :type user: str
+        :return: str
+        """
+        key: tuple = (host, int(port), user, client.meta.region_name)
+        token: str = self.__lookup(key)
+        if token is not None:
+            return token
+        with self.lock:
+            key_lock: threading.Lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            token = self.__lookup(key)
+            if token is not None:
+                return token
+            token = client.generate_db_auth_token(
+                DBHostname=host,
+                Port=int(port),
+                DBUsername=user,
+                Region=client.meta.region_name,
+            )
+            with self.lock:
+                self.signings += 1
+                self.entries[key] = (time.monotonic(), token)
+            logging.debug(f"Signed an authentication token for {user}@{host}")
+            return token
+
+    def invalidate(self, host: str, port: int, user: str) -> None:
+        """
+        Drop the cached tokens of an endpoint and user, e.g. after a rejected
+        login.
+
+        :param host: The endpoint address
+        :param port: The endpoint port
+        :param user: The database user
+        :type host: str
+        :type port: int
+        :type user: str
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[:3] == (host, port, user)]:
+                del self.entries[key]
+            for key in [key for key in self.key_locks if key[:3] == (host, port, user)]:
+                drop_key_lock(self.key_locks, key)
+
+
+def get_iam_dsn(dsn: str, client, cache: "TokenCache") -> str:
+    """
+    Return the connection string with a cached token as the password.
+
+    :param dsn: The connection string without a password
+    :param client: A boto3 RDS client in the region of the database
+    :param cache: The token cache
+    :type dsn: str
+    :type cache: TokenCache
+    :return: str
+    """
+    parameters: dict = parse_dsn(dsn)
+    token: str = cache.get(
+        client,
+        parameters["host"],
+        parameters.get("port", 5432),
+        parameters["user"],
+    )
+    return make_dsn(dsn, password=token)
+
+
+class IamConnection(connection):
+    """
+    psycopg2 connection that logs in with a token from the cache. Used as the
+    connection_factory of psycopg2.connect().
+    """
+
+    def __init__(self, dsn: str, *args, client=None, cache: "TokenCache" = None):
+        """Class constructor.
+
+        :param dsn: The connection string built by psycopg2.connect()
+        :param client: A boto3 RDS client in the region of the database
+        :param cache: The token cache
+        :type dsn: str
+        :type cache: TokenCache
+        """
+        super().__init__(get_iam_dsn(dsn, client, cache), *args)
+
+
+class IamConnectionPool(ThreadedConnectionPool):
+    """
+    Thread safe psycopg2 connection pool that logs in with IAM authentication.
+    Every new connection is an IamConnection with a token from the cache, so
+    the pool keeps working past the lifetime of the token it was created with.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        client,
+        cache: "TokenCache" = None,
+        **parameters,
+    ) -> None:
+        """Class constructor.
+
+        :param minconn: The connections opened up front
+        :param maxconn: The maximum number of connections
+        :param client: A boto3 RDS client in the region of the database
+        :param cache: The token cache. Default: None, the shared cache
+        :param parameters: The psycopg2 connection parameters without a password
+        :type minconn: int
+        :type maxconn: int
+        :type cache: TokenCache
+        """
+        self.client = client
+        self.cache: TokenCache = cache or SHARED_TOKEN_CACHE
+        super().__init__(
+            minconn,
+            maxconn,
+            connection_factory=functools.partial(
+                IamConnection, client=client, cache=self.cache
+            ),
+            **parameters,
+        )
+
+
+# Shared by every connection path in the process.
+SHARED_TOKEN_CACHE: TokenCache = TokenCache()
@@ -0,0 +1,651 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0902,R0903,R0913,R0914
+"""
+Engine upgrade regression suite
+"""
+
+import argparse
+import functools
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import psycopg2
+
+import probe
+import rds
+from log_analyzer import DURATION, LOG_RECORD, fingerprint, read_records
+from security_groups import parse_address
+from stats import holm, mann_whitney, summarize
+
+STATEMENT = re.compile(r"^statement: (?P<statement>.*)$", re.DOTALL)
+# The bind parameters of an extended protocol statement, logged as a DETAIL
+# record after it, e.g. parameters: $1 = '42', $2 = NULL
+PARAMETERS = re.compile(r"^parameters: (?P<parameters>.*)$", re.DOTALL)
+PARAMETER = re.compile(r"\$(?P<number>\d+) = (?P<value>'(?:[^']|'')*'|NULL)")
+PLACEHOLDER = re.compile(r"\$(\d+)\b")
+# Only statements that can be replayed without side effects outside of a
+# transaction that is rolled back.
+REPLAYABLE = re.compile(r"^\s*(?:select|with|insert|update|delete|values)\b", re.I)
+# Calls whose effects a rollback doesn't undo: sequence changes and session
+# level advisory locks, which would also block the other clients.
+NON_TRANSACTIONAL = re.compile(
+    r"\b(?:nextval|setval|pg_advisory_lock|pg_advisory_lock_shared)\s*\(", re.I
+)
+PG_STAT_STATEMENTS: str = """
+SELECT s.query, s.calls, s.mean_exec_time
+FROM pg_stat_statements s
+JOIN pg_database d ON d.oid = s.dbid
+WHERE d.datname = current_database()
+ORDER BY s.total_exec_time DESC
+LIMIT %s
+"""
+
+
+def is_replayable(statement: str) -> bool:
+    """
+    Check if a statement can be replayed in a transaction that is rolled back
+    without leaving any effect behind.
+
+    :param statement: The statement
+    :type statement: str
+    :return: bool
+    """
+    return (
+        REPLAYABLE.match(statement) is not None
+        and NON_TRANSACTIONAL.search(statement) is None
+    )
+
+
+class WorkloadCapture:
+    """
+    Class for capturing a workload as statement fingerprints with their call
+    counts and executable samples.
+
+    pg_stat_statements has the complete set of statements and their call
+    counts, but with the constants replaced by $n placeholders. A recorded
+    log has the statements with their constants. Both normalize to the same
+    fingerprint, so a capture from both replays the call mix of
+    pg_stat_statements with the constants from the log.
+    """
+
+    def __init__(self, samples: int = 20) -> None:
+        """Class constructor.
+
+        :param samples: The executable samples kept per fingerprint. Default: 20
+        :type samples: int
+        """
+        self.samples: int = samples
+        self.statements: dict = {}
+        self.sources: list = []
+
+    def __entry(self, statement: str) -> dict:
+        """
+        Return the entry of the statement's fingerprint, created when missing.
+
+        :return: dict
+        """
+        return self.statements.setdefault(
+            fingerprint(statement), {"calls": 0, "mean_ms": None, "samples": []}
+        )
+
+    def add_sample(self, statement: str) -> None:
+        """
+        Count an executed statement and keep it as a sample until the
+        fingerprint has enough.
+
+        :param statement: The statement with its constants
+        :type statement: str
+        """
+        if not is_replayable(statement):
+            return
+        entry: dict = self.__entry(statement)
+        entry["calls"] += 1
+        if PLACEHOLDER.search(statement) is not None:
+            return
+        if len(entry["samples"]) < self.samples and statement not in entry["samples"]:
+            entry["samples"].append(statement)
+
+    def read_log(self, lines) -> int:
+        """
+        Capture the statements of a PostgreSQL log, written with
+        log_min_duration_statement = 0 or log_statement = all. Parameters of
+        extended protocol statements are substituted from their DETAIL record.
+
+        :param lines: The log lines
+        :return: int the number of statements read
+        """
+        pending: dict = {}
+        count: int = 0
+        for record in read_records(lines):
+            match = LOG_RECORD.match(record)
+            message: str = match.group("message")
+            pid: str = match.group("pid")
+            if match.group("level") == "DETAIL":
+                parameters = PARAMETERS.match(message)
+                if parameters is not None and pid in pending:
+                    self.add_sample(
+                        bind(pending.pop(pid), parameters.group("parameters"))
+                    )
+                continue
+            statement: str = None
+            duration = DURATION.match(message)
+            if duration is not None:
+                statement = duration.group("statement")
+            else:
+                logged = STATEMENT.match(message)
+                if logged is not None:
+                    statement = logged.group("statement")
+            if statement is None:
+                continue
+            count += 1
+            if PLACEHOLDER.search(statement) is not None:
+                # Wait for the parameters, counted then.
+                pending[pid] = statement
+                continue
+            pending.pop(pid, None)
+            self.add_sample(statement)
+        # Statements whose parameters weren't logged are counted only.
+        for statement in pending.values():
+            self.add_sample(statement)
+        self.sources.append("log")
+        return count
+
+    def read_pg_stat_statements(self, conn, limit: int = 500) -> int:
+        """
+        Capture the call counts and mean execution times of the database's
+        statements from pg_stat_statements. Statements without placeholders
+        become samples too.
+
+        :param conn: A psycopg2 connection to the captured database
+        :param limit: The statements with the largest total time. Default: 500
+        :type limit: int
+        :return: int the number of statements read, None without the extension
+        """
+        with conn.cursor() as sql:
+            sql.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'"
+            )
+            if sql.fetchone() is None:
+                logging.warning("pg_stat_statements is not installed")
+                return None
+            sql.execute(PG_STAT_STATEMENTS, (limit,))
+            rows: list = sql.fetchall()
+        for query, calls, mean_ms in rows:
+            if not is_replayable(query):
+                continue
+            entry: dict = self.__entry(query)
+            # The counts of pg_stat_statements are complete, unlike a log
+            # sample, so they replace the counted log statements.
+            entry["calls"] = int(calls)
+            entry["mean_ms"] = float(mean_ms)
+            if PLACEHOLDER.search(query) is None and query not in entry["samples"]:
+                entry["samples"].append(query)
+        self.sources.append("pg_stat_statements")
+        return len(rows)
+
+    def to_dict(self) -> dict:
+        """
+        Return the workload. Fingerprints without an executable sample can't be
+        replayed and are listed separately.
+
+        :return: dict
+        """
+        return {
+            "sources": self.sources,
+            "statements": {
+                key: entry
+                for key, entry in self.statements.items()
+                if len(entry["samples"]) > 0
+            },
+            "unreplayable": sorted(
+                key for key, entry in self.statements.items() if not entry["samples"]
+            ),
+        }
+
+
+def bind(statement: str, parameters: str) -> str:
+    """
+    Substitute the $n placeholders of a statement with the logged literals.
+
+    :param statement: The statement with placeholders
+    :param parameters: The logged parameters, e.g. $1 = '42', $2 = NULL
+    :type statement: str
+    :type parameters: str
+    :return: str
+    """
+    values: dict = {
+        match.group("number"): match.group("value")
+        for match in PARAMETER.finditer(parameters)
+    }
+    return PLACEHOLDER.sub(
+        lambda match: values.get(match.group(1), match.group(0)), statement
+    )
+
+
+def schedule(workload: dict, executions: int, minimum: int = 30, seed: int = 1) -> list:
+    """
+    Return the statements to replay. Every fingerprint runs at least minimum
+    times, so it can be tested for a significant change, and the remaining
+    executions follow the captured call mix. The same seed gives the same
+    schedule for every target.
+
+    :param workload: The captured workload
+    :param executions: The number of executions
+    :param minimum: The executions per fingerprint at least. Default: 30
+    :param seed: The random seed. Default: 1
+    :type workload: dict
+    :type executions: int
+    :type minimum: int
+    :type seed: int
+    :return: list of (fingerprint, statement)
+    """
+    rng = random.Random(seed)
+    statements: dict = workload["statements"]
+    keys: list = sorted(statements)
+    if len(keys) == 0:
+        return []
+    chosen: list = [key for key in keys for _ in range(minimum)]
+    weights: list = [max(1, statements[key]["calls"]) for key in keys]
+    chosen += rng.choices(keys, weights=weights, k=max(0, executions - len(chosen)))
+    rng.shuffle(chosen)
+    return [(key, rng.choice(statements[key]["samples"])) for key in chosen]
+
+
+class Replayer:
+    """
+    Class for replaying a workload against a database with a fixed number of
+    concurrent clients.
+
+    Every statement runs in a transaction that is rolled back, so the data
+    stays the same for every target and round. Reads too, as a SELECT can
+    write through a function or lock rows with FOR UPDATE. Only the
+    statement itself is timed.
+    """
+
+    def __init__(
+        self, parameters: dict, clients: int = 8, statement_timeout: int = 30000
+    ) -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters of the target
+        :param clients: The number of concurrent clients. Default: 8
+        :param statement_timeout: Milliseconds before a statement is cancelled.
+            Default: 30000
+        :type parameters: dict
+        :type clients: int
+        :type statement_timeout: int
+        """
+        self.parameters: dict = dict(
+            parameters, options=f"-c statement_timeout={statement_timeout}"
+        )
+        self.clients: int = clients
+        self.latencies: dict = {}
+        self.errors: dict = {}
+        self.lock = threading.Lock()
+
+    def __client(self, items: list, warmup: bool) -> None:
+        """
+        Execute the statements on one connection and record the latencies.
+
+        :param items: The (fingerprint, statement) pairs of the client
+        :param warmup: Execute every distinct statement once untimed first
+        """
+        latencies: dict = {}
+        errors: dict = {}
+        conn = psycopg2.connect(**self.parameters)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as sql:
+                if warmup:
+                    for statement in {statement for _, statement in items}:
+                        try:
+                            self.__execute(sql, statement)
+                        except psycopg2.Error as error:
+                            logging.debug(error)
+                for key, statement in items:
+                    try:
+                        latency: float = self.__execute(sql, statement)
+                    except psycopg2.Error as error:
+                        errors[key] = errors.get(key, 0) + 1
+                        logging.debug(f"{key}: {error}")
+                        continue
+                    latencies.setdefault(key, []).append(latency)
+        finally:
+            conn.close()
+        with self.lock:
+            for key, values in latencies.items():
+                self.latencies.setdefault(key, []).extend(values)
+            for key, count in errors.items():
+                self.errors[key] = self.errors.get(key, 0) + count
+
+    @staticmethod
+    def __execute(sql, statement: str) -> float:
+        """
+        Execute a statement and return its latency in seconds.
+
+        :return: float
+        """
+        sql.execute("BEGIN")
+        try:
+            start: float = time.perf_counter()
+            sql.execute(statement)
+            if sql.description is not None:
+                sql.fetchall()
+            return time.perf_counter() - start
+        finally:
+            sql.execute("ROLLBACK")
+
+    def run(self, items: list, warmup: bool = True) -> float:
+        """
+        Replay the statements, dealt round robin to the clients.
+
+        :param items: The (fingerprint, statement) pairs
+        :param warmup: Execute every distinct statement once untimed per
+            client first, so cold caches don't count. Default: True
+        :type items: list
+        :type warmup: bool
+        :return: float elapsed seconds
+        """
+        clients: int = self.clients
+        chunks: list = [items[index::clients] for index in range(clients)]
+        start: float = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.clients) as executor:
+            list(
+                executor.map(
+                    lambda chunk: self.__client(chunk, warmup),
+                    [chunk for chunk in chunks if chunk],
+                )
+            )
+        return time.perf_counter() - start
+
+
+def compare(
+    baseline: dict, candidate: dict, alpha: float = 0.05, threshold: float = 0.1
+) -> list:
+    """
+    Compare the latencies per fingerprint. A fingerprint regressed when its
+    latencies are significantly larger after the Holm correction and its
+    median grew by more than the threshold. Small but significant changes
+    are common with thousands of samples and are not reported.
+
+    :param baseline: Latencies in seconds per fingerprint on the old version
+    :param candidate: Latencies in seconds per fingerprint on the new version
+    :param alpha: The significance level. Default: 0.05
+    :param threshold: The relative change of the median that matters. Default: 0.1
+    :type baseline: dict
+    :type candidate: dict
+    :type alpha: float
+    :type threshold: float
+    :return: list of dict, the largest slowdowns first
+    """
+    rows: list = []
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        test: dict = mann_whitney(new, old)
+        old_median: float = float(np.median(old))
+        rows.append(
+            {
+                "fingerprint": key,
+                "old": summarize(old),
+                "new": summarize(new),
+                "median_ratio": (
+                    float(np.median(new)) / old_median if old_median > 0 else None
+                ),
+                "p_value": test["p_value"],
+                "effect": test["effect"],
+            }
+        )
+    adjusted: list = holm([row["p_value"] for row in rows])
+    for row, p_value in zip(rows, adjusted):
+        row["adjusted_p_value"] = p_value
+        ratio: float = row["median_ratio"]
+        significant: bool = p_value is not None and p_value < alpha
+        if significant and ratio is not None and ratio > 1 + threshold:
+            row["verdict"] = "regressed"
+        elif significant and ratio is not None and ratio < 1 / (1 + threshold):
+            row["verdict"] = "improved"
+        else:
+            row["verdict"] = "unchanged"
+    return sorted(rows, key=lambda row: -(row["median_ratio"] or 0))
+
+
+def get_server_version(parameters: dict) -> str:
+    """
+    Return the server version of a target.
+
+    :param parameters: psycopg2 connection parameters
+    :type parameters: dict
+    :return: str
+    """
+    conn = psycopg2.connect(**parameters)
+    try:
+        with conn.cursor() as sql:
+            sql.execute("SHOW server_version")
+            return sql.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def tag_target(kind: str, value: str) -> tuple:
+    """
+    Tag the value of a --target or --target-identifier argument with its kind,
+    so that both kinds share one list in the command line order.
+
+    :param kind: host or identifier
+    :param value: The argument value
+    :type kind: str
+    :type value: str
+    :return: tuple of (kind, value)
+    """
+    return kind, value
+
+
+def get_targets(args: argparse.Namespace) -> list:
+    """
+    Return the name and connection parameters of the replay targets in the
+    order they were given, as name=host[:port] with the credentials of the
+    connection arguments, or as name=identifier of RDS instances with their
+    own credentials. The parameters are None for an instance without an
+    endpoint or secret.
+
+    :param args: The parsed command line arguments
+    :type args: argparse.Namespace
+    :return: list of (name, dict)
+    """
+    targets: list = []
+    for kind, value in args.targets:
+        if kind == "host":
+            name, host, port = parse_address(value, args.port)
+            parameters: dict = {
+                "dbname": args.database,
+                "user": args.user,
+                "password": args.password,
+                "host": host,
+                "port": port,
+                "sslmode": args.sslmode,
+            }
+        else:
+            name, _, identifier = value.partition("=")
+            parameters = probe.get_qa_parameters(
+                rds.QA(
+                    database=args.database,
+                    region=args.region,
+                    log_level=logging.ERROR,
+                    identifier=identifier or name,
+                )
+            )
+        targets.append((name, parameters))
+    return targets
+
+
+def capture(args: argparse.Namespace) -> int:
+    """
+    Capture a workload from the command line.
+
+    :return: int
+    """
+    workload = WorkloadCapture(samples=args.samples)
+    for path in args.log:
+        with open(path, encoding="utf-8", errors="replace") as lines:
+            logging.info(f"Read {workload.read_log(lines)} statements from {path}")
+    if args.pg_stat_statements:
+        parameters: dict = probe.get_connection_parameters(args)
+        if parameters is None:
+            logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+            return 1
+        conn = psycopg2.connect(**parameters)
+        try:
+            count: int = workload.read_pg_stat_statements(conn, args.limit)
+        finally:
+            conn.close()
+        if count is None:
+            return 1
+        logging.info(f"Read {count} statements from pg_stat_statements")
+    result: dict = workload.to_dict()
+    logging.info(
+        f"Captured {len(result['statements'])} replayable fingerprints, "
+        f"{len(result['unreplayable'])} without constants to replay them with"
+    )
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(result, output, indent=2)
+    return 0
+
+
+def replay(args: argparse.Namespace) -> int:
+    """
+    Replay a workload against the targets and compare the first with the
+    others from the command line.
+
+    :return: int 1 when a fingerprint regressed
+    """
+    with open(args.workload, encoding="utf-8") as source:
+        workload: dict = json.load(source)
+    targets: list = get_targets(args)
+    if len(targets) == 0:
+        logging.error("Give at least one --target or --target-identifier")
+        return 2
+    for name, parameters in targets:
+        if parameters is None:
+            logging.error(f"Target {name} has no endpoint or secret yet")
+            return 2
+    items: list = schedule(workload, args.executions, args.minimum, args.seed)
+    replayers: dict = {
+        name: Replayer(parameters, args.clients) for name, parameters in targets
+    }
+    report: dict = {"targets": {}, "comparisons": {}}
+    for name, parameters in targets:
+        report["targets"][name] = {"version": get_server_version(parameters)}
+    # Alternate the targets in rounds, so a drift over time, e.g. a noisy
+    # neighbour, affects all of them alike. Every other round runs them in
+    # reverse, so no target always runs right after another one's load.
+    rounds: int = max(1, args.rounds)
+    for number in range(rounds):
+        chunk: list = items[number::rounds]
+        order: list = targets if number % 2 == 0 else targets[::-1]
+        for name, _ in order:
+            elapsed: float = replayers[name].run(chunk, warmup=number == 0)
+            logging.info(
+                f"Round {number + 1}/{rounds}: {name} ran {len(chunk)} statements "
+                f"in {elapsed:.2f} s"
+            )
+    for name, replayer in replayers.items():
+        latencies: list = [
+            value for values in replayer.latencies.values() for value in values
+        ]
+        report["targets"][name].update(
+            {"latency": summarize(latencies), "errors": replayer.errors}
+        )
+    baseline: str = targets[0][0]
+    regressed: int = 0
+    for name, _ in targets[1:]:
+        rows: list = compare(
+            replayers[baseline].latencies,
+            replayers[name].latencies,
+            args.alpha,
+            args.threshold,
+        )
+        report["comparisons"][f"{baseline}..{name}"] = rows
+        # A statement that fails only on the new version regressed too, e.g.
+        # because of a removed function or a changed cast.
+        for key, count in replayers[name].errors.items():
+            if key not in replayers[baseline].errors:
+                regressed += 1
+                logging.warning(
+                    f"{count} executions failed on {name} only: {key[:120]}"
+                )
+        for row in rows:
+            if row["verdict"] == "regressed":
+                regressed += 1
+                logging.warning(
+                    f"{name} is {row['median_ratio']:.2f}x slower than {baseline} "
+                    f"(p={row['adjusted_p_value']:.2g}): {row['fingerprint'][:120]}"
+                )
+    print(json.dumps(report, indent=2))
+    return 1 if regressed > 0 else 0
+
+
+def main() -> int:
+    """
+    Capture a workload or replay it against an old and a new engine version
+    from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(
+        description="Find queries that got slower with an engine upgrade."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = subparsers.add_parser("capture", help="Capture a workload")
+    probe.add_connection_arguments(capture_parser)
+    capture_parser.add_argument(
+        "--log", action="append", default=[], help="A recorded PostgreSQL log"
+    )
+    capture_parser.add_argument("--pg-stat-statements", action="store_true")
+    capture_parser.add_argument("--limit", type=int, default=500)
+    capture_parser.add_argument("--samples", type=int, default=20)
+    capture_parser.add_argument("--output", default="workload.json")
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay a workload against the targets"
+    )
+    probe.add_connection_arguments(replay_parser)
+    replay_parser.add_argument("--workload", default="workload.json")
+    replay_parser.add_argument(
+        "--target",
+        dest="targets",
+        action="append",
+        default=[],
+        type=functools.partial(tag_target, "host"),
+        help="name=host[:port], the first target given is the baseline",
+    )
+    replay_parser.add_argument(
+        "--target-identifier",
+        dest="targets",
+        action="append",
+        default=[],
+        type=functools.partial(tag_target, "identifier"),
+        help="name=identifier of an RDS instance",
+    )
+    replay_parser.add_argument("--clients", type=int, default=8)
+    replay_parser.add_argument("--executions", type=int, default=5000)
+    replay_parser.add_argument("--minimum", type=int, default=30)
+    replay_parser.add_argument("--rounds", type=int, default=4)
+    replay_parser.add_argument("--seed", type=int, default=1)
+    replay_parser.add_argument("--alpha", type=float, default=0.05)
+    replay_parser.add_argument("--threshold", type=float, default=0.1)
+    args = probe.parse_arguments(parser)
+    if args.command == "capture":
+        return capture(args)
+    return replay(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# pylint: disable=W1203,R0914
+"""
+Workload
+"""
+
+import argparse
+import datetime
+import functools
+import logging
+import random
+import sys
+import time
+
+import numpy as np
+import psycopg2
+
+import monitoring
+import probe
+from stats import summarize
+
+ACCOUNTS_PER_SCALE: int = 100000
+TELLERS_PER_SCALE: int = 10
+
+# Share of each transaction type per profile.
+PROFILES: dict = {
+    "read-heavy": {"select": 0.9, "tpcb": 0.1},
+    "write-heavy": {"select": 0.1, "tpcb": 0.9},
+    "mixed": {"select": 0.5, "tpcb": 0.5},
+}
+
+# Seconds a client waits before it connects again after a failed connect.
+RECONNECT_DELAY: float = 0.5
+
+# Upper bounds in milliseconds of the latency histogram buckets.
+HISTOGRAM_BUCKETS_MS: list = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, np.inf]
+
+SCHEMA: tuple = (
+    "DROP TABLE IF EXISTS qa_history, qa_accounts, qa_tellers, qa_branches",
+    "CREATE TABLE qa_branches (bid int PRIMARY KEY, bbalance int, filler char(88))",
+    "CREATE TABLE qa_tellers (tid int PRIMARY KEY, bid int, tbalance int, filler char(84))",
+    "CREATE TABLE qa_accounts (aid int PRIMARY KEY, bid int, abalance int, filler char(84))",
+    "CREATE TABLE qa_history (tid int, bid int, aid int, delta int, "
+    "mtime timestamp, filler char(22))",
+)
+
+
+def get_instance_metadata(snapshot) -> dict:
+    """
+    Return the instance settings a benchmark result is compared by.
+
+    :param snapshot: The instance snapshot, or None for a local stand-in
+    :return: dict
+    """
+    if snapshot is None:
+        return {"instance_class": "local"}
+    return {
+        "identifier": snapshot.identifier,
+        "instance_class": snapshot.instance_class,
+        "engine_version": snapshot.engine_version,
+        "storage_type": snapshot.storage_type,
+        "allocated_storage": snapshot.allocated_storage,
+        "iops": snapshot.iops,
+        "storage_throughput": snapshot.storage_throughput,
+        "multi_az": snapshot.multi_az,
+    }
+
+
+def histogram(samples: list) -> dict:
+    """
+    Count latency samples given in seconds into millisecond buckets. A sample
+    counts in the first bucket whose upper bound it doesn't exceed.
+
+    :param samples: The latency samples in seconds
+    :type samples: list
+    :return: dict of bucket upper bound to count
+    """
+    buckets: np.ndarray = np.searchsorted(
+        HISTOGRAM_BUCKETS_MS, np.asarray(samples, dtype=float) * 1000, side="left"
+    )
+    counts: np.ndarray = np.bincount(buckets, minlength=len(HISTOGRAM_BUCKETS_MS))
+    labels: list = [f"le_{edge}ms" for edge in HISTOGRAM_BUCKETS_MS[:-1]] + ["le_inf"]
+    return {label: int(count) for label, count in zip(labels, counts)}
+
+
+class Workload:
+    """
+    Class for running pgbench-style OLTP profiles against a PostgreSQL database
+    """
+
+    def __init__(self, parameters: dict, scale: int = 1) -> None:
+        """Class constructor.
+
+        :param parameters: The psycopg2 connection parameters
+        :param scale: The data scale, 100000 accounts per unit. Default: 1
+        :type parameters: dict
+        :type scale: int
+        """
+        self.parameters: dict = parameters
+        self.scale: int = scale
+
+    def initialize(self) -> float:
+        """
+        Create the benchmark schema and generate its data server side.
+
+        :return: float seconds it took
+        """
+        start: float = time.perf_counter()
+        conn = psycopg2.connect(**self.parameters)
+        try:
+            with conn.cursor() as sql:
+                for statement in SCHEMA:
+                    sql.execute(statement)
+                sql.execute(
+                    "INSERT INTO qa_branches SELECT bid, 0, '' "
+                    "FROM generate_series(1, %s) AS bid",
+                    (self.scale,),
+                )
+                sql.execute(
+                    "INSERT INTO qa_tellers SELECT tid, (tid - 1) / %s + 1, 0, '' "
+                    "FROM generate_series(1, %s) AS tid",
+                    (TELLERS_PER_SCALE, TELLERS_PER_SCALE * self.scale),
+                )
+                sql.execute(
+                    "INSERT INTO qa_accounts SELECT aid, (aid - 1) / %s + 1, 0, '' "
+                    "FROM generate_series(1, %s) AS aid",
+                    (ACCOUNTS_PER_SCALE, ACCOUNTS_PER_SCALE * self.scale),
+                )
+            conn.commit()
+            conn.autocommit = True
+            with conn.cursor() as sql:
+                sql.execute("VACUUM ANALYZE qa_branches, qa_tellers, qa_accounts")
+        finally:
+            conn.close()
+        elapsed: float = time.perf_counter() - start
+        logging.info(f"Initialized scale {self.scale} in {elapsed:.2f}s")
+        return elapsed
+
+    def __select(self, sql, rng: random.Random) -> None:
+        """
+        Read the balance of a random account.
+        """
+        aid: int = rng.randint(1, ACCOUNTS_PER_SCALE * self.scale)
+        sql.execute("SELECT abalance FROM qa_accounts WHERE aid = %s", (aid,))
+        sql.fetchone()
+
+    def __tpcb(self, sql, rng: random.Random) -> None:
+        """
+        Run the TPC-B like transaction of pgbench.
+        """
+        aid: int = rng.randint(1, ACCOUNTS_PER_SCALE * self.scale)
+        tid: int = rng.randint(1, TELLERS_PER_SCALE * self.scale)
+        bid: int = rng.randint(1, self.scale)
+        delta: int = rng.randint(-5000, 5000)
+        sql.execute(
+            "UPDATE qa_accounts SET abalance = abalance + %s WHERE aid = %s",
+            (delta, aid),
+        )
+        sql.execute("SELECT abalance FROM qa_accounts WHERE aid = %s", (aid,))
+        sql.fetchone()
+        sql.execute(
+            "UPDATE qa_tellers SET tbalance = tbalance + %s WHERE tid = %s",
+            (delta, tid),
+        )
+        sql.execute(
+            "UPDATE qa_branches SET bbalance = bbalance + %s WHERE bid = %s",
+            (delta, bid),
+        )
+        sql.execute(
+            "INSERT INTO qa_history (tid, bid, aid, delta, mtime) "
+            "VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)",
+            (tid, bid, aid, delta),
+        )
+
+    def __run_client(self, profile: dict, deadline: float, seed: int) -> tuple:
+        """
+        Run transactions picked from the profile until the deadline.
+
+        A failed connect or a failed transaction counts as an error, and a
+        broken connection is replaced.
+
+        :return: tuple of (latencies per transaction type, error count)
+        """
+        rng = random.Random(seed)
+        kinds: list = list(profile)
+        weights: list = [profile[kind] for kind in kinds]
+        transactions: dict = {"select": self.__select, "tpcb": self.__tpcb}
+        latencies: dict = {kind: [] for kind in kinds}
+        errors: int = 0
+        conn = None
+        try:
+            while time.perf_counter() < deadline:
+                if conn is None:
+                    try:
+                        conn = psycopg2.connect(**self.parameters)
+                    except psycopg2.Error as error:
+                        errors += 1
+                        logging.debug(error)
+                        time.sleep(RECONNECT_DELAY)
+                        continue
+                kind: str = rng.choices(kinds, weights)[0]
+                start: float = time.perf_counter()
+                try:
+                    with conn.cursor() as sql:
+                        transactions[kind](sql, rng)
+                    conn.commit()
+                    latencies[kind].append(time.perf_counter() - start)
+                except psycopg2.Error as error:
+                    errors += 1
+                    logging.debug(error)
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        # The connection is gone, open a new one.
+                        conn.close()
+                        conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+        return latencies, errors
+
+    def run(
+        self, profile: str = "mixed", clients: int = 8, duration: float = 60
+    ) -> dict:
+        """
+        Run a profile with the given concurrency for the given duration.
+
+        :param profile: One of read-heavy, write-heavy or mixed. Default: mixed
+        :param clients: The number of concurrent clients. Default: 8
+        :param duration: The run time in seconds. Default: 60
+        :type profile: str
+        :type clients: int
+        :type duration: float
+        :return: dict
+        """
+        mix: dict = PROFILES[profile]
+        logging.info(f"Running {profile} with {clients} clients for {duration}s")
+        deadline: float = time.perf_counter() + duration
+        results, elapsed = probe.run_clients(
+            functools.partial(self.__run_client, mix, deadline), range(clients)
+        )
+
+        per_kind: dict = {kind: [] for kind in mix}
+        errors: int = 0
+        for latencies, client_errors in results:
+            errors += client_errors
+            for kind, samples in latencies.items():
+                per_kind[kind].extend(samples)
+        samples: list = [sample for kind in per_kind.values() for sample in kind]
+        return {
+            "profile": profile,
+            "scale": self.scale,
+            "clients": clients,
+            "duration_s": elapsed,
+            "transactions": len(samples),
+            "errors": errors,
+            "tps": len(samples) / elapsed if elapsed > 0 else 0.0,
+            "latency": summarize(samples),
+            "histogram": histogram(samples),
+            "per_type": {
+                kind: {
+                    "tps": len(kind_samples) / elapsed if elapsed > 0 else 0.0,
+                    "latency": summarize(kind_samples),
+                }
+                for kind, kind_samples in per_kind.items()
+            },
+        }
+
+
+def main() -> int:
+    """
+    Run workload profiles against the QA database from the command line.
+
+    :return: int
+    """
+    parser = argparse.ArgumentParser(description="Run OLTP workload profiles.")
+    probe.add_connection_arguments(parser)
+    parser.add_argument(
+        "--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES)
+    )
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--skip-init", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = probe.parse_arguments(parser)
+    parameters, snapshot = probe.get_target(args)
+    if parameters is None:
+        logging.error(f"Instance {args.identifier} has no endpoint or secret yet")
+        return 1
+
+    workload = Workload(parameters, scale=args.scale)
+    report: dict = {"instance": get_instance_metadata(snapshot), "runs": []}
+    if not args.skip_init:
+        report["initialize_s"] = workload.initialize()
+    start: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+    for profile in args.profiles:
+        report["runs"].append(workload.run(profile, args.clients, args.duration))
+    if snapshot is not None:
+        report["server"] = monitoring.collect(
+            snapshot.identifier,
+            start,
+            datetime.datetime.now(datetime.timezone.utc),
+            args.region,
+        )
+
+    probe.write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())